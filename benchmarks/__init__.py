@@ -0,0 +1 @@
+"""Benchmarks for ingestion and search."""
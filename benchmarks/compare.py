@@ -0,0 +1,46 @@
+"""Compare two benchmark reports.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import json
+
+METRICS = ("throughput_items_per_second", "p50_ms", "p95_ms", "p99_ms")
+
+
+def load_results(path: str) -> dict[str, dict]:
+    """Load a report and index its results by operation name."""
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {result["name"]: result for result in report["results"]}
+
+
+def compare(baseline: dict[str, dict], candidate: dict[str, dict]) -> str:
+    """Render the relative change of each metric for shared operations."""
+    header = f"{'operation':<28}" + "".join(f"{m.split('_')[0]:>14}" for m in METRICS)
+    lines = [header, "-" * len(header)]
+    for name in baseline:
+        if name not in candidate:
+            continue
+        cells = []
+        for metric in METRICS:
+            before, after = baseline[name][metric], candidate[name][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f"{change:>+13.1f}%")
+        lines.append(f"{name:<28}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point."""
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args(argv)
+    print(compare(load_results(args.baseline), load_results(args.candidate)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Deterministic embeddings and synthetic corpora for benchmarks."""
+
+import hashlib
+import math
+import random
+import uuid
+from collections.abc import Iterator
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Zipf-like vocabulary: a few very common words and a long tail of rare ones,
+# so keyword search sees realistic selectivity.
+VOCABULARY_SIZE = 5000
+
+
+def _vocabulary(seed: int) -> list[str]:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings using the hashing trick.
+
+    Texts that share words get similar vectors, so semantic search returns
+    meaningful neighbours (and recall can be measured) without calling a
+    remote model.
+    """
+
+    def __init__(self, size: int = 1536) -> None:
+        """Initialize with the output dimension."""
+        self.size = size
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.size] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of documents."""
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query."""
+        return self._embed(text)
+
+
+class SyntheticCorpus:
+    """Generate reproducible chunks and queries from a seeded vocabulary."""
+
+    def __init__(
+        self,
+        *,
+        chunk_chars: int = 1000,
+        chunks_per_file: int = 20,
+        seed: int = 42,
+    ) -> None:
+        """Initialize the generator.
+
+        Args:
+            chunk_chars: Approximate number of characters per chunk.
+            chunks_per_file: Number of chunks sharing the same ``file_id``.
+            seed: Seed for every random choice, so runs are comparable.
+        """
+        self.chunk_chars = chunk_chars
+        self.chunks_per_file = chunks_per_file
+        self.seed = seed
+        self.words = _vocabulary(seed)
+        # Zipf weights: word rank r is drawn with probability ~ 1 / r
+        self._weights = [1.0 / (rank + 1) for rank in range(len(self.words))]
+
+    def _text(self, rng: random.Random, chars: int) -> str:
+        words: list[str] = []
+        length = 0
+        while length < chars:
+            chunk = rng.choices(self.words, weights=self._weights, k=32)
+            words.extend(chunk)
+            length += sum(len(w) + 1 for w in chunk)
+        return " ".join(words)[:chars].rsplit(" ", 1)[0]
+
+    def text(self, index: int, chars: int | None = None) -> str:
+        """Return the text of chunk ``index``."""
+        rng = random.Random(f"{self.seed}:text:{index}")
+        return self._text(rng, chars or self.chunk_chars)
+
+    def document(self, index: int, chars: int) -> str:
+        """Return a text of about ``chars`` characters with lines and paragraphs.
+
+        Lines hold 40 to 120 characters and paragraphs 1 to 8 lines, like
+        prose or markdown, so every separator of a text splitter is exercised.
+        """
+        rng = random.Random(f"{self.seed}:document:{index}")
+        paragraphs = []
+        length = 0
+        while length < chars:
+            lines = [
+                self._text(rng, rng.randint(40, 120)) for _ in range(rng.randint(1, 8))
+            ]
+            paragraphs.append("\n".join(lines))
+            length += sum(len(line) + 1 for line in lines) + 1
+        return "\n\n".join(paragraphs)
+
+    def batches(self, num_chunks: int, batch_size: int) -> Iterator[list[Document]]:
+        """Yield ``num_chunks`` documents in batches without materializing all."""
+        for start in range(0, num_chunks, batch_size):
+            batch = []
+            for index in range(start, min(start + batch_size, num_chunks)):
+                file_index = index // self.chunks_per_file
+                file_id = uuid.UUID(
+                    bytes=hashlib.md5(f"{self.seed}:{file_index}".encode()).digest()
+                )
+                batch.append(
+                    Document(
+                        page_content=self.text(index),
+                        metadata={
+                            "file_id": str(file_id),
+                            "source": f"synthetic-{file_index}.txt",
+                            "chunk_index": index,
+                        },
+                    )
+                )
+            yield batch
+
+    def queries(self, count: int, words_per_query: int = 4) -> list[str]:
+        """Return ``count`` queries drawn from the same vocabulary."""
+        rng = random.Random(f"{self.seed}:queries")
+        return [
+            " ".join(rng.choices(self.words[:500], k=words_per_query))
+            for _ in range(count)
+        ]
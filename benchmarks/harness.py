@@ -0,0 +1,162 @@
+"""Timing, memory and reporting helpers for benchmarks."""
+
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the ``pct`` percentile of ``samples`` using linear interpolation."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+@dataclass
+class OperationResult:
+    """Summary statistics for one benchmarked operation."""
+
+    name: str
+    calls: int
+    items: int
+    total_seconds: float
+    throughput_items_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_memory_bytes: int | None
+    extra: dict[str, Any] = field(default_factory=dict)
+
+
+class Recorder:
+    """Record per-call latencies and the memory peak of an operation."""
+
+    def __init__(self, name: str, *, trace_memory: bool = True) -> None:
+        """Initialize the recorder for the operation ``name``."""
+        self.name = name
+        self.trace_memory = trace_memory
+        self.latencies: list[float] = []
+        self.items = 0
+        self.peak_memory: int | None = None
+        self.extra: dict[str, Any] = {}
+
+    @contextmanager
+    def call(self, items: int = 1):
+        """Time one call that processes ``items`` items."""
+        start = time.perf_counter()
+        yield
+        self.latencies.append(time.perf_counter() - start)
+        self.items += items
+
+    async def measure(self, fn: Callable[[], Awaitable[Any]], items: int = 1) -> Any:
+        """Await ``fn()`` and record it as one call."""
+        with self.call(items):
+            return await fn()
+
+    @contextmanager
+    def memory(self):
+        """Track the Python heap peak across the enclosed block."""
+        if not self.trace_memory:
+            yield
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_memory = max(peak - baseline, 0)
+            if started:
+                tracemalloc.stop()
+
+    def result(self) -> OperationResult:
+        """Summarize the recorded calls."""
+        total = sum(self.latencies)
+        millis = [latency * 1000 for latency in self.latencies]
+        return OperationResult(
+            name=self.name,
+            calls=len(self.latencies),
+            items=self.items,
+            total_seconds=total,
+            throughput_items_per_second=self.items / total if total else 0.0,
+            p50_ms=percentile(millis, 50),
+            p95_ms=percentile(millis, 95),
+            p99_ms=percentile(millis, 99),
+            max_ms=max(millis, default=0.0),
+            peak_memory_bytes=self.peak_memory,
+            extra=self.extra,
+        )
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(
+    results: list[OperationResult], params: dict[str, Any]
+) -> dict[str, Any]:
+    """Build the JSON-serializable report for a run."""
+    return {
+        "meta": {
+            "git_revision": _git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+
+def format_table(results: list[OperationResult]) -> str:
+    """Render results as a fixed-width text table."""
+    header = (
+        f"{'operation':<28}{'calls':>8}{'items/s':>12}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MiB':>10}"
+        f"{'recall':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        peak = (
+            f"{r.peak_memory_bytes / 2**20:.1f}"
+            if r.peak_memory_bytes is not None
+            else "-"
+        )
+        recall = r.extra.get("recall")
+        recall = f"{recall:.3f}" if recall is not None else "-"
+        lines.append(
+            f"{r.name:<28}{r.calls:>8}{r.throughput_items_per_second:>12.1f}"
+            f"{r.p50_ms:>10.2f}{r.p95_ms:>10.2f}{r.p99_ms:>10.2f}{peak:>10}"
+            f"{recall:>8}"
+        )
+    return "\n".join(lines)
+
+
+def write_report(report: dict[str, Any], path: str) -> None:
+    """Write ``report`` as pretty-printed JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,286 @@
+"""Benchmark ingestion and search.
+
+Usage:
+    python -m benchmarks.run --chunks 10000 --queries 200 --output bench.json
+
+The database benchmarks run against the Postgres/pgvector instance configured
+through the usual ``POSTGRES_*`` environment variables and use deterministic
+``HashingEmbeddings`` instead of a remote embedding model. Pass ``--skip-db``
+to only benchmark document processing.
+"""
+
+import argparse
+import asyncio
+import io
+import uuid
+from typing import Any
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from benchmarks.corpus import HashingEmbeddings, SyntheticCorpus
+from benchmarks.harness import (
+    OperationResult,
+    Recorder,
+    build_report,
+    format_table,
+    write_report,
+)
+from langconnect import config
+from langconnect.database.vector_storage import STORAGE_TYPES
+
+SEARCH_TYPES = ("semantic", "keyword", "hybrid")
+BENCHMARK_USER_ID = "benchmark-user"
+
+
+def _upload(content: str, index: int) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(content.encode("utf-8")),
+        filename=f"synthetic-{index}.txt",
+        headers=Headers({"content-type": "text/plain"}),
+    )
+
+
+async def bench_process_document(
+    corpus: SyntheticCorpus, args: argparse.Namespace
+) -> OperationResult:
+    """Benchmark parsing and splitting of synthetic text files."""
+    from langconnect.services.document_processor import process_document
+
+    recorder = Recorder("process_document", trace_memory=args.trace_memory)
+    texts = [corpus.text(i, chars=args.file_chars) for i in range(args.files)]
+    chunks = 0
+    with recorder.memory():
+        for index, text in enumerate(texts):
+            docs = await recorder.measure(
+                lambda index=index, text=text: process_document(
+                    _upload(text, index),
+                    chunk_size=args.chunk_size,
+                    chunk_overlap=args.chunk_overlap,
+                ),
+                items=len(text),
+            )
+            chunks += len(docs)
+    recorder.extra = {"files": args.files, "chunks": chunks, "items": "characters"}
+    return recorder.result()
+
+
+def bench_text_splitter(
+    corpus: SyntheticCorpus, args: argparse.Namespace
+) -> list[OperationResult]:
+    """Benchmark LangChain's recursive splitter against ``RecursiveTextSplitter``.
+
+    Both split the same documents; the chunks must be identical.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from langconnect.services.text_splitter import RecursiveTextSplitter
+
+    texts = [corpus.document(i, chars=args.file_chars) for i in range(args.files)]
+    splitters = {
+        "split[langchain]": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap
+        ),
+        "split[native]": RecursiveTextSplitter(args.chunk_size, args.chunk_overlap),
+    }
+    results = []
+    outputs = []
+    for name, splitter in splitters.items():
+        recorder = Recorder(name, trace_memory=args.trace_memory)
+        chunks = []
+        with recorder.memory():
+            for text in texts:
+                with recorder.call(items=len(text)):
+                    chunks.append(splitter.split_text(text))
+        outputs.append(chunks)
+        recorder.extra = {
+            "files": args.files,
+            "chunks": sum(map(len, chunks)),
+            "items": "characters",
+        }
+        results.append(recorder.result())
+    if outputs[0] != outputs[1]:
+        raise AssertionError("RecursiveTextSplitter chunks differ from LangChain's")
+    baseline, native = results
+    native.extra["speedup"] = baseline.total_seconds / native.total_seconds
+    return results
+
+
+async def bench_database(
+    corpus: SyntheticCorpus, args: argparse.Namespace
+) -> list[OperationResult]:
+    """Benchmark ``Collection.upsert`` and the three ``Collection.search`` modes."""
+    from langconnect.database.collections import Collection, CollectionsManager
+    from langconnect.database.connection import close_db_pool
+    from langconnect.services.reaper import reaper
+
+    manager = CollectionsManager(BENCHMARK_USER_ID)
+    details = await manager.create(f"benchmark-{uuid.uuid4().hex[:8]}")
+    if details is None:
+        raise RuntimeError("Failed to create benchmark collection")
+    collection = Collection(details["uuid"], BENCHMARK_USER_ID)
+    results = []
+
+    try:
+        upsert = Recorder("Collection.upsert", trace_memory=args.trace_memory)
+        with upsert.memory():
+            for batch in corpus.batches(args.chunks, args.batch_size):
+                await upsert.measure(
+                    lambda batch=batch: collection.upsert(batch), items=len(batch)
+                )
+        upsert.extra = {"chunks": args.chunks, "batch_size": args.batch_size}
+        results.append(upsert.result())
+
+        queries = corpus.queries(args.queries)
+        for search_type in args.search_types:
+            search = Recorder(
+                f"Collection.search[{search_type}]", trace_memory=args.trace_memory
+            )
+            with search.memory():
+                for query in queries:
+                    await search.measure(
+                        lambda query=query: collection.search(
+                            query, limit=args.limit, search_type=search_type
+                        )
+                    )
+            search.extra = {"limit": args.limit, "chunks": args.chunks}
+            results.append(search.result())
+
+        if args.storage_types:
+            results.extend(
+                await bench_vector_storage(collection, details["uuid"], queries, args)
+            )
+    finally:
+        if not args.keep:
+            await manager.delete(details["uuid"])
+            await reaper.run_pending()
+        await close_db_pool()
+    return results
+
+
+async def bench_vector_storage(
+    collection: Any, collection_id: str, queries: list[str], args: argparse.Namespace
+) -> list[OperationResult]:
+    """Benchmark semantic search over each storage type.
+
+    Recall is measured against the exact full-precision search the collection
+    runs before any storage option is applied.
+    """
+    from langconnect.database.connection import get_db_connection
+    from langconnect.database.vector_storage import apply_storage, index_name
+
+    async def search_ids(query: str) -> list[str]:
+        results = await collection.search(
+            query, limit=args.limit, search_type="semantic"
+        )
+        return [result["id"] for result in results]
+
+    exact = [await search_ids(query) for query in queries]
+    results = []
+    try:
+        for storage_type in args.storage_types:
+            options = {"type": storage_type, "dimensions": args.dim}
+            if storage_type == "matryoshka":
+                options["truncate_to"] = args.truncate_to
+            async with get_db_connection() as conn:
+                storage = await apply_storage(conn, collection_id, options)
+                index_size = await conn.fetchval(
+                    "SELECT pg_relation_size(to_regclass($1))",
+                    index_name(collection_id, storage_type),
+                )
+
+            search = Recorder(f"search[{storage_type}]", trace_memory=args.trace_memory)
+            hits = 0
+            with search.memory():
+                for query, expected in zip(queries, exact, strict=True):
+                    ids = await search.measure(lambda query=query: search_ids(query))
+                    hits += len(set(ids) & set(expected))
+            total = sum(len(expected) for expected in exact)
+            search.extra = {
+                "limit": args.limit,
+                "chunks": args.chunks,
+                "recall": hits / total if total else None,
+                "index_size_bytes": index_size,
+                "storage": storage,
+            }
+            results.append(search.result())
+    finally:
+        async with get_db_connection() as conn:
+            await apply_storage(conn, collection_id, None)
+    return results
+
+
+async def run(
+    args: argparse.Namespace,
+) -> tuple[dict[str, Any], list[OperationResult]]:
+    """Run the selected benchmarks and return the report and raw results."""
+    embeddings = HashingEmbeddings(size=args.dim)
+    config.get_embeddings = lambda model=None: embeddings
+    config.get_default_embeddings.cache_clear()
+
+    corpus = SyntheticCorpus(chunk_chars=args.chunk_chars, seed=args.seed)
+    results = [await bench_process_document(corpus, args)]
+    results.extend(bench_text_splitter(corpus, args))
+    if not args.skip_db:
+        results.extend(await bench_database(corpus, args))
+
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    return build_report(results, params), results
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks to upsert.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=10, help="Search limit.")
+    parser.add_argument(
+        "--search-types", nargs="+", choices=SEARCH_TYPES, default=list(SEARCH_TYPES)
+    )
+    parser.add_argument(
+        "--storage-types",
+        nargs="*",
+        choices=STORAGE_TYPES,
+        default=[],
+        help="Also benchmark semantic search over these vector storage types.",
+    )
+    parser.add_argument(
+        "--truncate-to",
+        type=int,
+        default=512,
+        help="Dimensions kept by the matryoshka storage type.",
+    )
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding size.")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--file-chars", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-trace-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="Disable tracemalloc (it slows down every operation).",
+    )
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the benchmark collection."
+    )
+    parser.add_argument("--output", help="Write the JSON report to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point."""
+    args = parse_args(argv)
+    report, results = asyncio.run(run(args))
+    print(format_table(results))
+    if args.output:
+        write_report(report, args.output)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
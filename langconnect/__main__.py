@@ -1,3 +1,3 @@
-import uvicorn
+from langconnect.launcher import main
 
-uvicorn.run("langconnect.server:APP", host="0.0.0.0", port=8080)
+main()
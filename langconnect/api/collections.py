@@ -1,11 +1,17 @@
-from typing import Annotated
+from typing import Annotated, Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from langconnect.auth import AuthenticatedUser, resolve_user
 from langconnect.database.collections import CollectionsManager
-from langconnect.models import CollectionCreate, CollectionResponse, CollectionUpdate
+from langconnect.models import (
+    CollectionClone,
+    CollectionCreate,
+    CollectionResponse,
+    CollectionUpdate,
+    EmbeddingMigrationCreate,
+)
 
 router = APIRouter(prefix="/collections", tags=["collections"])
 
@@ -20,14 +26,44 @@ async def collections_create(
     user: Annotated[AuthenticatedUser, Depends(resolve_user)],
 ):
     """Creates a new PGVector collection by name with optional metadata."""
+    vector_storage = collection_data.vector_storage
     collection_info = await CollectionsManager(user.identity).create(
-        collection_data.name, collection_data.metadata
+        collection_data.name,
+        collection_data.metadata,
+        vector_storage.model_dump(exclude_none=True) if vector_storage else None,
     )
     if not collection_info:
         raise HTTPException(status_code=500, detail="Failed to create collection")
     return CollectionResponse(**collection_info)
 
 
+@router.post(
+    "/{collection_id}/clone",
+    response_model=CollectionResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def collections_clone(
+    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    collection_id: UUID,
+    clone_data: CollectionClone,
+    response: Response,
+):
+    """Copies a collection, or part of it, with its embeddings.
+
+    Large copies continue in the background and answer 202; the ``clone``
+    metadata of the copy reports their progress.
+    """
+    copy, complete = await CollectionsManager(user.identity).clone(
+        str(collection_id),
+        clone_data.name,
+        clone_data.metadata,
+        clone_data.filter,
+    )
+    if not complete:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return CollectionResponse(**copy)
+
+
 @router.get("", response_model=list[CollectionResponse])
 async def collections_list(user: Annotated[AuthenticatedUser, Depends(resolve_user)]):
     """Lists all available PGVector collections (name and UUID)."""
@@ -81,3 +117,50 @@ async def collections_update(
         )
 
     return CollectionResponse(**updated_collection)
+
+
+@router.post(
+    "/{collection_id}/embedding-migration",
+    response_model=dict[str, Any],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def collections_migrate_embeddings(
+    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    collection_id: UUID,
+    migration: EmbeddingMigrationCreate,
+):
+    """Re-embeds a collection with another model in the background.
+
+    Searches keep using the current model until the migration completes.
+    """
+    return await CollectionsManager(user.identity).start_embedding_migration(
+        str(collection_id), migration.model
+    )
+
+
+@router.get("/{collection_id}/embedding-migration", response_model=dict[str, Any])
+async def collections_embedding_migration(
+    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    collection_id: UUID,
+):
+    """Returns the embedding model of a collection and its migration progress."""
+    return await CollectionsManager(user.identity).embedding_migration(
+        str(collection_id)
+    )
+
+
+@router.delete(
+    "/{collection_id}/embedding-migration", status_code=status.HTTP_204_NO_CONTENT
+)
+async def collections_cancel_embedding_migration(
+    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    collection_id: UUID,
+):
+    """Cancels the embedding migration of a collection."""
+    if not await CollectionsManager(user.identity).cancel_embedding_migration(
+        str(collection_id)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No embedding migration of collection '{collection_id}'",
+        )
@@ -3,9 +3,11 @@ from typing import Annotated, Any
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from langchain_core.documents import Document
 from pydantic import TypeAdapter, ValidationError
 
+from langconnect import config
 from langconnect.auth import AuthenticatedUser, resolve_user
 from langconnect.database.collections import Collection
 from langconnect.models import (
@@ -13,8 +15,10 @@ from langconnect.models import (
     SearchQuery,
     SearchResult,
     DocumentDelete,
+    RechunkRequest,
 )
-from langconnect.services import process_document
+from langconnect.ratelimit import rate_limited
+from langconnect.services import process_document, transfer
 
 # Create a TypeAdapter that enforces “list of dict”
 _metadata_adapter = TypeAdapter(list[dict[str, Any]])
@@ -44,19 +48,19 @@ async def documents_bulk_delete(
             detail="Either document_ids or file_ids must be provided.",
         )
 
-    deleted_count = await collection.delete_many(
+    result = await collection.delete_many(
         document_ids=delete_request.document_ids,
         file_ids=delete_request.file_ids,
     )
 
-    return {"success": True, "deleted_count": deleted_count}
+    return {"success": True, **result}
 
 
 
 
 @router.post("/collections/{collection_id}/documents", response_model=dict[str, Any])
 async def documents_create(
-    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    user: Annotated[AuthenticatedUser, Depends(rate_limited("ingest"))],
     collection_id: UUID,
     files: list[UploadFile] = File(...),
     metadatas_json: str | None = Form(None),
@@ -70,8 +74,9 @@ async def documents_create(
         collection_id: UUID of the collection to add documents to
         files: List of files to upload
         metadatas_json: JSON string containing metadata for each file
-        chunk_size: Maximum number of characters in each chunk (default: 1000)
-        chunk_overlap: Number of overlapping characters between chunks (default: 200)
+        chunk_size: Maximum size of each chunk, in characters or tokens
+            depending on ``CHUNK_SIZE_UNIT`` (default: 1000)
+        chunk_overlap: Overlap between consecutive chunks (default: 200)
     """
     # If no metadata JSON is provided, fill with None
     if not metadatas_json:
@@ -95,6 +100,8 @@ async def documents_create(
             )
 
     docs_to_index: list[Document] = []
+    # Parsed documents before splitting, kept for re-chunking
+    extracted: list[Document] = []
     processed_files_count = 0
     failed_files = []
 
@@ -107,6 +114,7 @@ async def documents_create(
                 metadata=metadata,
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap,
+                extracted=extracted,
             )
             if langchain_docs:
                 docs_to_index.extend(langchain_docs)
@@ -147,6 +155,12 @@ async def documents_create(
                 status_code=500,
                 detail="Failed to add document(s) to vector store after processing.",
             )
+        if extracted and config.STORE_EXTRACTED_TEXT:
+            try:
+                await collection.save_extracted_text(extracted)
+            except Exception as store_exc:
+                # The chunks are in; only re-chunking these files is lost
+                logger.warning(f"Failed to store extracted text: {store_exc}")
 
         # Construct response message
         success_message = (
@@ -179,6 +193,78 @@ async def documents_create(
         )
 
 
+@router.post("/collections/{collection_id}/rechunk", response_model=dict[str, Any])
+async def documents_rechunk(
+    user: Annotated[AuthenticatedUser, Depends(rate_limited("ingest"))],
+    collection_id: UUID,
+    rechunk_request: RechunkRequest,
+):
+    """Splits the stored text of files again with new chunk parameters.
+
+    Files are not parsed again, and only chunks whose text changed are
+    embedded. Files uploaded while ``STORE_EXTRACTED_TEXT`` was off have no
+    stored text and are reported in ``missing_file_ids`` if requested.
+    """
+    collection = Collection(
+        collection_id=str(collection_id),
+        user_id=user.identity,
+    )
+    try:
+        return await collection.rechunk(
+            rechunk_request.chunk_size,
+            rechunk_request.chunk_overlap,
+            rechunk_request.file_ids,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/collections/{collection_id}/export", response_class=StreamingResponse)
+async def documents_export(
+    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    collection_id: UUID,
+    format: transfer.ExportFormat = Query(
+        "arrow", description="'arrow' (IPC stream) or 'parquet'"
+    ),
+):
+    """Streams every chunk of a collection with its metadata and embedding.
+
+    The file can be loaded into another collection, in this or another
+    deployment, with ``POST /collections/{collection_id}/import``.
+    """
+    collection = Collection(
+        collection_id=str(collection_id),
+        user_id=user.identity,
+    )
+    stream = await collection.export(format)
+    filename = f"{collection_id}.{transfer.FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        stream,
+        media_type=transfer.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/collections/{collection_id}/import", response_model=dict[str, Any])
+async def documents_import(
+    user: Annotated[AuthenticatedUser, Depends(rate_limited("ingest"))],
+    collection_id: UUID,
+    file: UploadFile = File(...),
+):
+    """Loads a collection export, embeddings included, without re-embedding.
+
+    Chunks already in the collection are replaced. Chunks whose ID belongs to
+    another collection are skipped and not counted in ``chunks_imported``.
+    The export must record the collection's embedding model, and its
+    embeddings must have the dimensions of the collection's.
+    """
+    collection = Collection(
+        collection_id=str(collection_id),
+        user_id=user.identity,
+    )
+    return await collection.import_export(file.file)
+
+
 @router.get(
     "/collections/{collection_id}/documents", response_model=list[DocumentResponse]
 )
@@ -234,7 +320,7 @@ async def documents_delete(
     "/collections/{collection_id}/documents/search", response_model=list[SearchResult]
 )
 async def documents_search(
-    user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    user: Annotated[AuthenticatedUser, Depends(rate_limited("search"))],
     collection_id: UUID,
     search_query: SearchQuery,
 ):
@@ -252,5 +338,9 @@ async def documents_search(
         limit=search_query.limit or 10,
         search_type=search_query.search_type,
         filter=search_query.filter,
+        rerank=search_query.rerank,
+        diversity=search_query.diversity,
+        mmr_lambda=search_query.mmr_lambda,
+        collapse=search_query.collapse,
     )
     return results
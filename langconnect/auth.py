@@ -10,6 +10,7 @@ from starlette.authentication import BaseUser
 from supabase import create_client
 
 from langconnect import config
+from langconnect.metrics import timed
 
 security = HTTPBearer()
 
@@ -17,15 +18,18 @@ security = HTTPBearer()
 class AuthenticatedUser(BaseUser):
     """An authenticated user following the Starlette authentication model."""
 
-    def __init__(self, user_id: str, display_name: str) -> None:
+    def __init__(self, user_id: str, display_name: str, tier: str = "basic") -> None:
         """Initialize the AuthenticatedUser.
 
         Args:
             user_id: Unique identifier for the user.
             display_name: Display name for the user.
+            tier: Subscription tier (a ``UserTier`` value), which selects the
+                rate limits.
         """
         self.user_id = user_id
         self._display_name = display_name
+        self.tier = tier
 
     @property
     def is_authenticated(self) -> bool:
@@ -86,9 +90,16 @@ def resolve_user(
             status_code=401, detail="Invalid credentials or user not found"
         )
 
-    user = get_current_user(credentials.credentials)
+    with timed("auth"):
+        user = get_current_user(credentials.credentials)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    return AuthenticatedUser(user.id, user.user_metadata.get("name", "User"))
+    # app_metadata can only be changed with the service key, unlike
+    # user_metadata which users edit themselves
+    return AuthenticatedUser(
+        user.id,
+        user.user_metadata.get("name", "User"),
+        tier=(user.app_metadata or {}).get("tier", "basic"),
+    )
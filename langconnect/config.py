@@ -1,8 +1,12 @@
 import json
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from langchain_core.embeddings import Embeddings
 from starlette.config import Config, undefined
 
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
 env = Config()
 
 IS_TESTING = env("IS_TESTING", cast=str, default="").lower() == "true"
@@ -15,14 +19,75 @@ else:
     SUPABASE_KEY = env("SUPABASE_KEY", cast=str, default=undefined)
 
 
-def get_embeddings() -> Embeddings:
-    """Get the embeddings instance based on the environment."""
-    from langchain_openai import OpenAIEmbeddings
+# Embedding provider and model of new collections. Every collection records
+# the model of its vectors in its metadata, as "provider:name" for providers
+# other than OpenAI (see langconnect.services.embedding_providers);
+# collections created before that use LEGACY_EMBEDDING_MODEL. Existing
+# collections change model through an online migration (see
+# langconnect.services.embedding_migration).
+EMBEDDING_PROVIDER = env("EMBEDDING_PROVIDER", cast=str, default="openai")
+DEFAULT_PROVIDER_MODELS = {
+    "openai": "text-embedding-3-small",
+    "onnx": "sentence-transformers/all-MiniLM-L6-v2",
+}
+EMBEDDING_MODEL = env(
+    "EMBEDDING_MODEL",
+    cast=str,
+    default=DEFAULT_PROVIDER_MODELS.get(EMBEDDING_PROVIDER, ""),
+)
+if EMBEDDING_PROVIDER != "openai" and ":" not in EMBEDDING_MODEL:
+    EMBEDDING_MODEL = f"{EMBEDDING_PROVIDER}:{EMBEDDING_MODEL}"
+LEGACY_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Local ONNX embeddings (EMBEDDING_PROVIDER=onnx, needs `pip install
+# "langconnect-client[onnx]"`): texts per model run, seconds a query waits
+# to share a batch, inference threads per worker process (0: the usable
+# cores divided among WEB_CONCURRENCY processes), tokens kept per text, and
+# the pooling of token embeddings ("mean" or "cls").
+ONNX_MAX_BATCH_SIZE = env("ONNX_MAX_BATCH_SIZE", cast=int, default=32)
+ONNX_BATCH_WAIT = env("ONNX_BATCH_WAIT", cast=float, default=0.001)
+ONNX_WORKERS = env("ONNX_WORKERS", cast=int, default=0)
+ONNX_MAX_LENGTH = env("ONNX_MAX_LENGTH", cast=int, default=256)
+ONNX_POOLING = env("ONNX_POOLING", cast=str, default="mean")
+
+
+def get_embeddings(model: str | None = None) -> "Embeddings":
+    """Get the embeddings instance of ``model``, ``EMBEDDING_MODEL`` by default."""
+    from langconnect.services.embedding_providers import create_embeddings
+
+    return create_embeddings(model or EMBEDDING_MODEL)
+
+
+@lru_cache(maxsize=1)
+def get_default_embeddings() -> "Embeddings":
+    """Get the shared embeddings instance, creating it on first use.
+
+    Construction is deferred so importing the app does not pull in the
+    OpenAI client until an embedding is actually needed.
+    """
+    return get_embeddings()
 
-    return OpenAIEmbeddings(model="text-embedding-3-small")
+
+_model_embeddings: dict[str, "Embeddings"] = {}
+
+
+def get_model_embeddings(model: str) -> "Embeddings":
+    """Get the shared embeddings instance of ``model``."""
+    if model == EMBEDDING_MODEL:
+        return get_default_embeddings()
+    embeddings = _model_embeddings.get(model)
+    if embeddings is None:
+        embeddings = _model_embeddings[model] = get_embeddings(model)
+    return embeddings
+
+
+def __getattr__(name: str):
+    # Backwards compatible, lazily resolved ``config.DEFAULT_EMBEDDINGS``
+    if name == "DEFAULT_EMBEDDINGS":
+        return get_default_embeddings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-DEFAULT_EMBEDDINGS = get_embeddings()
 DEFAULT_COLLECTION_NAME = "default_collection"
 
 
@@ -33,6 +98,168 @@ POSTGRES_USER = env("POSTGRES_USER", cast=str, default="langchain")
 POSTGRES_PASSWORD = env("POSTGRES_PASSWORD", cast=str, default="langchain")
 POSTGRES_DB = env("POSTGRES_DB", cast=str, default="langchain_test")
 
+# Optional streaming read replica. When POSTGRES_REPLICA_HOST is set, searches
+# and listings are served from it while its replay lag stays below
+# REPLICA_MAX_LAG_SECONDS (checked every REPLICA_LAG_CHECK_INTERVAL seconds).
+# It uses the same database, credentials and pool settings as the primary.
+POSTGRES_REPLICA_HOST = env("POSTGRES_REPLICA_HOST", cast=str, default="")
+POSTGRES_REPLICA_PORT = env(
+    "POSTGRES_REPLICA_PORT", cast=int, default=str(POSTGRES_PORT)
+)
+REPLICA_MAX_LAG_SECONDS = env("REPLICA_MAX_LAG_SECONDS", cast=float, default=5.0)
+REPLICA_LAG_CHECK_INTERVAL = env("REPLICA_LAG_CHECK_INTERVAL", cast=float, default=5.0)
+
+# asyncpg pool. Set POSTGRES_STATEMENT_CACHE_SIZE=0 behind PgBouncer in
+# transaction mode, which cannot keep prepared statements across transactions;
+# this also turns off the named statements of hot queries.
+POSTGRES_POOL_MIN_SIZE = env("POSTGRES_POOL_MIN_SIZE", cast=int, default=2)
+POSTGRES_POOL_MAX_SIZE = env("POSTGRES_POOL_MAX_SIZE", cast=int, default=10)
+POSTGRES_COMMAND_TIMEOUT = env("POSTGRES_COMMAND_TIMEOUT", cast=float, default=60.0)
+POSTGRES_STATEMENT_CACHE_SIZE = env(
+    "POSTGRES_STATEMENT_CACHE_SIZE", cast=int, default=100
+)
+POSTGRES_MAX_INACTIVE_CONNECTION_LIFETIME = env(
+    "POSTGRES_MAX_INACTIVE_CONNECTION_LIFETIME", cast=float, default=300.0
+)
+# JSON object of run-time parameters set on every pooled connection.
+# JIT compilation only slows down the short queries this service runs.
+POSTGRES_SERVER_SETTINGS = json.loads(
+    env(
+        "POSTGRES_SERVER_SETTINGS",
+        cast=str,
+        default='{"application_name": "langconnect", "jit": "off"}',
+    )
+)
+
+# SQLAlchemy engine used by the vector store (connections per worker)
+VECTORSTORE_POOL_SIZE = env("VECTORSTORE_POOL_SIZE", cast=int, default=5)
+VECTORSTORE_MAX_OVERFLOW = env("VECTORSTORE_MAX_OVERFLOW", cast=int, default=10)
+
+# Production launcher (python -m langconnect). WEB_CONCURRENCY defaults to the
+# number of usable cores. Pool sizes above are per worker and are capped so
+# that all workers together stay within the server's max_connections, minus
+# POSTGRES_RESERVED_CONNECTIONS for superusers, migrations and other clients.
+HOST = env("HOST", cast=str, default="0.0.0.0")
+PORT = env("PORT", cast=int, default=8080)
+WEB_CONCURRENCY = env("WEB_CONCURRENCY", cast=int, default=0)
+KEEP_ALIVE_TIMEOUT = env("KEEP_ALIVE_TIMEOUT", cast=int, default=65)
+BACKLOG = env("BACKLOG", cast=int, default=2048)
+MAX_REQUESTS = env("MAX_REQUESTS", cast=int, default=0)
+MAX_REQUESTS_JITTER = env("MAX_REQUESTS_JITTER", cast=int, default=0)
+GRACEFUL_TIMEOUT = env("GRACEFUL_TIMEOUT", cast=int, default=30)
+POSTGRES_MAX_CONNECTIONS = env("POSTGRES_MAX_CONNECTIONS", cast=int, default=0)
+POSTGRES_RESERVED_CONNECTIONS = env(
+    "POSTGRES_RESERVED_CONNECTIONS", cast=int, default=10
+)
+
+# Startup and shutdown. PRELOAD_COLLECTION_IDS is a JSON list of collection
+# UUIDs whose rows are read into the database cache when the app starts.
+STARTUP_EMBEDDING_PROBE = env("STARTUP_EMBEDDING_PROBE", cast=bool, default=True)
+PRELOAD_COLLECTION_IDS = json.loads(
+    env("PRELOAD_COLLECTION_IDS", cast=str, default="[]")
+)
+SHUTDOWN_TIMEOUT = env("SHUTDOWN_TIMEOUT", cast=float, default=10.0)
+
+# Unit of the chunk_size and chunk_overlap of uploads: "characters", or
+# "tokens" of the tiktoken encoding CHUNK_TOKEN_ENCODING.
+CHUNK_SIZE_UNIT = env("CHUNK_SIZE_UNIT", default="characters")
+CHUNK_TOKEN_ENCODING = env("CHUNK_TOKEN_ENCODING", default="cl100k_base")
+
+# Hash partitions of the embedding table by collection; 0 keeps one table.
+# Setting it converts an existing table at startup, locking it meanwhile (see
+# langconnect.database.partitioning).
+EMBEDDING_PARTITIONS = env("EMBEDDING_PARTITIONS", cast=int, default=0)
+
+# Keep the parsed text of uploaded files (compressed, per file) so that
+# POST /collections/{id}/rechunk can split them again without re-uploading.
+STORE_EXTRACTED_TEXT = env("STORE_EXTRACTED_TEXT", cast=bool, default=True)
+
+# Ids joined per statement by bulk deletes; larger requests are batched
+# within the same transaction.
+BULK_DELETE_BATCH_SIZE = env("BULK_DELETE_BATCH_SIZE", cast=int, default=5000)
+
+# Collection export and import (needs `pip install "langconnect-client[transfer]"`):
+# chunks per record batch or Parquet row group, and the Parquet compression.
+EXPORT_BATCH_SIZE = env("EXPORT_BATCH_SIZE", cast=int, default=1000)
+EXPORT_PARQUET_COMPRESSION = env("EXPORT_PARQUET_COMPRESSION", cast=str, default="zstd")
+
+# Background removal of deleted collections: chunks deleted per batch, pause
+# between batches, seconds between scans, and the number of removed rows
+# that triggers a VACUUM of the embedding table.
+REAPER_BATCH_SIZE = env("REAPER_BATCH_SIZE", cast=int, default=1000)
+REAPER_BATCH_PAUSE = env("REAPER_BATCH_PAUSE", cast=float, default=0.2)
+REAPER_INTERVAL = env("REAPER_INTERVAL", cast=float, default=60.0)
+REAPER_VACUUM_MIN_ROWS = env("REAPER_VACUUM_MIN_ROWS", cast=int, default=10_000)
+
+# Collection clones: chunks copied per transaction, pause between batches of
+# background copies, seconds between scans for pending copies, and the largest
+# copy made within the request instead of in the background.
+CLONE_BATCH_SIZE = env("CLONE_BATCH_SIZE", cast=int, default=5000)
+CLONE_BATCH_PAUSE = env("CLONE_BATCH_PAUSE", cast=float, default=0.1)
+CLONE_INTERVAL = env("CLONE_INTERVAL", cast=float, default=60.0)
+CLONE_SYNC_MAX_CHUNKS = env("CLONE_SYNC_MAX_CHUNKS", cast=int, default=10_000)
+
+# Embedding model migrations: chunks re-embedded per batch, pause between
+# batches, and seconds between scans for migrations to run.
+MIGRATION_BATCH_SIZE = env("MIGRATION_BATCH_SIZE", cast=int, default=256)
+MIGRATION_BATCH_PAUSE = env("MIGRATION_BATCH_PAUSE", cast=float, default=0.5)
+MIGRATION_INTERVAL = env("MIGRATION_INTERVAL", cast=float, default=60.0)
+
+# Deep health check: per-check timeout and how long an embedding probe is reused
+HEALTH_CHECK_TIMEOUT = env("HEALTH_CHECK_TIMEOUT", cast=float, default=2.0)
+HEALTH_EMBEDDING_PROBE_TTL = env("HEALTH_EMBEDDING_PROBE_TTL", cast=float, default=60.0)
+
+# Optional cross-encoder re-ranking of search results (pip install
+# "langconnect-client[rerank]"). The top RERANK_CANDIDATES results are scored
+# in batches of RERANK_BATCH_SIZE on RERANK_WORKERS threads; scores of up to
+# RERANK_CACHE_SIZE (query, chunk) pairs are kept for repeated searches.
+RERANKER_MODEL = env(
+    "RERANKER_MODEL", cast=str, default="cross-encoder/ms-marco-MiniLM-L-6-v2"
+)
+RERANK_CANDIDATES = env("RERANK_CANDIDATES", cast=int, default=50)
+RERANK_BATCH_SIZE = env("RERANK_BATCH_SIZE", cast=int, default=16)
+RERANK_WORKERS = env("RERANK_WORKERS", cast=int, default=2)
+RERANK_CACHE_SIZE = env("RERANK_CACHE_SIZE", cast=int, default=10_000)
+
+# Diversified searches (MMR or near-duplicate collapse) pick their results from
+# the top DIVERSITY_CANDIDATES; chunks with a cosine similarity of at least
+# DUPLICATE_SIMILARITY to a better-ranked chunk count as duplicates.
+DIVERSITY_CANDIDATES = env("DIVERSITY_CANDIDATES", cast=int, default=40)
+DUPLICATE_SIMILARITY = env("DUPLICATE_SIMILARITY", cast=float, default=0.95)
+
+# In-process semantic search of collections of up to SNAPSHOT_MAX_CHUNKS
+# chunks: each worker keeps memory-mapped snapshots of the embeddings of the
+# last SNAPSHOT_MAX_COLLECTIONS collections it searched, as float32 or
+# float16, in SNAPSHOT_DIR (the temporary directory by default). Writes are
+# versioned by database triggers; snapshots are checked for writes every
+# SNAPSHOT_INTERVAL seconds and changes are logged for
+# SNAPSHOT_CHANGE_RETENTION seconds (see langconnect.services.snapshots).
+SNAPSHOT_SEARCH = env("SNAPSHOT_SEARCH", cast=bool, default=False)
+SNAPSHOT_MAX_CHUNKS = env("SNAPSHOT_MAX_CHUNKS", cast=int, default=100_000)
+SNAPSHOT_MAX_COLLECTIONS = env("SNAPSHOT_MAX_COLLECTIONS", cast=int, default=8)
+SNAPSHOT_DTYPE = env("SNAPSHOT_DTYPE", cast=str, default="float32")
+SNAPSHOT_DIR = env("SNAPSHOT_DIR", cast=str, default="")
+SNAPSHOT_INTERVAL = env("SNAPSHOT_INTERVAL", cast=float, default=5.0)
+SNAPSHOT_CHANGE_RETENTION = env("SNAPSHOT_CHANGE_RETENTION", cast=float, default=3600.0)
+
+# Per-user admission control of uploads ("ingest") and searches ("search"):
+# a token bucket refilled at "rate" requests per second holding up to "burst"
+# tokens, and at most "concurrency" requests in flight. Limits are per worker
+# process and per user tier; RATE_LIMITS is a JSON object overriding any of
+# the defaults, e.g. {"basic": {"ingest": {"rate": 0.2}}}.
+RATE_LIMIT_ENABLED = env("RATE_LIMIT_ENABLED", cast=bool, default=not IS_TESTING)
+DEFAULT_RATE_LIMITS = {
+    "basic": {
+        "ingest": {"rate": 0.5, "burst": 10, "concurrency": 2},
+        "search": {"rate": 5.0, "burst": 20, "concurrency": 4},
+    },
+    "premium": {
+        "ingest": {"rate": 2.0, "burst": 40, "concurrency": 8},
+        "search": {"rate": 20.0, "burst": 60, "concurrency": 16},
+    },
+}
+RATE_LIMITS = json.loads(env("RATE_LIMITS", cast=str, default="{}"))
+
 # Read allowed origins from environment variable
 ALLOW_ORIGINS_JSON = env("ALLOW_ORIGINS", cast=str, default="")
 
@@ -8,20 +8,244 @@ The current implementations are based on langchain-postgres PGVector class.
 Replace with your own implementation or favorite vectorstore if needed.
 """
 
+import asyncio
 import builtins
 import json
 import logging
 import uuid
-from typing import Any, Literal, NotRequired, Optional, TypedDict
+from collections.abc import AsyncIterator
+from typing import IO, Any, Literal, NotRequired, Optional, TypedDict
 
 from fastapi import status
 from fastapi.exceptions import HTTPException
 from langchain_core.documents import Document
 
-from langconnect.database.connection import get_db_connection, get_vectorstore
+from langconnect import config
+from langconnect.database import extracted_text, partitioning
+from langconnect.database.connection import (
+    advisory_lock,
+    get_db_connection,
+    get_vectorstore,
+    note_write,
+    use_replica,
+)
+from langconnect.database.vector_storage import (
+    STORAGE_METADATA_KEY,
+    apply_storage,
+    create_storage_indexes,
+    storage_of,
+)
+from langconnect.database.vector_storage import search as storage_search
+from langconnect.metrics import timed
+from langconnect.services import cloning, embedding_migration, snapshots, transfer
+from langconnect.services.cloning import CLONE_METADATA_KEY, cloner
+from langconnect.services.embedding_migration import (
+    MIGRATION_METADATA_KEY,
+    MODEL_METADATA_KEY,
+    is_flipped,
+    model_of,
+    vector_sql,
+)
+from langconnect.services.reaper import reaper
+from langconnect.services.reranker import get_reranker
+from langconnect.services.snapshots import snapshot_engine
+from langconnect.services.text_splitter import get_splitter
 
 logger = logging.getLogger(__name__)
 
+# Hot queries run through per-connection prepared statements (see
+# ``get_db_connection``); ``HOT_QUERIES`` are prepared when the pool warms up.
+# Queries of one collection filter on ``collection_id`` directly, not only
+# through a join, so a partitioned embedding table is pruned to one partition.
+LIST_COLLECTIONS_SQL = """
+    SELECT
+        c.uuid,
+        c.cmetadata,
+        COUNT(DISTINCT e.cmetadata->>'file_id') AS document_count,
+        COUNT(e.id) AS chunk_count
+    FROM langchain_pg_collection c
+    LEFT JOIN langchain_pg_embedding e ON c.uuid = e.collection_id
+    WHERE c.cmetadata->>'owner_id' = $1
+      AND c.cmetadata->>'deleted_at' IS NULL
+    GROUP BY c.uuid
+    ORDER BY c.cmetadata->>'name';
+"""
+
+# Also returns the write version checked by snapshot searches
+GET_COLLECTION_SQL = """
+    SELECT c.uuid, c.name, c.cmetadata, coalesce(v.version, 0) AS write_version
+      FROM langchain_pg_collection c
+      LEFT JOIN langconnect_collection_version v ON v.collection_id = c.uuid
+     WHERE c.uuid = $1
+       AND c.cmetadata->>'owner_id' = $2
+       AND c.cmetadata->>'deleted_at' IS NULL;
+"""
+
+# Collections are deleted by tombstoning them; the rows are removed in the
+# background by ``langconnect.services.reaper``.
+DELETE_COLLECTION_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(cmetadata::jsonb, '{deleted_at}', to_jsonb(now()))
+     WHERE uuid = $1
+       AND cmetadata->>'owner_id' = $2
+       AND cmetadata->>'deleted_at' IS NULL;
+"""
+
+DELETE_DOCUMENT_SQL = """
+    DELETE FROM langchain_pg_embedding AS lpe
+    USING langchain_pg_collection AS lpc
+    WHERE lpe.collection_id = lpc.uuid
+      AND lpe.collection_id = $1
+      AND lpc.uuid = $1
+      AND lpc.cmetadata->>'owner_id' = $2
+      AND lpc.cmetadata->>'deleted_at' IS NULL
+      AND lpe.id = $3
+"""
+
+DELETE_FILE_SQL = """
+    DELETE FROM langchain_pg_embedding AS lpe
+    USING langchain_pg_collection AS lpc
+    WHERE lpe.collection_id   = lpc.uuid
+      AND lpe.collection_id    = $1
+      AND lpc.uuid             = $1
+      AND lpc.cmetadata->>'owner_id' = $2
+      AND lpc.cmetadata->>'deleted_at' IS NULL
+      AND lpe.cmetadata->>'file_id'   = $3
+"""
+
+# Bulk deletes run in one transaction: the collection row is locked once to
+# check ownership, then the ids are joined in batches through unnest(). The
+# lock also keeps the collection from being tombstoned halfway through.
+LOCK_OWNED_COLLECTION_SQL = """
+    SELECT uuid
+      FROM langchain_pg_collection
+     WHERE uuid = $1
+       AND cmetadata->>'owner_id' = $2
+       AND cmetadata->>'deleted_at' IS NULL
+       FOR SHARE
+"""
+
+DELETE_DOCUMENTS_SQL = """
+    DELETE FROM langchain_pg_embedding AS lpe
+     USING unnest($2::text[]) AS ids(id)
+     WHERE lpe.collection_id = $1
+       AND lpe.id = ids.id
+    RETURNING lpe.id
+"""
+
+DELETE_FILES_SQL = """
+    DELETE FROM langchain_pg_embedding AS lpe
+     USING unnest($2::text[]) AS files(file_id)
+     WHERE lpe.collection_id = $1
+       AND lpe.cmetadata->>'file_id' = files.file_id
+    RETURNING files.file_id
+"""
+
+LIST_DOCUMENTS_SQL = """
+    SELECT lpe.id,
+           lpe.document,
+           lpe.cmetadata
+      FROM langchain_pg_embedding lpe
+      JOIN langchain_pg_collection lpc
+        ON lpe.collection_id = lpc.uuid
+     WHERE lpe.collection_id = $1
+       AND lpc.uuid = $1
+       AND lpc.cmetadata->>'owner_id' = $2
+       AND lpc.cmetadata->>'deleted_at' IS NULL
+     ORDER BY lpe.cmetadata->>'file_id', lpe.id
+     LIMIT  $3
+    OFFSET $4
+"""
+
+KEYWORD_SEARCH_SQL = """
+    SELECT e.id as id,
+           e.document as page_content,
+           e.cmetadata as metadata,
+           ts_rank(to_tsvector('english', e.document),
+                  plainto_tsquery('english', $1)) as score
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+    WHERE e.collection_id = $2
+      AND c.uuid = $2
+      AND c.cmetadata->>'owner_id' = $3
+      AND c.cmetadata->>'deleted_at' IS NULL
+      AND to_tsvector('english', e.document) @@ plainto_tsquery('english', $1)
+    ORDER BY score DESC
+    LIMIT $4
+"""
+
+FILE_CHUNKS_SQL = """
+    SELECT id, document, cmetadata
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND cmetadata->>'file_id' = $2
+"""
+
+DELETE_CHUNKS_SQL = """
+    DELETE FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND id = ANY($2::text[])
+"""
+
+CHUNK_EMBEDDINGS_SQL = f"""
+    SELECT id, {vector_sql("$1")} AS embedding
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND id = ANY($2::text[])
+"""
+
+# Indexes on top of those created by PGVector, built without blocking writes.
+# Per-collection scans (searches, listings, the reaper's batches) would
+# otherwise read the whole embedding table.
+SCHEMA_INDEXES = (
+    # Also serves the keyset batches of embedding migrations
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_collection_id_id
+        ON langchain_pg_embedding (collection_id, id)
+    """,
+    # Superseded by the index above
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_langchain_pg_embedding_collection_id",
+    # Deletes and listings by file_id, always within one collection
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_file_id
+        ON langchain_pg_embedding (collection_id, (cmetadata->>'file_id'))
+    """,
+)
+SCHEMA_LOCK_KEY = "langconnect:schema"
+
+# Indexes left invalid by an interrupted CREATE INDEX CONCURRENTLY, which
+# IF NOT EXISTS would skip forever. Builds still running are invalid until
+# they finish, so they are left alone.
+INVALID_INDEXES_SQL = """
+    SELECT format('%I.%I', n.nspname, i.relname) AS name,
+           i.relname LIKE 'ix\\_embedding\\_%' AS is_storage_index
+      FROM pg_index AS x
+      JOIN pg_class AS i ON i.oid = x.indexrelid
+      JOIN pg_class AS t ON t.oid = x.indrelid
+      JOIN pg_namespace AS n ON n.oid = i.relnamespace
+     WHERE NOT x.indisvalid
+       AND i.relkind = 'i'
+       AND t.relname ~ '^langchain_pg_embedding(_p[0-9]+)?$'
+       AND i.relname LIKE 'ix\\_%'
+       AND x.indexrelid NOT IN (
+             SELECT index_relid FROM pg_stat_progress_create_index
+           )
+"""
+
+HOT_QUERIES = (
+    LIST_COLLECTIONS_SQL,
+    GET_COLLECTION_SQL,
+    DELETE_COLLECTION_SQL,
+    DELETE_DOCUMENT_SQL,
+    DELETE_FILE_SQL,
+    LOCK_OWNED_COLLECTION_SQL,
+    DELETE_DOCUMENTS_SQL,
+    DELETE_FILES_SQL,
+    LIST_DOCUMENTS_SQL,
+    KEYWORD_SEARCH_SQL,
+    CHUNK_EMBEDDINGS_SQL,
+)
+
 
 class CollectionDetails(TypedDict):
     """TypedDict for collection details."""
@@ -31,6 +255,58 @@ class CollectionDetails(TypedDict):
     metadata: dict[str, Any]
     # Temporary field used internally to workaround an issue with PGVector
     table_id: NotRequired[str]
+    # Incremented by every write to the collection's chunks
+    write_version: NotRequired[int]
+
+
+class BulkDeleteResult(TypedDict):
+    """Outcome of ``Collection.delete_many``."""
+
+    deleted_count: int
+    deleted_document_ids: list[str]
+    missing_document_ids: list[str]
+    deleted_file_ids: list[str]
+    missing_file_ids: list[str]
+
+
+class RechunkResult(TypedDict):
+    """Outcome of ``Collection.rechunk``."""
+
+    files: int
+    missing_file_ids: list[str]
+    chunks_kept: int
+    chunks_added: int
+    chunks_deleted: int
+
+
+def diff_chunks(
+    existing: builtins.list[tuple[str, str, dict[str, Any]]],
+    chunks: builtins.list[Document],
+) -> tuple[builtins.list[Document], builtins.list[str]]:
+    """Match new chunks of a file against its stored ones.
+
+    A stored chunk is kept for a new chunk with the same text and metadata.
+
+    Args:
+        existing: ``(id, text, metadata)`` of the stored chunks.
+        chunks: The new chunks.
+
+    Returns:
+        The new chunks to add, and the ids of the stored chunks to delete.
+    """
+    stored: dict[tuple[str, str], builtins.list[str]] = {}
+    for chunk_id, text, metadata in existing:
+        key = (text, json.dumps(metadata, sort_keys=True))
+        stored.setdefault(key, []).append(chunk_id)
+    added = []
+    for chunk in chunks:
+        key = (chunk.page_content, json.dumps(chunk.metadata, sort_keys=True))
+        ids = stored.get(key)
+        if ids:
+            ids.pop()
+        else:
+            added.append(chunk)
+    return added, [chunk_id for ids in stored.values() for chunk_id in ids]
 
 
 class CollectionsManager:
@@ -48,28 +324,44 @@ class CollectionsManager:
         """
         logger.info("Starting database initialization...")
         get_vectorstore()
+        async with (
+            get_db_connection() as conn,
+            # Serializes workers starting at the same time
+            advisory_lock(conn, SCHEMA_LOCK_KEY, timeout=None),
+        ):
+            invalid = await conn.fetch(INVALID_INDEXES_SQL)
+            for row in invalid:
+                logger.warning("Rebuilding invalid index %s.", row["name"])
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row['name']}")
+            for statement in embedding_migration.SCHEMA:
+                await conn.execute(statement, timeout=None)
+            if partitioning.enabled():
+                await partitioning.migrate(conn, config.EMBEDDING_PARTITIONS)
+                indexes = partitioning.PARTITIONED_INDEXES
+            elif await partitioning.is_partitioned(conn):
+                raise RuntimeError(
+                    "langchain_pg_embedding is partitioned but "
+                    "EMBEDDING_PARTITIONS is not set."
+                )
+            else:
+                indexes = SCHEMA_INDEXES
+            for statement in (
+                *extracted_text.SCHEMA,
+                *indexes,
+                *snapshots.schema(),
+            ):
+                await conn.execute(statement, timeout=None)
+            if any(row["is_storage_index"] for row in invalid):
+                await create_storage_indexes(conn)
         logger.info("Database initialization complete.")
 
     async def list(
         self,
     ) -> list[CollectionDetails]:
         """List all collections owned by the given user, ordered by logical name."""
-        async with get_db_connection() as conn:
-            records = await conn.fetch(
-                """
-                SELECT 
-                    c.uuid, 
-                    c.cmetadata,
-                    COUNT(DISTINCT e.cmetadata->>'file_id') AS document_count,
-                    COUNT(e.id) AS chunk_count
-                FROM langchain_pg_collection c
-                LEFT JOIN langchain_pg_embedding e ON c.uuid = e.collection_id
-                WHERE c.cmetadata->>'owner_id' = $1
-                GROUP BY c.uuid
-                ORDER BY c.cmetadata->>'name';
-                """,
-                self.user_id,
-            )
+        replica = await use_replica(self.user_id)
+        async with get_db_connection(replica=replica) as conn:
+            records = await conn.fetch_prepared(LIST_COLLECTIONS_SQL, self.user_id)
 
         result: list[CollectionDetails] = []
         for r in records:
@@ -89,18 +381,22 @@ class CollectionsManager:
     async def get(
         self,
         collection_id: str,
+        *,
+        replica: bool | None = None,
     ) -> CollectionDetails | None:
-        """Fetch a single collection by UUID, ensuring the user owns it."""
-        async with get_db_connection() as conn:
-            rec = await conn.fetchrow(
-                """
-                SELECT uuid, name, cmetadata
-                  FROM langchain_pg_collection
-                 WHERE uuid = $1
-                   AND cmetadata->>'owner_id' = $2;
-                """,
-                collection_id,
-                self.user_id,
+        """Fetch a single collection by UUID, ensuring the user owns it.
+
+        Args:
+            collection_id: The collection UUID.
+            replica: Whether to read from the read replica. By default the
+                replica is used when ``use_replica`` allows it; pass ``False``
+                when the result decides a subsequent write.
+        """
+        if replica is None:
+            replica = await use_replica(self.user_id)
+        async with get_db_connection(replica=replica) as conn:
+            rec = await conn.fetchrow_prepared(
+                GET_COLLECTION_SQL, collection_id, self.user_id
             )
 
         if not rec:
@@ -113,24 +409,37 @@ class CollectionsManager:
             "name": name,
             "metadata": metadata,
             "table_id": rec["name"],
+            "write_version": rec["write_version"],
         }
 
     async def create(
         self,
         collection_name: str,
         metadata: Optional[dict[str, Any]] = None,
+        vector_storage: Optional[dict[str, Any]] = None,
+        *,
+        embedding_model: Optional[str] = None,
     ) -> CollectionDetails | None:
         """Create a new collection.
 
         Args:
             collection_name: The name of the new collection.
             metadata: Optional metadata for the collection.
+            vector_storage: Optional storage options for the embeddings (see
+                ``langconnect.database.vector_storage``).
+            embedding_model: Model of the collection's embeddings;
+                ``EMBEDDING_MODEL`` by default.
 
         Returns:
             Details of the created collection or None if creation failed.
         """
         # check for existing name
         metadata = metadata.copy() if metadata else {}
+        # Only set through apply_storage, which also builds the index
+        metadata.pop(STORAGE_METADATA_KEY, None)
+        metadata.pop(MIGRATION_METADATA_KEY, None)
+        metadata.pop(CLONE_METADATA_KEY, None)
+        metadata[MODEL_METADATA_KEY] = embedding_model or config.EMBEDDING_MODEL
         metadata["owner_id"] = self.user_id
         metadata["name"] = collection_name
 
@@ -139,6 +448,7 @@ class CollectionsManager:
         table_id = f"tbl_{uuid.uuid4().hex}"
 
         # triggers PGVector to create both the vectorstore and DB entry
+        note_write(self.user_id)
         get_vectorstore(table_id, collection_metadata=metadata)
 
         # Fetch the newly created table.
@@ -156,6 +466,18 @@ class CollectionsManager:
         if not rec:
             return None
         metadata = json.loads(rec["cmetadata"])
+        if vector_storage is not None:
+            async with get_db_connection() as conn:
+                try:
+                    storage = await apply_storage(conn, rec["uuid"], vector_storage)
+                except ValueError as e:
+                    await conn.execute_prepared(
+                        DELETE_COLLECTION_SQL, rec["uuid"], self.user_id
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+                    ) from e
+            metadata[STORAGE_METADATA_KEY] = storage
         name = metadata.pop("name")
         return {"uuid": str(rec["uuid"]), "name": name, "metadata": metadata}
 
@@ -181,18 +503,26 @@ class CollectionsManager:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Must update at least 1 attribute.",
             )
+        note_write(self.user_id)
 
         # Case 1 & 2: metadata supplied (with or without new name)
         if metadata is not None:
             # merge in owner_id + optional new name
             merged = metadata.copy()
+            for key in (
+                STORAGE_METADATA_KEY,
+                MODEL_METADATA_KEY,
+                MIGRATION_METADATA_KEY,
+                CLONE_METADATA_KEY,
+            ):
+                merged.pop(key, None)
             merged["owner_id"] = self.user_id
 
             if name is not None:
                 merged["name"] = name
             else:
                 # pull existing friendly name so we don't lose it
-                existing = await self.get(collection_id)
+                existing = await self.get(collection_id, replica=False)
                 if not existing:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
@@ -206,9 +536,18 @@ class CollectionsManager:
                 rec = await conn.fetchrow(
                     """
                     UPDATE langchain_pg_collection
-                       SET cmetadata = $1::jsonb
+                       SET cmetadata = $1::jsonb || jsonb_strip_nulls(
+                             jsonb_build_object(
+                               'vector_storage', cmetadata::jsonb->'vector_storage',
+                               'embedding_model', cmetadata::jsonb->'embedding_model',
+                               'embedding_migration',
+                               cmetadata::jsonb->'embedding_migration',
+                               'clone', cmetadata::jsonb->'clone'
+                             )
+                           )
                      WHERE uuid = $2
                        AND cmetadata->>'owner_id' = $3
+                       AND cmetadata->>'deleted_at' IS NULL
                     RETURNING uuid, cmetadata;
                     """,
                     metadata_json,
@@ -230,6 +569,7 @@ class CollectionsManager:
                            )
                      WHERE uuid = $2
                        AND cmetadata->>'owner_id' = $3
+                       AND cmetadata->>'deleted_at' IS NULL
                     RETURNING uuid, cmetadata;
                     """,
                     name,
@@ -257,20 +597,166 @@ class CollectionsManager:
         collection_id: str,
     ) -> int:
         """Delete a collection by UUID.
-        Returns number of rows deleted (1).
-        Raises 404 if no such collection.
+
+        The collection is hidden at once and its rows are removed in the
+        background (see ``langconnect.services.reaper``).
+
+        Returns number of collections deleted (0 or 1).
         """
+        note_write(self.user_id)
         async with get_db_connection() as conn:
-            result = await conn.execute(
-                """
-                DELETE FROM langchain_pg_collection
-                 WHERE uuid = $1
-                   AND cmetadata->>'owner_id' = $2;
-                """,
-                collection_id,
-                self.user_id,
+            result = await conn.execute_prepared(
+                DELETE_COLLECTION_SQL, collection_id, self.user_id
             )
-        return int(result.split()[-1])
+        deleted = int(result.split()[-1])
+        if deleted:
+            reaper.wake()
+        return deleted
+
+    async def clone(
+        self,
+        collection_id: str,
+        collection_name: str,
+        metadata: Optional[dict[str, Any]] = None,
+        filter: Optional[dict[str, Any]] = None,
+    ) -> tuple[CollectionDetails, bool]:
+        """Copy a collection, or the chunks matching ``filter``, server-side.
+
+        Chunks are copied with their embeddings; nothing is embedded again.
+        The copy keeps the embedding model and vector storage option of the
+        source. Copies of more than ``CLONE_SYNC_MAX_CHUNKS`` chunks run in
+        the background (see ``langconnect.services.cloning``), and their
+        progress is reported as ``clone`` in the metadata of the copy.
+
+        Args:
+            collection_id: The collection to copy.
+            collection_name: The name of the copy.
+            metadata: Optional metadata for the copy.
+            filter: Only copy chunks whose metadata contains these values.
+
+        Returns:
+            Details of the copy and whether it is complete.
+
+        Raises:
+            HTTPException: 404 if the collection does not exist.
+        """
+        source = await self.get(collection_id, replica=False)
+        if not source:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Collection '{collection_id}' not found or not owned by you.",
+            )
+        storage = storage_of(source["metadata"])
+        copy = await self.create(
+            collection_name,
+            metadata,
+            dict(storage) if storage else None,
+            embedding_model=model_of(source["metadata"]),
+        )
+        if not copy:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create collection",
+            )
+
+        job = cloning.new_job(collection_id, filter)
+        async with get_db_connection() as conn:
+            await cloning.start(conn, copy["uuid"], job)
+            chunks = await cloning.count(conn, collection_id, filter)
+        if chunks > config.CLONE_SYNC_MAX_CHUNKS:
+            cloner.wake()
+            copy["metadata"][CLONE_METADATA_KEY] = job
+            return copy, False
+        await cloner.clone(copy["uuid"], job)
+        # A background scan may have taken the copy over
+        copy = await self.get(copy["uuid"], replica=False)
+        return copy, copy["metadata"][CLONE_METADATA_KEY]["status"] == "done"
+
+    async def embedding_migration(self, collection_id: str) -> dict[str, Any]:
+        """Return the embedding model of a collection and its migration, if any.
+
+        ``vector_storage`` tells whether the collection has a storage option,
+        which rules out migrations.
+
+        Raises:
+            HTTPException: 404 if the collection does not exist.
+        """
+        details = await self.get(collection_id, replica=False)
+        if not details:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Collection '{collection_id}' not found or not owned by you.",
+            )
+        metadata = details["metadata"]
+        return {
+            "embedding_model": model_of(metadata),
+            "migration": metadata.get(MIGRATION_METADATA_KEY),
+            "vector_storage": storage_of(metadata) is not None,
+        }
+
+    async def start_embedding_migration(
+        self, collection_id: str, model: str
+    ) -> dict[str, Any]:
+        """Start re-embedding a collection with ``model`` in the background.
+
+        Searches keep using the current model until every chunk has been
+        re-embedded (see ``langconnect.services.embedding_migration``).
+
+        Raises:
+            HTTPException: 404 if the collection does not exist, 400 if
+                ``model`` is its current model or cannot embed, 409 if it
+                is already migrating or has a vector storage option.
+        """
+        state = await self.embedding_migration(collection_id)
+        if state["vector_storage"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Collections with a vector storage option cannot be "
+                "migrated: their index has the dimensions of the current model.",
+            )
+        if state["migration"] is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Collection is already migrating to "
+                f"{state['migration']['model']!r}.",
+            )
+        if state["embedding_model"] == model:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Collection already uses {model!r}.",
+            )
+        try:
+            await asyncio.to_thread(
+                config.get_model_embeddings(model).embed_query, "probe"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot embed with {model!r}: {e}",
+            ) from e
+
+        note_write(self.user_id)
+        async with get_db_connection() as conn:
+            migration = await embedding_migration.start(
+                conn, collection_id, self.user_id, model
+            )
+        if migration is None:
+            # Deleted, or migrated by a concurrent request
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Collection is already migrating or was deleted.",
+            )
+        return {**state, "migration": migration}
+
+    async def cancel_embedding_migration(self, collection_id: str) -> bool:
+        """Stop the embedding migration of a collection.
+
+        Returns:
+            Whether a migration was cancelled.
+        """
+        note_write(self.user_id)
+        async with get_db_connection() as conn:
+            return await embedding_migration.cancel(conn, collection_id, self.user_id)
 
 
 class Collection:
@@ -283,20 +769,222 @@ class Collection:
         """Initialize the collection by collection ID."""
         self.collection_id = collection_id
         self.user_id = user_id
+        self._query_embeddings: dict[tuple[str, str], list[float]] = {}
 
-    async def _get_details_or_raise(self) -> dict[str, Any]:
+    async def _get_details_or_raise(
+        self, *, replica: bool | None = None
+    ) -> dict[str, Any]:
         """Get collection details if it exists, otherwise raise an error."""
-        details = await CollectionsManager(self.user_id).get(self.collection_id)
+        with timed("get_details"):
+            details = await CollectionsManager(self.user_id).get(
+                self.collection_id, replica=replica
+            )
         if not details:
             raise HTTPException(status_code=404, detail="Collection not found")
         return details
 
     async def upsert(self, documents: list[Document]) -> list[str]:
         """Add one or more documents to the collection."""
-        details = await self._get_details_or_raise()
-        store = get_vectorstore(collection_name=details["table_id"])
-        added_ids = store.add_documents(documents)
-        return added_ids
+        details = await self._get_details_or_raise(replica=False)
+        note_write(self.user_id)
+        return await self._add(details, documents)
+
+    async def _add(
+        self, details: dict[str, Any], documents: builtins.list[Document]
+    ) -> builtins.list[str]:
+        """Embed and store ``documents`` with the model of the collection.
+
+        During an embedding migration the new chunks get their shadow
+        embeddings too (see ``embedding_migration.dual_write``). Chunks
+        without an id get a new one, as with ``PGVector``.
+        """
+        model = model_of(details["metadata"])
+        embeddings = config.get_model_embeddings(model)
+        documents = [
+            doc if doc.id else doc.model_copy(update={"id": str(uuid.uuid4())})
+            for doc in documents
+        ]
+        ids = [doc.id for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        vectors = await asyncio.to_thread(embeddings.embed_documents, texts)
+        if partitioning.enabled():
+            async with get_db_connection() as conn:
+                await partitioning.add_documents(
+                    conn, self.collection_id, documents, vectors
+                )
+        else:
+            store = get_vectorstore(
+                collection_name=details["table_id"], embeddings=embeddings
+            )
+            store.add_embeddings(
+                texts, vectors, [doc.metadata for doc in documents], ids
+            )
+        await embedding_migration.dual_write(
+            self.collection_id, ids, texts, model, vectors
+        )
+        return ids
+
+    async def save_extracted_text(self, documents: builtins.list[Document]) -> int:
+        """Keep the parsed, unsplit documents of uploaded files for ``rechunk``.
+
+        Returns:
+            The number of files stored.
+        """
+        async with get_db_connection() as conn:
+            return await extracted_text.store(conn, self.collection_id, documents)
+
+    async def rechunk(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        file_ids: Optional[builtins.list[str]] = None,
+    ) -> RechunkResult:
+        """Split the stored text of files again and update their chunks.
+
+        Only chunks whose text or metadata changed are embedded and added;
+        stored chunks that no longer match are deleted once the new ones are
+        in. Files are updated one at a time.
+
+        Args:
+            chunk_size: Maximum size of each chunk.
+            chunk_overlap: Overlap between consecutive chunks.
+            file_ids: Files to re-chunk; all files with stored text if None.
+
+        Raises:
+            HTTPException: 404 if the collection does not exist, 409 if it
+                is already being re-chunked.
+            ValueError: If the chunk parameters are invalid.
+        """
+        splitter = get_splitter(chunk_size, chunk_overlap)
+        details = await self._get_details_or_raise(replica=False)
+        note_write(self.user_id)
+        result: RechunkResult = {
+            "files": 0,
+            "missing_file_ids": [],
+            "chunks_kept": 0,
+            "chunks_added": 0,
+            "chunks_deleted": 0,
+        }
+        async with (
+            get_db_connection() as conn,
+            advisory_lock(conn, f"rechunk:{self.collection_id}") as locked,
+        ):
+            if not locked:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Collection is already being re-chunked.",
+                )
+            files = await extracted_text.load(conn, self.collection_id, file_ids)
+            result["missing_file_ids"] = [
+                file_id for file_id in file_ids or () if file_id not in files
+            ]
+            for file_id, documents in files.items():
+                rows = await conn.fetch(FILE_CHUNKS_SQL, self.collection_id, file_id)
+                existing = [
+                    (
+                        row["id"],
+                        row["document"],
+                        json.loads(row["cmetadata"]) if row["cmetadata"] else {},
+                    )
+                    for row in rows
+                ]
+                chunks = splitter.split_documents(documents)
+                added, stale = diff_chunks(existing, chunks)
+                if added:
+                    await self._add(details, added)
+                if stale:
+                    await conn.execute(DELETE_CHUNKS_SQL, self.collection_id, stale)
+                result["files"] += 1
+                result["chunks_kept"] += len(chunks) - len(added)
+                result["chunks_added"] += len(added)
+                result["chunks_deleted"] += len(stale)
+        logger.info(
+            "Re-chunked %d files of collection %s: %d chunks kept, "
+            "%d added, %d deleted.",
+            result["files"],
+            self.collection_id,
+            result["chunks_kept"],
+            result["chunks_added"],
+            result["chunks_deleted"],
+        )
+        return result
+
+    async def export(self, format: transfer.ExportFormat) -> AsyncIterator[bytes]:
+        """Return the chunks and embeddings of the collection as a byte stream.
+
+        See ``langconnect.services.transfer`` for the format.
+
+        Raises:
+            HTTPException: 404 if the collection does not exist, 501 if
+                pyarrow is not installed.
+        """
+        replica = await use_replica(self.user_id)
+        details = await self._get_details_or_raise(replica=replica)
+        try:
+            transfer.require_pyarrow()
+        except ImportError as e:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e)
+            ) from e
+        return transfer.export_collection(
+            self.collection_id,
+            format=format,
+            embedding_model=model_of(details["metadata"]),
+            collection_name=details["name"],
+            replica=replica,
+        )
+
+    async def import_export(self, file: IO[bytes]) -> dict[str, int]:
+        """Load chunks and embeddings exported by ``export``; nothing is embedded.
+
+        Raises:
+            HTTPException: 404 if the collection does not exist, 400 if the
+                file is not an export, does not record its embedding model or
+                holds embeddings of other dimensions than the collection's,
+                409 if its embeddings come from another model, 501 if pyarrow
+                is not installed.
+        """
+        details = await self._get_details_or_raise(replica=False)
+        try:
+            export_schema, batches = await asyncio.to_thread(
+                transfer.read_batches, file
+            )
+        except ImportError as e:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e)
+            ) from e
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            ) from e
+        export_model = transfer.model_of_export(export_schema)
+        model = model_of(details["metadata"])
+        if export_model != model:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Export was embedded with {export_model!r}, "
+                f"the collection uses {model!r}.",
+            )
+        note_write(self.user_id)
+        async with get_db_connection() as conn:
+            dimensions = await transfer.dimensions_of(
+                conn, self.collection_id, details["metadata"]
+            )
+            try:
+                result = await transfer.import_batches(
+                    conn, self.collection_id, batches, dimensions
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+                ) from e
+        logger.info(
+            "Imported %d of %d chunks into collection %s.",
+            result["chunks_imported"],
+            result["chunks_read"],
+            self.collection_id,
+        )
+        return result
 
     async def delete(
         self,
@@ -310,19 +998,12 @@ class Collection:
             file_id: Deletes all chunks from a specific file
             document_id: Deletes a specific chunk/document
         """
+        note_write(self.user_id)
         async with get_db_connection() as conn:
             if document_id:
                 # Delete specific document by ID
-                delete_sql = """
-                    DELETE FROM langchain_pg_embedding AS lpe
-                    USING langchain_pg_collection AS lpc
-                    WHERE lpe.collection_id = lpc.uuid
-                      AND lpc.uuid = $1
-                      AND lpc.cmetadata->>'owner_id' = $2
-                      AND lpe.id = $3
-                """
-                result = await conn.execute(
-                    delete_sql,
+                result = await conn.execute_prepared(
+                    DELETE_DOCUMENT_SQL,
                     self.collection_id,
                     self.user_id,
                     document_id,
@@ -333,16 +1014,8 @@ class Collection:
                 )
             elif file_id:
                 # Delete all documents from a file
-                delete_sql = """
-                    DELETE FROM langchain_pg_embedding AS lpe
-                    USING langchain_pg_collection AS lpc
-                    WHERE lpe.collection_id   = lpc.uuid
-                      AND lpc.uuid             = $1
-                      AND lpc.cmetadata->>'owner_id' = $2
-                      AND lpe.cmetadata->>'file_id'   = $3
-                """
-                result = await conn.execute(
-                    delete_sql,
+                result = await conn.execute_prepared(
+                    DELETE_FILE_SQL,
                     self.collection_id,
                     self.user_id,
                     file_id,
@@ -354,72 +1027,81 @@ class Collection:
 
             # For now if deleted count is 0, let's verify that the collection exists.
             if deleted_count == 0:
-                await self._get_details_or_raise()
+                await self._get_details_or_raise(replica=False)
+            if file_id:
+                await conn.execute(
+                    extracted_text.DELETE_SQL, self.collection_id, [file_id]
+                )
         return True
 
     async def delete_many(
         self,
         *,
-        document_ids: Optional[list[str]] = None,
-        file_ids: Optional[list[str]] = None,
-    ) -> int:
-        """Delete multiple documents by a list of document IDs or file IDs."""
+        document_ids: Optional[builtins.list[str]] = None,
+        file_ids: Optional[builtins.list[str]] = None,
+    ) -> BulkDeleteResult:
+        """Delete multiple documents by a list of document IDs or file IDs.
+
+        Everything is deleted in one transaction, ``BULK_DELETE_BATCH_SIZE``
+        ids per statement.
+
+        Returns:
+            The number of chunks deleted and which of the given ids matched.
+        """
         if not document_ids and not file_ids:
             raise ValueError("Either document_ids or file_ids must be provided.")
 
+        # Duplicates would be reported as missing after their first match
+        document_ids = builtins.list(dict.fromkeys(document_ids or ()))
+        file_ids = builtins.list(dict.fromkeys(file_ids or ()))
+        batch_size = config.BULK_DELETE_BATCH_SIZE
+
+        note_write(self.user_id)
         deleted_count = 0
-        async with get_db_connection() as conn:
-            if document_ids:
-                result = await conn.execute(
-                    """
-                    DELETE FROM langchain_pg_embedding AS lpe
-                    USING langchain_pg_collection AS lpc
-                    WHERE lpe.collection_id = lpc.uuid
-                      AND lpc.uuid = $1
-                      AND lpc.cmetadata->>'owner_id' = $2
-                      AND lpe.id = ANY($3::text[])
-                    """,
+        deleted_ids: set[str] = set()
+        deleted_file_ids: set[str] = set()
+        async with get_db_connection() as conn, conn.transaction():
+            owned = await conn.fetchrow_prepared(
+                LOCK_OWNED_COLLECTION_SQL, self.collection_id, self.user_id
+            )
+            if not owned:
+                raise HTTPException(status_code=404, detail="Collection not found")
+            for i in range(0, len(document_ids), batch_size):
+                rows = await conn.fetch_prepared(
+                    DELETE_DOCUMENTS_SQL,
                     self.collection_id,
-                    self.user_id,
-                    document_ids,
+                    document_ids[i : i + batch_size],
                 )
-                deleted_count += int(result.split()[-1])
-
-            if file_ids:
-                result = await conn.execute(
-                    """
-                    DELETE FROM langchain_pg_embedding AS lpe
-                    USING langchain_pg_collection AS lpc
-                    WHERE lpe.collection_id = lpc.uuid
-                      AND lpc.uuid = $1
-                      AND lpc.cmetadata->>'owner_id' = $2
-                      AND lpe.cmetadata->>'file_id' = ANY($3::text[])
-                    """,
+                deleted_count += len(rows)
+                deleted_ids.update(row["id"] for row in rows)
+            for i in range(0, len(file_ids), batch_size):
+                rows = await conn.fetch_prepared(
+                    DELETE_FILES_SQL,
                     self.collection_id,
-                    self.user_id,
-                    file_ids,
+                    file_ids[i : i + batch_size],
                 )
-                deleted_count += int(result.split()[-1])
-        
-        return deleted_count
+                deleted_count += len(rows)
+                deleted_file_ids.update(row["file_id"] for row in rows)
+                await conn.execute(
+                    extracted_text.DELETE_SQL,
+                    self.collection_id,
+                    file_ids[i : i + batch_size],
+                )
+
+        return {
+            "deleted_count": deleted_count,
+            "deleted_document_ids": [i for i in document_ids if i in deleted_ids],
+            "missing_document_ids": [i for i in document_ids if i not in deleted_ids],
+            "deleted_file_ids": [i for i in file_ids if i in deleted_file_ids],
+            "missing_file_ids": [i for i in file_ids if i not in deleted_file_ids],
+        }
 
     async def list(self, *, limit: int = 10, offset: int = 0) -> list[dict[str, Any]]:
         """List all document chunks in this collection."""
-        async with get_db_connection() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT lpe.id,
-                       lpe.document,
-                       lpe.cmetadata
-                  FROM langchain_pg_embedding lpe
-                  JOIN langchain_pg_collection lpc
-                    ON lpe.collection_id = lpc.uuid
-                 WHERE lpc.uuid = $1
-                   AND lpc.cmetadata->>'owner_id' = $2
-                 ORDER BY lpe.cmetadata->>'file_id', lpe.id
-                 LIMIT  $3
-                OFFSET $4
-                """,
+        replica = await use_replica(self.user_id)
+        async with get_db_connection(replica=replica) as conn:
+            rows = await conn.fetch_prepared(
+                LIST_DOCUMENTS_SQL,
                 self.collection_id,
                 self.user_id,
                 limit,
@@ -445,12 +1127,13 @@ class Collection:
             # It may make sense to consider this a 200 OK with empty list.
             # And make sure its user responsibility to check that the collection
             # exists.
-            await self._get_details_or_raise()
+            await self._get_details_or_raise(replica=replica)
         return docs
 
     async def get(self, document_id: str) -> dict[str, Any]:
         """Fetch a single chunk by its UUID, verifying collection ownership."""
-        async with get_db_connection() as conn:
+        replica = await use_replica(self.user_id)
+        async with get_db_connection(replica=replica) as conn:
             row = await conn.fetchrow(
                 """
                 SELECT e.uuid, e.document, e.cmetadata
@@ -459,7 +1142,9 @@ class Collection:
                     ON e.collection_id = c.uuid
                  WHERE e.uuid = $1
                    AND c.cmetadata->>'owner_id' = $2
+                   AND c.cmetadata->>'deleted_at' IS NULL
                    AND c.uuid = $3
+                   AND e.collection_id = $3
                 """,
                 document_id,
                 self.user_id,
@@ -475,6 +1160,142 @@ class Collection:
             "metadata": metadata,
         }
 
+    async def _embed_query(
+        self, query: str, search_type: str, model: str
+    ) -> builtins.list[float]:
+        """Embed ``query`` with ``model``, reusing the embedding in this request.
+
+        Runs off the event loop, so concurrent searches can share a batch of a
+        local model (see ``langconnect.services.onnx_embeddings``).
+        """
+        embedding = self._query_embeddings.get((model, query))
+        if embedding is None:
+            embeddings = config.get_model_embeddings(model)
+            with timed("embed", search_type):
+                embedding = await embeddings.aembed_query(query)
+            self._query_embeddings[(model, query)] = embedding
+        return embedding
+
+    async def _embeddings_of(
+        self, ids: builtins.list[str], *, replica: bool
+    ) -> dict[str, Any]:
+        """Return the stored embedding of each chunk in ``ids`` by chunk ID."""
+        async with get_db_connection(replica=replica) as conn:
+            rows = await conn.fetch_prepared(
+                CHUNK_EMBEDDINGS_SQL, self.collection_id, ids
+            )
+        embeddings = {}
+        for row in rows:
+            embedding = row["embedding"]
+            if isinstance(embedding, str):  # pgvector codec not registered
+                embedding = json.loads(embedding)
+            embeddings[row["id"]] = embedding
+        return embeddings
+
+    async def _diversify(
+        self,
+        query: str,
+        candidates: builtins.list[dict[str, Any]],
+        limit: int,
+        *,
+        diversity: str,
+        mmr_lambda: float,
+        collapse: str,
+        search_type: str,
+        replica: bool,
+    ) -> builtins.list[dict[str, Any]]:
+        """Pick ``limit`` varied results out of ranked ``candidates``."""
+        # Imported here because it pulls in numpy
+        import numpy as np
+
+        from langconnect.services.diversity import (
+            collapse_by_key,
+            collapse_similar,
+            mmr,
+        )
+
+        if collapse == "file_id":
+            keep = collapse_by_key(
+                [candidate["metadata"].get("file_id") for candidate in candidates]
+            )
+            candidates = [candidates[i] for i in keep]
+        if diversity == "none" and collapse != "embedding":
+            return candidates[:limit]
+
+        embeddings = await self._embeddings_of(
+            [candidate["id"] for candidate in candidates], replica=replica
+        )
+        # Chunks deleted since the search have no embedding left
+        candidates = [c for c in candidates if c["id"] in embeddings]
+        if not candidates:
+            return []
+        if diversity == "mmr":
+            details = await self._get_details_or_raise(replica=replica)
+            model = model_of(details["metadata"])
+        with timed("diversify", search_type):
+            matrix = np.asarray(
+                [embeddings[c["id"]] for c in candidates], dtype=np.float32
+            )
+            if collapse == "embedding":
+                keep = collapse_similar(matrix, config.DUPLICATE_SIMILARITY)
+                candidates = [candidates[i] for i in keep]
+                matrix = matrix[keep]
+            if diversity == "mmr":
+                query_embedding = np.asarray(
+                    await self._embed_query(query, search_type, model),
+                    dtype=np.float32,
+                )
+                keep = mmr(query_embedding, matrix, limit, mmr_lambda)
+                candidates = [candidates[i] for i in keep]
+        return candidates[:limit]
+
+    async def _similarity_search(
+        self,
+        details: dict[str, Any],
+        query: str,
+        k: int,
+        *,
+        search_type: str,
+        replica: bool,
+    ) -> builtins.list[tuple[Document, float]]:
+        """Return the ``k`` chunks nearest to ``query`` with their distance.
+
+        A snapshot of the collection at its current write version is
+        searched in process (see ``langconnect.services.snapshots``).
+        Otherwise, collections with a storage option search their own index;
+        the others go through ``PGVector``, unless an embedding migration is
+        copying their shadow vectors back.
+        """
+        storage = storage_of(details["metadata"])
+        embedding = await self._embed_query(
+            query, search_type, model_of(details["metadata"])
+        )
+        if is_flipped(details["metadata"]):
+            async with get_db_connection(replica=replica) as conn:
+                with timed("sql", search_type):
+                    return await embedding_migration.search(
+                        conn, self.collection_id, embedding, k
+                    )
+        if snapshots.enabled():
+            with timed("snapshot", search_type):
+                results = await snapshot_engine.search(
+                    self.collection_id, details.get("write_version", 0), embedding, k
+                )
+            if results is not None:
+                return results
+        if storage is None:
+            store = get_vectorstore(
+                collection_name=details["table_id"], replica=replica
+            )
+            with timed("sql", search_type):
+                return store.similarity_search_with_score_by_vector(embedding, k=k)
+
+        async with get_db_connection(replica=replica) as conn:
+            with timed("sql", search_type):
+                return await storage_search(
+                    conn, self.collection_id, storage, embedding, k
+                )
+
     async def search(
         self,
         query: str,
@@ -482,6 +1303,10 @@ class Collection:
         limit: int = 4,
         search_type: Literal["semantic", "keyword", "hybrid"] = "semantic",
         filter: Optional[dict[str, Any]] = None,
+        rerank: bool = False,
+        diversity: Literal["none", "mmr"] = "none",
+        mmr_lambda: float = 0.5,
+        collapse: Literal["none", "file_id", "embedding"] = "none",
     ) -> builtins.list[dict[str, Any]]:
         """Run a search in the collection.
 
@@ -490,6 +1315,14 @@ class Collection:
             limit: Maximum number of results to return
             search_type: Type of search - "semantic", "keyword", or "hybrid"
             filter: Optional metadata filter to apply to results
+            rerank: Re-rank the top ``RERANK_CANDIDATES`` results with the
+                cross-encoder; scores are then cross-encoder scores
+            diversity: "mmr" selects results by Maximal Marginal Relevance
+                among the top ``DIVERSITY_CANDIDATES`` results
+            mmr_lambda: Trade-off of MMR, from 1 (relevance only) to 0
+                (diversity only)
+            collapse: Keep only the best chunk of each file ("file_id") or drop
+                chunks nearly identical to a better one ("embedding")
 
         Returns:
             List of search results with id, page_content, metadata, and score
@@ -500,7 +1333,42 @@ class Collection:
                 detail=f"Invalid search type: {search_type}. Must be 'semantic', 'keyword', or 'hybrid'.",
             )
 
-        details = await self._get_details_or_raise()
+        if diversity != "none" or collapse != "none":
+            candidates = await self.search(
+                query,
+                limit=max(limit, config.DIVERSITY_CANDIDATES),
+                search_type=search_type,
+                filter=filter,
+                rerank=rerank,
+            )
+            return await self._diversify(
+                query,
+                candidates,
+                limit,
+                diversity=diversity,
+                mmr_lambda=mmr_lambda,
+                collapse=collapse,
+                search_type=search_type,
+                replica=await use_replica(self.user_id),
+            )
+
+        if rerank:
+            candidates = await self.search(
+                query,
+                limit=max(limit, config.RERANK_CANDIDATES),
+                search_type=search_type,
+                filter=filter,
+            )
+            try:
+                with timed("rerank", search_type):
+                    return await get_reranker().rerank(query, candidates, limit)
+            except ImportError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e)
+                ) from e
+
+        replica = await use_replica(self.user_id)
+        details = await self._get_details_or_raise(replica=replica)
 
         # Helper function to apply metadata filter
         def apply_metadata_filter(
@@ -525,10 +1393,11 @@ class Collection:
 
         if search_type == "semantic":
             # Current semantic search implementation
-            store = get_vectorstore(collection_name=details["table_id"])
             # Get more results initially if filter is applied
             k = limit * 3 if filter else limit
-            results = store.similarity_search_with_score(query, k=k)
+            results = await self._similarity_search(
+                details, query, k, search_type=search_type, replica=replica
+            )
 
             # Convert to standard format
             formatted_results = [
@@ -552,27 +1421,15 @@ class Collection:
             # Get more results initially if filter is applied
             search_limit = limit * 3 if filter else limit
 
-            async with get_db_connection() as conn:
-                rows = await conn.fetch(
-                    """
-                    SELECT e.id as id,
-                           e.document as page_content,
-                           e.cmetadata as metadata,
-                           ts_rank(to_tsvector('english', e.document), 
-                                  plainto_tsquery('english', $1)) as score
-                    FROM langchain_pg_embedding e
-                    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
-                    WHERE c.uuid = $2
-                      AND c.cmetadata->>'owner_id' = $3
-                      AND to_tsvector('english', e.document) @@ plainto_tsquery('english', $1)
-                    ORDER BY score DESC
-                    LIMIT $4
-                    """,
-                    query,
-                    self.collection_id,
-                    self.user_id,
-                    search_limit,
-                )
+            async with get_db_connection(replica=replica) as conn:
+                with timed("sql", search_type):
+                    rows = await conn.fetch_prepared(
+                        KEYWORD_SEARCH_SQL,
+                        query,
+                        self.collection_id,
+                        self.user_id,
+                        search_limit,
+                    )
 
             formatted_results = [
                 {
@@ -592,102 +1449,92 @@ class Collection:
 
         # hybrid
         # Get semantic search results
-        store = get_vectorstore(collection_name=details["table_id"])
-        semantic_results = store.similarity_search_with_score(query, k=limit * 2)
+        semantic_results = await self._similarity_search(
+            details, query, limit * 2, search_type=search_type, replica=replica
+        )
 
         # Get keyword search results
-        async with get_db_connection() as conn:
-            keyword_rows = await conn.fetch(
-                """
-                    SELECT e.id as id,
-                           e.document as page_content,
-                           e.cmetadata as metadata,
-                           ts_rank(to_tsvector('english', e.document), 
-                                  plainto_tsquery('english', $1)) as score
-                    FROM langchain_pg_embedding e
-                    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
-                    WHERE c.uuid = $2
-                      AND c.cmetadata->>'owner_id' = $3
-                      AND to_tsvector('english', e.document) @@ plainto_tsquery('english', $1)
-                    ORDER BY score DESC
-                    LIMIT $4
-                    """,
-                query,
-                self.collection_id,
-                self.user_id,
-                limit * 2,
-            )
+        async with get_db_connection(replica=replica) as conn:
+            with timed("sql", search_type):
+                keyword_rows = await conn.fetch_prepared(
+                    KEYWORD_SEARCH_SQL,
+                    query,
+                    self.collection_id,
+                    self.user_id,
+                    limit * 2,
+                )
 
-        # Combine and deduplicate results
-        combined_results = {}
+        with timed("fusion", search_type):
+            # Combine and deduplicate results
+            combined_results = {}
 
-        # Add semantic results with normalized scores
-        max_semantic_score = max(
-            (score for _, score in semantic_results), default=1.0
-        )
-        for doc, score in semantic_results:
-            normalized_score = (
-                score / max_semantic_score if max_semantic_score > 0 else 0
-            )
-            combined_results[doc.id] = {
-                "id": doc.id,
-                "page_content": doc.page_content,
-                "metadata": doc.metadata,
-                "semantic_score": normalized_score,
-                "keyword_score": 0,
-                "combined_score": normalized_score * 0.7,  # 70% weight for semantic
-            }
-
-        # Add keyword results with normalized scores
-        if keyword_rows:
-            max_keyword_score = max(
-                (float(row["score"]) for row in keyword_rows), default=1.0
-            )
-            for row in keyword_rows:
-                doc_id = str(row["id"])
+            # Add semantic results with normalized scores
+            max_semantic_score = max(
+                (score for _, score in semantic_results), default=1.0
+            )
+            for doc, score in semantic_results:
                 normalized_score = (
-                    float(row["score"]) / max_keyword_score
-                    if max_keyword_score > 0
-                    else 0
+                    score / max_semantic_score if max_semantic_score > 0 else 0
                 )
+                combined_results[doc.id] = {
+                    "id": doc.id,
+                    "page_content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "semantic_score": normalized_score,
+                    "keyword_score": 0,
+                    "combined_score": normalized_score * 0.7,  # 70% weight for semantic
+                }
 
-                if doc_id in combined_results:
-                    # Document exists, update scores
-                    combined_results[doc_id]["keyword_score"] = normalized_score
-                    combined_results[doc_id]["combined_score"] = (
-                        combined_results[doc_id]["semantic_score"] * 0.7
-                        + normalized_score * 0.3  # 30% weight for keyword
+            # Add keyword results with normalized scores
+            if keyword_rows:
+                max_keyword_score = max(
+                    (float(row["score"]) for row in keyword_rows), default=1.0
+                )
+                for row in keyword_rows:
+                    doc_id = str(row["id"])
+                    normalized_score = (
+                        float(row["score"]) / max_keyword_score
+                        if max_keyword_score > 0
+                        else 0
                     )
-                else:
-                    # New document from keyword search
-                    combined_results[doc_id] = {
-                        "id": doc_id,
-                        "page_content": row["page_content"],
-                        "metadata": json.loads(row["metadata"])
-                        if row["metadata"]
-                        else {},
-                        "semantic_score": 0,
-                        "keyword_score": normalized_score,
-                        "combined_score": normalized_score * 0.3,
-                    }
-
-        # Convert combined results to list format
-        all_results = [
-            {
-                "id": result["id"],
-                "page_content": result["page_content"],
-                "metadata": result["metadata"],
-                "score": result["combined_score"],
-            }
-            for result in combined_results.values()
-        ]
 
-        # Apply metadata filter
-        filtered_results = apply_metadata_filter(all_results, filter)
+                    if doc_id in combined_results:
+                        # Document exists, update scores
+                        combined_results[doc_id]["keyword_score"] = normalized_score
+                        combined_results[doc_id]["combined_score"] = (
+                            combined_results[doc_id]["semantic_score"] * 0.7
+                            + normalized_score * 0.3  # 30% weight for keyword
+                        )
+                    else:
+                        # New document from keyword search
+                        combined_results[doc_id] = {
+                            "id": doc_id,
+                            "page_content": row["page_content"],
+                            "metadata": json.loads(row["metadata"])
+                            if row["metadata"]
+                            else {},
+                            "semantic_score": 0,
+                            "keyword_score": normalized_score,
+                            "combined_score": normalized_score * 0.3,
+                        }
+
+            # Convert combined results to list format
+            all_results = [
+                {
+                    "id": result["id"],
+                    "page_content": result["page_content"],
+                    "metadata": result["metadata"],
+                    "score": result["combined_score"],
+                }
+                for result in combined_results.values()
+            ]
+
+            # Apply metadata filter
+            filtered_results = apply_metadata_filter(all_results, filter)
 
-        # Sort by combined score and return top results
-        sorted_results = sorted(
-            filtered_results, key=lambda x: x["score"], reverse=True
-        )[:limit]
+            # Sort by combined score and return top results
+            sorted_results = sorted(
+                filtered_results, key=lambda x: x["score"], reverse=True
+            )[:limit]
 
         return sorted_results
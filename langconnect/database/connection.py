@@ -1,21 +1,138 @@
+import asyncio
+import functools
 import logging
-from collections.abc import AsyncGenerator
+import time
+from collections.abc import AsyncGenerator, Sequence
 from contextlib import asynccontextmanager
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 import asyncpg
 import sqlalchemy
+from asyncpg.prepared_stmt import PreparedStatement
 from langchain_core.embeddings import Embeddings
-from langchain_postgres.vectorstores import PGVector
 from sqlalchemy import Engine, create_engine
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from langconnect import config
+from langconnect.metrics import timed
+
+if TYPE_CHECKING:
+    from langchain_postgres.vectorstores import PGVector
 
 logger = logging.getLogger(__name__)
 
 
+class Connection(asyncpg.Connection):
+    """Connection that keeps prepared statements for hot queries.
+
+    Statements are prepared through asyncpg's statement cache, so preparing
+    a query again on a later checkout costs no round trip, and are held for
+    the rest of the checkout. asyncpg invalidates statement objects when the
+    connection goes back to the pool, so the pool's ``setup`` hook forgets
+    them on every acquire. With ``POSTGRES_STATEMENT_CACHE_SIZE=0`` (e.g.
+    behind PgBouncer in transaction mode) the ``*_prepared`` methods run
+    queries unprepared instead.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the connection with an empty statement registry."""
+        super().__init__(*args, **kwargs)
+        self._hot_statements: dict[str, PreparedStatement] = {}
+
+    def forget_prepared(self) -> None:
+        """Drop the statements of the previous checkout."""
+        self._hot_statements.clear()
+
+    async def prepared(self, query: str) -> PreparedStatement:
+        """Return the prepared statement for ``query``, preparing it once."""
+        statement = self._hot_statements.get(query)
+        if statement is None:
+            statement = await self.prepare(query)
+            self._hot_statements[query] = statement
+        return statement
+
+    async def _run_prepared(
+        self, method: str, query: str, *args: Any
+    ) -> tuple[PreparedStatement, Any]:
+        statement = await self.prepared(query)
+        try:
+            return statement, await getattr(statement, method)(*args)
+        except asyncpg.InvalidCachedStatementError:
+            # The schema changed under the statement; prepare it again unless
+            # the failed statement has already aborted a transaction.
+            self._hot_statements.pop(query, None)
+            if self.is_in_transaction():
+                raise
+            statement = await self.prepared(query)
+            return statement, await getattr(statement, method)(*args)
+
+    async def fetch_prepared(self, query: str, *args: Any) -> list[asyncpg.Record]:
+        """Run ``query`` as a prepared statement and return all rows."""
+        if not config.POSTGRES_STATEMENT_CACHE_SIZE:
+            return await self.fetch(query, *args)
+        _, rows = await self._run_prepared("fetch", query, *args)
+        return rows
+
+    async def fetchrow_prepared(self, query: str, *args: Any) -> asyncpg.Record | None:
+        """Run ``query`` as a prepared statement and return the first row."""
+        if not config.POSTGRES_STATEMENT_CACHE_SIZE:
+            return await self.fetchrow(query, *args)
+        _, row = await self._run_prepared("fetchrow", query, *args)
+        return row
+
+    async def execute_prepared(self, query: str, *args: Any) -> str:
+        """Run ``query`` as a prepared statement and return its status."""
+        if not config.POSTGRES_STATEMENT_CACHE_SIZE:
+            return await self.execute(query, *args)
+        statement, _ = await self._run_prepared("fetch", query, *args)
+        return statement.get_statusmsg()
+
+
+async def _setup_connection(conn: Connection) -> None:
+    """Forget the prepared statements of the connection's previous checkout."""
+    conn.forget_prepared()
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Register the pgvector codecs on a new pooled connection."""
+    try:
+        # Imported here because it pulls in numpy
+        from pgvector.asyncpg import register_vector
+    except ImportError:
+        logger.warning("pgvector is not installed; vector columns stay as text.")
+        return
+    try:
+        await register_vector(conn)
+    except ValueError:
+        # The extension is created by the vector store setup on first start
+        logger.warning("pgvector extension not found; vector codec not registered.")
+
+
 _pool: asyncpg.Pool | None = None
+_replica_pool: asyncpg.Pool | None = None
+# Number of coroutines currently waiting for a pooled connection
+_waiters = 0
+
+
+async def _create_pool(host: str, port: int) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        user=config.POSTGRES_USER,
+        password=config.POSTGRES_PASSWORD,
+        host=host,
+        port=port,
+        database=config.POSTGRES_DB,
+        min_size=config.POSTGRES_POOL_MIN_SIZE,
+        max_size=config.POSTGRES_POOL_MAX_SIZE,
+        command_timeout=config.POSTGRES_COMMAND_TIMEOUT,
+        statement_cache_size=config.POSTGRES_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=(
+            config.POSTGRES_MAX_INACTIVE_CONNECTION_LIFETIME
+        ),
+        server_settings=config.POSTGRES_SERVER_SETTINGS,
+        connection_class=Connection,
+        init=_init_connection,
+        setup=_setup_connection,
+    )
 
 
 async def get_db_pool() -> asyncpg.Pool:
@@ -23,31 +140,269 @@ async def get_db_pool() -> asyncpg.Pool:
     global _pool
     if _pool is None:
         # Use parsed components for asyncpg connection
-        _pool = await asyncpg.create_pool(
-            user=config.POSTGRES_USER,
-            password=config.POSTGRES_PASSWORD,
-            host=config.POSTGRES_HOST,
-            port=config.POSTGRES_PORT,
-            database=config.POSTGRES_DB,
+        _pool = await _create_pool(config.POSTGRES_HOST, config.POSTGRES_PORT)
+        logger.info(
+            "Database connection pool created (min_size=%d, max_size=%d).",
+            config.POSTGRES_POOL_MIN_SIZE,
+            config.POSTGRES_POOL_MAX_SIZE,
         )
-        logger.info("Database connection pool created using parsed URL components.")
     return _pool
 
 
-async def close_db_pool():
-    """Close the pg connection pool."""
-    global _pool
-    if _pool:
-        await _pool.close()
-        _pool = None
+async def get_replica_pool() -> asyncpg.Pool | None:
+    """Get the read replica connection pool, or ``None`` if not configured."""
+    global _replica_pool
+    if not config.POSTGRES_REPLICA_HOST:
+        return None
+    if _replica_pool is None:
+        _replica_pool = await _create_pool(
+            config.POSTGRES_REPLICA_HOST, config.POSTGRES_REPLICA_PORT
+        )
+        logger.info("Read replica connection pool created.")
+    return _replica_pool
 
 
-@asynccontextmanager
-async def get_db_connection() -> AsyncGenerator[asyncpg.Connection, None]:
-    """Acquire a connection from the pool and release it when done."""
+REPLICA_LAG_SQL = """
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(
+               EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+             )
+           END
+"""
+
+
+class ReplicaMonitor:
+    """Track whether the read replica is reachable and caught up.
+
+    The replay lag is measured at most once per ``interval`` seconds, by
+    whichever request first finds the measurement stale; concurrent requests
+    use the previous answer instead of waiting.
+    """
+
+    def __init__(self, max_lag: float, interval: float) -> None:
+        """Initialize the monitor.
+
+        Args:
+            max_lag: Largest replay lag, in seconds, at which reads may use
+                the replica.
+            interval: Seconds between lag measurements.
+        """
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: float | None = None
+        self.usable = False
+        self._checked_at = float("-inf")
+        self._checking = False
+
+    def mark_unusable(self, error: BaseException) -> None:
+        """Route reads to the primary until the next measurement."""
+        if self.usable:
+            logger.warning("Read replica unavailable, using the primary: %s", error)
+        self.usable = False
+        self._checked_at = time.monotonic()
+
+    async def is_usable(self) -> bool:
+        """Return whether reads may currently be served by the replica."""
+        if self._checking or time.monotonic() - self._checked_at < self.interval:
+            return self.usable
+        self._checking = True
+        try:
+            pool = await get_replica_pool()
+            if pool is None:
+                return False
+            lag = await pool.fetchval(REPLICA_LAG_SQL, timeout=self.max_lag)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            self.lag = None
+            self.mark_unusable(e)
+        else:
+            self.lag = float(lag)
+            if self.lag > self.max_lag:
+                self.mark_unusable(RuntimeError(f"replay lag {self.lag:.1f}s"))
+            else:
+                self.usable = True
+                self._checked_at = time.monotonic()
+        finally:
+            self._checking = False
+        return self.usable
+
+
+replica_monitor = ReplicaMonitor(
+    max_lag=config.REPLICA_MAX_LAG_SECONDS,
+    interval=config.REPLICA_LAG_CHECK_INTERVAL,
+)
+
+# Monotonic time of the last write of each user in this process. Their reads
+# stay on the primary until the replica has had time to replay the write.
+_recent_writes: dict[str, float] = {}
+
+
+def note_write(user_id: str) -> None:
+    """Record that ``user_id`` wrote, for read-your-writes routing."""
+    now = time.monotonic()
+    _recent_writes[user_id] = now
+    if len(_recent_writes) > 10_000:
+        window = _read_your_writes_window()
+        for key, written_at in list(_recent_writes.items()):
+            if now - written_at > window:
+                del _recent_writes[key]
+
+
+def _read_your_writes_window() -> float:
+    return replica_monitor.max_lag + replica_monitor.interval
+
+
+async def use_replica(user_id: str | None = None) -> bool:
+    """Return whether a read for ``user_id`` may be served by the replica.
+
+    Reads go to the primary when no replica is configured, when it is
+    unreachable or lagging, and shortly after the user's own writes.
+    """
+    if not config.POSTGRES_REPLICA_HOST:
+        return False
+    if user_id is not None:
+        written_at = _recent_writes.get(user_id)
+        if (
+            written_at is not None
+            and time.monotonic() - written_at < _read_your_writes_window()
+        ):
+            return False
+    return await replica_monitor.is_usable()
+
+
+async def warm_db_pool(queries: Sequence[str] = ()) -> None:
+    """Open the pool and prepare ``queries`` on its idle connections.
+
+    The pool opens ``min_size`` connections when it is created; each of them
+    is checked out once so that the first requests find the hot statements
+    already prepared.
+    """
     pool = await get_db_pool()
-    async with pool.acquire() as conn:
+    if not config.POSTGRES_STATEMENT_CACHE_SIZE:
+        queries = ()
+    connections = [await pool.acquire() for _ in range(pool.get_idle_size())]
+    try:
+        for conn in connections:
+            for query in queries:
+                await conn.prepared(query)
+    finally:
+        for conn in connections:
+            await pool.release(conn)
+    logger.info(
+        "Warmed %d connections with %d prepared statements.",
+        len(connections),
+        len(queries),
+    )
+
+
+async def close_db_pool(timeout: float | None = None) -> None:
+    """Close the pg connection pools.
+
+    Waits for checked-out connections to be released, for at most ``timeout``
+    seconds, then terminates whatever is still open.
+    """
+    global _pool, _replica_pool
+    pools = [pool for pool in (_pool, _replica_pool) if pool is not None]
+    _pool = _replica_pool = None
+    for pool in pools:
+        try:
+            await asyncio.wait_for(pool.close(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out draining the connection pool; terminating.")
+            pool.terminate()
+
+
+def get_pool_stats() -> dict[str, int] | None:
+    """Return size, idle and waiter counts of the pool, if it exists."""
+    if _pool is None:
+        return None
+    return {
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+        "waiters": _waiters,
+    }
+
+
+@asynccontextmanager
+async def get_db_connection(
+    *, replica: bool = False
+) -> AsyncGenerator[asyncpg.Connection, None]:
+    """Acquire a connection from the pool and release it when done.
+
+    Args:
+        replica: Acquire from the read replica pool. Falls back to the primary
+            if the replica cannot be reached. Only for read-only queries; see
+            ``use_replica`` for when a read may see replica lag.
+    """
+    global _waiters
+    with timed("db_acquire"):
+        conn = None
+        if replica:
+            try:
+                pool = await get_replica_pool()
+                if pool is not None:
+                    conn = await pool.acquire()
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+                replica_monitor.mark_unusable(e)
+        if conn is None:
+            pool = await get_db_pool()
+            _waiters += 1
+            try:
+                conn = await pool.acquire()
+            finally:
+                _waiters -= 1
+    try:
         yield conn
+    finally:
+        await pool.release(conn)
+
+
+ADVISORY_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtextextended($1, 0))"
+ADVISORY_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtextextended($1, 0))"
+
+
+@asynccontextmanager
+async def advisory_lock(
+    conn: asyncpg.Connection,
+    key: str,
+    *,
+    timeout: float | None = 0,
+    poll_interval: float = 0.5,
+) -> AsyncGenerator[bool, None]:
+    """Hold the session advisory lock named ``key`` for the block.
+
+    The lock is polled with ``pg_try_advisory_lock`` rather than waited for
+    with ``pg_advisory_lock``: a blocked statement keeps its snapshot, and
+    ``CREATE INDEX CONCURRENTLY`` run by the lock holder waits for every
+    snapshot, so the two would deadlock.
+
+    Args:
+        conn: Connection holding the lock, outside of any transaction.
+        key: Name of the lock, hashed into the advisory lock id.
+        timeout: Seconds to wait for the lock; 0 tries once and ``None``
+            waits until it is free.
+        poll_interval: Seconds between attempts while waiting.
+
+    Yields:
+        Whether the lock was acquired; it is released on exit if it was.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        locked = await conn.fetchval(ADVISORY_LOCK_SQL, key)
+        if locked or (deadline is not None and time.monotonic() >= deadline):
+            break
+        await asyncio.sleep(poll_interval)
+    try:
+        yield locked
+    finally:
+        if locked:
+            await conn.fetchval(ADVISORY_UNLOCK_SQL, key)
+
+
+_engines: dict[str, Engine] = {}
 
 
 def get_vectorstore_engine(
@@ -57,32 +412,83 @@ def get_vectorstore_engine(
     password: str = config.POSTGRES_PASSWORD,
     dbname: str = config.POSTGRES_DB,
 ) -> Engine:
-    """Creates and returns a sync SQLAlchemy engine for PostgreSQL."""
+    """Creates and returns a sync SQLAlchemy engine for PostgreSQL.
+
+    Engines are shared per connection string, so vector stores reuse one
+    connection pool instead of opening new connections on every request.
+    """
     connection_string = f"postgresql+psycopg://{user}:{password}@{host}:{port}/{dbname}"
-    engine = create_engine(connection_string)
+    engine = _engines.get(connection_string)
+    if engine is None:
+        engine = create_engine(
+            connection_string,
+            pool_size=config.VECTORSTORE_POOL_SIZE,
+            max_overflow=config.VECTORSTORE_MAX_OVERFLOW,
+        )
+        _engines[connection_string] = engine
     return engine
 
 
+def dispose_vectorstore_engines() -> None:
+    """Close the connections of every shared SQLAlchemy engine."""
+    while _engines:
+        _, engine = _engines.popitem()
+        engine.dispose()
+
+
 DBConnection = Union[sqlalchemy.engine.Engine, str]
 
 
+@functools.cache
+def _replica_vectorstore_class() -> type["PGVector"]:
+    """Return a ``PGVector`` that does not create its collection."""
+    from langchain_postgres.vectorstores import PGVector
+
+    class ReplicaPGVector(PGVector):
+        def create_collection(self) -> None:
+            # The collection row is replicated from the primary; inserting it
+            # here would be a write, which a standby rejects
+            pass
+
+    return ReplicaPGVector
+
+
 def get_vectorstore(
     collection_name: str = config.DEFAULT_COLLECTION_NAME,
-    embeddings: Embeddings = config.DEFAULT_EMBEDDINGS,
+    embeddings: Optional[Embeddings] = None,
     engine: Optional[Union[DBConnection, Engine, AsyncEngine]] = None,
     collection_metadata: Optional[dict[str, Any]] = None,
-) -> PGVector:
+    *,
+    replica: bool = False,
+) -> "PGVector":
     """Initializes and returns a PGVector store for a specific collection,
     using an existing engine or creating one from connection parameters.
+
+    With ``replica=True`` the store reads from the read replica and does not
+    try to create the pgvector extension or the collection, which a standby
+    would reject. Only use such a store for searches, of collections read
+    from the replica.
     """
+    # Imported here to keep langchain-postgres off the import path of the app
+    from langchain_postgres.vectorstores import PGVector
+
+    if embeddings is None:
+        embeddings = config.get_default_embeddings()
     if engine is None:
-        engine = get_vectorstore_engine()
+        if replica:
+            engine = get_vectorstore_engine(
+                host=config.POSTGRES_REPLICA_HOST, port=config.POSTGRES_REPLICA_PORT
+            )
+        else:
+            engine = get_vectorstore_engine()
 
-    store = PGVector(
+    store_class = _replica_vectorstore_class() if replica else PGVector
+    store = store_class(
         embeddings=embeddings,
         collection_name=collection_name,
         connection=engine,
         use_jsonb=True,
         collection_metadata=collection_metadata,
+        create_extension=not replica,
     )
     return store
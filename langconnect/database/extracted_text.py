@@ -0,0 +1,98 @@
+"""Extracted text of uploaded files, kept to re-chunk without re-parsing.
+
+Parsing (PDFs above all) is the slowest step of an upload, and chunk
+parameters can only be changed by splitting again. So the parsed documents of
+every file, before splitting, are stored once per ``file_id`` in a side table:
+a zlib-compressed JSON list of ``{"page_content", "metadata"}`` objects.
+``Collection.rechunk`` splits them again with new parameters.
+
+Rows belong to a collection and go away with it; deleting a file's chunks by
+``file_id`` deletes its text too.
+"""
+
+import json
+import zlib
+from typing import Any
+
+from langchain_core.documents import Document
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS langconnect_extracted_text (
+        collection_id uuid NOT NULL
+            REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+        file_id text NOT NULL,
+        documents bytea NOT NULL,
+        created_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (collection_id, file_id)
+    )
+    """,
+    # Already compressed: stored out of line without a second compression pass
+    """
+    ALTER TABLE langconnect_extracted_text
+        ALTER COLUMN documents SET STORAGE EXTERNAL
+    """,
+)
+
+STORE_SQL = """
+    INSERT INTO langconnect_extracted_text (collection_id, file_id, documents)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (collection_id, file_id)
+    DO UPDATE SET documents = EXCLUDED.documents, created_at = now()
+"""
+
+LOAD_SQL = """
+    SELECT file_id, documents
+      FROM langconnect_extracted_text
+     WHERE collection_id = $1
+       AND ($2::text[] IS NULL OR file_id = ANY($2::text[]))
+     ORDER BY created_at, file_id
+"""
+
+DELETE_SQL = """
+    DELETE FROM langconnect_extracted_text
+     WHERE collection_id = $1
+       AND file_id = ANY($2::text[])
+"""
+
+
+def encode(documents: list[Document]) -> bytes:
+    """Serialize and compress the parsed documents of a file."""
+    payload = [
+        {"page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in documents
+    ]
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+
+
+def decode(data: bytes) -> list[Document]:
+    """Inverse of ``encode``."""
+    return [Document(**doc) for doc in json.loads(zlib.decompress(data))]
+
+
+async def store(conn: Any, collection_id: str, documents: list[Document]) -> int:
+    """Store parsed documents, grouped by their ``file_id`` metadata.
+
+    Documents without a ``file_id`` are skipped.
+
+    Returns:
+        The number of files stored.
+    """
+    files: dict[str, list[Document]] = {}
+    for doc in documents:
+        file_id = doc.metadata.get("file_id")
+        if file_id is not None:
+            files.setdefault(str(file_id), []).append(doc)
+    await conn.executemany(
+        STORE_SQL,
+        [(collection_id, file_id, encode(docs)) for file_id, docs in files.items()],
+    )
+    return len(files)
+
+
+async def load(
+    conn: Any, collection_id: str, file_ids: list[str] | None = None
+) -> dict[str, list[Document]]:
+    """Return the parsed documents of the given files, or of all files."""
+    rows = await conn.fetch(LOAD_SQL, collection_id, file_ids)
+    return {row["file_id"]: decode(row["documents"]) for row in rows}
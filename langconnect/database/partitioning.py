@@ -0,0 +1,266 @@
+"""Hash partitioning of ``langchain_pg_embedding`` by collection.
+
+By default every collection shares one embedding heap, so a scan that cannot
+use an index reads every user's chunks, and bulk deletes fragment the shared
+table. With ``EMBEDDING_PARTITIONS`` set, the table is partitioned by
+``HASH (collection_id)`` into that many partitions,
+``langchain_pg_embedding_p0`` to ``langchain_pg_embedding_p{n-1}``:
+
+- every query of one collection filters on ``collection_id`` and is pruned
+  to a single partition, at plan time or at executor start-up for prepared
+  statements;
+- the metadata, file id and full-text indexes are declared on the parent
+  and built per partition; the HNSW indexes of vector storage options (see
+  ``langconnect.database.vector_storage``) are built on the partition of
+  their collection;
+- collections without a storage option have no vector index, as in the
+  single table: ``embedding`` has no fixed dimensions, which HNSW needs,
+  and ``PGVector`` orders by the bare column. A ``vector`` storage option
+  gives a collection a full-precision index on its partition;
+- the primary key becomes ``(collection_id, id)``. ``PGVector`` upserts
+  conflict on ``id`` alone, which a partitioned table cannot enforce, so
+  chunks are written by ``add_documents`` instead. Imports still skip ids
+  of other collections, as with the single table.
+
+``CollectionsManager.setup`` converts an existing table when the setting is
+on, in one transaction that holds an exclusive lock on the table while the
+rows are copied: searches and writes wait for it. Run it ahead of a deploy
+with::
+
+    python -m langconnect.database.partitioning --partitions 16
+
+Going back to a single table is not automated.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import asyncpg
+from langchain_core.documents import Document
+
+from langconnect import config
+from langconnect.services.embedding_migration import vector_literal
+
+logger = logging.getLogger(__name__)
+
+TABLE = "langchain_pg_embedding"
+
+IS_PARTITIONED_SQL = """
+    SELECT relkind = 'p'
+      FROM pg_class
+     WHERE oid = to_regclass('langchain_pg_embedding')
+"""
+
+# The collection's partition, found by testing each partition's remainder
+PARTITION_OF_SQL = """
+    SELECT c.relname
+      FROM pg_inherits AS i
+      JOIN pg_class AS c ON c.oid = i.inhrelid
+     WHERE i.inhparent = 'langchain_pg_embedding'::regclass
+       AND satisfies_hash_partition(
+             'langchain_pg_embedding'::regclass,
+             (SELECT count(*)::int FROM pg_inherits
+               WHERE inhparent = 'langchain_pg_embedding'::regclass),
+             substring(c.relname FROM '_p([0-9]+)$')::int,
+             $1::uuid
+           )
+"""
+
+# Declared on the parent, so every partition gets its own copy
+PARTITIONED_INDEXES = (
+    """
+    CREATE INDEX IF NOT EXISTS ix_cmetadata_gin
+        ON langchain_pg_embedding USING gin (cmetadata jsonb_path_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_file_id
+        ON langchain_pg_embedding (collection_id, (cmetadata->>'file_id'))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_document_tsv
+        ON langchain_pg_embedding USING gin (to_tsvector('english', document))
+    """,
+    # Imports skip ids of other collections; the primary key leads with
+    # collection_id, so it cannot find an id alone
+    """
+    CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_id
+        ON langchain_pg_embedding (id)
+    """,
+)
+
+# Chunk upserts of a partitioned table, in place of PGVector's
+ADD_SQL = """
+    INSERT INTO langchain_pg_embedding
+           (id, collection_id, embedding, document, cmetadata)
+    SELECT v.id, $1, v.embedding::vector, v.document, v.cmetadata::jsonb
+      FROM unnest($2::text[], $3::text[], $4::text[], $5::text[])
+           AS v(id, embedding, document, cmetadata)
+        ON CONFLICT (collection_id, id) DO UPDATE
+       SET embedding = EXCLUDED.embedding,
+           document = EXCLUDED.document,
+           cmetadata = EXCLUDED.cmetadata
+"""
+
+
+def enabled() -> bool:
+    """Whether the embedding table is configured to be partitioned."""
+    return config.EMBEDDING_PARTITIONS > 0
+
+
+def migration_sql(partitions: int) -> list[str]:
+    """Return the statements converting the table into ``partitions``."""
+    statements = [
+        "LOCK TABLE langchain_pg_embedding IN ACCESS EXCLUSIVE MODE",
+        """
+        CREATE TABLE langchain_pg_embedding_partitioned (
+            id varchar NOT NULL,
+            collection_id uuid NOT NULL,
+            embedding vector,
+            document varchar,
+            cmetadata jsonb,
+            embedding_shadow vector
+        ) PARTITION BY HASH (collection_id)
+        """,
+    ]
+    statements += [
+        f"""
+        CREATE TABLE {TABLE}_p{remainder}
+            PARTITION OF langchain_pg_embedding_partitioned
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})
+        """
+        for remainder in range(partitions)
+    ]
+    statements += [
+        """
+        INSERT INTO langchain_pg_embedding_partitioned
+               (id, collection_id, embedding, document, cmetadata)
+        SELECT e.id, e.collection_id,
+               CASE WHEN c.cmetadata->'embedding_migration'->>'flipped_at'
+                         IS NOT NULL
+                    THEN COALESCE(e.embedding_shadow, e.embedding)
+                    ELSE e.embedding
+               END,
+               e.document, e.cmetadata
+          FROM langchain_pg_embedding AS e
+          JOIN langchain_pg_collection AS c ON c.uuid = e.collection_id
+        """,
+        # Also drops its indexes, storage indexes included
+        "DROP TABLE langchain_pg_embedding",
+        """
+        ALTER TABLE langchain_pg_embedding_partitioned
+            RENAME TO langchain_pg_embedding
+        """,
+        """
+        ALTER TABLE langchain_pg_embedding
+            ADD CONSTRAINT langchain_pg_embedding_pkey PRIMARY KEY (collection_id, id)
+        """,
+        """
+        ALTER TABLE langchain_pg_embedding
+            ADD CONSTRAINT langchain_pg_embedding_collection_id_fkey
+            FOREIGN KEY (collection_id)
+            REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE
+        """,
+        *PARTITIONED_INDEXES,
+    ]
+    return statements
+
+
+async def is_partitioned(conn: asyncpg.Connection) -> bool:
+    """Whether the embedding table is partitioned in the database."""
+    return bool(await conn.fetchval(IS_PARTITIONED_SQL))
+
+
+async def conflict_target(conn: asyncpg.Connection) -> str:
+    """Return the conflict target of statements inserting chunks with given ids.
+
+    Read from the table rather than ``EMBEDDING_PARTITIONS``, which may be
+    unset where the table was partitioned from the command line.
+    """
+    return "(collection_id, id)" if await is_partitioned(conn) else "(id)"
+
+
+async def migrate(conn: asyncpg.Connection, partitions: int) -> bool:
+    """Partition the embedding table if it is not partitioned yet.
+
+    Storage indexes are rebuilt on the partitions afterwards. Chunks without
+    a collection are not copied, nor are the shadow vectors of embedding
+    migrations, which are backfilled again; those of flipped migrations are
+    copied in place of ``embedding``.
+
+    Returns:
+        Whether the table was converted.
+    """
+    if await is_partitioned(conn):
+        return False
+    # Imported here: vector_storage imports this module
+    from langconnect.database.vector_storage import create_storage_indexes
+
+    start = time.perf_counter()
+    async with conn.transaction():
+        for statement in migration_sql(partitions):
+            await conn.execute(statement, timeout=None)
+    logger.info(
+        "Partitioned %s into %d partitions in %.1fs.",
+        TABLE,
+        partitions,
+        time.perf_counter() - start,
+    )
+    await create_storage_indexes(conn)
+    return True
+
+
+async def table_for(conn: asyncpg.Connection, collection_id: str) -> str:
+    """Return the table holding a collection's chunks: its partition, if any."""
+    if not await is_partitioned(conn):
+        return TABLE
+    return await conn.fetchval(PARTITION_OF_SQL, collection_id)
+
+
+async def add_documents(
+    conn: asyncpg.Connection,
+    collection_id: str,
+    documents: list[Document],
+    vectors: list[list[float]],
+) -> None:
+    """Upsert chunks with their ids and the vectors of their texts."""
+    await conn.execute(
+        ADD_SQL,
+        collection_id,
+        [doc.id for doc in documents],
+        [vector_literal(vector) for vector in vectors],
+        [doc.page_content for doc in documents],
+        [json.dumps(doc.metadata) for doc in documents],
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Partition the embedding table of the configured database."""
+    conn = await asyncpg.connect(
+        user=config.POSTGRES_USER,
+        password=config.POSTGRES_PASSWORD,
+        host=config.POSTGRES_HOST,
+        port=config.POSTGRES_PORT,
+        database=config.POSTGRES_DB,
+    )
+    try:
+        if await migrate(conn, args.partitions):
+            print(f"Partitioned {TABLE} into {args.partitions} partitions.")
+        else:
+            print(f"{TABLE} is already partitioned.")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=config.EMBEDDING_PARTITIONS or 16,
+        help="number of hash partitions (default: EMBEDDING_PARTITIONS or 16)",
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,400 @@
+"""Per-collection storage of embeddings for search: halfvec, binary, Matryoshka.
+
+Every collection shares ``langchain_pg_embedding``, whose ``embedding``
+column keeps the full-precision vectors. A storage option adds a partial HNSW
+index over a compact expression of those vectors, restricted to one
+collection, and searches order by that expression:
+
+* ``vector``: full precision, 4 bytes per dimension.
+* ``halfvec``: ``embedding::halfvec(d)``, 2 bytes per dimension.
+* ``binary``: ``binary_quantize(embedding)::bit(d)``, 1 bit per dimension.
+* ``matryoshka``: the first ``truncate_to`` dimensions of ``embedding``.
+
+The index is what has to stay in memory for fast search; the heap is only
+read for the few candidate rows. Searches fetch ``candidates`` times the
+requested number of rows from the index and re-rank them by exact cosine
+distance against the full vectors, so scores stay comparable with the
+default search. The option is stored under ``vector_storage`` in the
+collection metadata.
+
+Convert existing collections with::
+
+    python -m langconnect.database.vector_storage COLLECTION_ID --type binary
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, NotRequired, TypedDict
+
+import asyncpg
+from langchain_core.documents import Document
+
+from langconnect import config
+from langconnect.database import partitioning
+
+logger = logging.getLogger(__name__)
+
+STORAGE_METADATA_KEY = "vector_storage"
+STORAGE_TYPES = ("vector", "halfvec", "binary", "matryoshka")
+
+# Operator class and distance operator of the index of each type
+_OPERATORS = {
+    "vector": ("vector_cosine_ops", "<=>"),
+    "halfvec": ("halfvec_cosine_ops", "<=>"),
+    "binary": ("bit_hamming_ops", "<~>"),
+    "matryoshka": ("vector_cosine_ops", "<=>"),
+}
+# Largest number of dimensions pgvector can index with HNSW, per type
+MAX_INDEX_DIMENSIONS = {
+    "vector": 2000,
+    "halfvec": 4000,
+    "binary": 64000,
+    "matryoshka": 2000,
+}
+# Re-ranking over-fetch factor; one bit per dimension loses the most recall
+DEFAULT_CANDIDATES = {"vector": 1, "halfvec": 1, "binary": 4, "matryoshka": 2}
+MAX_CANDIDATES = 100
+# hnsw.ef_search bounds how many rows an HNSW scan can return (max 1000)
+DEFAULT_EF_SEARCH = 40
+MAX_EF_SEARCH = 1000
+
+
+class VectorStorage(TypedDict):
+    """Validated storage option of a collection."""
+
+    type: str
+    dimensions: int
+    candidates: int
+    truncate_to: NotRequired[int]
+
+
+def normalize_storage(options: dict[str, Any]) -> VectorStorage:
+    """Validate storage options and fill in defaults.
+
+    Args:
+        options: ``type``, ``dimensions`` (of the full embeddings) and the
+            optional ``candidates`` and ``truncate_to`` (``matryoshka`` only).
+
+    Raises:
+        ValueError: If the options are invalid or cannot be indexed.
+    """
+    storage_type = options.get("type")
+    if storage_type not in STORAGE_TYPES:
+        raise ValueError(
+            f"Invalid storage type: {storage_type!r}. "
+            f"Must be one of {', '.join(STORAGE_TYPES)}."
+        )
+    dimensions = options.get("dimensions")
+    if not isinstance(dimensions, int) or dimensions < 1:
+        raise ValueError("dimensions must be a positive integer.")
+    candidates = options.get("candidates") or DEFAULT_CANDIDATES[storage_type]
+    if not isinstance(candidates, int) or not 1 <= candidates <= MAX_CANDIDATES:
+        raise ValueError(f"candidates must be between 1 and {MAX_CANDIDATES}.")
+
+    storage: VectorStorage = {
+        "type": storage_type,
+        "dimensions": dimensions,
+        "candidates": candidates,
+    }
+    indexed = dimensions
+    truncate_to = options.get("truncate_to")
+    if storage_type == "matryoshka":
+        if not isinstance(truncate_to, int) or not 0 < truncate_to < dimensions:
+            raise ValueError(
+                f"truncate_to must be between 1 and {dimensions - 1} for "
+                "matryoshka storage."
+            )
+        storage["truncate_to"] = indexed = truncate_to
+    elif truncate_to is not None:
+        raise ValueError("truncate_to only applies to matryoshka storage.")
+
+    if indexed > MAX_INDEX_DIMENSIONS[storage_type]:
+        raise ValueError(
+            f"{storage_type} storage can index at most "
+            f"{MAX_INDEX_DIMENSIONS[storage_type]} dimensions, got {indexed}."
+        )
+    return storage
+
+
+def storage_of(metadata: dict[str, Any]) -> VectorStorage | None:
+    """Return the storage option recorded in collection metadata, if any."""
+    options = metadata.get(STORAGE_METADATA_KEY)
+    return normalize_storage(options) if options else None
+
+
+def index_name(collection_id: str, storage_type: str) -> str:
+    """Return the name of the index backing a collection's storage."""
+    return f"ix_embedding_{uuid.UUID(str(collection_id)).hex}_{storage_type}"
+
+
+def _collection_predicate(collection_id: str) -> str:
+    # The partial index is only usable when the planner can prove the query's
+    # predicate implies the index's, which needs a constant. Going through
+    # uuid.UUID makes the literal safe to inline.
+    return f"collection_id = '{uuid.UUID(str(collection_id))}'::uuid"
+
+
+def _expression(storage: VectorStorage, value: str) -> str:
+    """Return the indexed expression of ``value``, a vector expression."""
+    dimensions = storage["dimensions"]
+    storage_type = storage["type"]
+    if storage_type == "halfvec":
+        return f"({value})::halfvec({dimensions})"
+    if storage_type == "binary":
+        return f"binary_quantize({value})::bit({dimensions})"
+    if storage_type == "matryoshka":
+        truncate_to = storage["truncate_to"]
+        return f"subvector({value}, 1, {truncate_to})::vector({truncate_to})"
+    return f"({value})::vector({dimensions})"
+
+
+def create_index_sql(
+    collection_id: str, storage: VectorStorage, table: str = partitioning.TABLE
+) -> str:
+    """Return the DDL building the HNSW index of a collection's storage.
+
+    ``table`` is the collection's partition when the embedding table is
+    partitioned: indexes cannot be built concurrently on the parent.
+    """
+    opclass, _ = _OPERATORS[storage["type"]]
+    name = index_name(collection_id, storage["type"])
+    return f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}
+            ON {table}
+         USING hnsw (({_expression(storage, "embedding")}) {opclass})
+         WHERE {_collection_predicate(collection_id)}
+    """
+
+
+def search_sql(collection_id: str, storage: VectorStorage) -> str:
+    """Return the nearest-neighbour query of a collection's storage.
+
+    Parameters are ``$1`` the query vector, ``$2`` the number of results and
+    ``$3`` the number of candidates read from the index. ``score`` is the
+    full-precision cosine distance, as returned by ``PGVector``.
+    """
+    _, operator = _OPERATORS[storage["type"]]
+    query = _expression(storage, "$1::vector")
+    return f"""
+        SELECT id, document, cmetadata, embedding <=> $1::vector AS score
+          FROM (
+                SELECT id, document, cmetadata, embedding
+                  FROM langchain_pg_embedding
+                 WHERE {_collection_predicate(collection_id)}
+                 ORDER BY {_expression(storage, "embedding")} {operator} {query}
+                 LIMIT $3
+               ) AS candidates
+         ORDER BY score
+         LIMIT $2
+    """
+
+
+async def search(
+    conn: asyncpg.Connection,
+    collection_id: str,
+    storage: VectorStorage,
+    embedding: list[float],
+    k: int,
+) -> list[tuple[Document, float]]:
+    """Return the ``k`` nearest chunks with their cosine distance."""
+    fetch = min(k * storage["candidates"], MAX_EF_SEARCH)
+    async with conn.transaction():
+        if fetch > DEFAULT_EF_SEARCH:
+            await conn.execute(f"SET LOCAL hnsw.ef_search = {fetch}")
+        rows = await conn.fetch(
+            search_sql(collection_id, storage), embedding, k, max(fetch, k)
+        )
+    return [
+        (
+            Document(
+                id=str(row["id"]),
+                page_content=row["document"],
+                metadata=json.loads(row["cmetadata"]) if row["cmetadata"] else {},
+            ),
+            float(row["score"]),
+        )
+        for row in rows
+    ]
+
+
+async def embedding_dimensions(conn: asyncpg.Connection, collection_id: str) -> int:
+    """Return the dimensions of a collection's vectors, or of the embeddings."""
+    dimensions = await conn.fetchval(
+        """
+        SELECT vector_dims(embedding)
+          FROM langchain_pg_embedding
+         WHERE collection_id = $1
+         LIMIT 1
+        """,
+        collection_id,
+    )
+    if dimensions is None:
+        embeddings = config.get_default_embeddings()
+        vector = await asyncio.to_thread(embeddings.embed_query, "dimensions")
+        dimensions = len(vector)
+    return dimensions
+
+
+async def create_storage_index(
+    conn: asyncpg.Connection, collection_id: str, storage: VectorStorage
+) -> None:
+    """Build the index of ``storage``, leaving writes to the table unblocked."""
+    table = await partitioning.table_for(conn, collection_id)
+    await conn.execute(create_index_sql(collection_id, storage, table), timeout=None)
+
+
+async def create_storage_indexes(conn: asyncpg.Connection) -> None:
+    """Build the storage indexes of every collection that lacks its index."""
+    rows = await conn.fetch(
+        """
+        SELECT uuid, cmetadata
+          FROM langchain_pg_collection
+         WHERE cmetadata->'vector_storage' IS NOT NULL
+        """
+    )
+    for row in rows:
+        storage = storage_of(json.loads(row["cmetadata"]))
+        if storage is not None:
+            await create_storage_index(conn, str(row["uuid"]), storage)
+
+
+async def apply_storage(
+    conn: asyncpg.Connection,
+    collection_id: str,
+    options: dict[str, Any] | None,
+) -> VectorStorage | None:
+    """Convert a collection to a storage option, or back to the default.
+
+    The new index is built first and the metadata switched afterwards, so
+    searches keep using the previous storage until the new one is ready. The
+    full vectors are never modified, which makes every conversion reversible.
+
+    Args:
+        conn: A connection outside of any transaction.
+        collection_id: UUID of the collection.
+        options: Storage options (see ``normalize_storage``); ``dimensions``
+            is read from the collection when omitted. ``None`` returns the
+            collection to the default full-precision sequential search.
+
+    Raises:
+        LookupError: If the collection does not exist.
+        ValueError: If the options are invalid.
+    """
+    metadata = await conn.fetchval(
+        "SELECT cmetadata FROM langchain_pg_collection WHERE uuid = $1",
+        collection_id,
+    )
+    if metadata is None:
+        raise LookupError(f"Collection '{collection_id}' not found")
+    previous = storage_of(json.loads(metadata))
+
+    storage = None
+    if options is not None:
+        options = dict(options)
+        if not options.get("dimensions"):
+            options["dimensions"] = await embedding_dimensions(conn, collection_id)
+        storage = normalize_storage(options)
+        start = asyncio.get_running_loop().time()
+        await create_storage_index(conn, collection_id, storage)
+        logger.info(
+            "Built %s index of collection %s in %.1fs.",
+            storage["type"],
+            collection_id,
+            asyncio.get_running_loop().time() - start,
+        )
+
+    await conn.execute(
+        """
+        UPDATE langchain_pg_collection
+           SET cmetadata = CASE
+                 WHEN $2::jsonb IS NULL THEN cmetadata::jsonb - $3
+                 ELSE jsonb_set(cmetadata::jsonb, ARRAY[$3], $2::jsonb, true)
+               END
+         WHERE uuid = $1
+        """,
+        collection_id,
+        json.dumps(storage) if storage is not None else None,
+        STORAGE_METADATA_KEY,
+    )
+
+    if previous is not None and (
+        storage is None or storage["type"] != previous["type"]
+    ):
+        await conn.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS "
+            f"{index_name(collection_id, previous['type'])}"
+        )
+    return storage
+
+
+async def drop_storage_indexes(conn: asyncpg.Connection, collection_id: str) -> None:
+    """Drop every storage index of a collection."""
+    for storage_type in STORAGE_TYPES:
+        await conn.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS "
+            f"{index_name(collection_id, storage_type)}"
+        )
+
+
+async def migrate(args: argparse.Namespace) -> None:
+    """Convert the collections named on the command line."""
+    conn = await asyncpg.connect(
+        user=config.POSTGRES_USER,
+        password=config.POSTGRES_PASSWORD,
+        host=config.POSTGRES_HOST,
+        port=config.POSTGRES_PORT,
+        database=config.POSTGRES_DB,
+    )
+    try:
+        for collection_id in args.collection_ids:
+            options = None
+            if args.type != "default":
+                options = {
+                    "type": args.type,
+                    "dimensions": args.dimensions,
+                    "candidates": args.candidates,
+                    "truncate_to": args.truncate_to,
+                }
+            storage = await apply_storage(conn, collection_id, options)
+            print(f"{collection_id}: {json.dumps(storage)}")
+    finally:
+        await conn.close()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Convert collections to another vector storage."
+    )
+    parser.add_argument("collection_ids", nargs="+", metavar="COLLECTION_ID")
+    parser.add_argument(
+        "--type",
+        required=True,
+        choices=[*STORAGE_TYPES, "default"],
+        help="'default' drops the index and searches full vectors sequentially.",
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        help="Embedding dimensions (default: read from the collection).",
+    )
+    parser.add_argument("--truncate-to", type=int, help="Matryoshka dimensions.")
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        help="Rows re-ranked per requested result (default depends on --type).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
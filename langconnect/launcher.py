@@ -0,0 +1,204 @@
+"""Production launcher for the API server.
+
+Runs ``langconnect.server:APP`` on several uvicorn worker processes, each
+with its own event loop and connection pools. Settings default to the values
+in ``langconnect.config`` and can be overridden on the command line::
+
+    python -m langconnect --workers 4 --max-requests 10000
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+import os
+
+import asyncpg
+import uvicorn
+
+from langconnect import config
+
+logger = logging.getLogger(__name__)
+
+APP = "langconnect.server:APP"
+
+
+def default_workers() -> int:
+    """Return the number of cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS
+        return os.cpu_count() or 1
+
+
+def pool_max_size(
+    max_connections: int,
+    workers: int,
+    *,
+    reserved: int,
+    engine_connections: int,
+) -> int:
+    """Return the asyncpg pool size that keeps all workers within budget.
+
+    Each worker also holds up to ``engine_connections`` connections in the
+    SQLAlchemy engine used by the vector store.
+
+    Raises:
+        ValueError: If the budget leaves no connection for the asyncpg pool.
+    """
+    per_worker = (max_connections - reserved) // workers
+    size = per_worker - engine_connections
+    if size < 1:
+        raise ValueError(
+            f"max_connections={max_connections} is too small for {workers} "
+            f"workers: each needs {engine_connections} vector store "
+            f"connections plus at least one pooled connection, with {reserved} "
+            "reserved. Lower the worker count or the pool sizes."
+        )
+    return size
+
+
+async def fetch_max_connections() -> int:
+    """Read ``max_connections`` from the configured Postgres server."""
+    conn = await asyncpg.connect(
+        user=config.POSTGRES_USER,
+        password=config.POSTGRES_PASSWORD,
+        host=config.POSTGRES_HOST,
+        port=config.POSTGRES_PORT,
+        database=config.POSTGRES_DB,
+        timeout=10,
+    )
+    try:
+        return int(await conn.fetchval("SHOW max_connections"))
+    finally:
+        await conn.close()
+
+
+def size_worker_pools(workers: int, max_connections: int | None) -> None:
+    """Cap the per-worker pool sizes and export them to the workers.
+
+    Worker processes are fresh interpreters that read ``langconnect.config``
+    from the environment, so the sizes are passed through ``os.environ`` as
+    well as set on the already imported config of this process.
+    """
+    if max_connections is None:
+        try:
+            max_connections = asyncio.run(fetch_max_connections())
+        except Exception as e:
+            logger.warning(
+                "Could not read max_connections (%s); keeping the configured "
+                "pool size of %d per worker.",
+                e,
+                config.POSTGRES_POOL_MAX_SIZE,
+            )
+            return
+
+    budget = pool_max_size(
+        max_connections,
+        workers,
+        reserved=config.POSTGRES_RESERVED_CONNECTIONS,
+        engine_connections=(
+            config.VECTORSTORE_POOL_SIZE + config.VECTORSTORE_MAX_OVERFLOW
+        ),
+    )
+    max_size = min(config.POSTGRES_POOL_MAX_SIZE, budget)
+    min_size = min(config.POSTGRES_POOL_MIN_SIZE, max_size)
+    os.environ["POSTGRES_POOL_MAX_SIZE"] = str(max_size)
+    os.environ["POSTGRES_POOL_MIN_SIZE"] = str(min_size)
+    config.POSTGRES_POOL_MAX_SIZE = max_size
+    config.POSTGRES_POOL_MIN_SIZE = min_size
+    logger.info(
+        "Sized pools for %d workers and max_connections=%d: min_size=%d, "
+        "max_size=%d per worker.",
+        workers,
+        max_connections,
+        min_size,
+        max_size,
+    )
+
+
+def uvicorn_options(args: argparse.Namespace) -> dict:
+    """Translate launcher arguments into ``uvicorn.run`` keyword arguments."""
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        # "auto" picks uvloop and httptools when installed (uvicorn[standard])
+        "loop": args.loop,
+        "http": args.http,
+        "timeout_keep_alive": args.keep_alive,
+        "backlog": args.backlog,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "server_header": False,
+    }
+    if args.max_requests:
+        options["limit_max_requests"] = args.max_requests
+        # Spreads worker restarts out; older uvicorn releases lack the option
+        parameters = inspect.signature(uvicorn.Config).parameters
+        if args.max_requests_jitter and "limit_max_requests_jitter" in parameters:
+            options["limit_max_requests_jitter"] = args.max_requests_jitter
+    return options
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.WEB_CONCURRENCY or default_workers(),
+        help="Worker processes (default: WEB_CONCURRENCY or the core count).",
+    )
+    parser.add_argument("--loop", default="auto", choices=["auto", "uvloop", "asyncio"])
+    parser.add_argument("--http", default="auto", choices=["auto", "httptools", "h11"])
+    parser.add_argument(
+        "--keep-alive",
+        type=int,
+        default=config.KEEP_ALIVE_TIMEOUT,
+        help="Seconds to keep idle connections open. Keep it above the idle "
+        "timeout of the load balancer in front.",
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=config.BACKLOG,
+        help="Maximum number of pending connections on the listening socket.",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=config.MAX_REQUESTS,
+        help="Restart a worker after this many requests (0 disables).",
+    )
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=config.MAX_REQUESTS_JITTER
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=config.GRACEFUL_TIMEOUT,
+        help="Seconds a stopping worker may spend finishing in-flight requests.",
+    )
+    parser.add_argument(
+        "--db-max-connections",
+        type=int,
+        default=config.POSTGRES_MAX_CONNECTIONS or None,
+        help="Postgres max_connections budget (default: read from the server).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Size the connection pools and run the API server."""
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    size_worker_pools(args.workers, args.db_max_connections)
+    # Workers divide the cores among themselves (see onnx_embeddings)
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run(APP, **uvicorn_options(args))
+
+
+if __name__ == "__main__":
+    main()
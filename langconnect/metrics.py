@@ -0,0 +1,322 @@
+"""Request and hot-path latency metrics exposed in Prometheus text format.
+
+Histograms are sharded per thread: every thread increments only its own
+bucket counters, so observations never take a lock (``list.append`` used to
+register a shard is atomic in CPython). Exposition sums the shards, which may
+be momentarily behind a concurrent writer but is never corrupted.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency buckets in seconds, from sub-millisecond SQL up to slow uploads
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# ASGI scope of the request being served, used to label stage timings with the
+# matched route template once routing has happened
+current_scope: ContextVar[Scope | None] = ContextVar("current_scope", default=None)
+
+LabelValues = tuple[str, ...]
+
+
+class _Shard:
+    __slots__ = ("counts", "max", "min", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+
+class Histogram:
+    """A labelled histogram with per-thread, lock-free shards."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize the histogram.
+
+        Args:
+            name: Metric name.
+            documentation: Help text for the ``# HELP`` line.
+            labelnames: Names of the labels every observation carries.
+            buckets: Upper bounds of the finite buckets, in ascending order.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: list[dict[LabelValues, _Shard]] = []
+
+    def _series(self) -> dict[LabelValues, _Shard]:
+        series = getattr(self._local, "series", None)
+        if series is None:
+            series = self._local.series = {}
+            self._shards.append(series)
+        return series
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation for the given label values."""
+        series = self._series()
+        shard = series.get(labelvalues)
+        if shard is None:
+            shard = series[labelvalues] = _Shard(len(self.buckets) + 1)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        shard.counts[index] += 1
+        shard.sum += value
+        if value < shard.min:
+            shard.min = value
+        if value > shard.max:
+            shard.max = value
+
+    def collect(self) -> dict[LabelValues, "HistogramSnapshot"]:
+        """Merge the shards into one snapshot per label set."""
+        merged: dict[LabelValues, HistogramSnapshot] = {}
+        for series in list(self._shards):
+            for labelvalues, shard in list(series.items()):
+                snapshot = merged.get(labelvalues)
+                if snapshot is None:
+                    snapshot = merged[labelvalues] = HistogramSnapshot(
+                        len(self.buckets) + 1
+                    )
+                snapshot.add(shard)
+        return merged
+
+    def quantile(self, counts: list[int], q: float) -> float | None:
+        """Estimate the ``q`` quantile from bucket counts by interpolation."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def expose(self) -> list[str]:
+        """Render the histogram in Prometheus text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labelvalues, snapshot in sorted(self.collect().items()):
+            counts = snapshot.counts
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, labelvalues, strict=True)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=False):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {snapshot.sum}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class HistogramSnapshot:
+    """Non-cumulative bucket counts, sum, min and max of one label set."""
+
+    def __init__(self, size: int) -> None:
+        """Initialize an empty snapshot with ``size`` buckets."""
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, shard: _Shard) -> None:
+        """Fold a shard into the snapshot."""
+        self.counts = [a + b for a, b in zip(self.counts, shard.counts, strict=True)]
+        self.sum += shard.sum
+        self.min = min(self.min, shard.min)
+        self.max = max(self.max, shard.max)
+
+    @property
+    def count(self) -> int:
+        """Total number of observations."""
+        return sum(self.counts)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "langconnect_http_request_duration_seconds",
+    "Latency of HTTP requests.",
+    ("method", "endpoint", "status"),
+)
+STAGE_DURATION = Histogram(
+    "langconnect_stage_duration_seconds",
+    "Latency of individual request stages (auth, db_acquire, get_details, "
+    "embed, sql, fusion, json_encode).",
+    ("stage", "endpoint", "search_type"),
+)
+HISTOGRAMS = (REQUEST_DURATION, STAGE_DURATION)
+
+
+def _endpoint(scope: Scope | None) -> str:
+    """Return the matched route template of a request scope."""
+    if scope is None:
+        return "none"
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+@contextmanager
+def timed(stage: str, search_type: str = "") -> Iterator[None]:
+    """Record the duration of the enclosed block as a request stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        endpoint = _endpoint(current_scope.get())
+        STAGE_DURATION.observe(
+            time.perf_counter() - start, stage, endpoint, search_type
+        )
+
+
+def render_prometheus() -> str:
+    """Render every metric in Prometheus text exposition format."""
+    lines: list[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return "\n".join(lines) + "\n"
+
+
+def stage_average_ms(stage: str) -> float | None:
+    """Return the mean latency of ``stage`` across all labels, in milliseconds."""
+    total = 0.0
+    count = 0
+    for labelvalues, snapshot in STAGE_DURATION.collect().items():
+        if labelvalues[0] == stage:
+            total += snapshot.sum
+            count += snapshot.count
+    return total / count * 1000 if count else None
+
+
+def performance_summaries() -> list[dict[str, Any]]:
+    """Summarize latencies using the fields of ``PerformanceMetric``.
+
+    Values are in milliseconds and cover the lifetime of the process.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    summaries = []
+    for histogram in HISTOGRAMS:
+        for labelvalues, snapshot in sorted(histogram.collect().items()):
+            count = snapshot.count
+            if not count:
+                continue
+            labels = dict(zip(histogram.labelnames, labelvalues, strict=True))
+            quantiles = {
+                q: histogram.quantile(snapshot.counts, q) * 1000
+                for q in (0.50, 0.95, 0.99)
+            }
+            summaries.append(
+                {
+                    "id": f"{histogram.name}:{':'.join(labelvalues)}",
+                    "timestamp": now,
+                    "metric_type": "response_time",
+                    "timeframe": "process",
+                    "labels": labels,
+                    "count": count,
+                    "avg_value": snapshot.sum / count * 1000,
+                    "min_value": snapshot.min * 1000,
+                    "max_value": snapshot.max * 1000,
+                    "p50_value": quantiles[0.50],
+                    "p95_value": quantiles[0.95],
+                    "p99_value": quantiles[0.99],
+                }
+            )
+    return summaries
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request.
+
+    Requests are labelled with the matched route template (e.g.
+    ``/collections/{collection_id}/documents/search``) rather than the raw
+    path, which keeps label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Wrap ``app``."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Serve the request and record its latency."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        token = current_scope.set(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                _endpoint(scope),
+                str(status_code),
+            )
+            current_scope.reset(token)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response that records encoding time as the ``json_encode`` stage."""
+
+    def render(self, content: Any) -> bytes:
+        """Encode ``content`` and time it."""
+        with timed("json_encode"):
+            return super().render(content)
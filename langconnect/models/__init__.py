@@ -1,25 +1,33 @@
 from langconnect.models.collection import (
+    CollectionClone,
     CollectionCreate,
     CollectionResponse,
     CollectionUpdate,
+    EmbeddingMigrationCreate,
+    VectorStorageOptions,
 )
 from langconnect.models.document import (
     DocumentCreate,
+    DocumentDelete,
     DocumentResponse,
     DocumentUpdate,
+    RechunkRequest,
     SearchQuery,
     SearchResult,
-    DocumentDelete,
 )
 
 __all__ = [
+    "CollectionClone",
     "CollectionCreate",
     "CollectionResponse",
     "CollectionUpdate",
+    "EmbeddingMigrationCreate",
+    "VectorStorageOptions",
     "DocumentCreate",
     "DocumentResponse",
     "DocumentUpdate",
     "SearchQuery",
     "SearchResult",
     "DocumentDelete",
+    "RechunkRequest",
 ]
@@ -1,5 +1,5 @@
 import datetime
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
@@ -8,6 +8,28 @@ from pydantic import BaseModel, Field
 # =====================
 
 
+class VectorStorageOptions(BaseModel):
+    """Schema for how a collection indexes its embeddings."""
+
+    type: Literal["vector", "halfvec", "binary", "matryoshka"] = Field(
+        ...,
+        description="Indexed representation: full precision, half precision, "
+        "binary quantization or the first `truncate_to` dimensions.",
+    )
+    dimensions: int | None = Field(
+        None, gt=0, description="Embedding dimensions (default: detected)."
+    )
+    truncate_to: int | None = Field(
+        None, gt=0, description="Dimensions kept by matryoshka storage."
+    )
+    candidates: int | None = Field(
+        None,
+        ge=1,
+        le=100,
+        description="Rows re-ranked against the full vectors per result.",
+    )
+
+
 class CollectionCreate(BaseModel):
     """Schema for creating a new collection."""
 
@@ -15,6 +37,9 @@ class CollectionCreate(BaseModel):
     metadata: dict[str, Any] = Field(
         default_factory=dict, description="Optional metadata for the collection."
     )
+    vector_storage: VectorStorageOptions | None = Field(
+        None, description="Optional compact index for the embeddings."
+    )
 
 
 class CollectionUpdate(BaseModel):
@@ -26,6 +51,28 @@ class CollectionUpdate(BaseModel):
     )
 
 
+class CollectionClone(BaseModel):
+    """Schema for copying a collection."""
+
+    name: str = Field(..., description="The name of the copy.")
+    metadata: dict[str, Any] = Field(
+        default_factory=dict, description="Optional metadata for the copy."
+    )
+    filter: dict[str, Any] | None = Field(
+        None,
+        description="Only copy chunks whose metadata has these values, "
+        'e.g. {"file_id": "..."}.',
+    )
+
+
+class EmbeddingMigrationCreate(BaseModel):
+    """Schema for moving a collection to another embedding model."""
+
+    model: str = Field(
+        ..., min_length=1, description="Embedding model to re-embed the chunks with."
+    )
+
+
 class CollectionResponse(BaseModel):
     """Schema for representing a collection from PGVector."""
 
@@ -25,6 +25,10 @@ class SearchQuery(BaseModel):
     limit: int | None = 10
     filter: dict[str, Any] | None = None
     search_type: Literal["semantic", "keyword", "hybrid"] = "semantic"
+    rerank: bool = False
+    diversity: Literal["none", "mmr"] = "none"
+    mmr_lambda: float = Field(0.5, ge=0.0, le=1.0)
+    collapse: Literal["none", "file_id", "embedding"] = "none"
 
 
 class SearchResult(BaseModel):
@@ -36,3 +40,9 @@ class SearchResult(BaseModel):
 class DocumentDelete(BaseModel):
     document_ids: Optional[list[str]] = Field(None, description="List of document IDs to delete.")
     file_ids: Optional[list[str]] = Field(None, description="List of file IDs to delete all associated documents.")
+
+
+class RechunkRequest(BaseModel):
+    chunk_size: int = Field(1000, gt=0, description="Maximum size of each chunk.")
+    chunk_overlap: int = Field(200, ge=0, description="Overlap between chunks.")
+    file_ids: Optional[list[str]] = Field(None, description="Files to re-chunk; all files with stored text if omitted.")
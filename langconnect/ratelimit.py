@@ -0,0 +1,168 @@
+"""Per-user rate limiting and concurrency admission control.
+
+Every user gets, per budget ("ingest" or "search"), a token bucket bounding
+the request rate and a cap on requests in flight. Requests over either limit
+are rejected up front with ``429 Too Many Requests`` and a ``Retry-After``
+header, before they take a database connection or call the embedding
+provider, so one tenant cannot starve the others.
+
+Limits depend on the user tier, whose values mirror ``UserTier`` in
+``src/models/user_models.py``. State lives in the worker process.
+"""
+
+import math
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Annotated, Any
+
+from fastapi import Depends, status
+from fastapi.exceptions import HTTPException
+
+from langconnect import config
+from langconnect.auth import AuthenticatedUser, resolve_user
+
+BASIC = "basic"
+
+# Idle users are forgotten once this many (user, budget) pairs are tracked
+MAX_TRACKED = 10_000
+
+
+class TokenBucket:
+    """Allow ``rate`` events per second with bursts of up to ``burst``."""
+
+    __slots__ = ("burst", "rate", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float | None = None) -> float:
+        """Take a token; return 0, or the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """Return whether the bucket has refilled completely."""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Budget:
+    __slots__ = ("bucket", "concurrency", "in_flight")
+
+    def __init__(self, rate: float, burst: float, concurrency: int) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.in_flight = 0
+
+
+def tier_limits(tier: str, budget: str) -> dict[str, Any]:
+    """Return the limits of ``budget`` for ``tier``, overrides applied.
+
+    Unknown tiers get the limits of the basic tier.
+    """
+    if tier not in config.DEFAULT_RATE_LIMITS:
+        tier = BASIC
+    return {
+        **config.DEFAULT_RATE_LIMITS[tier][budget],
+        **config.RATE_LIMITS.get(tier, {}).get(budget, {}),
+    }
+
+
+class RateLimiter:
+    """Admission control keyed on (user identity, budget)."""
+
+    def __init__(self, max_tracked: int = MAX_TRACKED) -> None:
+        """Initialize an empty limiter."""
+        self.max_tracked = max_tracked
+        self._budgets: dict[tuple[str, str], _Budget] = {}
+
+    def _budget(self, user: AuthenticatedUser, budget: str) -> _Budget:
+        key = (user.identity, budget)
+        state = self._budgets.get(key)
+        if state is None:
+            if len(self._budgets) >= self.max_tracked:
+                self._forget_idle()
+            limits = tier_limits(user.tier, budget)
+            state = self._budgets[key] = _Budget(
+                limits["rate"], limits["burst"], limits["concurrency"]
+            )
+        return state
+
+    def _forget_idle(self) -> None:
+        # A full bucket with nothing in flight is the state of a new user
+        now = time.monotonic()
+        for key, state in list(self._budgets.items()):
+            if not state.in_flight and state.bucket.is_full(now):
+                del self._budgets[key]
+
+    @asynccontextmanager
+    async def admit(self, user: AuthenticatedUser, budget: str) -> AsyncIterator[None]:
+        """Hold a slot of ``budget`` for the enclosed request.
+
+        Raises:
+            HTTPException: 429 if the user is over the rate or concurrency
+                limit of ``budget``.
+        """
+        state = self._budget(user, budget)
+        if state.in_flight >= state.concurrency:
+            raise _too_many_requests(
+                f"Too many concurrent {budget} requests (limit {state.concurrency}).",
+                retry_after=1,
+            )
+        wait = state.bucket.take()
+        if wait:
+            raise _too_many_requests(
+                f"{budget.capitalize()} rate limit exceeded.", retry_after=wait
+            )
+        state.in_flight += 1
+        try:
+            yield
+        finally:
+            state.in_flight -= 1
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    seconds = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 3600
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(seconds)},
+    )
+
+
+limiter = RateLimiter()
+
+
+def rate_limited(
+    budget: str,
+) -> Callable[..., AsyncIterator[AuthenticatedUser]]:
+    """Return a dependency resolving the user and admitting it to ``budget``.
+
+    Use in place of ``Depends(resolve_user)``.
+    """
+
+    async def dependency(
+        user: Annotated[AuthenticatedUser, Depends(resolve_user)],
+    ) -> AsyncIterator[AuthenticatedUser]:
+        if not config.RATE_LIMIT_ENABLED:
+            yield user
+            return
+        async with limiter.admit(user, budget):
+            yield user
+
+    return dependency
@@ -4,10 +4,30 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from langconnect import config
 from langconnect.api import auth_router, collections_router, documents_router
 from langconnect.config import ALLOWED_ORIGINS
-from langconnect.database.collections import CollectionsManager
+from langconnect.database.collections import HOT_QUERIES, CollectionsManager
+from langconnect.database.connection import (
+    close_db_pool,
+    dispose_vectorstore_engines,
+    warm_db_pool,
+)
+from langconnect.metrics import (
+    MetricsMiddleware,
+    TimedJSONResponse,
+    performance_summaries,
+    render_prometheus,
+)
+from langconnect.services.cloning import cloner
+from langconnect.services.embedding_migration import migrator
+from langconnect.services.health import DOWN, deep_health
+from langconnect.services.reaper import reaper
+from langconnect.services.reranker import shutdown_reranker
+from langconnect.services.snapshots import snapshot_engine
+from langconnect.services.warmup import warm_up
 
 # Configure logging
 logging.basicConfig(
@@ -23,11 +43,32 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    """Lifespan context manager for FastAPI application."""
+    """Lifespan context manager for FastAPI application.
+
+    Opens and warms the connection pool, primes the embedding client and
+    preloads hot collections before serving, so the first requests after a
+    deploy do not pay for cold connections. On shutdown the pool is drained
+    and every connection closed, and the re-ranker's threads are stopped.
+    """
     logger.info("App is starting up. Creating background worker...")
     await CollectionsManager.setup()
-    yield
-    logger.info("App is shutting down. Stopping background worker...")
+    await warm_db_pool(HOT_QUERIES)
+    await warm_up(config.PRELOAD_COLLECTION_IDS)
+    reaper.start()
+    migrator.start()
+    cloner.start()
+    snapshot_engine.start()
+    try:
+        yield
+    finally:
+        logger.info("App is shutting down. Stopping background worker...")
+        await snapshot_engine.stop()
+        await cloner.stop()
+        await migrator.stop()
+        await reaper.stop()
+        await close_db_pool(timeout=config.SHUTDOWN_TIMEOUT)
+        dispose_vectorstore_engines()
+        shutdown_reranker()
 
 
 APP = FastAPI(
@@ -35,6 +76,7 @@ APP = FastAPI(
     description="A REST API for a RAG system using FastAPI and LangChain",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
 )
 
 # Add CORS middleware
@@ -45,6 +87,8 @@ APP.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request latency includes CORS handling
+APP.add_middleware(MetricsMiddleware)
 
 # Include API routers
 APP.include_router(auth_router)
@@ -58,7 +102,38 @@ async def health_check() -> dict:
     return {"status": "ok"}
 
 
-if __name__ == "__main__":
-    import uvicorn
+@APP.get("/health/deep")
+async def deep_health_check() -> TimedJSONResponse:
+    """Report pool, database, vector store and embedding provider health.
+
+    Responds with 503 when any component is down, so load balancers can take
+    the worker out of rotation.
+    """
+    report = await deep_health()
+    status_code = 503 if report["status"] == DOWN else 200
+    return TimedJSONResponse(report, status_code=status_code)
+
+
+@APP.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Request and stage latency histograms in Prometheus text format."""
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
 
-    uvicorn.run("langconnect.server:APP", host="0.0.0.0", port=8080)
+
+@APP.get("/metrics/summary")
+async def metrics_summary() -> list[dict]:
+    """Latency percentiles per endpoint and stage, as PerformanceMetric fields."""
+    return performance_summaries()
+
+
+def main() -> None:
+    """Run the API server with the multi-worker production launcher."""
+    from langconnect.launcher import main as launch
+
+    launch()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Background jobs working through collections flagged in their metadata.
+
+The reaper, the cloner and the embedding migrator each scan for the
+collections they have work on every ``interval`` seconds, or at once when
+woken, and work through each in batches of ``batch_size`` rows with a pause
+in between. Every worker process runs every job; a session advisory lock per
+collection keeps two of them from working on the same collection.
+"""
+
+import abc
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from langconnect.database.connection import advisory_lock, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJob(abc.ABC):
+    """Scan for pending collections in the background and work through them.
+
+    Subclasses set ``name``, ``pending_sql`` and ``lock_prefix`` and
+    implement ``run``.
+    """
+
+    # Name of the task, also used in logs
+    name = "background-job"
+    # Query returning the uuid and cmetadata of the pending collections
+    pending_sql = ""
+    # Prefix of the advisory lock key, followed by the collection id
+    lock_prefix = ""
+
+    def __init__(self, *, batch_size: int, pause: float, interval: float) -> None:
+        """Initialize the job.
+
+        Args:
+            batch_size: Rows handled per batch.
+            pause: Seconds to sleep between batches.
+            interval: Seconds between scans for pending collections.
+        """
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self) -> None:
+        """Start a scan now instead of at the next interval."""
+        self._wake.set()
+
+    def start(self) -> None:
+        """Run the job in the background of the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        """Stop the job; interrupted work resumes at the next start."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_pending()
+            except Exception:
+                logger.exception("%s failed; retrying later.", self.name)
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+
+    async def run_pending(self) -> int:
+        """Work through every pending collection; return the sum of ``run``."""
+        async with get_db_connection() as conn:
+            rows = await conn.fetch(self.pending_sql)
+        total = 0
+        for row in rows:
+            total += await self.run(str(row["uuid"]), json.loads(row["cmetadata"]))
+        return total
+
+    @abc.abstractmethod
+    async def run(self, collection_id: str, metadata: dict[str, Any]) -> int:
+        """Work through one pending collection.
+
+        Args:
+            collection_id: The collection's id.
+            metadata: The collection's metadata when it was found pending.
+        """
+
+    @contextlib.asynccontextmanager
+    async def locked(self, collection_id: str) -> AsyncGenerator[Any, None]:
+        """Hold the collection's advisory lock for the block.
+
+        Yields:
+            A connection holding the lock, or None when another worker
+            holds it.
+        """
+        async with (
+            get_db_connection() as conn,
+            advisory_lock(conn, self.lock_prefix + collection_id) as acquired,
+        ):
+            yield conn if acquired else None
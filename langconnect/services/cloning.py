@@ -0,0 +1,243 @@
+"""Server-side copies of collections.
+
+``CollectionsManager.clone`` creates the new collection and records the copy
+to make as ``clone`` in its metadata: the source collection, an optional
+metadata filter and the progress. Chunks are then copied by ``INSERT ...
+SELECT`` in keyset batches of ``CLONE_BATCH_SIZE`` rows, with their
+embeddings, so nothing goes through Python row by row and nothing is
+embedded again. Each batch commits together with its progress, so a copy
+interrupted by a restart resumes where it stopped.
+
+Copies of up to ``CLONE_SYNC_MAX_CHUNKS`` chunks run within the request;
+larger ones run in the background, in every worker, under a session
+advisory lock per collection (see ``langconnect.services.background``).
+Once all chunks are copied, the stored extracted text of the copied files
+is copied too, and the status becomes ``done``. A copy whose source is
+deleted meanwhile stops at the next batch with the status ``failed``.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from langconnect import config
+from langconnect.services.background import BackgroundJob
+from langconnect.services.embedding_migration import vector_sql
+
+logger = logging.getLogger(__name__)
+
+CLONE_METADATA_KEY = "clone"
+
+START_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(cmetadata::jsonb, '{clone}', $2::jsonb)
+     WHERE uuid = $1
+"""
+
+PENDING_SQL = """
+    SELECT uuid, cmetadata
+      FROM langchain_pg_collection
+     WHERE cmetadata->'clone'->>'status' = 'copying'
+       AND cmetadata->>'deleted_at' IS NULL
+"""
+
+COUNT_SQL = """
+    SELECT count(*)
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND ($2::jsonb IS NULL OR cmetadata @> $2::jsonb)
+"""
+
+# NULL when the source is gone, false once deleted; the row lock keeps the
+# source from being deleted while a batch is copied
+SOURCE_LIVE_SQL = """
+    SELECT cmetadata->>'deleted_at' IS NULL
+      FROM langchain_pg_collection
+     WHERE uuid = $1
+       FOR SHARE
+"""
+
+# Chunks get new ids: ids are unique across collections
+COPY_BATCH_SQL = f"""
+    WITH batch AS (
+        SELECT id, {vector_sql("$1")} AS embedding, document, cmetadata
+          FROM langchain_pg_embedding
+         WHERE collection_id = $1
+           AND id > $3
+           AND ($4::jsonb IS NULL OR cmetadata @> $4::jsonb)
+         ORDER BY id
+         LIMIT $5
+    ), copied AS (
+        INSERT INTO langchain_pg_embedding
+               (id, collection_id, embedding, document, cmetadata)
+        SELECT gen_random_uuid()::text, $2, embedding, document, cmetadata
+          FROM batch
+    )
+    SELECT max(id) AS last_id, count(*) AS copied FROM batch
+"""
+
+PROGRESS_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             jsonb_set(cmetadata::jsonb, '{clone,last_id}', to_jsonb($2::text)),
+             '{clone,copied}',
+             to_jsonb($3::bigint)
+           )
+     WHERE uuid = $1
+"""
+
+COPY_TEXT_SQL = """
+    INSERT INTO langconnect_extracted_text (collection_id, file_id, documents)
+    SELECT $2, file_id, documents
+      FROM langconnect_extracted_text
+     WHERE collection_id = $1
+       AND file_id IN (
+           SELECT DISTINCT cmetadata->>'file_id'
+             FROM langchain_pg_embedding
+            WHERE collection_id = $2
+           )
+        ON CONFLICT (collection_id, file_id) DO NOTHING
+"""
+
+FINISH_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             jsonb_set(cmetadata::jsonb, '{clone,status}', '"done"'),
+             '{clone,finished_at}',
+             to_jsonb($2::text)
+           )
+     WHERE uuid = $1
+"""
+
+FAIL_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             cmetadata::jsonb, '{clone}', (cmetadata::jsonb->'clone') || $2::jsonb
+           )
+     WHERE uuid = $1
+"""
+
+
+def new_job(source_id: str, filter: dict[str, Any] | None) -> dict[str, Any]:
+    """Return the ``clone`` metadata of a copy that has not started yet."""
+    return {
+        "source_id": source_id,
+        "filter": filter,
+        "status": "copying",
+        "copied": 0,
+        "last_id": "",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def start(conn: Any, clone_id: str, job: dict[str, Any]) -> None:
+    """Record the copy to make into ``clone_id``."""
+    await conn.execute(START_SQL, clone_id, json.dumps(job))
+
+
+async def count(conn: Any, source_id: str, filter: dict[str, Any] | None) -> int:
+    """Return the number of chunks a copy of ``source_id`` would copy."""
+    return await conn.fetchval(
+        COUNT_SQL, source_id, json.dumps(filter) if filter else None
+    )
+
+
+class CollectionCloner(BackgroundJob):
+    """Copy the chunks of pending clones in batches."""
+
+    name = "collection-cloner"
+    pending_sql = PENDING_SQL
+    lock_prefix = "clone:"
+
+    async def run(self, collection_id: str, metadata: dict[str, Any]) -> int:
+        """Run a pending copy in the background; return the chunks copied."""
+        return await self.clone(
+            collection_id, metadata[CLONE_METADATA_KEY], pause=self.pause
+        )
+
+    async def clone(
+        self, clone_id: str, job: dict[str, Any], *, pause: float = 0
+    ) -> int:
+        """Run one copy to the end; return the chunks copied.
+
+        Returns 0 without doing anything when another worker holds the copy.
+        """
+        async with self.locked(clone_id) as conn:
+            if conn is None:
+                return 0
+            return await self._clone(conn, clone_id, job, pause)
+
+    async def _clone(
+        self, conn: Any, clone_id: str, job: dict[str, Any], pause: float
+    ) -> int:
+        start = time.perf_counter()
+        source_id = job["source_id"]
+        filter = json.dumps(job["filter"]) if job.get("filter") else None
+        last_id = job.get("last_id", "")
+        total = job.get("copied", 0)
+        copied = 0
+        while True:
+            async with conn.transaction():
+                if not await conn.fetchval(SOURCE_LIVE_SQL, source_id):
+                    await self._fail(conn, clone_id, "The source was deleted.")
+                    logger.warning(
+                        "Stopped cloning collection %s into %s: the source was "
+                        "deleted after %d chunks.",
+                        source_id,
+                        clone_id,
+                        total,
+                    )
+                    return copied
+                row = await conn.fetchrow(
+                    COPY_BATCH_SQL,
+                    source_id,
+                    clone_id,
+                    last_id,
+                    filter,
+                    self.batch_size,
+                    timeout=None,
+                )
+                if not row["copied"]:
+                    break
+                last_id = row["last_id"]
+                copied += row["copied"]
+                total += row["copied"]
+                await conn.execute(PROGRESS_SQL, clone_id, last_id, total)
+            logger.info(
+                "Copied %d chunks of collection %s into %s (%d in total).",
+                row["copied"],
+                source_id,
+                clone_id,
+                total,
+            )
+            if pause:
+                await asyncio.sleep(pause)
+
+        await conn.execute(COPY_TEXT_SQL, source_id, clone_id)
+        await conn.execute(FINISH_SQL, clone_id, datetime.now(timezone.utc).isoformat())
+        logger.info(
+            "Cloned collection %s into %s: %d chunks in %.1fs.",
+            source_id,
+            clone_id,
+            total,
+            time.perf_counter() - start,
+        )
+        return copied
+
+    async def _fail(self, conn: Any, clone_id: str, error: str) -> None:
+        failure = {
+            "status": "failed",
+            "error": error,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await conn.execute(FAIL_SQL, clone_id, json.dumps(failure))
+
+
+cloner = CollectionCloner(
+    batch_size=config.CLONE_BATCH_SIZE,
+    pause=config.CLONE_BATCH_PAUSE,
+    interval=config.CLONE_INTERVAL,
+)
@@ -0,0 +1,105 @@
+"""Diversification of search results: MMR and near-duplicate collapse.
+
+Overlapping chunks of the same file tend to fill the top of a result list
+with nearly the same text. These functions pick which candidates to keep;
+they operate on the candidate embedding matrix (one row per result, in rank
+order) and return row indices, so callers can reorder any result shape.
+
+All similarities are cosine similarities computed with matrix products over
+the L2-normalized rows; the per-step work of MMR is a single matrix-vector
+product over the candidates.
+"""
+
+from collections.abc import Hashable, Sequence
+
+import numpy as np
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Return ``matrix`` with L2-normalized rows (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> list[int]:
+    """Select ``k`` candidates by Maximal Marginal Relevance.
+
+    Each step picks the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, selected)``.
+
+    Args:
+        query: Query embedding, shape ``(d,)``.
+        candidates: Candidate embeddings, shape ``(n, d)``.
+        k: Number of candidates to select.
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+
+    Returns:
+        Indices of the selected candidates, in selection order.
+    """
+    n = len(candidates)
+    if not n or k <= 0:
+        return []
+    matrix = _normalize(candidates)
+    relevance = matrix @ _normalize(query)
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to any selected one
+    redundancy = matrix @ matrix[selected[0]]
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, n) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, matrix @ matrix[best], out=redundancy)
+    return selected
+
+
+def collapse_similar(candidates: np.ndarray, threshold: float) -> list[int]:
+    """Drop candidates nearly identical to a better-ranked one.
+
+    Args:
+        candidates: Candidate embeddings in rank order, shape ``(n, d)``.
+        threshold: Cosine similarity at or above which two candidates are
+            duplicates.
+
+    Returns:
+        Indices of the kept candidates, in rank order.
+    """
+    n = len(candidates)
+    if not n:
+        return []
+    matrix = _normalize(candidates)
+    similarity = matrix @ matrix.T
+    dropped = np.zeros(n, dtype=bool)
+    kept = []
+    for i in range(n):
+        if dropped[i]:
+            continue
+        kept.append(i)
+        dropped |= similarity[i] >= threshold
+    return kept
+
+
+def collapse_by_key(keys: Sequence[Hashable | None], max_per_key: int = 1) -> list[int]:
+    """Keep at most ``max_per_key`` candidates per key, in rank order.
+
+    Candidates whose key is ``None`` are always kept.
+    """
+    counts: dict[Hashable, int] = {}
+    kept = []
+    for i, key in enumerate(keys):
+        if key is not None:
+            if counts.get(key, 0) >= max_per_key:
+                continue
+            counts[key] = counts.get(key, 0) + 1
+        kept.append(i)
+    return kept
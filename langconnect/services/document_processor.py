@@ -1,31 +1,86 @@
 import logging
 import uuid
+from collections.abc import Callable, Iterator, Mapping
 
 from fastapi import UploadFile
-from langchain_community.document_loaders.parsers import (
-    BS4HTMLParser,
-    PDFPlumberParser,
-)
 from langchain_community.document_loaders.parsers.generic import MimeTypeBasedParser
-from langchain_community.document_loaders.parsers.msword import MsWordParser
-from langchain_community.document_loaders.parsers.txt import TextParser
+from langchain_core.document_loaders import BaseBlobParser
 from langchain_core.documents.base import Blob, Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from langconnect.services.text_splitter import get_splitter
 
 LOGGER = logging.getLogger(__name__)
 
+
+# Parser factories import their dependencies on first use, so that loading this
+# module does not pull in pdfplumber, unstructured or BeautifulSoup.
+def _pdf_parser() -> BaseBlobParser:
+    from langchain_community.document_loaders.parsers import PDFPlumberParser
+
+    return PDFPlumberParser()
+
+
+def _text_parser() -> BaseBlobParser:
+    from langchain_community.document_loaders.parsers.txt import TextParser
+
+    return TextParser()
+
+
+def _html_parser() -> BaseBlobParser:
+    from langchain_community.document_loaders.parsers import BS4HTMLParser
+
+    return BS4HTMLParser()
+
+
+def _msword_parser() -> BaseBlobParser:
+    from langchain_community.document_loaders.parsers.msword import MsWordParser
+
+    return MsWordParser()
+
+
+class LazyParserMapping(Mapping[str, BaseBlobParser]):
+    """Mapping of mime type to parser that builds each parser on first access."""
+
+    def __init__(self, factories: dict[str, Callable[[], BaseBlobParser]]) -> None:
+        """Initialize with a mapping of mime type to parser factory."""
+        self._factories = factories
+        self._parsers: dict[str, BaseBlobParser] = {}
+
+    def __getitem__(self, mimetype: str) -> BaseBlobParser:
+        """Return the parser for a mime type, constructing it if needed."""
+        parser = self._parsers.get(mimetype)
+        if parser is None:
+            parser = self._factories[mimetype]()
+            self._parsers[mimetype] = parser
+        return parser
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over supported mime types without constructing parsers."""
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        """Return the number of supported mime types."""
+        return len(self._factories)
+
+    def __contains__(self, mimetype: object) -> bool:
+        """Check support for a mime type without constructing its parser."""
+        return mimetype in self._factories
+
+
 # Document Parser Configuration
-HANDLERS = {
-    "application/pdf": PDFPlumberParser(),
-    "text/plain": TextParser(),
-    "text/html": BS4HTMLParser(),
-    "text/markdown": TextParser(),  # Markdown files
-    "text/x-markdown": TextParser(),  # Alternative markdown MIME type
-    "application/msword": MsWordParser(),
-    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
-        MsWordParser()
-    ),
-}
+HANDLERS = LazyParserMapping(
+    {
+        "application/pdf": _pdf_parser,
+        "text/plain": _text_parser,
+        "text/html": _html_parser,
+        "text/markdown": _text_parser,  # Markdown files
+        "text/x-markdown": _text_parser,  # Alternative markdown MIME type
+        "application/msword": _msword_parser,
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+            _msword_parser
+        ),
+    }
+)
 
 SUPPORTED_MIMETYPES = sorted(HANDLERS.keys())
 
@@ -40,8 +95,19 @@ async def process_document(
     metadata: dict | None = None,
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
+    *,
+    extracted: list[Document] | None = None,
 ) -> list[Document]:
-    """Process an uploaded file into LangChain documents."""
+    """Process an uploaded file into LangChain documents.
+
+    Args:
+        file: The uploaded file.
+        metadata: Metadata added to every chunk.
+        chunk_size: Maximum size of each chunk.
+        chunk_overlap: Overlap between consecutive chunks.
+        extracted: If given, the parsed documents are appended to it before
+            they are split, so their text can be kept for re-chunking.
+    """
     # Generate a unique ID for this file processing instance
     file_id = uuid.uuid4()
 
@@ -79,22 +145,13 @@ async def process_document(
             # Update with provided metadata, preserving existing keys if not overridden
             doc.metadata.update(metadata)
 
-    # Create text splitter with provided parameters
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
-
-    # Split documents
-    split_docs = text_splitter.split_documents(docs)
-
-    # Add the generated file_id to all split documents' metadata
-    for split_doc in split_docs:
-        if not hasattr(split_doc, "metadata") or not isinstance(
-            split_doc.metadata, dict
-        ):
-            split_doc.metadata = {}  # Initialize if it doesn't exist
-        split_doc.metadata["file_id"] = str(
-            file_id
-        )  # Store as string for compatibility
-
-    return split_docs
+    # Add the generated file_id to every document, and so to all its chunks
+    for doc in docs:
+        if not hasattr(doc, "metadata") or not isinstance(doc.metadata, dict):
+            doc.metadata = {}  # Initialize if it doesn't exist
+        doc.metadata["file_id"] = str(file_id)  # Store as string for compatibility
+    if extracted is not None:
+        extracted.extend(docs)
+
+    # Split documents; the splitter for given parameters is shared
+    return get_splitter(chunk_size, chunk_overlap).split_documents(docs)
@@ -0,0 +1,527 @@
+"""Online migration of collections to another embedding model.
+
+Every collection records the model of its vectors as ``embedding_model`` in
+its metadata. Migrating a collection re-embeds its chunks without taking it
+offline:
+
+1. ``start`` records the target model as ``embedding_migration``.
+2. The migrator re-embeds chunks into the ``embedding_shadow`` column in
+   batches of ``MIGRATION_BATCH_SIZE``, pausing ``MIGRATION_BATCH_PAUSE``
+   seconds in between. Searches keep using ``embedding`` and the current
+   model meanwhile.
+3. Upserts during the migration write both columns (``dual_write``).
+4. Once every chunk has a shadow vector, the flip switches
+   ``embedding_model`` and records ``flipped_at`` in one short transaction
+   that only updates the collection row, so searches move to the new model
+   at once. From then on a chunk's vector is its shadow vector if it has one
+   (``vector_sql``).
+5. The migrator copies the shadow vectors over ``embedding`` in keyset
+   batches, clearing them, then drops ``embedding_migration``.
+
+The flip locks the collection row ``FOR UPDATE``; batches and dual writes
+re-check the migration under ``FOR SHARE`` of the same row before writing.
+An upsert thus either writes its shadow vectors before the flip, or finds
+the new model afterwards and writes ``embedding`` again with no shadow
+vector. A search that straddles the flip can still embed its query with the
+previous model once. Flipped migrations cannot be cancelled.
+
+Collections with a vector storage option are not migrated: their indexes
+are built for the dimensions of the current model.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any
+
+from langchain_core.documents import Document
+
+from langconnect import config
+from langconnect.database.connection import get_db_connection
+from langconnect.services.background import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+MODEL_METADATA_KEY = "embedding_model"
+MIGRATION_METADATA_KEY = "embedding_migration"
+
+SCHEMA = (
+    # Skips the ACCESS EXCLUSIVE lock of ALTER TABLE once the column exists
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT FROM information_schema.columns
+             WHERE table_name = 'langchain_pg_embedding'
+               AND column_name = 'embedding_shadow'
+        ) THEN
+            ALTER TABLE langchain_pg_embedding ADD COLUMN embedding_shadow vector;
+        END IF;
+    END
+    $$
+    """,
+)
+
+START_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(cmetadata::jsonb, ARRAY[$3], $4::jsonb)
+     WHERE uuid = $1
+       AND cmetadata->>'owner_id' = $2
+       AND cmetadata->>'deleted_at' IS NULL
+       AND cmetadata->$3 IS NULL
+       AND cmetadata->'vector_storage' IS NULL
+"""
+
+CANCEL_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = cmetadata::jsonb - $3
+     WHERE uuid = $1
+       AND cmetadata->>'owner_id' = $2
+       AND cmetadata->$3 IS NOT NULL
+       AND cmetadata->$3->>'flipped_at' IS NULL
+"""
+
+PENDING_SQL = """
+    SELECT uuid, cmetadata
+      FROM langchain_pg_collection
+     WHERE cmetadata->'embedding_migration' IS NOT NULL
+       AND cmetadata->>'deleted_at' IS NULL
+"""
+
+STATE_SQL = "SELECT cmetadata FROM langchain_pg_collection WHERE uuid = $1"
+LOCK_SHARE_SQL = STATE_SQL + " FOR SHARE"
+LOCK_UPDATE_SQL = STATE_SQL + " FOR UPDATE"
+
+# Keyset pagination over the (collection_id, id) index
+BATCH_SQL = """
+    SELECT id, document
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND id > $2
+       AND embedding_shadow IS NULL
+     ORDER BY id
+     LIMIT $3
+"""
+
+# Skips chunks whose text changed since the batch was read
+SHADOW_BATCH_SQL = """
+    UPDATE langchain_pg_embedding AS e
+       SET embedding_shadow = v.embedding::vector
+      FROM unnest($2::text[], $3::text[], $4::text[]) AS v(id, document, embedding)
+     WHERE e.collection_id = $1
+       AND e.id = v.id
+       AND e.document = v.document
+"""
+
+WRITE_SQL = """
+    UPDATE langchain_pg_embedding AS e
+       SET {column} = v.embedding::vector
+      FROM unnest($2::text[], $3::text[]) AS v(id, embedding)
+     WHERE e.collection_id = $1
+       AND e.id = v.id
+"""
+WRITE_EMBEDDING_SQL = WRITE_SQL.format(column="embedding")
+WRITE_SHADOW_SQL = WRITE_SQL.format(column="embedding_shadow")
+
+# Upserts once the migration flipped
+WRITE_FLIPPED_SQL = """
+    UPDATE langchain_pg_embedding AS e
+       SET embedding = v.embedding::vector,
+           embedding_shadow = NULL
+      FROM unnest($2::text[], $3::text[]) AS v(id, embedding)
+     WHERE e.collection_id = $1
+       AND e.id = v.id
+"""
+
+PROGRESS_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             cmetadata::jsonb,
+             '{embedding_migration,backfilled}',
+             to_jsonb($2::bigint)
+           )
+     WHERE uuid = $1
+       AND cmetadata->'embedding_migration' IS NOT NULL
+"""
+
+REMAINING_SQL = """
+    SELECT count(*)
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND embedding_shadow IS NULL
+"""
+
+FLIP_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             jsonb_set(cmetadata::jsonb, '{embedding_model}', to_jsonb($2::text)),
+             '{embedding_migration,flipped_at}',
+             to_jsonb($3::text)
+           )
+     WHERE uuid = $1
+"""
+
+# Re-checks the shadow vector of every row, which dual writes may clear
+COPY_BACK_BATCH_SQL = """
+    WITH batch AS (
+        SELECT id
+          FROM langchain_pg_embedding
+         WHERE collection_id = $1
+           AND id > $2
+           AND embedding_shadow IS NOT NULL
+         ORDER BY id
+         LIMIT $3
+    ), copied AS (
+        UPDATE langchain_pg_embedding AS e
+           SET embedding = e.embedding_shadow,
+               embedding_shadow = NULL
+          FROM batch
+         WHERE e.collection_id = $1
+           AND e.id = batch.id
+           AND e.embedding_shadow IS NOT NULL
+    )
+    SELECT max(id) AS last_id, count(*) AS copied FROM batch
+"""
+
+# Snapshots of the collection are rebuilt: its vectors change with the flip,
+# and the copy-back that follows is not logged
+BUMP_VERSION_SQL = """
+    INSERT INTO langconnect_collection_version AS v (collection_id, version)
+    VALUES ($1, 1)
+        ON CONFLICT (collection_id) DO UPDATE SET version = v.version + 1
+"""
+
+# Writes that leave the vectors searches read unchanged (shadow vectors
+# before the flip, the copy-back after it) are left out of the change log
+# of snapshots for the rest of the transaction
+SKIP_CHANGE_LOG_SETTING = "langconnect.skip_change_log"
+SKIP_CHANGE_LOG_SQL = f"SET LOCAL {SKIP_CHANGE_LOG_SETTING} = on"
+
+FINISH_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = cmetadata::jsonb - 'embedding_migration'
+     WHERE uuid = $1
+       AND cmetadata->'embedding_migration'->>'flipped_at' IS NOT NULL
+"""
+
+CLEAR_SHADOW_SQL = """
+    UPDATE langchain_pg_embedding
+       SET embedding_shadow = NULL
+     WHERE collection_id = $1
+       AND embedding_shadow IS NOT NULL
+"""
+
+# Semantic search of a flipped collection; PGVector only reads ``embedding``
+FLIPPED_SEARCH_SQL = """
+    SELECT id, document, cmetadata,
+           COALESCE(embedding_shadow, embedding) <=> $2::vector AS score
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+     ORDER BY score
+     LIMIT $3
+"""
+
+
+def model_of(metadata: dict[str, Any]) -> str:
+    """Return the embedding model of a collection's vectors."""
+    return metadata.get(MODEL_METADATA_KEY) or config.LEGACY_EMBEDDING_MODEL
+
+
+def target_of(metadata: dict[str, Any]) -> str | None:
+    """Return the model a collection is migrating to, if any."""
+    migration = metadata.get(MIGRATION_METADATA_KEY)
+    return migration["model"] if migration else None
+
+
+def is_flipped(metadata: dict[str, Any]) -> bool:
+    """Whether a collection's shadow vectors are being copied back."""
+    migration = metadata.get(MIGRATION_METADATA_KEY)
+    return bool(migration and migration.get("flipped_at"))
+
+
+def vector_sql(collection_id: str = "$1") -> str:
+    """Return the SQL expression of a chunk's vector in its collection's model.
+
+    Args:
+        collection_id: SQL expression of the chunk's collection, e.g. a
+            query parameter.
+    """
+    return f"""
+        CASE WHEN (
+                 SELECT cmetadata->'embedding_migration'->>'flipped_at'
+                   FROM langchain_pg_collection
+                  WHERE uuid = {collection_id}
+             ) IS NOT NULL
+             THEN COALESCE(embedding_shadow, embedding)
+             ELSE embedding
+        END"""
+
+
+def vector_literal(vector: Sequence[float]) -> str:
+    """Return the text form of a vector, cast with ``::vector`` in SQL."""
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+async def _embed(model: str, texts: list[str]) -> list[str]:
+    embeddings = config.get_model_embeddings(model)
+    vectors = await asyncio.to_thread(embeddings.embed_documents, texts)
+    return [vector_literal(vector) for vector in vectors]
+
+
+async def _locked_state(conn: Any, collection_id: str, sql: str) -> tuple:
+    metadata = await conn.fetchval(sql, collection_id)
+    if metadata is None:
+        return None, None, False
+    metadata = json.loads(metadata)
+    return model_of(metadata), target_of(metadata), is_flipped(metadata)
+
+
+async def search(
+    conn: Any, collection_id: str, embedding: list[float], k: int
+) -> list[tuple[Document, float]]:
+    """Return the ``k`` chunks of a flipped collection nearest to ``embedding``.
+
+    Scores are cosine distances, as returned by ``PGVector``.
+    """
+    rows = await conn.fetch(FLIPPED_SEARCH_SQL, collection_id, embedding, k)
+    return [
+        (
+            Document(
+                id=str(row["id"]),
+                page_content=row["document"],
+                metadata=json.loads(row["cmetadata"]) if row["cmetadata"] else {},
+            ),
+            float(row["score"]),
+        )
+        for row in rows
+    ]
+
+
+async def start(
+    conn: Any, collection_id: str, user_id: str, model: str
+) -> dict[str, Any] | None:
+    """Record a migration of a collection to ``model``.
+
+    Returns:
+        The migration, or None if the collection is not found, is already
+        migrating or has a vector storage option.
+    """
+    migration = {
+        "model": model,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "backfilled": 0,
+    }
+    result = await conn.execute(
+        START_SQL,
+        collection_id,
+        user_id,
+        MIGRATION_METADATA_KEY,
+        json.dumps(migration),
+    )
+    if result.split()[-1] == "0":
+        return None
+    migrator.wake()
+    return migration
+
+
+async def cancel(conn: Any, collection_id: str, user_id: str) -> bool:
+    """Stop a migration and drop its shadow vectors.
+
+    Returns:
+        Whether a migration was cancelled; flipped ones cannot be.
+    """
+    async with conn.transaction():
+        result = await conn.execute(
+            CANCEL_SQL, collection_id, user_id, MIGRATION_METADATA_KEY
+        )
+        if result.split()[-1] == "0":
+            return False
+        await conn.execute(SKIP_CHANGE_LOG_SQL)
+        await conn.execute(CLEAR_SHADOW_SQL, collection_id, timeout=None)
+    return True
+
+
+async def dual_write(
+    collection_id: str,
+    ids: list[str],
+    texts: list[str],
+    model: str,
+    vectors: Sequence[Sequence[float]],
+) -> None:
+    """Bring newly added chunks in line with the collection's models.
+
+    ``ids`` were just stored with ``vectors``, embedded with ``model``. If a
+    migration is in progress their shadow vectors are written too; if the
+    collection moved to another model in the meantime, they are re-embedded
+    with it. Once the migration flipped they are written again without
+    shadow vectors, which the copy-back may have copied over them.
+    """
+    embedded = {model: [vector_literal(vector) for vector in vectors]}
+    while True:
+        async with get_db_connection() as conn:
+            state = await _locked_state(conn, collection_id, STATE_SQL)
+        current, target, flipped = state
+        if current is None or (current == model and target is None):
+            return
+        for needed in {current, target} - {None} - set(embedded):
+            embedded[needed] = await _embed(needed, texts)
+
+        async with get_db_connection() as conn, conn.transaction():
+            if await _locked_state(conn, collection_id, LOCK_SHARE_SQL) != state:
+                continue
+            if flipped:
+                await conn.execute(
+                    WRITE_FLIPPED_SQL, collection_id, ids, embedded[current]
+                )
+                return
+            if current != model:
+                await conn.execute(
+                    WRITE_EMBEDDING_SQL, collection_id, ids, embedded[current]
+                )
+            if target is not None:
+                await conn.execute(SKIP_CHANGE_LOG_SQL)
+                await conn.execute(
+                    WRITE_SHADOW_SQL, collection_id, ids, embedded[target]
+                )
+        return
+
+
+class EmbeddingMigrator(BackgroundJob):
+    """Re-embed the chunks of migrating collections in throttled batches."""
+
+    name = "embedding-migrator"
+    pending_sql = PENDING_SQL
+    lock_prefix = "migrate:"
+
+    async def run(self, collection_id: str, metadata: dict[str, Any]) -> int:
+        """Run a pending migration; return 1 if it completed, else 0."""
+        return int(await self.migrate(collection_id, metadata[MIGRATION_METADATA_KEY]))
+
+    async def migrate(self, collection_id: str, migration: dict[str, Any]) -> bool:
+        """Backfill, flip and copy back one collection; return whether it completed.
+
+        Returns False without doing anything when another worker holds the
+        collection, and when the migration was cancelled meanwhile.
+        """
+        async with self.locked(collection_id) as conn:
+            if conn is None:
+                return False
+            return await self._migrate(conn, collection_id, migration)
+
+    async def _migrate(
+        self, conn: Any, collection_id: str, migration: dict[str, Any]
+    ) -> bool:
+        start = time.perf_counter()
+        target = migration["model"]
+        backfilled = migration.get("backfilled", 0)
+        while not migration.get("flipped_at"):
+            # A pass over the chunks without a shadow vector, in id order
+            last_id = ""
+            while True:
+                rows = await conn.fetch(
+                    BATCH_SQL, collection_id, last_id, self.batch_size
+                )
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                ids = [row["id"] for row in rows]
+                texts = [row["document"] for row in rows]
+                vectors = await _embed(target, texts)
+                async with conn.transaction():
+                    _, current_target, _ = await _locked_state(
+                        conn, collection_id, LOCK_SHARE_SQL
+                    )
+                    if current_target != target:
+                        logger.info("Migration of %s was cancelled.", collection_id)
+                        return False
+                    await conn.execute(SKIP_CHANGE_LOG_SQL)
+                    result = await conn.execute(
+                        SHADOW_BATCH_SQL, collection_id, ids, texts, vectors
+                    )
+                backfilled += int(result.split()[-1])
+                await conn.execute(PROGRESS_SQL, collection_id, backfilled)
+                logger.info(
+                    "Re-embedded %d chunks of collection %s with %s (%d in total).",
+                    len(rows),
+                    collection_id,
+                    target,
+                    backfilled,
+                )
+                await asyncio.sleep(self.pause)
+
+            flipped = await self._flip(conn, collection_id, target)
+            if flipped is None:
+                logger.info("Migration of %s was cancelled.", collection_id)
+                return False
+            if flipped:
+                migration = {**migration, "flipped_at": flipped}
+
+        copied = await self._copy_back(conn, collection_id)
+        await conn.execute(FINISH_SQL, collection_id)
+        logger.info(
+            "Migrated collection %s to %s: %d chunks re-embedded, %d copied "
+            "back in %.1fs.",
+            collection_id,
+            target,
+            backfilled,
+            copied,
+            time.perf_counter() - start,
+        )
+        return True
+
+    async def _flip(self, conn: Any, collection_id: str, target: str) -> str | None:
+        """Switch the collection to ``target`` if every chunk is backfilled.
+
+        Only the collection row is updated: the shadow vectors are copied
+        back afterwards.
+
+        Returns:
+            When it switched, "" if chunks are still to be backfilled, or
+            None if the migration was cancelled.
+        """
+        async with conn.transaction():
+            _, current_target, _ = await _locked_state(
+                conn, collection_id, LOCK_UPDATE_SQL
+            )
+            if current_target != target:
+                return None
+            if await conn.fetchval(REMAINING_SQL, collection_id):
+                # Chunks added or changed since the pass started
+                return ""
+            flipped_at = datetime.now(timezone.utc).isoformat()
+            await conn.execute(FLIP_SQL, collection_id, target, flipped_at)
+            await conn.execute(BUMP_VERSION_SQL, collection_id)
+        return flipped_at
+
+    async def _copy_back(self, conn: Any, collection_id: str) -> int:
+        """Move the shadow vectors of a flipped collection into ``embedding``.
+
+        Dual writes leave no shadow vectors after the flip, so one pass in id
+        order is enough.
+
+        Returns:
+            The number of chunks copied.
+        """
+        copied = 0
+        last_id = ""
+        while True:
+            async with conn.transaction():
+                await conn.execute(SKIP_CHANGE_LOG_SQL)
+                row = await conn.fetchrow(
+                    COPY_BACK_BATCH_SQL, collection_id, last_id, self.batch_size
+                )
+            if not row["copied"]:
+                return copied
+            last_id = row["last_id"]
+            copied += row["copied"]
+            await asyncio.sleep(self.pause)
+
+
+migrator = EmbeddingMigrator(
+    batch_size=config.MIGRATION_BATCH_SIZE,
+    pause=config.MIGRATION_BATCH_PAUSE,
+    interval=config.MIGRATION_INTERVAL,
+)
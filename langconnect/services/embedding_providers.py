@@ -0,0 +1,86 @@
+"""Registry of embedding providers.
+
+Embedding models are named ``provider:name``, e.g.
+``onnx:sentence-transformers/all-MiniLM-L6-v2``. Names without a provider
+prefix are OpenAI models, which is how collections created before providers
+existed record theirs. A collection keeps the provider of its model whatever
+``EMBEDDING_PROVIDER`` is set to later; it changes provider through an
+embedding migration like any other model change.
+
+Built-in providers:
+
+- ``openai``: the OpenAI embeddings API.
+- ``onnx``: a local sentence-embedding model run on CPU by ONNX Runtime (see
+  ``langconnect.services.onnx_embeddings``).
+
+Other providers are added with ``register_provider``.
+"""
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from langconnect import config
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+EmbeddingsFactory = Callable[[str], "Embeddings"]
+
+_providers: dict[str, EmbeddingsFactory] = {}
+
+
+def register_provider(name: str, factory: EmbeddingsFactory) -> None:
+    """Make ``name:model`` embedding models available.
+
+    Args:
+        name: Provider prefix of the models.
+        factory: Called with the model name, without the prefix, to create
+            its embeddings; at most once per model and process.
+    """
+    _providers[name] = factory
+
+
+def split_model(model: str) -> tuple[str, str]:
+    """Return the provider and the name of an embedding model.
+
+    Raises:
+        ValueError: If the model names a provider that is not registered.
+    """
+    provider, separator, name = model.partition(":")
+    if not separator:
+        return "openai", model
+    if provider not in _providers:
+        raise ValueError(
+            f"Unknown embedding provider {provider!r} of model {model!r}; "
+            f"expected one of {sorted(_providers)}."
+        )
+    return provider, name
+
+
+def create_embeddings(model: str) -> "Embeddings":
+    """Create the embeddings of ``model`` with its provider."""
+    provider, name = split_model(model)
+    return _providers[provider](name)
+
+
+def _openai(name: str) -> "Embeddings":
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=name)
+
+
+def _onnx(name: str) -> "Embeddings":
+    from langconnect.services.onnx_embeddings import OnnxEmbeddings
+
+    return OnnxEmbeddings(
+        name,
+        max_batch_size=config.ONNX_MAX_BATCH_SIZE,
+        batch_wait=config.ONNX_BATCH_WAIT,
+        workers=config.ONNX_WORKERS,
+        max_length=config.ONNX_MAX_LENGTH,
+        pooling=config.ONNX_POOLING,
+    )
+
+
+register_provider("openai", _openai)
+register_provider("onnx", _onnx)
@@ -0,0 +1,286 @@
+"""Deep health checks of the database, the vector store and the embeddings.
+
+Each component is reported with the fields of ``SystemHealthLog``
+(``src/models/monitoring_models.py``). Every check is bounded by
+``HEALTH_CHECK_TIMEOUT`` and only runs catalog queries, so the endpoint is
+cheap enough to poll every few seconds. The embedding probe calls the
+provider, so its result is reused for ``HEALTH_EMBEDDING_PROBE_TTL`` seconds.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import asyncpg
+
+from langconnect import config
+from langconnect.database.connection import (
+    get_db_pool,
+    get_pool_stats,
+    replica_monitor,
+)
+from langconnect.metrics import stage_average_ms
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+DOWN = "down"
+_SEVERITY = {HEALTHY: 0, DEGRADED: 1, DOWN: 2}
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+# The table named by $1 and its partitions. pg_partition_tree() returns no
+# rows for an ordinary table, which is then its own single leaf.
+_EMBEDDING_TABLES_SQL = """
+    SELECT relid, isleaf FROM pg_partition_tree(to_regclass($1))
+    UNION
+    SELECT oid, true FROM pg_class WHERE oid = to_regclass($1) AND relkind <> 'p'
+"""
+
+
+def _health_log(component: str, status: str, **fields: Any) -> dict[str, Any]:
+    """Build a ``SystemHealthLog``-shaped dict; unset fields are ``None``."""
+    log = {
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "component": component,
+        "status": status,
+        "response_time_ms": None,
+        "cpu_usage_percent": None,
+        "memory_usage_percent": None,
+        "disk_usage_percent": None,
+        "db_connections_active": None,
+        "db_connections_max": None,
+        "db_query_avg_time_ms": None,
+        "vector_db_total_vectors": None,
+        "vector_db_index_size": None,
+        "vector_db_query_time_ms": None,
+        "error_message": None,
+        "metadata": None,
+    }
+    log.update(fields)
+    return log
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+async def check_database(conn: asyncpg.Connection, acquire_ms: float) -> dict:
+    """Report pool usage and the latency of ``SELECT 1``."""
+    start = time.perf_counter()
+    await conn.fetchval("SELECT 1", timeout=config.HEALTH_CHECK_TIMEOUT)
+    query_ms = _elapsed_ms(start)
+
+    pool = get_pool_stats() or {}
+    status = HEALTHY
+    # Callers queueing for a connection means requests are already slowed down
+    if pool.get("waiters"):
+        status = DEGRADED
+    return _health_log(
+        "database",
+        status,
+        response_time_ms=round(query_ms),
+        db_connections_active=pool.get("size", 0) - pool.get("idle", 0),
+        db_connections_max=pool.get("max_size"),
+        db_query_avg_time_ms=stage_average_ms("sql"),
+        metadata={
+            "pool": pool,
+            "acquire_ms": acquire_ms,
+            "select_1_ms": query_ms,
+            "replica": {
+                "configured": bool(config.POSTGRES_REPLICA_HOST),
+                "usable": replica_monitor.usable,
+                "lag_seconds": replica_monitor.lag,
+            },
+        },
+    )
+
+
+async def check_vector_store(conn: asyncpg.Connection) -> dict:
+    """Report the pgvector version, index presence and the number of vectors.
+
+    The vector count is the planner estimate from ``pg_class`` and only falls
+    back to ``COUNT(*)`` while the table has never been analyzed.
+    """
+    start = time.perf_counter()
+    timeout = config.HEALTH_CHECK_TIMEOUT
+    version = await conn.fetchval(
+        "SELECT extversion FROM pg_extension WHERE extname = 'vector'",
+        timeout=timeout,
+    )
+    indexes = await conn.fetch(
+        f"""
+        WITH tables AS ({_EMBEDDING_TABLES_SQL})
+        SELECT i.indexrelid::regclass::text AS name,
+               pg_get_indexdef(i.indexrelid) AS definition,
+               COALESCE(
+                   (SELECT sum(pg_relation_size(t.relid))
+                      FROM pg_partition_tree(i.indexrelid) AS t),
+                   pg_relation_size(i.indexrelid)
+               )::bigint AS size
+          FROM pg_index i
+         WHERE i.indrelid IN (SELECT relid FROM tables)
+           -- Partition indexes are counted with the parent index they belong to
+           AND NOT EXISTS (SELECT FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+        """,
+        EMBEDDING_TABLE,
+        timeout=timeout,
+    )
+    estimate = await conn.fetchval(
+        # Summed over the partitions of a partitioned table
+        f"""
+        WITH tables AS ({_EMBEDDING_TABLES_SQL})
+        SELECT CASE WHEN bool_or(c.reltuples < 0) THEN -1
+                    ELSE sum(c.reltuples) END::bigint
+          FROM tables AS t
+          JOIN pg_class AS c ON c.oid = t.relid
+         WHERE t.isleaf
+        """,
+        EMBEDDING_TABLE,
+        timeout=timeout,
+    )
+    if estimate is not None and estimate < 0:
+        estimate = await conn.fetchval(
+            f"SELECT COUNT(*) FROM {EMBEDDING_TABLE}", timeout=timeout
+        )
+    query_ms = _elapsed_ms(start)
+
+    vector_indexes = [
+        r for r in indexes if any(m in r["definition"] for m in ("hnsw", "ivfflat"))
+    ]
+    text_indexes = [r for r in indexes if "tsvector" in r["definition"]]
+
+    if version is None or estimate is None:
+        status = DOWN
+        error = (
+            "pgvector extension is not installed"
+            if version is None
+            else f"Table {EMBEDDING_TABLE} does not exist"
+        )
+    else:
+        # Without indexes searches still work, but as sequential scans
+        status = DEGRADED if not vector_indexes or not text_indexes else HEALTHY
+        error = None
+
+    return _health_log(
+        "vector_db",
+        status,
+        response_time_ms=round(query_ms),
+        vector_db_total_vectors=estimate,
+        vector_db_index_size=sum(r["size"] for r in vector_indexes) / 2**20,
+        vector_db_query_time_ms=stage_average_ms("sql"),
+        error_message=error,
+        metadata={
+            "pgvector_version": version,
+            "vector_indexes": [r["name"] for r in vector_indexes],
+            "tsvector_indexes": [r["name"] for r in text_indexes],
+            "index_size_unit": "MiB",
+        },
+    )
+
+
+async def check_postgres() -> list[dict]:
+    """Run the database and vector store checks on one pooled connection."""
+    timeout = config.HEALTH_CHECK_TIMEOUT
+    start = time.perf_counter()
+    try:
+        pool = await asyncio.wait_for(get_db_pool(), timeout)
+        async with pool.acquire(timeout=timeout) as conn:
+            acquire_ms = _elapsed_ms(start)
+            return [
+                await check_database(conn, acquire_ms),
+                await check_vector_store(conn),
+            ]
+    except Exception as e:
+        logger.warning("Database health check failed: %s", e)
+        elapsed = round(_elapsed_ms(start))
+        error = f"{type(e).__name__}: {e}"
+        return [
+            _health_log(
+                component,
+                DOWN,
+                response_time_ms=elapsed,
+                error_message=error,
+                metadata={"pool": get_pool_stats()},
+            )
+            for component in ("database", "vector_db")
+        ]
+
+
+class EmbeddingProbe:
+    """Measure embedding latency, reusing the result for ``ttl`` seconds.
+
+    Concurrent callers share one in-flight probe, so polling the health
+    endpoint from several load balancers calls the provider at most once per
+    ``ttl``.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        """Initialize the probe with the reuse window in seconds."""
+        self.ttl = ttl
+        self._result: dict | None = None
+        self._expires_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self) -> dict:
+        start = time.perf_counter()
+        try:
+            embeddings = config.get_default_embeddings()
+            vector = await asyncio.wait_for(
+                asyncio.to_thread(embeddings.embed_query, "health check"),
+                config.HEALTH_CHECK_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning("Embedding health check failed: %s", e)
+            # Keyword search still works without the provider, and an upstream
+            # outage should not take every worker out of rotation at once
+            return _health_log(
+                "ai_services",
+                DEGRADED,
+                response_time_ms=round(_elapsed_ms(start)),
+                error_message=f"{type(e).__name__}: {e}",
+            )
+        return _health_log(
+            "ai_services",
+            HEALTHY,
+            response_time_ms=round(_elapsed_ms(start)),
+            metadata={
+                "provider": type(embeddings).__name__,
+                "dimensions": len(vector),
+            },
+        )
+
+    async def get(self) -> dict:
+        """Return the cached probe result, probing again once it expired."""
+        cached = self._result is not None and time.monotonic() < self._expires_at
+        if not cached:
+            if self._task is None:
+                self._task = asyncio.ensure_future(self._probe())
+            task = self._task
+            try:
+                self._result = await asyncio.shield(task)
+            finally:
+                if self._task is task and task.done():
+                    self._task = None
+            self._expires_at = time.monotonic() + self.ttl
+        metadata = {**(self._result["metadata"] or {}), "cached": cached}
+        return {**self._result, "metadata": metadata}
+
+
+embedding_probe = EmbeddingProbe(ttl=config.HEALTH_EMBEDDING_PROBE_TTL)
+
+
+async def deep_health() -> dict[str, Any]:
+    """Check every component concurrently and aggregate the worst status."""
+    postgres, embeddings = await asyncio.gather(check_postgres(), embedding_probe.get())
+    components = [*postgres, embeddings]
+    status = max((c["status"] for c in components), key=_SEVERITY.__getitem__)
+    return {
+        "status": status,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "components": components,
+    }
@@ -0,0 +1,260 @@
+"""Local sentence embeddings with ONNX Runtime on CPU.
+
+Embeds with a sentence-transformers style model exported to ONNX, e.g.
+``sentence-transformers/all-MiniLM-L6-v2``, either a local directory or a
+Hugging Face Hub repository holding ``model.onnx`` (or ``onnx/model.onnx``)
+and ``tokenizer.json``. Queries take a few milliseconds and need no network.
+
+Inference runs on a pool of ``ONNX_WORKERS`` threads, by default the usable
+cores divided among the worker processes; ONNX Runtime releases the GIL, so
+threads run in parallel without the pickling of a process pool. Each run is
+single-threaded and each thread tokenizes with its own tokenizer.
+
+Queries are micro-batched: a collector thread takes the queries waiting
+when a thread becomes free, up to ``ONNX_MAX_BATCH_SIZE``, after waiting at
+most ``ONNX_BATCH_WAIT`` seconds for more. Batches stay small when the
+service is idle and grow with load, which is when batching pays off.
+Documents are sorted by length and embedded in batches of the same size,
+concurrently.
+
+The model is loaded when the app starts (see ``langconnect.services.warmup``)
+or else on first use. Requires ``onnxruntime`` and ``tokenizers``, plus
+``huggingface-hub`` to download models
+(``pip install "langconnect-client[onnx]"``).
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILES = ("model.onnx", "onnx/model.onnx")
+DOWNLOAD_PATTERNS = ["model.onnx", "onnx/model.onnx", "tokenizer.json"]
+POOLING = ("mean", "cls")
+
+
+def default_workers() -> int:
+    """Return the usable cores divided among the API worker processes."""
+    from langconnect import config
+    from langconnect.launcher import default_workers as usable_cores
+
+    cores = usable_cores()
+    return max(1, cores // (config.WEB_CONCURRENCY or cores))
+
+
+def _require(module: str) -> Any:
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise ImportError(
+            f"Local ONNX embeddings require {module}. Install it with "
+            '`pip install "langconnect-client[onnx]"`.'
+        ) from e
+
+
+class OnnxEmbeddings(Embeddings):
+    """Embed texts with an ONNX model on a thread pool, batching queries."""
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        max_batch_size: int = 32,
+        batch_wait: float = 0.001,
+        workers: int = 0,
+        max_length: int = 256,
+        pooling: str = "mean",
+        session: Any = None,
+        tokenizer: Any = None,
+    ) -> None:
+        """Initialize the embeddings; the model is loaded on first use.
+
+        Args:
+            model_name: Local directory or Hugging Face Hub repository.
+            max_batch_size: Texts embedded per model run.
+            batch_wait: Seconds a query waits for others to share its batch.
+            workers: Threads running the model; 0 for ``default_workers()``.
+            max_length: Tokens kept per text; longer texts are truncated.
+            pooling: ``mean`` of the token embeddings, or the ``cls`` token.
+            session: ``onnxruntime.InferenceSession``-like object to use
+                instead of loading ``model_name``.
+            tokenizer: ``tokenizers.Tokenizer``-like object to use instead
+                of loading ``model_name``'s, shared by all threads.
+        """
+        if pooling not in POOLING:
+            raise ValueError(f"pooling must be one of {POOLING}, got {pooling!r}.")
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.workers = workers or default_workers()
+        self.max_length = max_length
+        self.pooling = pooling
+        self._session = session
+        self._tokenizer = tokenizer
+        self._tokenizer_file = ""
+        self._load_lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="onnx-embed"
+        )
+        # Queries waiting for a batch, and threads free to run one
+        self._queue: queue.SimpleQueue[tuple[str, Future]] = queue.SimpleQueue()
+        self._free = threading.Semaphore(self.workers)
+        self._collector: threading.Thread | None = None
+        # Not the load lock: queries queue while the model downloads
+        self._collector_lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Load the model and embed a first batch, so requests run warm."""
+        start = time.perf_counter()
+        self._embed(["warm up"])
+        logger.info(
+            "Loaded ONNX embedding model %s with %d threads in %.0fms.",
+            self.model_name,
+            self.workers,
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def _get_session(self) -> Any:
+        if self._session is None:
+            with self._load_lock:
+                if self._session is None:
+                    self._session = self._load_session()
+        return self._session
+
+    def _load_session(self) -> Any:
+        ort = _require("onnxruntime")
+        _require("tokenizers")
+        directory = self.model_name
+        if not os.path.isdir(directory):
+            hub = _require("huggingface_hub")
+            directory = hub.snapshot_download(
+                self.model_name, allow_patterns=DOWNLOAD_PATTERNS
+            )
+        paths = [os.path.join(directory, name) for name in MODEL_FILES]
+        model_path = next((path for path in paths if os.path.exists(path)), None)
+        if model_path is None:
+            raise FileNotFoundError(
+                f"No {' or '.join(MODEL_FILES)} in {self.model_name}."
+            )
+        self._tokenizer_file = os.path.join(directory, "tokenizer.json")
+        options = ort.SessionOptions()
+        # Threads of the pool run in parallel instead
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        return ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def _get_tokenizer(self) -> Any:
+        if self._tokenizer is not None:
+            return self._tokenizer
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(self._tokenizer_file)
+            tokenizer.enable_truncation(max_length=self.max_length)
+            if tokenizer.padding is None:
+                tokenizer.enable_padding()
+            self._local.tokenizer = tokenizer
+        return tokenizer
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed one batch of texts into normalized vectors."""
+        session = self._get_session()
+        encodings = self._get_tokenizer().encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        names = {model_input.name for model_input in session.get_inputs()}
+        output = session.run(None, {k: v for k, v in inputs.items() if k in names})[0]
+        if output.ndim == 3:  # Token embeddings, not pooled by the model
+            if self.pooling == "cls":
+                output = output[:, 0]
+            else:
+                weights = mask[:, :, None].astype(output.dtype)
+                output = (output * weights).sum(axis=1) / np.clip(
+                    weights.sum(axis=1), 1e-9, None
+                )
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.clip(norms, 1e-12, None)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts in batches of similar lengths, run concurrently."""
+        # Texts of similar length pad less when batched together
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            order[i : i + self.max_batch_size]
+            for i in range(0, len(order), self.max_batch_size)
+        ]
+        vectors: list[list[float]] = [[] for _ in texts]
+        results = self._executor.map(
+            lambda batch: self._embed([texts[i] for i in batch]), batches
+        )
+        for batch, batch_vectors in zip(batches, results, strict=True):
+            for i, vector in zip(batch, batch_vectors, strict=True):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query, in a batch with those submitted meanwhile."""
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a query without holding a thread while it waits."""
+        return await asyncio.wrap_future(self._submit(text))
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        if self._collector is None:
+            with self._collector_lock:
+                if self._collector is None:
+                    self._collector = threading.Thread(
+                        target=self._collect, name="onnx-embed-batcher", daemon=True
+                    )
+                    self._collector.start()
+        return future
+
+    def _collect(self) -> None:
+        while True:
+            # Queries keep queueing while every thread is busy
+            self._free.acquire()
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: list[tuple[str, Future]]) -> None:
+        try:
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            try:
+                vectors = self._embed([text for text, _ in batch])
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            for (_, future), vector in zip(batch, vectors, strict=True):
+                future.set_result(vector)
+        finally:
+            self._free.release()
@@ -0,0 +1,165 @@
+"""Background removal of deleted collections.
+
+``CollectionsManager.delete`` only tombstones a collection (``deleted_at`` in
+its metadata), which hides it at once. The reaper then deletes its chunks in
+batches of ``REAPER_BATCH_SIZE`` rows, each batch its own short transaction,
+pausing ``REAPER_BATCH_PAUSE`` seconds in between. Locks, WAL bursts and
+replication lag stay bounded however large the collection is, and no HTTP
+request waits for it.
+
+Progress is logged and recorded as ``deleted_chunks`` in the collection
+metadata. Once every chunk is gone, the storage indexes and the collection row
+are dropped, and ``VACUUM (ANALYZE)`` runs when enough rows were removed, so
+dead tuples and index entries are reclaimed without waiting for autovacuum.
+
+Every worker process runs a reaper (see ``langconnect.services.background``);
+a session advisory lock per collection keeps two of them from working on the
+same collection.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from langconnect import config
+from langconnect.database.connection import get_db_connection
+from langconnect.database.vector_storage import (
+    STORAGE_METADATA_KEY,
+    drop_storage_indexes,
+)
+from langconnect.services.background import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+PENDING_SQL = """
+    SELECT uuid, cmetadata
+      FROM langchain_pg_collection
+     WHERE cmetadata->>'deleted_at' IS NOT NULL
+     ORDER BY cmetadata->>'deleted_at'
+"""
+
+DELETE_BATCH_SQL = """
+    DELETE FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND id IN (
+           SELECT id
+             FROM langchain_pg_embedding
+            WHERE collection_id = $1
+            LIMIT $2
+           )
+"""
+
+PROGRESS_SQL = """
+    UPDATE langchain_pg_collection
+       SET cmetadata = jsonb_set(
+             cmetadata::jsonb, '{deleted_chunks}', to_jsonb($2::bigint)
+           )
+     WHERE uuid = $1
+"""
+
+PURGE_SQL = """
+    DELETE FROM langchain_pg_collection
+     WHERE uuid = $1
+       AND cmetadata->>'deleted_at' IS NOT NULL
+"""
+
+
+class CollectionReaper(BackgroundJob):
+    """Delete the chunks of tombstoned collections in throttled batches."""
+
+    name = "collection-reaper"
+    pending_sql = PENDING_SQL
+    lock_prefix = "reap:"
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        pause: float,
+        interval: float,
+        vacuum_min_rows: int,
+    ) -> None:
+        """Initialize the reaper.
+
+        Args:
+            batch_size: Chunks deleted per transaction.
+            pause: Seconds to sleep between batches.
+            interval: Seconds between scans for tombstoned collections.
+            vacuum_min_rows: Rows a scan must remove to trigger ``VACUUM``.
+        """
+        super().__init__(batch_size=batch_size, pause=pause, interval=interval)
+        self.vacuum_min_rows = vacuum_min_rows
+
+    async def run_pending(self) -> int:
+        """Remove every tombstoned collection; return the chunks deleted."""
+        removed = await super().run_pending()
+        if removed >= self.vacuum_min_rows:
+            await self.vacuum()
+        return removed
+
+    async def run(self, collection_id: str, metadata: dict[str, Any]) -> int:
+        """Remove one tombstoned collection; return the chunks deleted."""
+        return await self.reap(collection_id, metadata)
+
+    async def reap(self, collection_id: str, metadata: dict[str, Any]) -> int:
+        """Remove one tombstoned collection; return the chunks deleted.
+
+        Returns 0 without doing anything when another worker holds the
+        collection.
+        """
+        async with self.locked(collection_id) as conn:
+            if conn is None:
+                return 0
+            return await self._reap(conn, collection_id, metadata)
+
+    async def _reap(self, conn: Any, collection_id: str, metadata: dict) -> int:
+        start = time.perf_counter()
+        deleted = metadata.get("deleted_chunks", 0)
+        removed = 0
+        while True:
+            status = await conn.execute(
+                DELETE_BATCH_SQL, collection_id, self.batch_size
+            )
+            count = int(status.split()[-1])
+            if not count:
+                break
+            removed += count
+            deleted += count
+            await conn.execute(PROGRESS_SQL, collection_id, deleted)
+            logger.info(
+                "Deleted %d chunks of collection %s (%d in total).",
+                count,
+                collection_id,
+                deleted,
+            )
+            await asyncio.sleep(self.pause)
+
+        # Partial indexes are not dropped together with their rows
+        if metadata.get(STORAGE_METADATA_KEY):
+            await drop_storage_indexes(conn, collection_id)
+        await conn.execute(PURGE_SQL, collection_id)
+        logger.info(
+            "Removed collection %s: %d chunks in %.1fs.",
+            collection_id,
+            deleted,
+            time.perf_counter() - start,
+        )
+        return removed
+
+    async def vacuum(self) -> None:
+        """Reclaim dead tuples and index entries of the embedding table."""
+        start = time.perf_counter()
+        async with get_db_connection() as conn:
+            await conn.execute("VACUUM (ANALYZE) langchain_pg_embedding", timeout=None)
+        logger.info(
+            "Vacuumed langchain_pg_embedding in %.1fs.", time.perf_counter() - start
+        )
+
+
+reaper = CollectionReaper(
+    batch_size=config.REAPER_BATCH_SIZE,
+    pause=config.REAPER_BATCH_PAUSE,
+    interval=config.REAPER_INTERVAL,
+    vacuum_min_rows=config.REAPER_VACUUM_MIN_ROWS,
+)
@@ -0,0 +1,166 @@
+"""Second-stage re-ranking of search results with a local cross-encoder.
+
+A cross-encoder reads the query and a chunk together, which ranks far better
+than comparing two independently computed embeddings but costs one model
+forward pass per pair. Searches therefore fetch ``RERANK_CANDIDATES`` results
+cheaply and only those are scored.
+
+Scoring runs off the event loop on a small thread pool. The model libraries
+release the GIL during inference, so threads run in parallel without the
+pickling of a process pool; each thread loads its own model because fast
+tokenizers must not be shared between threads. Scores are cached per
+(query, chunk) pair, so paging through or repeating a search is free.
+
+Requires ``sentence-transformers`` (``pip install "langconnect-client[rerank]"``).
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langconnect import config
+
+logger = logging.getLogger(__name__)
+
+# (query, chunk id, hash of the chunk text); the hash invalidates entries of
+# chunks whose content changed
+CacheKey = tuple[str, str, int]
+
+
+class CrossEncoderReranker:
+    """Score (query, chunk) pairs with a cross-encoder on a thread pool."""
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        batch_size: int,
+        max_workers: int,
+        cache_size: int,
+        model: Any = None,
+    ) -> None:
+        """Initialize the re-ranker; the model is loaded on first use.
+
+        Args:
+            model_name: Hugging Face name or local path of the cross-encoder.
+            batch_size: Pairs scored per forward pass.
+            max_workers: Threads scoring batches concurrently.
+            cache_size: Number of (query, chunk) scores to keep.
+            model: Object with a ``predict(pairs, batch_size=...)`` method to
+                use instead of loading ``model_name``, shared by all threads.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._model = model
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rerank"
+        )
+        # Only touched from the event loop thread
+        self._cache: OrderedDict[CacheKey, float] = OrderedDict()
+
+    def _get_model(self) -> Any:
+        if self._model is not None:
+            return self._model
+        model = getattr(self._local, "model", None)
+        if model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError(
+                    "Re-ranking requires sentence-transformers. Install it with "
+                    '`pip install "langconnect-client[rerank]"`.'
+                ) from e
+            logger.info("Loading cross-encoder %s.", self.model_name)
+            model = self._local.model = CrossEncoder(self.model_name, device="cpu")
+        return model
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        scores = self._get_model().predict(pairs, batch_size=self.batch_size)
+        return [float(score) for score in scores]
+
+    async def score(self, query: str, chunks: Sequence[tuple[str, str]]) -> list[float]:
+        """Return the relevance of each ``(id, text)`` chunk to ``query``."""
+        keys = [(query, chunk_id, hash(text)) for chunk_id, text in chunks]
+        scores: dict[CacheKey, float] = {}
+        missing: dict[CacheKey, str] = {}
+        for key, (_, text) in zip(keys, chunks, strict=True):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                scores[key] = self._cache[key]
+            else:
+                missing[key] = text
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            items = list(missing.items())
+            batches = [
+                items[i : i + self.batch_size]
+                for i in range(0, len(items), self.batch_size)
+            ]
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self._executor,
+                        self._predict,
+                        [(query, text) for _, text in batch],
+                    )
+                    for batch in batches
+                )
+            )
+            for batch, batch_scores in zip(batches, results, strict=True):
+                for (key, _), score in zip(batch, batch_scores, strict=True):
+                    scores[key] = self._cache[key] = score
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return [scores[key] for key in keys]
+
+    async def rerank(
+        self, query: str, results: list[dict[str, Any]], limit: int
+    ) -> list[dict[str, Any]]:
+        """Return the ``limit`` results most relevant to ``query``.
+
+        The ``score`` of each returned result is the cross-encoder score;
+        higher is more relevant.
+        """
+        scores = await self.score(
+            query, [(result["id"], result["page_content"]) for result in results]
+        )
+        ranked = sorted(
+            zip(scores, results, strict=True), key=lambda pair: pair[0], reverse=True
+        )
+        return [{**result, "score": score} for score, result in ranked[:limit]]
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_reranker: CrossEncoderReranker | None = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Return the process-wide re-ranker configured from ``langconnect.config``."""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker(
+            config.RERANKER_MODEL,
+            batch_size=config.RERANK_BATCH_SIZE,
+            max_workers=config.RERANK_WORKERS,
+            cache_size=config.RERANK_CACHE_SIZE,
+        )
+    return _reranker
+
+
+def shutdown_reranker() -> None:
+    """Stop the process-wide re-ranker's threads, if it was created."""
+    global _reranker
+    if _reranker is not None:
+        _reranker.shutdown()
+        _reranker = None
@@ -0,0 +1,443 @@
+"""In-process semantic search of small collections over local snapshots.
+
+For a collection of up to ``SNAPSHOT_MAX_CHUNKS`` chunks, the database round
+trip is most of the latency of a semantic search. With ``SNAPSHOT_SEARCH``
+on, each worker keeps a ``VectorSnapshot`` (see
+``langconnect.services.vector_snapshot``) of the last
+``SNAPSHOT_MAX_COLLECTIONS`` collections it searched, in memory-mapped files
+under ``SNAPSHOT_DIR``, and searches them exactly in process.
+
+Freshness follows a write version per collection. Statement triggers on
+``langchain_pg_embedding`` increment the collection's version in
+``langconnect_collection_version`` and log the ids of the chunks written or
+deleted in ``langconnect_embedding_change``, in the writing transaction.
+Deletes of deleted collections are not logged, nor the writes of embedding
+migrations that leave searched vectors as they were; the flip of a
+migration bumps the version without logging chunks, which rebuilds the
+collection's snapshots.
+Concurrent writers to one collection queue on its version row, so versions
+are committed in order. ``CollectionsManager.get`` returns the version with
+the collection at no extra cost, and ``Collection.search`` uses the
+snapshot only when it is at least that recent, falling back to SQL
+otherwise. Stale snapshots catch up in the background by re-reading the
+changed chunks only; when the log no longer covers the gap (it is pruned
+after ``SNAPSHOT_CHANGE_RETENTION`` seconds) or more chunks changed than
+the snapshot holds, it is rebuilt.
+
+Turning ``SNAPSHOT_SEARCH`` off drops the triggers at the next start-up,
+and with them their cost on writes.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.documents import Document
+
+from langconnect import config
+from langconnect.database.connection import get_db_connection
+from langconnect.services.embedding_migration import (
+    SKIP_CHANGE_LOG_SETTING,
+    vector_sql,
+)
+
+if TYPE_CHECKING:
+    from langconnect.services.vector_snapshot import VectorSnapshot
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS langconnect_collection_version (
+        collection_id uuid PRIMARY KEY
+            REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+        version bigint NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS langconnect_embedding_change (
+        collection_id uuid NOT NULL
+            REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+        version bigint NOT NULL,
+        chunk_id text NOT NULL,
+        changed_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_langconnect_embedding_change_version
+        ON langconnect_embedding_change (collection_id, version)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_langconnect_embedding_change_changed_at
+        ON langconnect_embedding_change (changed_at)
+    """,
+)
+
+# Chunks of collections being deleted, by the reaper or a cascade, are not
+# logged, nor writes that do not change what searches read
+TRIGGERS = (
+    f"""
+    CREATE OR REPLACE FUNCTION langconnect_log_embedding_change()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF current_setting('{SKIP_CHANGE_LOG_SETTING}', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        WITH changed AS (
+            SELECT collection_id, id
+              FROM changed_rows
+             WHERE collection_id IS NOT NULL
+        ), bumped AS (
+            INSERT INTO langconnect_collection_version AS v (collection_id, version)
+            SELECT DISTINCT c.collection_id, 1
+              FROM changed AS c
+              JOIN langchain_pg_collection AS p
+                ON p.uuid = c.collection_id
+               AND p.cmetadata->>'deleted_at' IS NULL
+                ON CONFLICT (collection_id) DO UPDATE SET version = v.version + 1
+            RETURNING collection_id, version
+        )
+        INSERT INTO langconnect_embedding_change (collection_id, version, chunk_id)
+        SELECT c.collection_id, b.version, c.id
+          FROM changed AS c
+          JOIN bumped AS b USING (collection_id);
+        RETURN NULL;
+    END
+    $$
+    """,
+    *(
+        f"""
+        CREATE OR REPLACE TRIGGER langconnect_embedding_{operation.lower()}
+            AFTER {operation} ON langchain_pg_embedding
+            REFERENCING {"OLD" if operation == "DELETE" else "NEW"} TABLE
+                AS changed_rows
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION langconnect_log_embedding_change()
+        """
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ),
+)
+DROP_TRIGGERS = tuple(
+    f"DROP TRIGGER IF EXISTS langconnect_embedding_{operation}"
+    " ON langchain_pg_embedding"
+    for operation in ("insert", "update", "delete")
+)
+
+VERSION_SQL = """
+    SELECT coalesce(
+             (SELECT version
+                FROM langconnect_collection_version
+               WHERE collection_id = $1),
+             0
+           )
+"""
+
+VERSIONS_SQL = """
+    SELECT collection_id::text, version
+      FROM langconnect_collection_version
+     WHERE collection_id = ANY($1::uuid[])
+"""
+
+COUNT_SQL = "SELECT count(*) FROM langchain_pg_embedding WHERE collection_id = $1"
+
+CHUNKS_SQL = f"""
+    SELECT id, document, cmetadata::text AS metadata,
+           {vector_sql("$1")} AS embedding
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+"""
+
+CHANGES_SQL = """
+    SELECT count(DISTINCT version) AS versions,
+           array_agg(DISTINCT chunk_id) AS ids
+      FROM langconnect_embedding_change
+     WHERE collection_id = $1
+       AND version > $2
+"""
+
+CHANGED_CHUNKS_SQL = f"""
+    SELECT id, document, cmetadata::text AS metadata,
+           {vector_sql("$1")} AS embedding
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+       AND id = ANY($2::text[])
+"""
+
+PRUNE_SQL = """
+    DELETE FROM langconnect_embedding_change
+     WHERE changed_at < now() - make_interval(secs => $1)
+"""
+
+# Rows read per round trip while building a snapshot
+BUILD_BATCH_SIZE = 5000
+
+
+def enabled() -> bool:
+    """Whether semantic searches may be served from local snapshots."""
+    return config.SNAPSHOT_SEARCH
+
+
+def schema() -> tuple[str, ...]:
+    """Return the statements setting up write versions, triggers included if on."""
+    return (*SCHEMA, *(TRIGGERS if enabled() else DROP_TRIGGERS))
+
+
+def _chunk(row: Any) -> tuple[str, str, dict[str, Any], Any]:
+    metadata = json.loads(row["metadata"]) if row["metadata"] else {}
+    return row["id"], row["document"], metadata, row["embedding"]
+
+
+class SnapshotEngine:
+    """Build, refresh and search the snapshots of one worker process."""
+
+    def __init__(
+        self,
+        *,
+        max_chunks: int,
+        max_collections: int,
+        dtype: str,
+        directory: str,
+        interval: float,
+        retention: float,
+    ) -> None:
+        """Initialize the engine.
+
+        Args:
+            max_chunks: Largest collection to keep a snapshot of.
+            max_collections: Snapshots kept at most; the least recently
+                searched is dropped first.
+            dtype: ``float32``, or ``float16`` for half the memory.
+            directory: Where the matrix files are created.
+            interval: Seconds between checks for writes to snapshotted
+                collections.
+            retention: Seconds changed chunk ids stay in the change log.
+        """
+        self.max_chunks = max_chunks
+        self.max_collections = max_collections
+        self.dtype = dtype
+        self.directory = directory
+        self.interval = interval
+        self.retention = retention
+        self._snapshots: OrderedDict[str, "VectorSnapshot"] = OrderedDict()
+        # Version at which a collection was found empty or too large
+        self._skipped: dict[str, int] = {}
+        self._pending: set[str] = set()
+        self._pruned_at = 0.0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Run the refresh loop in the background, if snapshots are on."""
+        if enabled() and self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._remove_orphans()
+            self._task = asyncio.create_task(self._run(), name="snapshot-refresh")
+
+    async def stop(self) -> None:
+        """Stop the refresh loop and delete every snapshot file."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        while self._snapshots:
+            _, snapshot = self._snapshots.popitem()
+            snapshot.close()
+
+    def _remove_orphans(self) -> None:
+        """Delete the files left behind by worker processes that died."""
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) != 4 or not parts[1].isdigit():
+                continue
+            try:
+                os.kill(int(parts[1]), 0)
+            except ProcessLookupError:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def request(self, collection_id: str, version: int) -> None:
+        """Ask for a snapshot of a collection at ``version`` or later."""
+        if self._task is None or self._skipped.get(collection_id) == version:
+            return
+        if collection_id not in self._pending:
+            self._pending.add(collection_id)
+            self._wake.set()
+
+    async def search(
+        self, collection_id: str, version: int, embedding: list[float], k: int
+    ) -> list[tuple[Document, float]] | None:
+        """Return the ``k`` chunks nearest to ``embedding`` with their distance.
+
+        Returns:
+            None when there is no snapshot of the collection at ``version``
+            or later; one is then requested.
+        """
+        snapshot = self._snapshots.get(collection_id)
+        if snapshot is None or snapshot.version < version:
+            self.request(collection_id, version)
+            return None
+        self._snapshots.move_to_end(collection_id)
+        # None if the snapshot was dropped in the meantime
+        return await asyncio.to_thread(snapshot.search, embedding, k)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.refresh_pending()
+            except Exception:
+                logger.exception("Snapshot refresh failed; retrying later.")
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+
+    async def refresh_pending(self) -> int:
+        """Build requested snapshots and catch up those behind their collection.
+
+        Returns:
+            The number of snapshots built or refreshed.
+        """
+        pending, self._pending = self._pending, set()
+        async with get_db_connection() as conn:
+            if self._snapshots:
+                rows = await conn.fetch(VERSIONS_SQL, list(self._snapshots))
+                for row in rows:
+                    snapshot = self._snapshots.get(row["collection_id"])
+                    if snapshot is not None and snapshot.version < row["version"]:
+                        pending.add(row["collection_id"])
+            if time.monotonic() - self._pruned_at >= self.interval:
+                self._pruned_at = time.monotonic()
+                await conn.execute(PRUNE_SQL, self.retention)
+        for collection_id in pending:
+            try:
+                await self.refresh(collection_id)
+            except Exception:
+                logger.exception("Could not snapshot collection %s.", collection_id)
+                self._drop(collection_id)
+        return len(pending)
+
+    async def refresh(self, collection_id: str) -> None:
+        """Bring the snapshot of a collection up to date, building it if needed."""
+        snapshot = self._snapshots.get(collection_id)
+        if snapshot is None or not await self._catch_up(snapshot):
+            await self._build(collection_id)
+
+    async def _catch_up(self, snapshot: "VectorSnapshot") -> bool:
+        """Apply the chunks changed since the snapshot's version.
+
+        Returns:
+            False if the snapshot must be rebuilt instead.
+        """
+        collection_id = snapshot.collection_id
+        async with (
+            get_db_connection() as conn,
+            conn.transaction(isolation="repeatable_read", readonly=True),
+        ):
+            version = await conn.fetchval(VERSION_SQL, collection_id)
+            if version <= snapshot.version:
+                return True
+            changes = await conn.fetchrow(CHANGES_SQL, collection_id, snapshot.version)
+            # The log was pruned past the snapshot, or a version bumped without
+            # logging chunks, by the flip of an embedding migration
+            if changes["versions"] != version - snapshot.version:
+                return False
+            ids = changes["ids"]
+            # Cheaper to read the collection again
+            if len(ids) > len(snapshot):
+                return False
+            rows = await conn.fetch(CHANGED_CHUNKS_SQL, collection_id, ids)
+        found = {row["id"] for row in rows}
+        try:
+            await asyncio.to_thread(
+                snapshot.update,
+                [_chunk(row) for row in rows],
+                [chunk_id for chunk_id in ids if chunk_id not in found],
+            )
+        except ValueError:  # Another embedding model, after a migration
+            return False
+        snapshot.version = version
+        if len(snapshot) > self.max_chunks:
+            self._drop(collection_id)
+            self._skipped[collection_id] = version
+        logger.debug(
+            "Snapshot of collection %s: %d chunks changed, now at version %d.",
+            collection_id,
+            len(ids),
+            version,
+        )
+        return True
+
+    async def _build(self, collection_id: str) -> None:
+        # Imported here because it pulls in numpy
+        from langconnect.services.vector_snapshot import VectorSnapshot, as_vector
+
+        start = time.perf_counter()
+        snapshot = None
+        async with (
+            get_db_connection() as conn,
+            conn.transaction(isolation="repeatable_read", readonly=True),
+        ):
+            version = await conn.fetchval(VERSION_SQL, collection_id)
+            count = await conn.fetchval(COUNT_SQL, collection_id)
+            if not count or count > self.max_chunks:
+                self._drop(collection_id)
+                self._skipped[collection_id] = version
+                return
+            cursor = await conn.cursor(CHUNKS_SQL, collection_id)
+            while rows := await cursor.fetch(BUILD_BATCH_SIZE):
+                if snapshot is None:
+                    snapshot = VectorSnapshot(
+                        collection_id,
+                        len(as_vector(rows[0]["embedding"])),
+                        directory=self.directory,
+                        dtype=self.dtype,
+                        capacity=count,
+                    )
+                try:
+                    await asyncio.to_thread(snapshot.update, map(_chunk, rows))
+                except BaseException:
+                    snapshot.close()
+                    raise
+        if snapshot is None:
+            return
+        snapshot.version = version
+        self._skipped.pop(collection_id, None)
+        # Searches move to the new snapshot before the old one is closed
+        previous = self._snapshots.pop(collection_id, None)
+        while len(self._snapshots) >= self.max_collections:
+            _, evicted = self._snapshots.popitem(last=False)
+            evicted.close()
+        self._snapshots[collection_id] = snapshot
+        if previous is not None:
+            previous.close()
+        logger.info(
+            "Built a snapshot of collection %s: %d chunks (%.1f MiB) in %.2fs.",
+            collection_id,
+            len(snapshot),
+            snapshot.nbytes / 2**20,
+            time.perf_counter() - start,
+        )
+
+    def _drop(self, collection_id: str) -> None:
+        snapshot = self._snapshots.pop(collection_id, None)
+        if snapshot is not None:
+            snapshot.close()
+
+
+snapshot_engine = SnapshotEngine(
+    max_chunks=config.SNAPSHOT_MAX_CHUNKS,
+    max_collections=config.SNAPSHOT_MAX_COLLECTIONS,
+    dtype=config.SNAPSHOT_DTYPE,
+    directory=config.SNAPSHOT_DIR
+    or os.path.join(tempfile.gettempdir(), "langconnect-snapshots"),
+    interval=config.SNAPSHOT_INTERVAL,
+    retention=config.SNAPSHOT_CHANGE_RETENTION,
+)
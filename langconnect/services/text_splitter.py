@@ -0,0 +1,286 @@
+"""Recursive text splitting over offsets.
+
+``RecursiveTextSplitter`` produces exactly the chunks of LangChain's
+``RecursiveCharacterTextSplitter`` with its default settings (literal
+separators, separators kept at the start of the following piece, whitespace
+stripped), but works on ``(start, end)`` offsets into the original text:
+
+- separator positions come from ``str.find`` over the current span instead of
+  ``re.split``, so no intermediate piece strings are built;
+- lengths are differences of offsets, so the start and end of every chunk
+  are found by bisecting the piece offsets, once per chunk instead of once
+  per piece (or once per character, for text without spaces such as CJK).
+
+A chunk string is only created when it is emitted. With ``length_function``
+set, e.g. to a token counter, pieces are measured through it instead; the
+boundaries then match LangChain with the same ``length_function``.
+"""
+
+import bisect
+import copy
+import functools
+from collections.abc import Callable, Iterable, Sequence
+
+from langchain_core.documents import Document
+
+from langconnect import config
+
+CHUNK_SIZE_UNITS = ("characters", "tokens")
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class RecursiveTextSplitter:
+    """Split text on paragraphs, lines, words and characters, in that order."""
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        *,
+        separators: Iterable[str] = DEFAULT_SEPARATORS,
+        length_function: Callable[[str], int] | None = None,
+    ) -> None:
+        """Initialize the splitter.
+
+        Args:
+            chunk_size: Maximum length of a chunk.
+            chunk_overlap: Length shared by consecutive chunks, at most.
+            separators: Literal separators, coarsest first; ``""`` splits
+                into characters.
+            length_function: Measures a piece of text; ``None`` counts
+                characters.
+
+        Raises:
+            ValueError: If the sizes are not positive or the overlap exceeds
+                the chunk size.
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"chunk_overlap must be >= 0, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self.length_function = length_function
+
+    def split_text(self, text: str) -> list[str]:
+        """Split ``text`` into chunks."""
+        chunks: list[str] = []
+        self._split(text, 0, len(text), 0, chunks)
+        return chunks
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        """Split documents, copying the metadata of each into its chunks."""
+        return [
+            Document(page_content=chunk, metadata=copy.deepcopy(doc.metadata))
+            for doc in documents
+            for chunk in self.split_text(doc.page_content)
+        ]
+
+    def _split(
+        self, text: str, start: int, end: int, level: int, chunks: list[str]
+    ) -> None:
+        """Split ``text[start:end]`` with the separators from ``level`` on."""
+        separators = self.separators
+        separator = separators[-1]
+        next_level = None
+        for i in range(level, len(separators)):
+            if not separators[i]:
+                separator = ""
+                break
+            if text.find(separators[i], start, end) != -1:
+                separator = separators[i]
+                if i + 1 < len(separators):
+                    next_level = i + 1
+                break
+
+        if separator:
+            bounds, long = _separator_bounds(
+                text, start, end, separator, self.chunk_size
+            )
+        else:
+            bounds = range(start, end + 1)
+            long = range(end - start) if self.chunk_size == 1 else ()
+        if self.length_function is not None:
+            self._split_measured(text, bounds, next_level, chunks)
+            return
+
+        # Pieces of at least chunk_size are split further, the runs of
+        # pieces between them are merged
+        run_start = 0
+        for piece in long:
+            if run_start < piece:
+                self._merge(text, bounds, run_start, piece, chunks)
+            self._split_piece(
+                text, bounds[piece], bounds[piece + 1], next_level, chunks
+            )
+            run_start = piece + 1
+        if run_start < len(bounds) - 1:
+            self._merge(text, bounds, run_start, len(bounds) - 1, chunks)
+
+    def _split_piece(
+        self, text: str, start: int, end: int, level: int | None, chunks: list[str]
+    ) -> None:
+        if level is None:
+            chunks.append(text[start:end])
+        else:
+            self._split(text, start, end, level, chunks)
+
+    def _merge(
+        self,
+        text: str,
+        bounds: Sequence[int],
+        first: int,
+        last: int,
+        chunks: list[str],
+    ) -> None:
+        """Merge pieces ``first`` to ``last - 1`` into chunks.
+
+        Piece ``i`` is ``text[bounds[i]:bounds[i + 1]]``. A chunk grows until
+        the next piece would overflow ``chunk_size``; the next chunk then
+        starts at the first piece leaving at most ``chunk_overlap`` before
+        that piece and room for it. Both are found by bisection, so the cost
+        is per chunk rather than per piece.
+        """
+        head = first
+        while True:
+            # The piece that would overflow a chunk starting at head
+            overflow = (
+                bisect.bisect_right(
+                    bounds, bounds[head] + self.chunk_size, head + 1, last + 1
+                )
+                - 1
+            )
+            if overflow == last:
+                break
+            _emit(text, bounds[head], bounds[overflow], chunks)
+            head = max(
+                bisect.bisect_left(
+                    bounds, bounds[overflow] - self.chunk_overlap, head, overflow
+                ),
+                bisect.bisect_left(
+                    bounds, bounds[overflow + 1] - self.chunk_size, head, overflow
+                ),
+            )
+        _emit(text, bounds[head], bounds[last], chunks)
+
+    def _split_measured(
+        self,
+        text: str,
+        bounds: Sequence[int],
+        level: int | None,
+        chunks: list[str],
+    ) -> None:
+        """``_split`` of the pieces in ``bounds`` measured by ``length_function``."""
+        good: list[tuple[int, int, int]] = []
+        for start, end in zip(bounds, bounds[1:]):
+            length = self.length_function(text[start:end])
+            if length < self.chunk_size:
+                good.append((start, end, length))
+                continue
+            if good:
+                self._merge_measured(text, good, chunks)
+                good = []
+            self._split_piece(text, start, end, level, chunks)
+        if good:
+            self._merge_measured(text, good, chunks)
+
+    def _merge_measured(
+        self, text: str, pieces: list[tuple[int, int, int]], chunks: list[str]
+    ) -> None:
+        """Merge contiguous ``(start, end, length)`` pieces into chunks."""
+        head = 0
+        total = 0
+        for i, (_, _, length) in enumerate(pieces):
+            if total + length > self.chunk_size:
+                if head < i:
+                    _emit(text, pieces[head][0], pieces[i - 1][1], chunks)
+                    while total > self.chunk_overlap or (
+                        total + length > self.chunk_size and total > 0
+                    ):
+                        total -= pieces[head][2]
+                        head += 1
+            total += length
+        if head < len(pieces):
+            _emit(text, pieces[head][0], pieces[-1][1], chunks)
+
+
+def _separator_bounds(
+    text: str, start: int, end: int, separator: str, chunk_size: int
+) -> tuple[list[int], list[int]]:
+    """Return the piece bounds of ``text[start:end]`` and its long pieces.
+
+    Every occurrence of ``separator`` starts a new piece that keeps it. Long
+    pieces, of at least ``chunk_size`` characters, are returned by index.
+    """
+    bounds = [start]
+    long = []
+    step = len(separator)
+    position = text.find(separator, start, end)
+    if position == start:
+        position = text.find(separator, start + step, end)
+    while position != -1:
+        if position - bounds[-1] >= chunk_size:
+            long.append(len(bounds) - 1)
+        bounds.append(position)
+        position = text.find(separator, position + step, end)
+    if end - bounds[-1] >= chunk_size:
+        long.append(len(bounds) - 1)
+    bounds.append(end)
+    return bounds, long
+
+
+def _emit(text: str, start: int, end: int, chunks: list[str]) -> None:
+    chunk = text[start:end].strip()
+    if chunk:
+        chunks.append(chunk)
+
+
+@functools.lru_cache(maxsize=8)
+def token_length(encoding_name: str) -> Callable[[str], int]:
+    """Return a function counting the ``tiktoken`` tokens of a text.
+
+    The encoding is loaded once per name.
+
+    Raises:
+        ImportError: If ``tiktoken`` is not installed.
+    """
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def length(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return length
+
+
+def get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveTextSplitter:
+    """Return the shared splitter for these sizes, in ``CHUNK_SIZE_UNIT``.
+
+    Raises:
+        ValueError: If the sizes or ``CHUNK_SIZE_UNIT`` are invalid.
+    """
+    return _splitter(
+        chunk_size, chunk_overlap, config.CHUNK_SIZE_UNIT, config.CHUNK_TOKEN_ENCODING
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _splitter(
+    chunk_size: int, chunk_overlap: int, unit: str, encoding_name: str
+) -> RecursiveTextSplitter:
+    if unit not in CHUNK_SIZE_UNITS:
+        raise ValueError(
+            f"Unknown chunk size unit {unit!r}; expected one of {CHUNK_SIZE_UNITS}."
+        )
+    return RecursiveTextSplitter(
+        chunk_size,
+        chunk_overlap,
+        length_function=token_length(encoding_name) if unit == "tokens" else None,
+    )
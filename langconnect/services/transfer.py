@@ -0,0 +1,358 @@
+"""Export and import of collections with their embeddings.
+
+A collection is exported as a stream of record batches, either Arrow IPC
+(stream format) or Parquet, one row group per batch, with the columns:
+
+- ``id``: chunk ID
+- ``document``: chunk text
+- ``metadata``: chunk metadata as JSON text
+- ``embedding``: list of float32
+
+The schema metadata records the embedding model and the source collection.
+An import requires the model, and refuses vectors of another model or of
+other dimensions than the collection's: vectors pgvector would store but
+never match against the collection's queries. Moving a collection this way
+costs no parsing and no embedding calls.
+
+Exports read through a server-side cursor in a read-only, repeatable read
+transaction: memory stays at one batch, and the file is a consistent
+snapshot however long the download takes. Imports read the file one batch
+at a time, ``COPY`` each batch into a temporary table and insert it from
+there, all in one transaction.
+
+Requires ``pyarrow`` (``pip install "langconnect-client[transfer]"``).
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from typing import IO, Any, Literal
+
+from langconnect import config
+from langconnect.database import partitioning
+from langconnect.database.connection import get_db_connection
+from langconnect.database.vector_storage import storage_of
+from langconnect.services.embedding_migration import vector_sql
+
+ExportFormat = Literal["arrow", "parquet"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+FILE_EXTENSIONS: dict[str, str] = {"arrow": "arrows", "parquet": "parquet"}
+
+PARQUET_MAGIC = b"PAR1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+EXPORT_SQL = f"""
+    SELECT id, document, cmetadata::text AS metadata,
+           ({vector_sql("$1")})::real[] AS embedding
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+     ORDER BY id
+"""
+
+STAGING_TABLE = "langconnect_import"
+STAGING_SQL = f"""
+    CREATE TEMPORARY TABLE {STAGING_TABLE} (
+        id text NOT NULL,
+        document text,
+        cmetadata jsonb,
+        embedding real[]
+    ) ON COMMIT DROP
+"""
+STAGING_COLUMNS = ("id", "document", "cmetadata", "embedding")
+
+# Chunks with the same id in another collection are left alone and skipped.
+# A partitioned table only enforces unique ids within a collection, hence the
+# explicit check; the ON CONFLICT guard covers concurrent writes otherwise.
+# Replaced chunks lose their shadow vector of an embedding migration.
+INSERT_STAGED_SQL = f"""
+    INSERT INTO langchain_pg_embedding
+           (id, collection_id, document, cmetadata, embedding)
+    SELECT s.id, $1, s.document, s.cmetadata, s.embedding::vector
+      FROM {STAGING_TABLE} AS s
+     WHERE NOT EXISTS (
+           SELECT FROM langchain_pg_embedding AS o
+            WHERE o.id = s.id
+              AND o.collection_id <> $1
+           )
+        ON CONFLICT {{conflict_target}} DO UPDATE
+       SET document = EXCLUDED.document,
+           cmetadata = EXCLUDED.cmetadata,
+           embedding = EXCLUDED.embedding,
+           embedding_shadow = NULL
+     WHERE langchain_pg_embedding.collection_id = EXCLUDED.collection_id
+"""
+TRUNCATE_STAGING_SQL = f"TRUNCATE {STAGING_TABLE}"
+
+DIMENSIONS_SQL = f"""
+    SELECT vector_dims({vector_sql("$1")})
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+     LIMIT 1
+"""
+
+
+def require_pyarrow() -> Any:
+    """Return the pyarrow module.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError(
+            "Collection export and import require pyarrow. Install it with "
+            '`pip install "langconnect-client[transfer]"`.'
+        ) from e
+    return pa
+
+
+def schema(embedding_model: str, collection_name: str) -> Any:
+    """Return the Arrow schema of an export."""
+    pa = require_pyarrow()
+    return pa.schema(
+        [
+            pa.field("id", pa.string(), nullable=False),
+            pa.field("document", pa.string()),
+            pa.field("metadata", pa.string()),
+            pa.field("embedding", pa.list_(pa.float32())),
+        ],
+        metadata={
+            "embedding_model": embedding_model,
+            "collection_name": collection_name,
+        },
+    )
+
+
+class _Sink:
+    """Write-only file object whose contents are drained after each batch."""
+
+    def __init__(self) -> None:
+        self.closed = False
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+async def export_collection(
+    collection_id: str,
+    *,
+    format: ExportFormat,
+    embedding_model: str,
+    collection_name: str,
+    replica: bool = False,
+    batch_size: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield the chunks of a collection encoded as ``format``, batch by batch."""
+    pa = require_pyarrow()
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    arrow_schema = schema(embedding_model, collection_name)
+    sink = _Sink()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(
+            sink, arrow_schema, compression=config.EXPORT_PARQUET_COMPRESSION
+        )
+    else:
+        writer = pa.ipc.new_stream(sink, arrow_schema)
+
+    async with (
+        get_db_connection(replica=replica) as conn,
+        conn.transaction(isolation="repeatable_read", readonly=True),
+    ):
+        cursor = await conn.cursor(EXPORT_SQL, collection_id)
+        while rows := await cursor.fetch(batch_size):
+            # Encoding and compression run off the event loop
+            yield await asyncio.to_thread(_encode, rows, arrow_schema, writer, sink)
+    writer.close()
+    yield sink.drain()
+
+
+def _encode(rows: list, arrow_schema: Any, writer: Any, sink: _Sink) -> bytes:
+    batch = require_pyarrow().record_batch(
+        [
+            [row["id"] for row in rows],
+            [row["document"] for row in rows],
+            [row["metadata"] for row in rows],
+            [row["embedding"] for row in rows],
+        ],
+        schema=arrow_schema,
+    )
+    # One row group per batch in Parquet
+    writer.write_batch(batch)
+    return sink.drain()
+
+
+def detect_format(file: IO[bytes]) -> ExportFormat:
+    """Tell a Parquet file from an Arrow IPC stream by its first bytes.
+
+    Raises:
+        ValueError: If the file is neither.
+    """
+    head = file.read(4)
+    file.seek(0)
+    if head == PARQUET_MAGIC:
+        return "parquet"
+    if head == ARROW_STREAM_MAGIC:
+        return "arrow"
+    raise ValueError("Expected a Parquet file or an Arrow IPC stream.")
+
+
+def read_batches(
+    file: IO[bytes], batch_size: int | None = None
+) -> tuple[Any, Iterator]:
+    """Open an export and return its schema and an iterator over its batches.
+
+    Raises:
+        ValueError: If the file is not an export.
+    """
+    pa = require_pyarrow()
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    try:
+        if detect_format(file) == "parquet":
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(file)
+            arrow_schema = parquet.schema_arrow
+            batches = parquet.iter_batches(batch_size=batch_size)
+        else:
+            reader = pa.ipc.open_stream(file)
+            arrow_schema = reader.schema
+            batches = iter(reader)
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Unreadable export: {e}") from e
+    missing = {"id", "document", "metadata", "embedding"} - set(arrow_schema.names)
+    if missing:
+        raise ValueError(f"Export is missing columns: {sorted(missing)}")
+    if not (arrow_schema.metadata or {}).get(b"embedding_model"):
+        raise ValueError("Export does not record its embedding model.")
+    return arrow_schema, batches
+
+
+def model_of_export(arrow_schema: Any) -> str:
+    """Return the embedding model recorded in an export."""
+    return arrow_schema.metadata[b"embedding_model"].decode()
+
+
+async def dimensions_of(
+    conn: Any, collection_id: str, metadata: dict[str, Any]
+) -> int | None:
+    """Return the dimensions of a collection's vectors; None if it has none."""
+    storage = storage_of(metadata)
+    if storage is not None:
+        return storage["dimensions"]
+    return await conn.fetchval(DIMENSIONS_SQL, collection_id)
+
+
+def _check_dimensions(records: list[tuple], dimensions: int | None) -> int:
+    """Return the dimensions of a batch, which must all be ``dimensions``.
+
+    Raises:
+        ValueError: If an embedding is missing or has other dimensions.
+    """
+    found = {len(record[3]) if record[3] else 0 for record in records}
+    if 0 in found:
+        raise ValueError("The export has chunks without an embedding.")
+    expected = dimensions or max(found)
+    if found != {expected}:
+        raise ValueError(
+            f"Expected embeddings of {expected} dimensions, the export has "
+            f"embeddings of {', '.join(map(str, sorted(found)))}."
+        )
+    return expected
+
+
+def _check_ids(records: list[tuple]) -> None:
+    """Check that a batch does not repeat a chunk id.
+
+    Raises:
+        ValueError: If an id appears twice, which one insert cannot apply.
+    """
+    seen = set()
+    for record in records:
+        if record[0] in seen:
+            raise ValueError(f"The export repeats chunk id {record[0]!r}.")
+        seen.add(record[0])
+
+
+def _next_records(batches: Iterator) -> list[tuple] | None:
+    """Decode the next batch into COPY records; None when done."""
+    batch = next(batches, None)
+    if batch is None:
+        return None
+    columns = batch.to_pydict()
+    return list(
+        zip(
+            columns["id"],
+            columns["document"],
+            columns["metadata"],
+            columns["embedding"],
+            strict=True,
+        )
+    )
+
+
+async def import_batches(
+    conn: Any, collection_id: str, batches: Iterator, dimensions: int | None = None
+) -> dict[str, int]:
+    """Load the batches of an export into a collection, in one transaction.
+
+    Chunks already in the collection are replaced; chunks whose id belongs
+    to another collection are skipped.
+
+    Args:
+        conn: Connection to import with.
+        collection_id: Collection to import into.
+        batches: Record batches of the export.
+        dimensions: Dimensions of the collection's vectors, or None for an
+            empty collection: the export's vectors must then agree.
+
+    Returns:
+        The number of chunks read and of chunks imported.
+
+    Raises:
+        ValueError: If an embedding is missing or has other dimensions, or a
+            batch repeats an id; nothing is imported.
+    """
+    read = imported = 0
+    insert_sql = INSERT_STAGED_SQL.format(
+        conflict_target=await partitioning.conflict_target(conn)
+    )
+    async with conn.transaction():
+        await conn.execute(STAGING_SQL)
+        # Decoding runs off the event loop
+        while (records := await asyncio.to_thread(_next_records, batches)) is not None:
+            if not records:
+                continue
+            dimensions = _check_dimensions(records, dimensions)
+            _check_ids(records)
+            await conn.copy_records_to_table(
+                STAGING_TABLE, records=records, columns=STAGING_COLUMNS
+            )
+            result = await conn.execute(insert_sql, collection_id, timeout=None)
+            await conn.execute(TRUNCATE_STAGING_SQL)
+            read += len(records)
+            imported += int(result.split()[-1])
+    return {"chunks_read": read, "chunks_imported": imported}
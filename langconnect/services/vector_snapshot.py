@@ -0,0 +1,217 @@
+"""Exact nearest-neighbour search over a memory-mapped copy of a collection.
+
+A ``VectorSnapshot`` holds the embeddings of one collection as the rows of a
+``float32`` or ``float16`` matrix in a file mapped into memory, normalized
+so that a query is scored against every chunk with one matrix-vector
+product, and the ``k`` best are picked with ``argpartition``. Chunk text and
+metadata are kept alongside in memory, so a search needs no database round
+trip at all. See ``langconnect.services.snapshots`` for how snapshots are
+built and kept up to date.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Rows scored per block: float16 blocks are converted to float32 for BLAS
+SEARCH_BLOCK_ROWS = 16_384
+
+# Numbers the matrix files of the process: a rebuilt or resized snapshot
+# never writes to a file that another matrix still maps
+_file_numbers = itertools.count()
+
+
+def as_vector(value: Any) -> np.ndarray:
+    """Return a stored embedding as a float32 array, whatever its codec."""
+    if isinstance(value, str):  # pgvector codec not registered
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorSnapshot:
+    """Embeddings, text and metadata of one collection at a write version.
+
+    Rows of deleted chunks are masked out and reclaimed once they make up a
+    quarter of the matrix. Searches and updates take a lock, so updates can
+    run in a thread while other threads search.
+    """
+
+    def __init__(
+        self,
+        collection_id: str,
+        dimensions: int,
+        *,
+        directory: str,
+        dtype: str = "float32",
+        capacity: int = 1024,
+    ) -> None:
+        """Create an empty snapshot backed by a new file in ``directory``."""
+        self.collection_id = collection_id
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype)
+        self.version = 0
+        self.directory = directory
+        self.path = ""
+        self._lock = threading.Lock()
+        self._closed = False
+        self._size = 0
+        self._rows: dict[str, int] = {}
+        self._chunks: list[tuple[str, str, dict[str, Any]] | None] = []
+        self._matrix = self._allocate(capacity)
+        self._alive = np.zeros(len(self._matrix), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the matrix file."""
+        return self._matrix.nbytes
+
+    def _allocate(self, capacity: int) -> np.memmap:
+        """Map a new file of ``capacity`` rows, which becomes ``path``."""
+        self.path = os.path.join(
+            self.directory,
+            f"{self.collection_id}.{os.getpid()}.{next(_file_numbers)}."
+            f"{self.dtype.name}",
+        )
+        return np.memmap(
+            self.path,
+            dtype=self.dtype,
+            mode="w+",
+            shape=(max(capacity, 1), self.dimensions),
+        )
+
+    def _resize(self, capacity: int, keep: np.ndarray) -> None:
+        """Move the rows ``keep`` to the start of a matrix of ``capacity`` rows."""
+        rows = np.array(self._matrix[keep])
+        previous = self.path
+        # The old file is unmapped once its last reference is dropped
+        self._matrix = self._allocate(capacity)
+        _remove(previous)
+        self._matrix[: len(keep)] = rows
+        self._alive = np.zeros(len(self._matrix), dtype=bool)
+        self._alive[: len(keep)] = True
+        chunks = [self._chunks[i] for i in keep]
+        self._chunks = chunks
+        self._rows = {chunk[0]: i for i, chunk in enumerate(chunks)}
+        self._size = len(keep)
+
+    def update(
+        self,
+        chunks: Iterable[tuple[str, str, dict[str, Any], Any]],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        """Remove the chunks ``deleted``, then add or replace ``chunks``.
+
+        Args:
+            chunks: ``(id, text, metadata, embedding)`` of each chunk.
+            deleted: Ids of chunks that no longer exist.
+
+        Raises:
+            ValueError: If an embedding does not have ``dimensions`` values.
+        """
+        with self._lock:
+            for chunk_id in deleted:
+                row = self._rows.pop(chunk_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._chunks[row] = None
+            batch = list(chunks)
+            if not batch:
+                self._compact()
+                return
+            vectors = np.stack([as_vector(chunk[3]) for chunk in batch])
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Expected {self.dimensions} dimensions, got {vectors.shape[1]}."
+                )
+            vectors = _normalized(vectors)
+            new = sum(chunk[0] not in self._rows for chunk in batch)
+            if self._size + new > len(self._matrix):
+                keep = np.flatnonzero(self._alive[: self._size])
+                self._resize(2 * (len(keep) + new), keep)
+            for (chunk_id, text, metadata, _), vector in zip(
+                batch, vectors, strict=True
+            ):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = self._rows[chunk_id] = self._size
+                    self._chunks.append(None)
+                    self._size += 1
+                self._matrix[row] = vector
+                self._alive[row] = True
+                self._chunks[row] = (chunk_id, text, metadata)
+            self._compact()
+
+    def _compact(self) -> None:
+        dead = self._size - len(self._rows)
+        if dead and dead * 4 >= len(self._matrix):
+            keep = np.flatnonzero(self._alive[: self._size])
+            self._resize(2 * len(keep), keep)
+
+    def search(self, query: list[float], k: int) -> list[tuple[Document, float]] | None:
+        """Return the ``k`` chunks nearest to ``query`` with their cosine distance.
+
+        Distances are those of pgvector's ``<=>`` operator, best first. Returns
+        None once the snapshot is closed.
+        """
+        vector = as_vector(query)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        with self._lock:
+            if self._closed:
+                return None
+            size = self._size
+            k = min(k, len(self._rows))
+            if k <= 0:
+                return []
+            scores = np.empty(size, dtype=np.float32)
+            for start in range(0, size, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, size)
+                block = self._matrix[start:end].astype(np.float32, copy=False)
+                scores[start:end] = block @ vector
+            scores[~self._alive[:size]] = -np.inf
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            chunks = [self._chunks[i] for i in top]
+        return [
+            (
+                Document(id=chunk_id, page_content=text, metadata=dict(metadata)),
+                1.0 - float(score),
+            )
+            for (chunk_id, text, metadata), score in zip(
+                chunks, scores[top], strict=True
+            )
+        ]
+
+    def close(self) -> None:
+        """Unmap the matrix and delete its file."""
+        with self._lock:
+            self._closed = True
+            # Searches only hold views of the matrix under the lock, so this
+            # drops its last reference
+            self._matrix = np.empty((0, self.dimensions), dtype=self.dtype)
+            self._rows.clear()
+            self._chunks.clear()
+            self._size = 0
+        _remove(self.path)
+
+
+def _remove(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
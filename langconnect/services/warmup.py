@@ -0,0 +1,75 @@
+"""Start-up warm-up of the embedding client and hot collections.
+
+Both steps are best effort: a failure is logged and the app still starts, it
+only serves its first requests cold.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Sequence
+
+from langconnect import config
+from langconnect.database.connection import get_db_connection
+from langconnect.services.health import embedding_probe
+
+logger = logging.getLogger(__name__)
+
+# vector_dims() and length() detoast every embedding and document, so the
+# collection's heap and TOAST pages end up in the database cache.
+PRELOAD_COLLECTION_SQL = """
+    SELECT COUNT(*) AS chunks,
+           COALESCE(SUM(vector_dims(embedding)), 0) AS dimensions,
+           COALESCE(SUM(length(document)), 0) AS characters
+      FROM langchain_pg_embedding
+     WHERE collection_id = $1
+"""
+
+
+async def prime_embeddings() -> None:
+    """Create the embedding client and, if enabled, open its connection.
+
+    Local models are loaded and run once. The probe result is shared with
+    ``/health/deep``.
+    """
+    start = time.perf_counter()
+    try:
+        embeddings = await asyncio.to_thread(config.get_default_embeddings)
+        warm_up_model = getattr(embeddings, "warm_up", None)
+        if warm_up_model is not None:
+            await asyncio.to_thread(warm_up_model)
+        if not config.STARTUP_EMBEDDING_PROBE:
+            return
+        result = await embedding_probe.get()
+        if result["error_message"]:
+            logger.warning("Embedding warm-up failed: %s", result["error_message"])
+            return
+    except Exception:
+        logger.exception("Embedding warm-up failed.")
+        return
+    logger.info("Embeddings primed in %.0fms.", (time.perf_counter() - start) * 1000)
+
+
+async def preload_collection(collection_id: str) -> None:
+    """Read the rows of a collection so they are cached by the database."""
+    start = time.perf_counter()
+    try:
+        async with get_db_connection() as conn:
+            row = await conn.fetchrow(PRELOAD_COLLECTION_SQL, collection_id)
+    except Exception:
+        logger.exception("Failed to preload collection %s.", collection_id)
+        return
+    logger.info(
+        "Preloaded collection %s (%d chunks) in %.0fms.",
+        collection_id,
+        row["chunks"],
+        (time.perf_counter() - start) * 1000,
+    )
+
+
+async def warm_up(collection_ids: Sequence[str] = ()) -> None:
+    """Prime the embeddings and preload ``collection_ids`` concurrently."""
+    await asyncio.gather(
+        prime_embeddings(),
+        *(preload_collection(collection_id) for collection_id in collection_ids),
+    )
@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 """LangConnect MCP Server using FastMCP (stdio)"""
 
+import asyncio
+import importlib.util
 import json
+import logging
 import os
+import random
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
 import httpx
@@ -16,15 +25,56 @@ from fastmcp import FastMCP
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8080")
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+# HTTP client pool configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))
+# HTTP/2 needs the optional `h2` package (installed via `httpx[http2]`)
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+# Methods that are safe to resend after a transport error
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+# A DELETE applied before the connection dropped answers 404 when resent, so
+# these methods are only retried when the request never reached the server
+UNSENT_ONLY_METHODS = frozenset({"DELETE"})
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Multi-query generation cache
+MULTI_QUERY_CACHE_SIZE = int(os.getenv("MULTI_QUERY_CACHE_SIZE", "256"))
+MULTI_QUERY_CACHE_TTL = float(os.getenv("MULTI_QUERY_CACHE_TTL", "86400"))
+# Optional JSON file the cache is loaded from and persisted to
+MULTI_QUERY_CACHE_PATH = os.getenv("MULTI_QUERY_CACHE_PATH", "")
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Build the multi-query chain up front and close the pooled API client on exit."""
+    if OPENAI_API_KEY:
+        get_multi_query_chain()
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
 # Create FastMCP server
 mcp = FastMCP(
     name="langconnect-rag-mcp",
-    instructions="This server provides vector search tools that can be used to search for documents in a collection. Call list_collections() to get a list of available collections. Call get_collection(collection_id) to get details of a specific collection. Call search_documents(collection_id, query, limit, search_type, filter_json) to search for documents in a collection. Call list_documents(collection_id, limit) to list documents in a collection. Call add_documents(collection_id, text) to add a text document to a collection. Call delete_document(collection_id, document_id) to delete a document from a collection. Call get_health_status() to check the health status of the server.",
+    lifespan=lifespan,
+    instructions="This server provides vector search tools that can be used to search for documents in a collection. Call list_collections() to get a list of available collections. Call get_collection(collection_id) to get details of a specific collection. Call search_documents(collection_id, query, limit, search_type, filter_json) to search for documents in a collection. Call multi_search(collection_id, question, limit, search_type, filter_json) to search with several generated variants of a question in a single call. Call list_documents(collection_id, limit) to list documents in a collection. Call add_documents(collection_id, text) to add a text document to a collection. Call delete_document(collection_id, document_id) to delete a document from a collection. Call get_health_status() to check the health status of the server.",
 )
 
 
@@ -35,9 +85,8 @@ def get_instructions() -> str:
     return """
 Follow the guidelines step-by-step to find the answer.
 1. Use `list_collections` to list up collections and find right **Collection ID** for user's request.
-2. Use `multi_query` to generate at least 3 sub-questions which are related to original user's request.
-3. Search all queries generated from previous step(`multi_query`) and find useful documents from collection.
-4. Use searched documents to answer the question."""
+2. Use `multi_search` with the user's request to search the collection. It generates related sub-questions and searches them all in one call.
+3. Use searched documents to answer the question."""
 
 
 @mcp.prompt("rag-prompt")
@@ -57,9 +106,8 @@ You must use search tool to answer the question.
 #Search Guidelines:
 Follow the guidelines step-by-step to find the answer.
 1. Use `list_collections` to list up collections and find right **Collection ID** for user's request.
-2. Use `multi_query` to generate at least 3 sub-questions which are related to original user's request.
-3. Search all queries generated from previous step(`multi_query`) and find useful documents from collection.
-4. Use searched documents to answer the question.
+2. Use `multi_search` with the user's request to search the collection. It generates related sub-questions and searches them all in one call.
+3. Use searched documents to answer the question.
 
 ---
 
@@ -93,6 +141,14 @@ class LineListOutputParser(BaseOutputParser[list[str]]):
         return [line for line in lines if line]
 
 
+MULTI_QUERY_TEMPLATE = """You are an AI language model assistant. Your task is to generate 3 to 5 
+different versions of the given user question to retrieve relevant documents from a vector 
+database. By generating multiple perspectives on the user question, your goal is to help
+the user overcome some of the limitations of the distance-based similarity search. 
+Provide these alternative questions separated by newlines. Do not number them.
+Original question: {question}"""
+
+
 # HTTP client
 class LangConnectClient:
     def __init__(self, base_url: str, token: str):
@@ -103,20 +159,76 @@ class LangConnectClient:
         }
         if token:
             self.headers["Authorization"] = f"Bearer {token}"
-
-    async def request(self, method: str, endpoint: str, **kwargs):
-        async with httpx.AsyncClient() as client:
-            url = f"{self.base_url}{endpoint}"
-            response = await client.request(
-                method, url, headers=self.headers, timeout=60.0, **kwargs
+        # Long-lived, pooled connection to the API; created lazily so it binds
+        # to the event loop that actually serves the tool calls.
+        self._http: httpx.AsyncClient | None = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """Return the shared pooled client, creating it on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
             )
-            response.raise_for_status()
-            return (
-                response.json()
-                if response.status_code != 204
-                else {"status": "success"}
+        return self._http
+
+    async def aclose(self):
+        """Close the pooled client and release its connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ):
+        """Send a request over the pooled client.
+
+        Idempotent requests (by method, or when ``idempotent=True`` is passed
+        for read-only POSTs such as search) are retried with exponential
+        backoff on transport errors and 502/503/504 responses. DELETEs are
+        only retried when the connection could not be made.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = HTTP_MAX_RETRIES + 1 if idempotent else 1
+        unsent_only = method.upper() in UNSENT_ONLY_METHODS
+        headers = kwargs.pop("headers", self.headers)
+        kwargs.setdefault("timeout", 60.0)
+        url = f"{self.base_url}{endpoint}"
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await self._get_http().request(
+                    method, url, headers=headers, **kwargs
+                )
+            except httpx.TransportError as e:
+                if last_attempt or (unsent_only and not isinstance(e, UNSENT_ERRORS)):
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or last_attempt
+                    or unsent_only
+                ):
+                    break
+            await asyncio.sleep(
+                HTTP_RETRY_BACKOFF * (2**attempt) * (0.5 + random.random())
             )
 
+        response.raise_for_status()
+        return response.json() if response.status_code != 204 else {"status": "success"}
+
 
 # Initialize client
 client = LangConnectClient(API_BASE_URL, SUPABASE_JWT_SECRET)
@@ -129,6 +241,8 @@ async def search_documents(
     limit: int = 5,
     search_type: str = "semantic",
     filter_json: Optional[str] = None,
+    rerank: bool = False,
+    diversity: str = "none",
 ) -> str:
     """Search documents in a collection using semantic, keyword, or hybrid search.
 
@@ -150,8 +264,18 @@ async def search_documents(
         filter_json: Optional JSON string containing metadata filters to narrow down the search scope.
                     Example: '{"source": "sample.pdf", "category": "technical"}'
                     This helps focus the search on specific document types or sources.
+        rerank: Re-score a wide candidate set with a cross-encoder and return the best `limit`.
+                Use it instead of raising `limit` when the top results are not relevant enough.
+        diversity: "mmr" returns varied results instead of overlapping chunks of the same passage.
+                   Default is "none".
     """
-    search_data = {"query": query, "limit": limit, "search_type": search_type}
+    search_data = {
+        "query": query,
+        "limit": limit,
+        "search_type": search_type,
+        "rerank": rerank,
+        "diversity": diversity,
+    }
 
     if filter_json:
         try:
@@ -160,7 +284,10 @@ async def search_documents(
             return "Error: Invalid JSON in filter parameter"
 
     results = await client.request(
-        "POST", f"/collections/{collection_id}/documents/search", json=search_data
+        "POST",
+        f"/collections/{collection_id}/documents/search",
+        json=search_data,
+        idempotent=True,
     )
 
     if not results:
@@ -371,16 +498,14 @@ async def add_documents(collection_id: str, text: str) -> str:
     headers = client.headers.copy()
     headers.pop("Content-Type", None)
 
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(
-            f"{client.base_url}/collections/{collection_id}/documents",
-            headers=headers,
-            files=files,
-            data=data,
-            timeout=120.0,
-        )
-        response.raise_for_status()
-        result = response.json()
+    result = await client.request(
+        "POST",
+        f"/collections/{collection_id}/documents",
+        headers=headers,
+        files=files,
+        data=data,
+        timeout=120.0,
+    )
 
     if result.get("success"):
         return f"Document added successfully! Created {len(result.get('added_chunk_ids', []))} chunks."
@@ -434,6 +559,128 @@ async def get_health_status() -> str:
     return f"Status: {result.get('status', 'Unknown')}\nAPI: {API_BASE_URL}\nAuth: {'✓' if SUPABASE_JWT_SECRET else '✗'}"
 
 
+class QueryCache:
+    """LRU cache of question -> generated queries with a TTL.
+
+    Entries are stamped with wall-clock time so they stay valid across
+    restarts when the cache is persisted to ``path``.
+    """
+
+    def __init__(self, max_size: int, ttl: float, path: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+        self.load()
+
+    @staticmethod
+    def key(question: str) -> str:
+        """Normalize whitespace so trivially different questions share an entry."""
+        return " ".join(question.split())
+
+    def get(self, question: str) -> Optional[list[str]]:
+        key = self.key(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, queries = entry
+        if time.time() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(queries)
+
+    def set(self, question: str, queries: list[str]):
+        key = self.key(question)
+        self._entries[key] = (time.time(), list(queries))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def load(self):
+        """Load unexpired entries from disk, ignoring a missing or corrupt file."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        now = time.time()
+        for key, entry in data.items():
+            try:
+                created_at, queries = entry
+                fresh = now - float(created_at) <= self.ttl
+            except (TypeError, ValueError):
+                continue
+            if fresh and isinstance(queries, list):
+                self._entries[key] = (float(created_at), queries)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def save(self):
+        """Write the cache to disk, off the event loop, if it changed.
+
+        Entries set while a write is running are written by the next call,
+        so concurrent callers share writes instead of queueing one each.
+        """
+        if not self.path:
+            return
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = json.dumps(self._entries, ensure_ascii=False)
+            await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: str):
+        """Atomically replace the cache file with ``data``."""
+        try:
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+query_cache = QueryCache(
+    MULTI_QUERY_CACHE_SIZE, MULTI_QUERY_CACHE_TTL, MULTI_QUERY_CACHE_PATH
+)
+_multi_query_chain = None
+
+
+def get_multi_query_chain():
+    """Return the multi-query LLM chain, building it on first use."""
+    global _multi_query_chain
+    if _multi_query_chain is None:
+        llm = ChatOpenAI(temperature=0, api_key=OPENAI_API_KEY)
+        query_prompt = PromptTemplate(
+            input_variables=["question"],
+            template=MULTI_QUERY_TEMPLATE,
+        )
+        _multi_query_chain = query_prompt | llm | LineListOutputParser()
+    return _multi_query_chain
+
+
+async def generate_queries(question: str) -> list[str]:
+    """Generate alternative phrasings of a question with the LLM.
+
+    Results are served from ``query_cache`` when the question was seen before.
+    """
+    cached = query_cache.get(question)
+    if cached is not None:
+        return cached
+
+    queries = await get_multi_query_chain().ainvoke({"question": question})
+    query_cache.set(question, queries)
+    await query_cache.save()
+    return queries
+
+
 @mcp.tool
 async def multi_query(question: str) -> str:
     """Generate multiple queries (3-5) for better vector search results from a single user question.
@@ -461,28 +708,7 @@ async def multi_query(question: str) -> str:
         return json.dumps({"error": "OpenAI API key not configured"})
 
     try:
-        # Initialize LLM
-        llm = ChatOpenAI(temperature=0, api_key=OPENAI_API_KEY)
-
-        # Create prompt template
-        query_prompt = PromptTemplate(
-            input_variables=["question"],
-            template="""You are an AI language model assistant. Your task is to generate 3 to 5 
-different versions of the given user question to retrieve relevant documents from a vector 
-database. By generating multiple perspectives on the user question, your goal is to help
-the user overcome some of the limitations of the distance-based similarity search. 
-Provide these alternative questions separated by newlines. Do not number them.
-Original question: {question}""",
-        )
-
-        # Create parser
-        output_parser = LineListOutputParser()
-
-        # Create chain
-        chain = query_prompt | llm | output_parser
-
-        # Generate queries
-        queries = await chain.ainvoke({"question": question})
+        queries = await generate_queries(question)
 
         # Return as JSON array
         return json.dumps(queries, ensure_ascii=False)
@@ -491,6 +717,134 @@ Original question: {question}""",
         return json.dumps({"error": f"Failed to generate queries: {e!s}"})
 
 
+def fuse_search_results(result_lists: list[list[dict]], limit: int) -> list[dict]:
+    """Merge several search result lists, deduplicating by chunk id.
+
+    Each chunk keeps its best score and records how many of the queries
+    returned it; ties on score are broken by that hit count. Chunks are
+    keyed on their content too, so results without an id are not merged
+    into one.
+    """
+    fused: dict[tuple, dict] = {}
+    for results in result_lists:
+        for result in results:
+            key = (result.get("id"), result.get("page_content"))
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = {**result, "hits": 1}
+                continue
+            entry["hits"] += 1
+            if result.get("score", 0) > entry.get("score", 0):
+                entry.update(result, hits=entry["hits"])
+
+    ranked = sorted(
+        fused.values(),
+        key=lambda r: (r.get("score", 0), r["hits"]),
+        reverse=True,
+    )
+    return ranked[:limit]
+
+
+@mcp.tool
+async def multi_search(
+    collection_id: str,
+    question: str,
+    limit: int = 10,
+    search_type: str = "hybrid",
+    filter_json: Optional[str] = None,
+) -> str:
+    """Search a collection with several generated variants of a question in one call.
+
+    This function combines multi_query() and search_documents(): it generates 3-5
+    alternative phrasings of the question, runs one search per phrasing (plus the
+    original question) concurrently against the API, and merges the results into a
+    single block. Chunks returned by more than one query appear only once, keeping
+    their best score. Prefer this over calling search_documents() once per query.
+    If OpenAI is not configured, only the original question is searched.
+
+    Args:
+        collection_id: The unique identifier of the collection to search in. This should be obtained
+                      from the list_collections() function or provided by the user.
+        question: The original user question. Variants are generated from it automatically.
+        limit: Maximum number of fused documents to return. Default is 10. The same limit is
+               used for each individual search.
+        search_type: Type of search algorithm to perform: "semantic", "keyword" or
+                    "hybrid" (default, best overall results).
+        filter_json: Optional JSON string containing metadata filters applied to every search.
+                    Example: '{"source": "sample.pdf"}'
+
+    Returns:
+        str: Search results in the same format as search_documents(), preceded by the list of
+             queries that were searched. Each document also reports how many queries matched it.
+    """
+    search_data = {"limit": limit, "search_type": search_type}
+
+    if filter_json:
+        try:
+            search_data["filter"] = json.loads(filter_json)
+        except json.JSONDecodeError:
+            return "Error: Invalid JSON in filter parameter"
+
+    queries = [question]
+    if OPENAI_API_KEY:
+        try:
+            queries.extend(await generate_queries(question))
+        except Exception:
+            # Fall back to searching the original question only
+            logger.warning(
+                "Query generation failed; searching the question only.",
+                exc_info=True,
+            )
+    queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+
+    responses = await asyncio.gather(
+        *(
+            client.request(
+                "POST",
+                f"/collections/{collection_id}/documents/search",
+                json={**search_data, "query": query},
+                idempotent=True,
+            )
+            for query in queries
+        ),
+        return_exceptions=True,
+    )
+    errors = [r for r in responses if isinstance(r, BaseException)]
+    if len(errors) == len(responses):
+        raise errors[0]
+    for query, response in zip(queries, responses, strict=True):
+        if isinstance(response, BaseException):
+            logger.warning(
+                "Search for %r failed; dropping it from the results.",
+                query,
+                exc_info=response,
+            )
+
+    results = fuse_search_results(
+        [r for r in responses if not isinstance(r, BaseException)], limit
+    )
+
+    if not results:
+        return "No results found."
+
+    output = f'<search_results type="{search_type}">\n'
+    output += "  <queries>\n"
+    for query in queries:
+        output += f"    <query>{query}</query>\n"
+    output += "  </queries>\n"
+    for result in results:
+        output += "  <document>\n"
+        output += f"    <content>{result.get('page_content', '')}</content>\n"
+        output += f"    <metadata>{json.dumps(result.get('metadata', {}), ensure_ascii=False)}</metadata>\n"
+        output += f"    <score>{result.get('score', 0):.4f}</score>\n"
+        output += f"    <hits>{result['hits']}</hits>\n"
+        output += f"    <id>{result.get('id', 'Unknown')}</id>\n"
+        output += "  </document>\n"
+    output += "</search_results>"
+
+    return output
+
+
 def main():
     """Entry point for the MCP server"""
     import sys
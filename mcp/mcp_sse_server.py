@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 """LangConnect MCP Server using FastMCP"""
 
+import asyncio
+import importlib.util
 import json
+import logging
 import os
+import random
 import sys
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
 from getpass import getpass
 from pathlib import Path
@@ -20,6 +28,8 @@ from fastmcp import FastMCP
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8080")
@@ -29,6 +39,32 @@ SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
 SSE_PORT = int(os.getenv("SSE_PORT", "8765"))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+# HTTP client pool configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))
+# HTTP/2 needs the optional `h2` package (installed via `httpx[http2]`)
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+# Methods that are safe to resend after a transport error
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+# A DELETE applied before the connection dropped answers 404 when resent, so
+# these methods are only retried when the request never reached the server
+UNSENT_ONLY_METHODS = frozenset({"DELETE"})
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Multi-query generation cache
+MULTI_QUERY_CACHE_SIZE = int(os.getenv("MULTI_QUERY_CACHE_SIZE", "256"))
+MULTI_QUERY_CACHE_TTL = float(os.getenv("MULTI_QUERY_CACHE_TTL", "86400"))
+# Optional JSON file the cache is loaded from and persisted to
+MULTI_QUERY_CACHE_PATH = os.getenv("MULTI_QUERY_CACHE_PATH", "")
+
 
 # Output parser for multi-query generation
 class LineListOutputParser(BaseOutputParser[list[str]]):
@@ -40,8 +76,27 @@ class LineListOutputParser(BaseOutputParser[list[str]]):
         return [line for line in lines if line]
 
 
+MULTI_QUERY_TEMPLATE = """You are an AI language model assistant. Your task is to generate 3 to 5 
+different versions of the given user question to retrieve relevant documents from a vector 
+database. By generating multiple perspectives on the user question, your goal is to help
+the user overcome some of the limitations of the distance-based similarity search. 
+Provide these alternative questions separated by newlines. Do not number them.
+Original question: {question}"""
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Build the multi-query chain up front and close the pooled API client on exit."""
+    if OPENAI_API_KEY:
+        get_multi_query_chain()
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
 # Create FastMCP server
-mcp = FastMCP(name="LangConnect")
+mcp = FastMCP(name="LangConnect", lifespan=lifespan)
 
 
 # Authentication functions
@@ -186,6 +241,9 @@ class LangConnectClient:
         }
         if token:
             self.headers["Authorization"] = f"Bearer {token}"
+        # Long-lived, pooled connection to the API; created lazily so it binds
+        # to the event loop that actually serves the tool calls.
+        self._http: httpx.AsyncClient | None = None
 
     def update_token(self, token: str):
         """Update the authorization token."""
@@ -195,19 +253,72 @@ class LangConnectClient:
         else:
             self.headers.pop("Authorization", None)
 
-    async def request(self, method: str, endpoint: str, **kwargs):
-        async with httpx.AsyncClient() as client:
-            url = f"{self.base_url}{endpoint}"
-            response = await client.request(
-                method, url, headers=self.headers, timeout=60.0, **kwargs
+    def _get_http(self) -> httpx.AsyncClient:
+        """Return the shared pooled client, creating it on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
             )
-            response.raise_for_status()
-            return (
-                response.json()
-                if response.status_code != 204
-                else {"status": "success"}
+        return self._http
+
+    async def aclose(self):
+        """Close the pooled client and release its connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ):
+        """Send a request over the pooled client.
+
+        Idempotent requests (by method, or when ``idempotent=True`` is passed
+        for read-only POSTs such as search) are retried with exponential
+        backoff on transport errors and 502/503/504 responses. DELETEs are
+        only retried when the connection could not be made.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = HTTP_MAX_RETRIES + 1 if idempotent else 1
+        unsent_only = method.upper() in UNSENT_ONLY_METHODS
+        headers = kwargs.pop("headers", self.headers)
+        kwargs.setdefault("timeout", 60.0)
+        url = f"{self.base_url}{endpoint}"
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await self._get_http().request(
+                    method, url, headers=headers, **kwargs
+                )
+            except httpx.TransportError as e:
+                if last_attempt or (unsent_only and not isinstance(e, UNSENT_ERRORS)):
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or last_attempt
+                    or unsent_only
+                ):
+                    break
+            await asyncio.sleep(
+                HTTP_RETRY_BACKOFF * (2**attempt) * (0.5 + random.random())
             )
 
+        response.raise_for_status()
+        return response.json() if response.status_code != 204 else {"status": "success"}
+
 
 # Initialize client (will be updated with valid token on startup)
 client = LangConnectClient(API_BASE_URL, "")
@@ -220,9 +331,17 @@ async def search_documents(
     limit: int = 5,
     search_type: str = "semantic",
     filter_json: Optional[str] = None,
+    rerank: bool = False,
+    diversity: str = "none",
 ) -> str:
     """Search documents in a collection using semantic, keyword, or hybrid search."""
-    search_data = {"query": query, "limit": limit, "search_type": search_type}
+    search_data = {
+        "query": query,
+        "limit": limit,
+        "search_type": search_type,
+        "rerank": rerank,
+        "diversity": diversity,
+    }
 
     if filter_json:
         try:
@@ -231,7 +350,10 @@ async def search_documents(
             return "Error: Invalid JSON in filter parameter"
 
     results = await client.request(
-        "POST", f"/collections/{collection_id}/documents/search", json=search_data
+        "POST",
+        f"/collections/{collection_id}/documents/search",
+        json=search_data,
+        idempotent=True,
     )
 
     if not results:
@@ -324,16 +446,14 @@ async def add_documents(collection_id: str, text: str) -> str:
     headers = client.headers.copy()
     headers.pop("Content-Type", None)
 
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(
-            f"{client.base_url}/collections/{collection_id}/documents",
-            headers=headers,
-            files=files,
-            data=data,
-            timeout=60.0,
-        )
-        response.raise_for_status()
-        result = response.json()
+    result = await client.request(
+        "POST",
+        f"/collections/{collection_id}/documents",
+        headers=headers,
+        files=files,
+        data=data,
+        timeout=60.0,
+    )
 
     if result.get("success"):
         return f"Document added successfully! Created {len(result.get('added_chunk_ids', []))} chunks."
@@ -349,35 +469,136 @@ async def delete_document(collection_id: str, document_id: str) -> str:
     return f"Document {document_id} deleted successfully!"
 
 
-@mcp.tool
-async def multi_query(question: str) -> str:
-    """Generate multiple queries (3-5) for better vector search results from a single user question."""
-    if not OPENAI_API_KEY:
-        return json.dumps({"error": "OpenAI API key not configured"})
+class QueryCache:
+    """LRU cache of question -> generated queries with a TTL.
+
+    Entries are stamped with wall-clock time so they stay valid across
+    restarts when the cache is persisted to ``path``.
+    """
+
+    def __init__(self, max_size: int, ttl: float, path: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+        self.load()
+
+    @staticmethod
+    def key(question: str) -> str:
+        """Normalize whitespace so trivially different questions share an entry."""
+        return " ".join(question.split())
+
+    def get(self, question: str) -> Optional[list[str]]:
+        key = self.key(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, queries = entry
+        if time.time() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(queries)
+
+    def set(self, question: str, queries: list[str]):
+        key = self.key(question)
+        self._entries[key] = (time.time(), list(queries))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def load(self):
+        """Load unexpired entries from disk, ignoring a missing or corrupt file."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        now = time.time()
+        for key, entry in data.items():
+            try:
+                created_at, queries = entry
+                fresh = now - float(created_at) <= self.ttl
+            except (TypeError, ValueError):
+                continue
+            if fresh and isinstance(queries, list):
+                self._entries[key] = (float(created_at), queries)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def save(self):
+        """Write the cache to disk, off the event loop, if it changed.
+
+        Entries set while a write is running are written by the next call,
+        so concurrent callers share writes instead of queueing one each.
+        """
+        if not self.path:
+            return
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = json.dumps(self._entries, ensure_ascii=False)
+            await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: str):
+        """Atomically replace the cache file with ``data``."""
+        try:
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+query_cache = QueryCache(
+    MULTI_QUERY_CACHE_SIZE, MULTI_QUERY_CACHE_TTL, MULTI_QUERY_CACHE_PATH
+)
+_multi_query_chain = None
 
-    try:
-        # Initialize LLM
-        llm = ChatOpenAI(temperature=0, api_key=OPENAI_API_KEY)
 
-        # Create prompt template
+def get_multi_query_chain():
+    """Return the multi-query LLM chain, building it on first use."""
+    global _multi_query_chain
+    if _multi_query_chain is None:
+        llm = ChatOpenAI(temperature=0, api_key=OPENAI_API_KEY)
         query_prompt = PromptTemplate(
             input_variables=["question"],
-            template="""You are an AI language model assistant. Your task is to generate 3 to 5 
-different versions of the given user question to retrieve relevant documents from a vector 
-database. By generating multiple perspectives on the user question, your goal is to help
-the user overcome some of the limitations of the distance-based similarity search. 
-Provide these alternative questions separated by newlines. Do not number them.
-Original question: {question}""",
+            template=MULTI_QUERY_TEMPLATE,
         )
+        _multi_query_chain = query_prompt | llm | LineListOutputParser()
+    return _multi_query_chain
+
+
+async def generate_queries(question: str) -> list[str]:
+    """Generate alternative phrasings of a question with the LLM.
 
-        # Create parser
-        output_parser = LineListOutputParser()
+    Results are served from ``query_cache`` when the question was seen before.
+    """
+    cached = query_cache.get(question)
+    if cached is not None:
+        return cached
 
-        # Create chain
-        chain = query_prompt | llm | output_parser
+    queries = await get_multi_query_chain().ainvoke({"question": question})
+    query_cache.set(question, queries)
+    await query_cache.save()
+    return queries
 
-        # Generate queries
-        queries = await chain.ainvoke({"question": question})
+
+@mcp.tool
+async def multi_query(question: str) -> str:
+    """Generate multiple queries (3-5) for better vector search results from a single user question."""
+    if not OPENAI_API_KEY:
+        return json.dumps({"error": "OpenAI API key not configured"})
+
+    try:
+        queries = await generate_queries(question)
 
         # Return as JSON array
         return json.dumps(queries, ensure_ascii=False)
@@ -386,6 +607,103 @@ Original question: {question}""",
         return json.dumps({"error": f"Failed to generate queries: {e!s}"})
 
 
+def fuse_search_results(result_lists: list[list[dict]], limit: int) -> list[dict]:
+    """Merge several search result lists, deduplicating by chunk id.
+
+    Each chunk keeps its best score and records how many of the queries
+    returned it; ties on score are broken by that hit count. Chunks are
+    keyed on their content too, so results without an id are not merged
+    into one.
+    """
+    fused: dict[tuple, dict] = {}
+    for results in result_lists:
+        for result in results:
+            key = (result.get("id"), result.get("page_content"))
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = {**result, "hits": 1}
+                continue
+            entry["hits"] += 1
+            if result.get("score", 0) > entry.get("score", 0):
+                entry.update(result, hits=entry["hits"])
+
+    ranked = sorted(
+        fused.values(),
+        key=lambda r: (r.get("score", 0), r["hits"]),
+        reverse=True,
+    )
+    return ranked[:limit]
+
+
+@mcp.tool
+async def multi_search(
+    collection_id: str,
+    question: str,
+    limit: int = 10,
+    search_type: str = "hybrid",
+    filter_json: Optional[str] = None,
+) -> str:
+    """Search a collection with several generated variants of a question, fused into one result."""
+    search_data = {"limit": limit, "search_type": search_type}
+
+    if filter_json:
+        try:
+            search_data["filter"] = json.loads(filter_json)
+        except json.JSONDecodeError:
+            return "Error: Invalid JSON in filter parameter"
+
+    queries = [question]
+    if OPENAI_API_KEY:
+        try:
+            queries.extend(await generate_queries(question))
+        except Exception:
+            # Fall back to searching the original question only
+            logger.warning(
+                "Query generation failed; searching the question only.",
+                exc_info=True,
+            )
+    queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+
+    responses = await asyncio.gather(
+        *(
+            client.request(
+                "POST",
+                f"/collections/{collection_id}/documents/search",
+                json={**search_data, "query": query},
+                idempotent=True,
+            )
+            for query in queries
+        ),
+        return_exceptions=True,
+    )
+    errors = [r for r in responses if isinstance(r, BaseException)]
+    if len(errors) == len(responses):
+        raise errors[0]
+    for query, response in zip(queries, responses, strict=True):
+        if isinstance(response, BaseException):
+            logger.warning(
+                "Search for %r failed; dropping it from the results.",
+                query,
+                exc_info=response,
+            )
+
+    results = fuse_search_results(
+        [r for r in responses if not isinstance(r, BaseException)], limit
+    )
+
+    if not results:
+        return "No results found."
+
+    output = f"## Search Results ({search_type})\n\n"
+    output += "Queries: " + "; ".join(queries) + "\n\n"
+    for i, result in enumerate(results, 1):
+        output += f"### Result {i} (Score: {result.get('score', 0):.4f}, Hits: {result['hits']})\n"
+        output += f"{result.get('page_content', '')}\n"
+        output += f"Document ID: {result.get('id', 'Unknown')}\n\n"
+
+    return output
+
+
 @mcp.tool
 async def get_health_status() -> str:
     """Check API health status."""
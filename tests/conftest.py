@@ -34,8 +34,9 @@ def dummy_request(monkeypatch):
 
 
 class DummyResponse:
-    def __init__(self, data):
+    def __init__(self, data, status_code=200):
         self._data = data
+        self.status_code = status_code
 
     def raise_for_status(self):
         pass
@@ -47,6 +48,8 @@ class DummyResponse:
 class DummyAsyncClient:
     def __init__(self, response_data):
         self._response = DummyResponse(response_data)
+        self.is_closed = False
+        self.calls = []
 
     async def __aenter__(self):
         return self
@@ -57,6 +60,13 @@ class DummyAsyncClient:
     async def post(self, *args, **kwargs):
         return self._response
 
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return self._response
+
+    async def aclose(self):
+        self.is_closed = True
+
 
 @pytest.fixture
 def dummy_http_client(monkeypatch):
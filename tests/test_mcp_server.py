@@ -135,11 +135,91 @@ async def test_add_documents_failure(monkeypatch):
 
     dummy = DummyAsyncClient({"success": False, "message": "err msg"})
     monkeypatch.setenv("SUPABASE_JWT_SECRET", "token")
+    monkeypatch.setattr(
+        mcp_mod, "client", mcp_mod.LangConnectClient(mcp_mod.API_BASE_URL, "token")
+    )
     monkeypatch.setattr(mcp_mod.httpx, "AsyncClient", lambda *args, **kwargs: dummy)
     out = await mcp_mod.add_documents("cid", "text")
     assert "Failed to add document: err msg" in out
 
 
+async def test_client_reuses_pooled_connection(monkeypatch):
+    from conftest import DummyAsyncClient
+
+    created = []
+
+    def factory(*args, **kwargs):
+        created.append(DummyAsyncClient({"status": "ok"}))
+        return created[-1]
+
+    monkeypatch.setattr(mcp_mod.httpx, "AsyncClient", factory)
+    api = mcp_mod.LangConnectClient(mcp_mod.API_BASE_URL, "token")
+    for _ in range(3):
+        await api.request("GET", "/health")
+    assert len(created) == 1
+    assert len(created[0].calls) == 3
+
+    await api.aclose()
+    assert created[0].is_closed
+
+
+async def test_client_retries_idempotent_requests(monkeypatch):
+    from conftest import DummyResponse
+
+    attempts = []
+
+    class FlakyClient:
+        is_closed = False
+
+        async def request(self, method, url, **kwargs):
+            attempts.append(method)
+            if len(attempts) < 3:
+                raise mcp_mod.httpx.ConnectError("boom")
+            return DummyResponse({"status": "ok"})
+
+    monkeypatch.setattr(mcp_mod, "HTTP_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(mcp_mod.httpx, "AsyncClient", lambda *a, **kw: FlakyClient())
+    api = mcp_mod.LangConnectClient(mcp_mod.API_BASE_URL, "token")
+    assert await api.request("GET", "/health") == {"status": "ok"}
+    assert attempts == ["GET", "GET", "GET"]
+
+    attempts.clear()
+    with pytest.raises(mcp_mod.httpx.ConnectError):
+        await api.request("POST", "/collections", json={})
+    assert attempts == ["POST"]
+
+
+async def test_client_retries_deletes_only_before_sending(monkeypatch):
+    from conftest import DummyResponse
+
+    attempts = []
+    errors = []
+
+    class FlakyClient:
+        is_closed = False
+
+        async def request(self, method, url, **kwargs):
+            attempts.append(method)
+            if errors:
+                raise errors.pop(0)
+            return DummyResponse({"status": "ok"})
+
+    monkeypatch.setattr(mcp_mod, "HTTP_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(mcp_mod.httpx, "AsyncClient", lambda *a, **kw: FlakyClient())
+    api = mcp_mod.LangConnectClient(mcp_mod.API_BASE_URL, "token")
+
+    errors.append(mcp_mod.httpx.ConnectError("refused"))
+    assert await api.request("DELETE", "/collections/c") == {"status": "ok"}
+    assert attempts == ["DELETE", "DELETE"]
+
+    # The first attempt may have been applied: a retry would answer 404
+    attempts.clear()
+    errors.append(mcp_mod.httpx.ReadError("connection reset"))
+    with pytest.raises(mcp_mod.httpx.ReadError):
+        await api.request("DELETE", "/collections/c")
+    assert attempts == ["DELETE"]
+
+
 async def test_delete_document(monkeypatch):
     async def dummy_request(method, endpoint, **kwargs):
         return {}
@@ -170,3 +250,145 @@ async def test_multi_query_no_key():
     data = json.loads(out)
     assert "error" in data
     monkeypatch.undo()
+
+
+async def test_fuse_search_results_dedups_by_id():
+    fused = mcp_mod.fuse_search_results(
+        [
+            [{"id": "a", "score": 0.4}, {"id": "b", "score": 0.9}],
+            [{"id": "a", "score": 0.7}, {"id": "c", "score": 0.1}],
+        ],
+        limit=2,
+    )
+    assert [r["id"] for r in fused] == ["b", "a"]
+    assert fused[1]["score"] == 0.7
+    assert fused[1]["hits"] == 2
+
+
+async def test_fuse_search_results_keeps_results_without_id_apart():
+    fused = mcp_mod.fuse_search_results(
+        [
+            [{"id": None, "page_content": "x", "score": 0.4}],
+            [
+                {"id": None, "page_content": "y", "score": 0.3},
+                {"id": None, "page_content": "x", "score": 0.6},
+            ],
+        ],
+        limit=5,
+    )
+    assert [(r["page_content"], r["hits"]) for r in fused] == [("x", 2), ("y", 1)]
+
+
+async def test_multi_search_fans_out_and_fuses(monkeypatch):
+    seen = []
+
+    async def dummy_request(method, endpoint, **kwargs):
+        query = kwargs["json"]["query"]
+        seen.append(query)
+        return [
+            {"id": "shared", "page_content": "S", "score": 0.5},
+            {"id": query, "page_content": query, "score": 0.1},
+        ]
+
+    async def dummy_generate(question):
+        return ["variant one", "variant two"]
+
+    monkeypatch.setattr(mcp_mod, "OPENAI_API_KEY", "key")
+    monkeypatch.setattr(mcp_mod, "generate_queries", dummy_generate)
+    monkeypatch.setattr(mcp_mod.client, "request", dummy_request)
+    out = await mcp_mod.multi_search("col", "question")
+    assert sorted(seen) == ["question", "variant one", "variant two"]
+    assert out.count("<id>shared</id>") == 1
+    assert "<hits>3</hits>" in out
+    assert "<query>variant two</query>" in out
+
+
+async def test_multi_search_without_openai_uses_question(monkeypatch):
+    seen = []
+
+    async def dummy_request(method, endpoint, **kwargs):
+        seen.append(kwargs["json"]["query"])
+        return []
+
+    monkeypatch.setattr(mcp_mod.client, "request", dummy_request)
+    out = await mcp_mod.multi_search("col", "question")
+    assert seen == ["question"]
+    assert out == "No results found."
+
+
+async def test_multi_search_logs_failed_queries(monkeypatch, caplog):
+    async def dummy_request(method, endpoint, **kwargs):
+        query = kwargs["json"]["query"]
+        if query == "variant":
+            raise RuntimeError("backend down")
+        return [{"id": "a", "page_content": "A", "score": 0.5}]
+
+    async def dummy_generate(question):
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(mcp_mod, "OPENAI_API_KEY", "key")
+    monkeypatch.setattr(mcp_mod, "generate_queries", dummy_generate)
+    monkeypatch.setattr(mcp_mod.client, "request", dummy_request)
+    out = await mcp_mod.multi_search("col", "question")
+    assert "<id>a</id>" in out
+    assert "Query generation failed" in caplog.text
+
+    async def dummy_generate(question):
+        return ["variant"]
+
+    caplog.clear()
+    monkeypatch.setattr(mcp_mod, "generate_queries", dummy_generate)
+    out = await mcp_mod.multi_search("col", "question")
+    assert "<id>a</id>" in out
+    assert "Search for 'variant' failed" in caplog.text
+    assert "backend down" in caplog.text
+
+
+async def test_query_cache_lru_and_ttl(monkeypatch):
+    cache = mcp_mod.QueryCache(max_size=2, ttl=60)
+    cache.set("a", ["a1"])
+    cache.set("b", ["b1"])
+    assert cache.get("  a ") == ["a1"]
+    cache.set("c", ["c1"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a1"]
+
+    now = mcp_mod.time.time()
+    monkeypatch.setattr(mcp_mod.time, "time", lambda: now + 120)
+    assert cache.get("a") is None
+
+
+async def test_query_cache_persists_to_disk(tmp_path):
+    path = tmp_path / "multi_query.json"
+    cache = mcp_mod.QueryCache(max_size=10, ttl=60, path=str(path))
+    cache.set("question", ["q1", "q2"])
+    await cache.save()
+    reloaded = mcp_mod.QueryCache(max_size=10, ttl=60, path=str(path))
+    assert reloaded.get("question") == ["q1", "q2"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["not json", "[1, 2]", '{"a": 1, "b": [1, 2, 3], "c": ["x", ["q"]]}'],
+)
+async def test_query_cache_ignores_malformed_files(tmp_path, content):
+    path = tmp_path / "multi_query.json"
+    path.write_text(content, encoding="utf-8")
+    cache = mcp_mod.QueryCache(max_size=10, ttl=60, path=str(path))
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+async def test_generate_queries_uses_cache(monkeypatch):
+    calls = []
+
+    class DummyChain:
+        async def ainvoke(self, inputs):
+            calls.append(inputs["question"])
+            return ["v1", "v2"]
+
+    monkeypatch.setattr(mcp_mod, "query_cache", mcp_mod.QueryCache(10, 60))
+    monkeypatch.setattr(mcp_mod, "_multi_query_chain", DummyChain())
+    assert await mcp_mod.generate_queries("same question") == ["v1", "v2"]
+    assert await mcp_mod.generate_queries("same  question") == ["v1", "v2"]
+    assert calls == ["same question"]
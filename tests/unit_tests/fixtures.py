@@ -1,11 +1,27 @@
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from types import ModuleType
 
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
 
 from langconnect import config
-from langconnect.database.connection import get_vectorstore
+from langconnect.database.collections import CollectionsManager
+from langconnect.database.connection import (
+    ADVISORY_LOCK_SQL,
+    ADVISORY_UNLOCK_SQL,
+    get_vectorstore,
+    get_vectorstore_engine,
+)
 from langconnect.server import APP
+from langconnect.services import background
+
+# Tables of CollectionsManager.setup, some referencing the vector store's
+SETUP_TABLES = (
+    "langconnect_embedding_change",
+    "langconnect_collection_version",
+    "langconnect_extracted_text",
+)
 
 
 def reset_db() -> None:
@@ -22,6 +38,8 @@ def reset_db() -> None:
         )
     vectorstore = get_vectorstore()
     # Drop table
+    with get_vectorstore_engine().begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {', '.join(SETUP_TABLES)} CASCADE"))
     vectorstore.drop_tables()
     # Re-create
     vectorstore.__post_init__()
@@ -36,8 +54,42 @@ async def get_async_test_client() -> AsyncGenerator[AsyncClient, None]:
         raise_app_exceptions=True,
     )
     reset_db()
+    # The transport does not run the lifespan, which creates the rest of the schema
+    await CollectionsManager.setup()
     async_client = AsyncClient(base_url=url, transport=transport)
     try:
         yield async_client
     finally:
         await async_client.aclose()
+
+
+class FakeDatabase:
+    """Base of the in-memory databases standing in for a connection.
+
+    Advisory locks are free unless their key is in ``locked``, which another
+    worker holds. Subclasses answer the queries of the code under test.
+    """
+
+    def __init__(self, locked: set[str] = frozenset()) -> None:
+        self.locked = set(locked)
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, query, *args):
+        if query == ADVISORY_LOCK_SQL:
+            return args[0] not in self.locked
+        assert query == ADVISORY_UNLOCK_SQL, query
+        return True
+
+
+def use_database(monkeypatch, db: FakeDatabase, *modules: ModuleType) -> None:
+    """Make background jobs and ``modules`` connect to ``db``."""
+
+    @asynccontextmanager
+    async def get_db_connection():
+        yield db
+
+    for module in (background, *modules):
+        monkeypatch.setattr(module, "get_db_connection", get_db_connection)
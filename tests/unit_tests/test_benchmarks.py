@@ -0,0 +1,49 @@
+"""Tests for the benchmark harness helpers."""
+
+import pytest
+
+from benchmarks.corpus import HashingEmbeddings, SyntheticCorpus
+from benchmarks.harness import Recorder, percentile
+
+
+def test_percentile_interpolates() -> None:
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == pytest.approx(50.5)
+    assert percentile(samples, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_recorder_summarizes_calls() -> None:
+    recorder = Recorder("op", trace_memory=True)
+    with recorder.memory():
+        for _ in range(3):
+            with recorder.call(items=10):
+                _ = [0] * 1000
+    result = recorder.result()
+    assert result.calls == 3
+    assert result.items == 30
+    assert result.peak_memory_bytes is not None
+    assert result.p50_ms <= result.p99_ms
+
+
+def test_corpus_is_deterministic() -> None:
+    first = next(SyntheticCorpus(seed=7).batches(5, batch_size=5))
+    second = next(SyntheticCorpus(seed=7).batches(5, batch_size=5))
+    assert [d.page_content for d in first] == [d.page_content for d in second]
+    assert [d.metadata for d in first] == [d.metadata for d in second]
+    assert SyntheticCorpus(seed=7).queries(3) == SyntheticCorpus(seed=7).queries(3)
+
+
+def test_hashing_embeddings_reflect_word_overlap() -> None:
+    embeddings = HashingEmbeddings(size=256)
+    query = embeddings.embed_query("apple banana cherry")
+    close, far = embeddings.embed_documents(
+        ["apple banana cherry date", "kiwi lemon mango"]
+    )
+
+    def dot(a: list[float], b: list[float]) -> float:
+        return sum(x * y for x, y in zip(a, b, strict=True))
+
+    assert dot(query, close) > dot(query, far)
+    assert embeddings.embed_query("apple") == embeddings.embed_query("apple")
@@ -0,0 +1,94 @@
+"""Tests for set-based bulk deletes of documents."""
+
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from langconnect import config
+from langconnect.database import collections as collections_module
+from langconnect.database import extracted_text
+from langconnect.database.collections import (
+    DELETE_DOCUMENTS_SQL,
+    DELETE_FILES_SQL,
+    LOCK_OWNED_COLLECTION_SQL,
+    Collection,
+)
+
+
+class FakeConnection:
+    """Chunks of one collection, as (id, file_id) pairs."""
+
+    def __init__(self, chunks: list[tuple[str, str]], owned: bool = True) -> None:
+        self.chunks = list(chunks)
+        self.owned = owned
+        self.batches: list[list[str]] = []
+        self.transactions = 0
+        self.texts_deleted: list[str] = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+    async def fetchrow_prepared(self, query, collection_id, user_id):
+        assert query == LOCK_OWNED_COLLECTION_SQL
+        return {"uuid": collection_id} if self.owned else None
+
+    async def fetch_prepared(self, query, collection_id, ids):
+        self.batches.append(ids)
+        if query == DELETE_DOCUMENTS_SQL:
+            deleted = [c for c in self.chunks if c[0] in ids]
+            rows = [{"id": chunk_id} for chunk_id, _ in deleted]
+        else:
+            assert query == DELETE_FILES_SQL
+            deleted = [c for c in self.chunks if c[1] in ids]
+            rows = [{"file_id": file_id} for _, file_id in deleted]
+        self.chunks = [c for c in self.chunks if c not in deleted]
+        return rows
+
+    async def execute(self, query, collection_id, file_ids):
+        assert query == extracted_text.DELETE_SQL
+        self.texts_deleted.extend(file_ids)
+        return f"DELETE {len(file_ids)}"
+
+
+def _use(monkeypatch, conn: FakeConnection) -> None:
+    @asynccontextmanager
+    async def get_db_connection():
+        yield conn
+
+    monkeypatch.setattr(collections_module, "get_db_connection", get_db_connection)
+
+
+async def test_delete_many_reports_per_id_outcome(monkeypatch) -> None:
+    conn = FakeConnection([("a", "f1"), ("b", "f1"), ("c", "f2"), ("d", "f3")])
+    _use(monkeypatch, conn)
+    monkeypatch.setattr(config, "BULK_DELETE_BATCH_SIZE", 2)
+
+    result = await Collection("c1", "user").delete_many(
+        document_ids=["a", "x", "a", "d"], file_ids=["f1", "f9"]
+    )
+
+    assert result == {
+        "deleted_count": 3,
+        "deleted_document_ids": ["a", "d"],
+        "missing_document_ids": ["x"],
+        "deleted_file_ids": ["f1"],
+        "missing_file_ids": ["f9"],
+    }
+    assert conn.chunks == [("c", "f2")]
+    assert conn.batches == [["a", "x"], ["d"], ["f1", "f9"]]
+    assert conn.texts_deleted == ["f1", "f9"]
+    assert conn.transactions == 1
+
+
+async def test_delete_many_raises_for_unowned_collection(monkeypatch) -> None:
+    conn = FakeConnection([("a", "f1")], owned=False)
+    _use(monkeypatch, conn)
+
+    with pytest.raises(HTTPException) as exc:
+        await Collection("c1", "user").delete_many(document_ids=["a"])
+
+    assert exc.value.status_code == 404
+    assert conn.chunks == [("a", "f1")]
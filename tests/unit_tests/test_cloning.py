@@ -0,0 +1,106 @@
+"""Tests for server-side copies of collections."""
+
+import json
+
+from langconnect.services.cloning import (
+    COPY_BATCH_SQL,
+    COPY_TEXT_SQL,
+    FAIL_SQL,
+    FINISH_SQL,
+    PENDING_SQL,
+    PROGRESS_SQL,
+    SOURCE_LIVE_SQL,
+    CollectionCloner,
+    new_job,
+)
+from tests.unit_tests import fixtures
+
+
+class FakeDatabase(fixtures.FakeDatabase):
+    """Chunks of a source collection, with metadata, copied into a clone."""
+
+    def __init__(self, chunks: dict[str, dict], job: dict) -> None:
+        super().__init__()
+        self.source = chunks
+        self.copied: list[str] = []
+        self.clone = {"clone": job}
+        self.statements: list[str] = []
+        # The source is deleted once this many chunks are copied
+        self.deleted_after: int | None = None
+
+    async def fetchval(self, query, *args):
+        if query == SOURCE_LIVE_SQL:
+            return self.deleted_after is None or len(self.copied) < self.deleted_after
+        return await super().fetchval(query, *args)
+
+    async def fetch(self, query, *args):
+        assert query == PENDING_SQL
+        return [{"uuid": "copy", "cmetadata": json.dumps(self.clone)}]
+
+    async def fetchrow(self, query, source_id, clone_id, last_id, filter, limit, **_):
+        assert query == COPY_BATCH_SQL
+        wanted = json.loads(filter) if filter else {}
+        ids = sorted(
+            chunk_id
+            for chunk_id, metadata in self.source.items()
+            if chunk_id > last_id and wanted.items() <= metadata.items()
+        )[:limit]
+        self.copied.extend(ids)
+        return {"last_id": max(ids, default=None), "copied": len(ids)}
+
+    async def execute(self, query, *args, timeout=None):
+        if query == PROGRESS_SQL:
+            _, last_id, copied = args
+            self.clone["clone"].update(last_id=last_id, copied=copied)
+        elif query == FINISH_SQL:
+            self.clone["clone"]["status"] = "done"
+        elif query == FAIL_SQL:
+            self.clone["clone"].update(json.loads(args[1]))
+        self.statements.append(query)
+        return "OK"
+
+
+def _cloner() -> CollectionCloner:
+    return CollectionCloner(batch_size=2, pause=0, interval=60)
+
+
+async def test_clone_copies_matching_chunks_in_batches(monkeypatch) -> None:
+    chunks = {f"c{i}": {"file_id": f"f{i % 2}"} for i in range(6)}
+    job = new_job("source", {"file_id": "f0"})
+    db = FakeDatabase(chunks, job)
+    fixtures.use_database(monkeypatch, db)
+
+    assert await _cloner().clone("copy", job) == 3
+
+    assert db.copied == ["c0", "c2", "c4"]
+    assert db.clone["clone"]["copied"] == 3
+    assert db.clone["clone"]["status"] == "done"
+    assert db.statements[-2:] == [COPY_TEXT_SQL, FINISH_SQL]
+
+
+async def test_background_clone_resumes_after_the_last_copied_id(monkeypatch) -> None:
+    chunks = {f"c{i}": {} for i in range(5)}
+    job = {**new_job("source", None), "last_id": "c1", "copied": 2}
+    db = FakeDatabase(chunks, job)
+    fixtures.use_database(monkeypatch, db)
+
+    assert await _cloner().run_pending() == 3
+
+    assert db.copied == ["c2", "c3", "c4"]
+    assert db.clone["clone"]["copied"] == 5
+    assert db.clone["clone"]["status"] == "done"
+
+
+async def test_clone_fails_when_the_source_is_deleted(monkeypatch) -> None:
+    chunks = {f"c{i}": {} for i in range(6)}
+    job = new_job("source", None)
+    db = FakeDatabase(chunks, job)
+    db.deleted_after = 2
+    fixtures.use_database(monkeypatch, db)
+
+    assert await _cloner().clone("copy", job) == 2
+
+    assert db.copied == ["c0", "c1"]
+    assert db.clone["clone"]["status"] == "failed"
+    assert db.clone["clone"]["copied"] == 2
+    assert FINISH_SQL not in db.statements
@@ -1,3 +1,4 @@
+import json
 from uuid import UUID
 
 from tests.unit_tests.fixtures import get_async_test_client
@@ -368,3 +369,59 @@ async def test_ownership() -> None:
             f"/collections/{collection_id}", headers=USER_1_HEADERS
         )
         assert r5.status_code == 204
+
+
+async def test_clone_collection_with_filter() -> None:
+    """A clone copies the matching chunks with their vectors, under new ids."""
+    async with get_async_test_client() as client:
+        r = await client.post(
+            "/collections", json={"name": "clone_source"}, headers=USER_1_HEADERS
+        )
+        assert r.status_code == 201
+        source_id = r.json()["uuid"]
+        r = await client.post(
+            f"/collections/{source_id}/documents",
+            files=[
+                ("files", ("a.txt", b"Apples are red.", "text/plain")),
+                ("files", ("b.txt", b"Bananas are yellow.", "text/plain")),
+            ],
+            data={"metadatas_json": json.dumps([{"fruit": "a"}, {"fruit": "b"}])},
+            headers=USER_1_HEADERS,
+        )
+        assert r.status_code == 200
+        source_chunk_ids = r.json()["added_chunk_ids"]
+
+        r = await client.post(
+            f"/collections/{source_id}/clone",
+            json={"name": "clone_copy", "filter": {"fruit": "a"}},
+            headers=USER_1_HEADERS,
+        )
+        assert r.status_code == 201
+        copy = r.json()
+        assert copy["name"] == "clone_copy"
+        assert copy["metadata"]["clone"]["status"] == "done"
+        assert copy["metadata"]["clone"]["copied"] == 1
+
+        r = await client.get(
+            f"/collections/{copy['uuid']}/documents", headers=USER_1_HEADERS
+        )
+        assert r.status_code == 200
+        [chunk] = r.json()
+        assert chunk["content"] == "Apples are red."
+        assert chunk["metadata"]["fruit"] == "a"
+        assert chunk["id"] not in source_chunk_ids
+
+        # The copied vectors are searchable without embedding the chunks again
+        r = await client.post(
+            f"/collections/{copy['uuid']}/documents/search",
+            json={"query": "Apples are red.", "limit": 5},
+            headers=USER_1_HEADERS,
+        )
+        assert r.status_code == 200
+        assert [result["id"] for result in r.json()] == [chunk["id"]]
+
+        # The source is left as it was
+        r = await client.get(
+            f"/collections/{source_id}/documents", headers=USER_1_HEADERS
+        )
+        assert len(r.json()) == 2
@@ -0,0 +1,265 @@
+"""Tests for the asyncpg pool configuration and hot prepared statements."""
+
+import asyncio
+
+import asyncpg
+
+from langconnect import config
+from langconnect.database import connection
+from langconnect.database.collections import HOT_QUERIES
+from langconnect.database.connection import Connection
+
+
+class FakeStatement:
+    def __init__(self, query: str, fail: bool = False) -> None:
+        self.query = query
+        self.fail = fail
+        self.calls = 0
+
+    async def fetch(self, *args):
+        self.calls += 1
+        if self.fail:
+            raise asyncpg.InvalidCachedStatementError("cached plan changed")
+        return [args]
+
+    async def fetchrow(self, *args):
+        rows = await self.fetch(*args)
+        return rows[0]
+
+    def get_statusmsg(self) -> str:
+        return "DELETE 3"
+
+
+def _connection(statements: list[FakeStatement]) -> Connection:
+    """Build a connection without a server, preparing ``statements`` in order."""
+    conn = Connection.__new__(Connection)
+    conn._hot_statements = {}
+    conn.prepared_queries = []
+
+    async def prepare(query: str) -> FakeStatement:
+        conn.prepared_queries.append(query)
+        return statements.pop(0)
+
+    conn.prepare = prepare
+    conn.is_in_transaction = lambda: False
+    return conn
+
+
+async def test_hot_statements_are_prepared_once() -> None:
+    """Repeated queries reuse the statement prepared on the connection."""
+    statement = FakeStatement("SELECT $1")
+    conn = _connection([statement])
+
+    assert await conn.fetch_prepared("SELECT $1", 1) == [(1,)]
+    assert await conn.fetchrow_prepared("SELECT $1", 2) == (2,)
+    assert await conn.execute_prepared("SELECT $1", 3) == "DELETE 3"
+    assert conn.prepared_queries == ["SELECT $1"]
+    assert statement.calls == 3
+
+
+async def test_invalidated_statement_is_prepared_again() -> None:
+    """A statement invalidated by a schema change is re-prepared and retried."""
+    stale = FakeStatement("SELECT 1", fail=True)
+    fresh = FakeStatement("SELECT 1")
+    conn = _connection([stale, fresh])
+
+    assert await conn.fetch_prepared("SELECT 1") == [()]
+    assert conn.prepared_queries == ["SELECT 1", "SELECT 1"]
+    assert conn._hot_statements["SELECT 1"] is fresh
+
+
+async def test_statements_are_prepared_again_on_each_checkout() -> None:
+    """Statement objects of a previous checkout are not reused."""
+    first = FakeStatement("SELECT 1")
+    second = FakeStatement("SELECT 1")
+    conn = _connection([first, second])
+    await conn.fetch_prepared("SELECT 1")
+
+    await connection._setup_connection(conn)
+
+    assert await conn.fetch_prepared("SELECT 1") == [()]
+    assert conn.prepared_queries == ["SELECT 1", "SELECT 1"]
+    assert conn._hot_statements["SELECT 1"] is second
+
+
+async def test_pool_uses_configured_settings(monkeypatch) -> None:
+    """The pool is created from ``langconnect.config`` with the init hook."""
+    captured = {}
+
+    async def create_pool(**kwargs):
+        captured.update(kwargs)
+        return object()
+
+    monkeypatch.setattr(connection, "_pool", None)
+    monkeypatch.setattr(connection.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(config, "POSTGRES_POOL_MIN_SIZE", 3)
+    monkeypatch.setattr(config, "POSTGRES_POOL_MAX_SIZE", 7)
+
+    await connection.get_db_pool()
+
+    assert captured["min_size"] == 3
+    assert captured["max_size"] == 7
+    assert captured["statement_cache_size"] == config.POSTGRES_STATEMENT_CACHE_SIZE
+    assert captured["server_settings"] == config.POSTGRES_SERVER_SETTINGS
+    assert captured["connection_class"] is Connection
+    assert captured["init"] is connection._init_connection
+    assert captured["setup"] is connection._setup_connection
+    assert len(set(HOT_QUERIES)) == len(HOT_QUERIES)
+
+
+class SlowPool:
+    def __init__(self) -> None:
+        self.terminated = False
+
+    async def close(self) -> None:
+        await asyncio.sleep(10)
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+async def test_close_db_pool_terminates_after_timeout(monkeypatch) -> None:
+    """Connections still checked out after the drain timeout are terminated."""
+    pool = SlowPool()
+    monkeypatch.setattr(connection, "_pool", pool)
+
+    await connection.close_db_pool(timeout=0.01)
+
+    assert pool.terminated
+    assert connection._pool is None
+
+
+def test_vectorstore_engine_is_shared() -> None:
+    """Vector stores reuse one engine per connection string."""
+    try:
+        engine = connection.get_vectorstore_engine()
+        assert connection.get_vectorstore_engine() is engine
+        assert connection.get_vectorstore_engine(dbname="other") is not engine
+    finally:
+        connection.dispose_vectorstore_engines()
+    assert connection.get_vectorstore_engine() is not engine
+    connection.dispose_vectorstore_engines()
+
+
+def test_replica_vectorstore_does_not_create_its_collection() -> None:
+    """Creating the collection row would be a write on the standby."""
+    from langchain_postgres.vectorstores import PGVector
+
+    store_class = connection._replica_vectorstore_class()
+    store = store_class.__new__(store_class)
+    store.pre_delete_collection = True
+
+    assert issubclass(store_class, PGVector)
+    assert store.create_collection() is None
+
+
+class FakePool:
+    def __init__(self, lag: float = 0.0, fail: bool = False) -> None:
+        self.lag = lag
+        self.fail = fail
+        self.acquired = 0
+        self.released = 0
+
+    async def fetchval(self, query, timeout=None):
+        if self.fail:
+            raise ConnectionRefusedError("replica down")
+        return self.lag
+
+    async def acquire(self):
+        if self.fail:
+            raise ConnectionRefusedError("replica down")
+        self.acquired += 1
+        return object()
+
+    async def release(self, conn) -> None:
+        self.released += 1
+
+
+def _use_pools(monkeypatch, primary: FakePool, replica: FakePool) -> None:
+    async def get_db_pool():
+        return primary
+
+    async def get_replica_pool():
+        return replica
+
+    monkeypatch.setattr(config, "POSTGRES_REPLICA_HOST", "replica")
+    monkeypatch.setattr(connection, "get_db_pool", get_db_pool)
+    monkeypatch.setattr(connection, "get_replica_pool", get_replica_pool)
+    monkeypatch.setattr(
+        connection,
+        "replica_monitor",
+        connection.ReplicaMonitor(max_lag=5, interval=60),
+    )
+    monkeypatch.setattr(connection, "_recent_writes", {})
+
+
+async def test_reads_use_replica_unless_lagging(monkeypatch) -> None:
+    """The replica serves reads only while its replay lag is acceptable."""
+    replica = FakePool(lag=1.0)
+    _use_pools(monkeypatch, FakePool(), replica)
+    assert await connection.use_replica("user")
+
+    lagging = FakePool(lag=30.0)
+    _use_pools(monkeypatch, FakePool(), lagging)
+    assert not await connection.use_replica("user")
+    assert connection.replica_monitor.lag == 30.0
+
+
+async def test_reads_stay_on_primary_after_own_writes(monkeypatch) -> None:
+    """A user's reads go to the primary right after that user wrote."""
+    _use_pools(monkeypatch, FakePool(), FakePool(lag=0.0))
+    connection.note_write("writer")
+
+    assert not await connection.use_replica("writer")
+    assert await connection.use_replica("reader")
+
+
+async def test_unreachable_replica_falls_back_to_primary(monkeypatch) -> None:
+    """Acquiring from a dead replica falls back to the primary pool."""
+    primary = FakePool()
+    _use_pools(monkeypatch, primary, FakePool(fail=True))
+    connection.replica_monitor.usable = True
+
+    async with connection.get_db_connection(replica=True):
+        pass
+
+    assert primary.acquired == primary.released == 1
+    assert not connection.replica_monitor.usable
+
+
+async def test_replica_not_used_when_not_configured(monkeypatch) -> None:
+    """Without a replica host every read goes to the primary."""
+    monkeypatch.setattr(config, "POSTGRES_REPLICA_HOST", "")
+    assert not await connection.use_replica("user")
+
+
+class LockConnection:
+    """Answers ``pg_try_advisory_lock`` with ``free``, one attempt at a time."""
+
+    def __init__(self, free: list[bool]) -> None:
+        self.free = free
+        self.queries: list[str] = []
+
+    async def fetchval(self, query: str, key: str) -> bool:
+        self.queries.append(query.split("(")[0].split()[-1])
+        return self.free.pop(0) if "try" in query else True
+
+
+async def test_advisory_lock_polls_instead_of_blocking() -> None:
+    conn = LockConnection([False, False, True])
+
+    async with connection.advisory_lock(
+        conn, "k", timeout=None, poll_interval=0
+    ) as locked:
+        assert locked
+
+    assert conn.queries == ["pg_try_advisory_lock"] * 3 + ["pg_advisory_unlock"]
+
+
+async def test_advisory_lock_gives_up_after_timeout() -> None:
+    conn = LockConnection([False, False])
+
+    async with connection.advisory_lock(conn, "k") as locked:
+        assert not locked
+
+    assert conn.queries == ["pg_try_advisory_lock"]
@@ -0,0 +1,43 @@
+"""Tests for MMR and near-duplicate collapse."""
+
+import numpy as np
+
+from langconnect.services.diversity import collapse_by_key, collapse_similar, mmr
+
+
+def test_mmr_prefers_a_distinct_second_result() -> None:
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = np.array(
+        [
+            [1.0, 0.1, 0.0],  # most relevant
+            [1.0, 0.12, 0.0],  # near copy of the first
+            [0.8, 0.0, 0.6],  # less relevant but different
+        ]
+    )
+
+    assert mmr(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr(query, candidates, k=10) == [0, 2, 1]
+    assert mmr(query, np.empty((0, 3)), k=2) == []
+
+
+def test_collapse_similar_keeps_the_best_ranked_copy() -> None:
+    candidates = np.array(
+        [
+            [0.0, 1.0],
+            [1.0, 0.0],
+            [0.01, 1.0],  # duplicate of 0
+            [1.0, 0.02],  # duplicate of 1
+            [0.0, 0.0],  # zero vector is never a duplicate
+        ]
+    )
+
+    assert collapse_similar(candidates, threshold=0.99) == [0, 1, 4]
+    assert collapse_similar(candidates, threshold=1.01) == [0, 1, 2, 3, 4]
+
+
+def test_collapse_by_key_limits_chunks_per_file() -> None:
+    keys = ["a", "a", None, "b", "a", None, "b"]
+
+    assert collapse_by_key(keys) == [0, 2, 3, 5]
+    assert collapse_by_key(keys, max_per_key=2) == [0, 1, 2, 3, 5, 6]
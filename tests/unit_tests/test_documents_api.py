@@ -1,6 +1,9 @@
 import json
 from uuid import UUID
 
+import pytest
+
+from langconnect.database.connection import get_db_connection
 from tests.unit_tests.fixtures import (
     get_async_test_client,
 )
@@ -546,3 +549,291 @@ async def test_documents_bulk_delete() -> None:
         list_resp_after_file_delete = await client.get(f"/collections/{collection_id}/documents", headers=USER_1_HEADERS)
         assert list_resp_after_file_delete.json() == []
 
+
+async def _create_collection_with_files(
+    client, name: str, files: list, vector_storage: dict | None = None
+) -> str:
+    """Create a collection owned by user 1 and upload ``(text, metadata)`` files."""
+    response = await client.post(
+        "/collections",
+        json={"name": name, "metadata": {}, "vector_storage": vector_storage},
+        headers=USER_1_HEADERS,
+    )
+    assert response.status_code == 201
+    collection_id = response.json()["uuid"]
+    response = await client.post(
+        f"/collections/{collection_id}/documents",
+        files=[
+            ("files", (f"file{i}.txt", text.encode(), "text/plain"))
+            for i, (text, _) in enumerate(files)
+        ],
+        data={
+            "metadatas_json": json.dumps([metadata for _, metadata in files]),
+            "chunk_size": "60",
+            "chunk_overlap": "0",
+        },
+        headers=USER_1_HEADERS,
+    )
+    assert response.status_code == 200
+    return collection_id
+
+
+async def _list_chunks(client, collection_id: str) -> dict[str, tuple]:
+    response = await client.get(
+        f"/collections/{collection_id}/documents",
+        params={"limit": 100},
+        headers=USER_1_HEADERS,
+    )
+    assert response.status_code == 200
+    return {doc["id"]: (doc["content"], doc["metadata"]) for doc in response.json()}
+
+
+# Two paragraphs, split into two chunks by _create_collection_with_files
+CATS_AND_DOGS = "Cats purr when they are warm and content.\n\nDogs bark at strangers."
+
+
+async def test_documents_keyword_and_hybrid_search() -> None:
+    """Keyword search matches words; hybrid search fuses it with the vectors."""
+    async with get_async_test_client() as client:
+        collection_id = await _create_collection_with_files(
+            client,
+            "keyword_search",
+            [(CATS_AND_DOGS, {})],
+        )
+        chunks = await _list_chunks(client, collection_id)
+        assert len(chunks) == 2
+
+        response = await client.post(
+            f"/collections/{collection_id}/documents/search",
+            json={"query": "strangers", "limit": 5, "search_type": "keyword"},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 200
+        [result] = response.json()
+        assert result["page_content"] == "Dogs bark at strangers."
+        assert result["score"] > 0
+
+        response = await client.post(
+            f"/collections/{collection_id}/documents/search",
+            json={"query": "strangers", "limit": 5, "search_type": "hybrid"},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert {result["id"] for result in results} == set(chunks)
+        # The keyword match adds its weight to the semantic score
+        dogs = next(r for r in results if r["page_content"].startswith("Dogs"))
+        assert dogs["score"] >= 0.3
+
+
+@pytest.mark.parametrize(
+    "vector_storage",
+    [
+        {"type": "vector"},
+        {"type": "halfvec"},
+        {"type": "binary"},
+        {"type": "matryoshka", "truncate_to": 256},
+    ],
+)
+async def test_documents_search_with_vector_storage(vector_storage: dict) -> None:
+    """Collections with a storage option search their own index."""
+    async with get_async_test_client() as client:
+        collection_id = await _create_collection_with_files(
+            client,
+            "storage_search",
+            [(CATS_AND_DOGS, {})],
+            vector_storage=vector_storage,
+        )
+        chunks = await _list_chunks(client, collection_id)
+        for search_type in ("semantic", "hybrid"):
+            response = await client.post(
+                f"/collections/{collection_id}/documents/search",
+                json={
+                    "query": "Dogs bark at strangers.",
+                    "limit": 2,
+                    "search_type": search_type,
+                },
+                headers=USER_1_HEADERS,
+            )
+            assert response.status_code == 200
+            results = response.json()
+            assert {result["id"] for result in results} == set(chunks)
+            if search_type == "semantic":
+                # Scores are cosine distances: the same text comes first
+                assert results[0]["page_content"] == "Dogs bark at strangers."
+
+
+async def test_documents_search_reads_shadow_vectors_after_a_flip() -> None:
+    """Searches of a flipped migration prefer the vectors of the new model."""
+    async with get_async_test_client() as client:
+        collection_id = await _create_collection_with_files(
+            client,
+            "flipped_search",
+            [(CATS_AND_DOGS, {})],
+        )
+        chunks = await _list_chunks(client, collection_id)
+        cats, dogs = sorted(chunks, key=lambda chunk_id: chunks[chunk_id][0])
+        # Copy-back in progress: the cats chunk still has a shadow vector,
+        # here the one of the dogs chunk
+        async with get_db_connection() as conn:
+            await conn.execute(
+                """
+                UPDATE langchain_pg_collection
+                   SET cmetadata = cmetadata::jsonb || jsonb_build_object(
+                         'embedding_migration',
+                         jsonb_build_object(
+                           'model', 'text-embedding-3-small',
+                           'flipped_at', '2026-01-01T00:00:00+00:00'
+                         )
+                       )
+                 WHERE uuid = $1
+                """,
+                UUID(collection_id),
+            )
+            await conn.execute(
+                """
+                UPDATE langchain_pg_embedding AS e
+                   SET embedding_shadow = d.embedding
+                  FROM langchain_pg_embedding AS d
+                 WHERE e.id = $1 AND d.id = $2
+                """,
+                cats,
+                dogs,
+            )
+
+        response = await client.post(
+            f"/collections/{collection_id}/documents/search",
+            json={"query": "Dogs bark at strangers.", "limit": 2},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert {result["id"] for result in results} == {cats, dogs}
+        assert all(result["score"] == pytest.approx(0, abs=1e-6) for result in results)
+
+
+async def test_documents_export_and_import_round_trip() -> None:
+    """An export loads back into its collection with ids, metadata and vectors."""
+    pa = pytest.importorskip("pyarrow")
+    async with get_async_test_client() as client:
+        collection_id = await _create_collection_with_files(
+            client,
+            "export_source",
+            [(CATS_AND_DOGS, {})],
+        )
+        chunks = await _list_chunks(client, collection_id)
+        assert len(chunks) == 2
+
+        export = await client.get(
+            f"/collections/{collection_id}/export",
+            params={"format": "parquet"},
+            headers=USER_1_HEADERS,
+        )
+        assert export.status_code == 200
+        file_id = next(iter(chunks.values()))[1]["file_id"]
+        response = await client.delete(
+            f"/collections/{collection_id}/documents/{file_id}",
+            params={"delete_by": "file_id"},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 200
+        assert await _list_chunks(client, collection_id) == {}
+
+        # Imported twice: the second import replaces the chunks
+        for _ in range(2):
+            response = await client.post(
+                f"/collections/{collection_id}/import",
+                files={"file": ("export.parquet", export.content)},
+                headers=USER_1_HEADERS,
+            )
+            assert response.status_code == 200
+            assert response.json() == {"chunks_read": 2, "chunks_imported": 2}
+        assert await _list_chunks(client, collection_id) == chunks
+
+        search = await client.post(
+            f"/collections/{collection_id}/documents/search",
+            json={"query": "Dogs bark at strangers.", "limit": 1},
+            headers=USER_1_HEADERS,
+        )
+        assert search.status_code == 200
+        assert search.json()[0]["page_content"] == "Dogs bark at strangers."
+
+        # Chunk ids belong to their collection, in a partitioned table too:
+        # another one skips them
+        other_id = await _create_collection_with_files(
+            client, "export_target", [("Birds sing.", {})]
+        )
+        response = await client.post(
+            f"/collections/{other_id}/import",
+            files={"file": ("export.parquet", export.content)},
+            headers=USER_1_HEADERS,
+        )
+        assert response.json() == {"chunks_read": 2, "chunks_imported": 0}
+
+        # Vectors of other dimensions are refused, and nothing is imported
+        schema = pa.schema(
+            [
+                ("id", pa.string()),
+                ("document", pa.string()),
+                ("metadata", pa.string()),
+                ("embedding", pa.list_(pa.float32())),
+            ],
+            metadata={"embedding_model": "text-embedding-3-small"},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(
+                pa.record_batch(
+                    [["new"], ["Fish swim."], ["{}"], [[0.5, 0.5]]], schema=schema
+                )
+            )
+        response = await client.post(
+            f"/collections/{collection_id}/import",
+            files={"file": ("other.arrows", sink.getvalue().to_pybytes())},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 400
+        assert "dimensions" in response.json()["detail"]
+        assert await _list_chunks(client, collection_id) == chunks
+
+
+async def test_documents_rechunk_keeps_unchanged_chunks() -> None:
+    """Re-chunking only replaces the chunks whose text changed."""
+    # Paragraphs of 50 characters stay chunks of their own at both sizes
+    text = (
+        "Short paragraph one, fifty characters long or so.\n\n"
+        "Short paragraph two, fifty characters long or so.\n\n"
+        "A longer paragraph that is split at sixty characters, "
+        "but kept whole at ninety."
+    )
+    async with get_async_test_client() as client:
+        collection_id = await _create_collection_with_files(
+            client, "rechunk_test", [(text, {"kind": "notes"})]
+        )
+        before = await _list_chunks(client, collection_id)
+        assert len(before) == 4
+
+        response = await client.post(
+            f"/collections/{collection_id}/rechunk",
+            json={"chunk_size": 90, "chunk_overlap": 0},
+            headers=USER_1_HEADERS,
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["files"] == 1
+        assert result["chunks_kept"] == 2
+        assert result["chunks_added"] == 1
+        assert result["chunks_deleted"] == 2
+
+        after = await _list_chunks(client, collection_id)
+        kept = {
+            chunk_id: chunk
+            for chunk_id, chunk in before.items()
+            if chunk[0].startswith("Short")
+        }
+        assert {chunk_id: after[chunk_id] for chunk_id in kept} == kept
+        [(content, metadata)] = [
+            chunk for chunk_id, chunk in after.items() if chunk_id not in kept
+        ]
+        assert content.startswith("A longer paragraph")
+        assert metadata["kind"] == "notes"
@@ -0,0 +1,283 @@
+"""Tests for online migrations of collections to another embedding model."""
+
+import json
+from contextlib import asynccontextmanager
+
+from langconnect import config
+from langconnect.services import embedding_migration as migration_module
+from langconnect.services.embedding_migration import (
+    BATCH_SQL,
+    BUMP_VERSION_SQL,
+    CANCEL_SQL,
+    COPY_BACK_BATCH_SQL,
+    FINISH_SQL,
+    FLIP_SQL,
+    LOCK_SHARE_SQL,
+    LOCK_UPDATE_SQL,
+    PENDING_SQL,
+    PROGRESS_SQL,
+    REMAINING_SQL,
+    SHADOW_BATCH_SQL,
+    SKIP_CHANGE_LOG_SQL,
+    STATE_SQL,
+    WRITE_EMBEDDING_SQL,
+    WRITE_FLIPPED_SQL,
+    WRITE_SHADOW_SQL,
+    EmbeddingMigrator,
+    dual_write,
+    model_of,
+    vector_literal,
+)
+from tests.unit_tests import fixtures
+
+
+class FakeEmbeddings:
+    """Embeds a text as its length and the model's number."""
+
+    def __init__(self, model: str, calls: list) -> None:
+        self.number = float(model.rsplit("-", 1)[-1])
+        self.calls = calls
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return [[float(len(text)), self.number] for text in texts]
+
+
+class FakeDatabase(fixtures.FakeDatabase):
+    """One collection with its chunks, vectors kept as their text form."""
+
+    def __init__(self, texts: dict[str, str], metadata: dict) -> None:
+        super().__init__()
+        self.metadata = metadata
+        self.chunks = {
+            chunk_id: {"document": text, "embedding": "old", "shadow": None}
+            for chunk_id, text in texts.items()
+        }
+        self.progress: list[int] = []
+        # Chunks of each copy-back batch, and the metadata at the time
+        self.copied: list[tuple[list[str], dict]] = []
+        # Chunk writes left out of the change log of snapshots, and the
+        # writes logged
+        self.unlogged: list[str] = []
+        self.logged: list[str] = []
+        self.versions = 0
+        self.skip_change_log = False
+
+    @asynccontextmanager
+    async def transaction(self):
+        try:
+            yield
+        finally:
+            self.skip_change_log = False
+
+    def _write(self, query: str) -> None:
+        (self.unlogged if self.skip_change_log else self.logged).append(query)
+
+    async def fetch(self, query, *args):
+        if query == PENDING_SQL:
+            return [{"uuid": "c", "cmetadata": json.dumps(self.metadata)}]
+        assert query == BATCH_SQL
+        _, last_id, limit = args
+        ids = sorted(
+            chunk_id
+            for chunk_id, chunk in self.chunks.items()
+            if chunk_id > last_id and chunk["shadow"] is None
+        )
+        return [
+            {"id": chunk_id, "document": self.chunks[chunk_id]["document"]}
+            for chunk_id in ids[:limit]
+        ]
+
+    async def fetchval(self, query, *args):
+        if query in (STATE_SQL, LOCK_SHARE_SQL, LOCK_UPDATE_SQL):
+            return json.dumps(self.metadata)
+        if query == REMAINING_SQL:
+            return sum(chunk["shadow"] is None for chunk in self.chunks.values())
+        return await super().fetchval(query, *args)
+
+    async def fetchrow(self, query, *args):
+        assert query == COPY_BACK_BATCH_SQL
+        self._write(query)
+        _, last_id, limit = args
+        ids = sorted(
+            chunk_id
+            for chunk_id, chunk in self.chunks.items()
+            if chunk_id > last_id and chunk["shadow"] is not None
+        )[:limit]
+        for chunk_id in ids:
+            chunk = self.chunks[chunk_id]
+            chunk["embedding"], chunk["shadow"] = chunk["shadow"], None
+        self.copied.append((ids, json.loads(json.dumps(self.metadata))))
+        return {"last_id": max(ids, default=None), "copied": len(ids)}
+
+    async def execute(self, query, *args, timeout=None):
+        if query == SKIP_CHANGE_LOG_SQL:
+            self.skip_change_log = True
+            return "SET"
+        writes = (SHADOW_BATCH_SQL, WRITE_EMBEDDING_SQL, WRITE_SHADOW_SQL)
+        if query in (*writes, WRITE_FLIPPED_SQL):
+            self._write(query)
+        if query == SHADOW_BATCH_SQL:
+            _, ids, texts, vectors = args
+            count = 0
+            for chunk_id, text, vector in zip(ids, texts, vectors):
+                if self.chunks[chunk_id]["document"] == text:
+                    self.chunks[chunk_id]["shadow"] = vector
+                    count += 1
+            return f"UPDATE {count}"
+        if query in (WRITE_EMBEDDING_SQL, WRITE_SHADOW_SQL, WRITE_FLIPPED_SQL):
+            column = "shadow" if query == WRITE_SHADOW_SQL else "embedding"
+            _, ids, vectors = args
+            for chunk_id, vector in zip(ids, vectors):
+                self.chunks[chunk_id][column] = vector
+                if query == WRITE_FLIPPED_SQL:
+                    self.chunks[chunk_id]["shadow"] = None
+        elif query == PROGRESS_SQL:
+            self.progress.append(args[1])
+        elif query == FLIP_SQL:
+            self.metadata["embedding_model"] = args[1]
+            self.metadata["embedding_migration"]["flipped_at"] = args[2]
+        elif query == BUMP_VERSION_SQL:
+            self.versions += 1
+        elif query == FINISH_SQL:
+            del self.metadata["embedding_migration"]
+        elif query == CANCEL_SQL:
+            migration = self.metadata.get("embedding_migration")
+            if migration is None or "flipped_at" in migration:
+                return "UPDATE 0"
+            del self.metadata["embedding_migration"]
+        else:
+            raise AssertionError(query)
+        return "UPDATE 1"
+
+
+def _use(monkeypatch, db: FakeDatabase) -> list:
+    fixtures.use_database(monkeypatch, db, migration_module)
+    calls = []
+    monkeypatch.setattr(
+        config, "get_model_embeddings", lambda model: FakeEmbeddings(model, calls)
+    )
+    return calls
+
+
+def _migrating(model: str = "model-2") -> dict:
+    return {
+        "embedding_model": "model-1",
+        "embedding_migration": {"model": model, "backfilled": 0},
+    }
+
+
+def _migrator() -> EmbeddingMigrator:
+    return EmbeddingMigrator(batch_size=2, pause=0, interval=60)
+
+
+def test_model_of_defaults_to_the_legacy_model() -> None:
+    assert model_of({}) == config.LEGACY_EMBEDDING_MODEL
+    assert model_of({"embedding_model": "model-3"}) == "model-3"
+    assert vector_literal([1.0, 0.5]) == "[1.0,0.5]"
+
+
+async def test_migrator_backfills_flips_then_copies_back(monkeypatch) -> None:
+    db = FakeDatabase({"a": "x", "b": "yy", "c": "zzz"}, _migrating())
+    calls = _use(monkeypatch, db)
+
+    assert await _migrator().run_pending() == 1
+
+    assert calls == [2, 1]
+    assert db.progress == [2, 3]
+    # Copied back in batches once searches moved to the new model
+    assert [ids for ids, _ in db.copied] == [["a", "b"], ["c"], []]
+    _, metadata = db.copied[0]
+    assert metadata["embedding_model"] == "model-2"
+    assert metadata["embedding_migration"]["flipped_at"]
+    assert db.metadata == {"embedding_model": "model-2"}
+    assert {chunk_id: c["embedding"] for chunk_id, c in db.chunks.items()} == {
+        "a": "[1.0,2.0]",
+        "b": "[2.0,2.0]",
+        "c": "[3.0,2.0]",
+    }
+    assert all(chunk["shadow"] is None for chunk in db.chunks.values())
+    # Searched vectors change only with the flip, which rebuilds snapshots
+    assert db.logged == []
+    assert set(db.unlogged) == {SHADOW_BATCH_SQL, COPY_BACK_BATCH_SQL}
+    assert db.versions == 1
+
+
+async def test_migrator_catches_chunks_added_behind_the_pass(monkeypatch) -> None:
+    """Chunks still without a shadow vector at the flip get another pass."""
+    db = FakeDatabase({"b": "yy", "c": "zzz"}, _migrating())
+    calls = _use(monkeypatch, db)
+    original = db.execute
+
+    async def execute(query, *args, timeout=None):
+        if query == SHADOW_BATCH_SQL and "a" not in db.chunks:
+            db.chunks["a"] = {"document": "x", "embedding": "old", "shadow": None}
+        return await original(query, *args, timeout=timeout)
+
+    db.execute = execute
+
+    assert await _migrator().run_pending() == 1
+
+    assert calls == [2, 1]
+    assert db.chunks["a"]["embedding"] == "[1.0,2.0]"
+    assert db.metadata["embedding_model"] == "model-2"
+
+
+async def test_cancelled_migration_stops_without_flipping(monkeypatch) -> None:
+    db = FakeDatabase({"a": "x", "b": "yy", "c": "zzz"}, _migrating())
+    _use(monkeypatch, db)
+    original = db.execute
+
+    async def execute(query, *args, timeout=None):
+        if query == PROGRESS_SQL:
+            db.metadata.pop("embedding_migration")
+        return await original(query, *args, timeout=timeout)
+
+    db.execute = execute
+
+    assert await _migrator().run_pending() == 0
+
+    assert db.metadata == {"embedding_model": "model-1"}
+    assert db.chunks["c"]["shadow"] is None
+    assert all(chunk["embedding"] == "old" for chunk in db.chunks.values())
+
+
+async def test_dual_write_fills_shadow_vectors_during_a_migration(monkeypatch) -> None:
+    db = FakeDatabase({"a": "x"}, _migrating())
+    _use(monkeypatch, db)
+
+    await dual_write("c", ["a"], ["x"], "model-1", [[1.0, 1.0]])
+
+    assert db.chunks["a"]["embedding"] == "old"
+    assert db.chunks["a"]["shadow"] == "[1.0,2.0]"
+    assert db.unlogged == [WRITE_SHADOW_SQL]
+
+
+async def test_dual_write_re_embeds_chunks_after_a_migration(monkeypatch) -> None:
+    db = FakeDatabase({"a": "x"}, {"embedding_model": "model-2"})
+    calls = _use(monkeypatch, db)
+
+    await dual_write("c", ["a"], ["x"], "model-2", [[1.0, 2.0]])
+    assert calls == []
+
+    await dual_write("c", ["a"], ["x"], "model-1", [[1.0, 1.0]])
+    assert db.chunks["a"]["embedding"] == "[1.0,2.0]"
+    assert db.chunks["a"]["shadow"] is None
+
+
+async def test_dual_write_clears_shadow_vectors_after_the_flip(monkeypatch) -> None:
+    """A copy-back batch may have copied a stale shadow vector over the chunk."""
+    metadata = _migrating()
+    metadata["embedding_model"] = "model-2"
+    metadata["embedding_migration"]["flipped_at"] = "2026-01-01T00:00:00+00:00"
+    db = FakeDatabase({"a": "x"}, metadata)
+    db.chunks["a"]["shadow"] = "stale"
+    calls = _use(monkeypatch, db)
+
+    await dual_write("c", ["a"], ["x"], "model-2", [[1.0, 2.0]])
+
+    assert calls == []
+    assert db.chunks["a"] == {"document": "x", "embedding": "[1.0,2.0]", "shadow": None}
+    assert db.logged == [WRITE_FLIPPED_SQL]
+    assert not await migration_module.cancel(db, "c", "user")
+    assert "embedding_migration" in db.metadata
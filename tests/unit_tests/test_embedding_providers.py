@@ -0,0 +1,149 @@
+"""Tests for the embedding provider registry and local ONNX embeddings."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from langconnect.services import embedding_providers
+from langconnect.services.embedding_providers import (
+    create_embeddings,
+    register_provider,
+    split_model,
+)
+from langconnect.services.onnx_embeddings import OnnxEmbeddings
+
+# Token embeddings of the fake model, one per token id
+TABLE = np.random.default_rng(3).normal(size=(20, 4)).astype(np.float32)
+
+
+class FakeTokenizer:
+    """Maps each word to a token id, padding batches to their longest text."""
+
+    def encode_batch(self, texts):
+        ids = [[len(word) for word in text.split()] for text in texts]
+        length = max(len(row) for row in ids)
+        return [
+            SimpleNamespace(
+                ids=row + [0] * (length - len(row)),
+                attention_mask=[1] * len(row) + [0] * (length - len(row)),
+                type_ids=[0] * length,
+            )
+            for row in ids
+        ]
+
+
+class FakeSession:
+    """Returns token embeddings, recording the size of every batch."""
+
+    def __init__(self):
+        self.batches: list[int] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in ("input_ids", "attention_mask")]
+
+    def run(self, outputs, feeds):
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        self.release.wait()
+        self.batches.append(len(feeds["input_ids"]))
+        return [TABLE[feeds["input_ids"]]]
+
+
+def _expected(text: str) -> np.ndarray:
+    vector = TABLE[[len(word) for word in text.split()]].mean(axis=0)
+    return vector / np.linalg.norm(vector)
+
+
+def _embeddings(**kwargs) -> OnnxEmbeddings:
+    return OnnxEmbeddings(
+        "fake", session=FakeSession(), tokenizer=FakeTokenizer(), **kwargs
+    )
+
+
+def test_split_model() -> None:
+    model = "text-embedding-3-small"
+    assert split_model(model) == ("openai", model)
+    assert split_model("onnx:org/model") == ("onnx", "org/model")
+    with pytest.raises(ValueError, match="Unknown embedding provider"):
+        split_model("nope:model")
+
+
+def test_register_provider(monkeypatch) -> None:
+    providers = dict(embedding_providers._providers)
+    monkeypatch.setattr(embedding_providers, "_providers", providers)
+    register_provider("fake", lambda name: ("fake", name))
+
+    assert create_embeddings("fake:small") == ("fake", "small")
+
+
+def test_embed_documents_keeps_order_and_normalizes() -> None:
+    embeddings = _embeddings(max_batch_size=2, workers=2)
+    texts = ["a bb ccc", "dddd", "ee f", "g hh iii jjjj", "kkkkk"]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert embeddings._session.batches == [2, 2, 1]
+    for text, vector in zip(texts, vectors, strict=True):
+        assert vector == pytest.approx(_expected(text).tolist(), abs=1e-6)
+    assert embeddings.embed_query("dddd") == pytest.approx(vectors[1], abs=1e-6)
+
+
+def test_cls_pooling_and_validation() -> None:
+    embeddings = _embeddings(pooling="cls", workers=1)
+    vector = embeddings.embed_documents(["ccc dddd"])[0]
+
+    assert vector == pytest.approx((TABLE[3] / np.linalg.norm(TABLE[3])).tolist())
+    with pytest.raises(ValueError, match="pooling"):
+        _embeddings(pooling="max")
+
+
+async def test_concurrent_queries_share_batches() -> None:
+    embeddings = _embeddings(max_batch_size=8, batch_wait=0.001, workers=1)
+    session = embeddings._session
+    texts = [f"{'x' * (i % 5 + 1)} yy" for i in range(20)]
+
+    # The only thread is busy, so the other queries queue up meanwhile
+    session.release.clear()
+    first = asyncio.ensure_future(embeddings.aembed_query("warm"))
+    await asyncio.sleep(0.01)
+    rest = [asyncio.ensure_future(embeddings.aembed_query(t)) for t in texts]
+    await asyncio.sleep(0.01)
+    session.release.set()
+    await first
+    vectors = await asyncio.gather(*rest)
+
+    assert session.batches == [1, 8, 8, 4]
+    for text, vector in zip(texts, vectors, strict=True):
+        assert vector == pytest.approx(_expected(text).tolist(), abs=1e-6)
+
+
+async def test_queries_queue_while_the_model_loads(monkeypatch) -> None:
+    embeddings = _embeddings()
+    session, embeddings._session = embeddings._session, None
+    loaded = threading.Event()
+
+    def load_session():
+        loaded.wait()
+        return session
+
+    monkeypatch.setattr(embeddings, "_load_session", load_session)
+    warm_up = threading.Thread(target=embeddings.warm_up)
+    warm_up.start()
+    while not embeddings._load_lock.locked():
+        await asyncio.sleep(0.001)
+
+    # Submitting does not wait for the load, which would block the event loop
+    try:
+        future = await asyncio.wait_for(
+            asyncio.to_thread(embeddings._submit, "x yy"), 1
+        )
+        assert not future.done()
+    finally:
+        loaded.set()
+    vector = await asyncio.wrap_future(future)
+    assert vector == pytest.approx(_expected("x yy").tolist(), abs=1e-6)
+    warm_up.join()
@@ -0,0 +1,59 @@
+"""Tests for stored extracted text and re-chunking."""
+
+from langchain_core.documents import Document
+
+from langconnect.database.collections import diff_chunks
+from langconnect.database.extracted_text import decode, encode, store
+
+
+def test_encode_round_trips_documents() -> None:
+    documents = [
+        Document(page_content="page one " * 100, metadata={"page": 1, "file_id": "f"}),
+        Document(page_content="página dos", metadata={"page": 2, "file_id": "f"}),
+    ]
+
+    data = encode(documents)
+
+    assert len(data) < len(documents[0].page_content)
+    assert decode(data) == documents
+
+
+async def test_store_groups_documents_by_file() -> None:
+    class Connection:
+        async def executemany(self, query, args):
+            self.args = args
+
+    conn = Connection()
+    documents = [
+        Document(page_content="a", metadata={"file_id": "f1"}),
+        Document(page_content="b", metadata={"file_id": "f2"}),
+        Document(page_content="c", metadata={"file_id": "f1"}),
+        Document(page_content="d", metadata={}),
+    ]
+
+    assert await store(conn, "c1", documents) == 2
+
+    stored = {file_id: decode(data) for _, file_id, data in conn.args}
+    assert [doc.page_content for doc in stored["f1"]] == ["a", "c"]
+    assert [doc.page_content for doc in stored["f2"]] == ["b"]
+
+
+def test_diff_chunks_keeps_unchanged_chunks() -> None:
+    metadata = {"file_id": "f", "page": 1}
+    existing = [
+        ("1", "alpha", metadata),
+        ("2", "beta", metadata),
+        ("3", "beta", metadata),
+        ("4", "gamma", {"file_id": "f", "page": 2}),
+    ]
+    chunks = [
+        Document(page_content="alpha", metadata={"page": 1, "file_id": "f"}),
+        Document(page_content="beta", metadata=metadata),
+        Document(page_content="gamma", metadata=metadata),
+        Document(page_content="delta", metadata=metadata),
+    ]
+
+    added, stale = diff_chunks(existing, chunks)
+
+    assert [chunk.page_content for chunk in added] == ["gamma", "delta"]
+    assert sorted(stale) == ["2", "4"]
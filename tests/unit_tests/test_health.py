@@ -0,0 +1,128 @@
+"""Tests for the deep health check."""
+
+from httpx import ASGITransport, AsyncClient
+from langchain_core.embeddings import Embeddings
+
+from langconnect import config
+from langconnect.services import health
+from langconnect.services.health import EmbeddingProbe
+
+SYSTEM_HEALTH_LOG_FIELDS = {
+    "id",
+    "timestamp",
+    "component",
+    "status",
+    "response_time_ms",
+    "cpu_usage_percent",
+    "memory_usage_percent",
+    "disk_usage_percent",
+    "db_connections_active",
+    "db_connections_max",
+    "db_query_avg_time_ms",
+    "vector_db_total_vectors",
+    "vector_db_index_size",
+    "vector_db_query_time_ms",
+    "error_message",
+    "metadata",
+}
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, fail: bool = False) -> None:
+        self.calls = 0
+        self.fail = fail
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("provider unavailable")
+        return [0.0, 1.0, 0.0]
+
+
+async def test_embedding_probe_is_cached(monkeypatch) -> None:
+    """The provider is called once per TTL window."""
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(config, "get_default_embeddings", lambda: embeddings)
+    probe = EmbeddingProbe(ttl=60)
+
+    first = await probe.get()
+    second = await probe.get()
+
+    assert embeddings.calls == 1
+    assert set(first) == SYSTEM_HEALTH_LOG_FIELDS
+    assert first["status"] == "healthy"
+    assert first["metadata"]["dimensions"] == 3
+    assert first["metadata"]["cached"] is False
+    assert second["metadata"]["cached"] is True
+
+
+async def test_embedding_probe_failure_is_degraded(monkeypatch) -> None:
+    """A failing provider degrades the worker instead of taking it down."""
+    embeddings = CountingEmbeddings(fail=True)
+    monkeypatch.setattr(config, "get_default_embeddings", lambda: embeddings)
+
+    result = await EmbeddingProbe(ttl=0).get()
+
+    assert result["status"] == "degraded"
+    assert "provider unavailable" in result["error_message"]
+
+
+async def test_deep_health_reports_unreachable_database(monkeypatch) -> None:
+    """An unreachable database marks the worker down with a 503."""
+    from langconnect.server import APP
+
+    async def unreachable() -> None:
+        raise ConnectionRefusedError("connection refused")
+
+    monkeypatch.setattr(health, "get_db_pool", unreachable)
+    monkeypatch.setattr(config, "get_default_embeddings", CountingEmbeddings)
+    monkeypatch.setattr(health, "embedding_probe", EmbeddingProbe(ttl=60))
+
+    transport = ASGITransport(app=APP)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/health/deep")
+
+    assert response.status_code == 503
+    report = response.json()
+    assert report["status"] == "down"
+    components = {c["component"]: c for c in report["components"]}
+    assert set(components) == {"database", "vector_db", "ai_services"}
+    assert components["database"]["status"] == "down"
+    assert "connection refused" in components["database"]["error_message"]
+    assert components["ai_services"]["status"] == "healthy"
+    for component in components.values():
+        assert set(component) == SYSTEM_HEALTH_LOG_FIELDS
+
+
+async def test_deep_health_reports_the_unpartitioned_table(monkeypatch) -> None:
+    """The default, ordinary embedding table is found with its indexes."""
+    from langconnect.database.connection import get_db_connection
+    from tests.unit_tests.fixtures import get_async_test_client
+
+    monkeypatch.setattr(config, "get_default_embeddings", CountingEmbeddings)
+    monkeypatch.setattr(health, "embedding_probe", EmbeddingProbe(ttl=60))
+
+    async with get_async_test_client() as client:
+        async with get_db_connection() as conn:
+            await conn.execute(
+                "CREATE INDEX test_health_hnsw ON langchain_pg_embedding "
+                "USING hnsw ((embedding::vector(3)) vector_cosine_ops)"
+            )
+        try:
+            response = await client.get("/health/deep")
+        finally:
+            async with get_db_connection() as conn:
+                await conn.execute("DROP INDEX test_health_hnsw")
+
+    assert response.status_code == 200
+    vector_db = next(
+        c for c in response.json()["components"] if c["component"] == "vector_db"
+    )
+    assert vector_db["status"] != "down"
+    assert vector_db["error_message"] is None
+    assert vector_db["vector_db_total_vectors"] == 0
+    assert vector_db["metadata"]["vector_indexes"] == ["test_health_hnsw"]
+    assert vector_db["vector_db_index_size"] > 0
@@ -0,0 +1,86 @@
+"""Import-time budget for the API server.
+
+Heavy dependencies (the OpenAI client, langchain-postgres and the document
+parsers) are constructed lazily, so importing the app must not load them.
+"""
+
+import os
+import subprocess
+import sys
+
+# Generous default so the test catches regressions (eager imports add seconds)
+# without being flaky on slow machines.
+IMPORT_TIME_BUDGET_MS = int(os.environ.get("LANGCONNECT_IMPORT_BUDGET_MS", "5000"))
+
+DEFERRED_MODULES = [
+    "langchain_openai",
+    "langchain_postgres",
+    "pdfplumber",
+    "unstructured",
+    "bs4",
+    "sentence_transformers",
+    "pyarrow",
+    "onnxruntime",
+    "tokenizers",
+]
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return cumulative import time in microseconds for each imported module."""
+    env = {**os.environ, "IS_TESTING": "true"}
+    env.pop("OPENAI_API_KEY", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_server_import_defers_heavy_modules() -> None:
+    """Importing the server must not load embeddings, pgvector or parsers."""
+    times = _import_times("langconnect.server")
+    loaded = [name for name in DEFERRED_MODULES if name in times]
+    assert not loaded, f"Modules imported eagerly: {loaded}"
+
+
+def test_server_import_within_budget() -> None:
+    """Cold import of the server stays within the configured budget."""
+    times = _import_times("langconnect.server")
+    elapsed_ms = times["langconnect.server"] / 1000
+    assert elapsed_ms < IMPORT_TIME_BUDGET_MS, (
+        f"Importing langconnect.server took {elapsed_ms:.0f}ms "
+        f"(budget {IMPORT_TIME_BUDGET_MS}ms)"
+    )
+
+
+def test_parsers_are_built_on_first_use() -> None:
+    """Parsers are only constructed when their mime type is requested."""
+    from langconnect.services.document_processor import (
+        SUPPORTED_MIMETYPES,
+        LazyParserMapping,
+    )
+
+    calls = []
+
+    def factory() -> object:
+        calls.append(1)
+        return object()
+
+    handlers = LazyParserMapping({"text/plain": factory})
+    assert "text/plain" in handlers
+    assert list(handlers) == ["text/plain"]
+    assert not calls
+
+    parser = handlers["text/plain"]
+    assert handlers["text/plain"] is parser
+    assert len(calls) == 1
+    assert "application/pdf" in SUPPORTED_MIMETYPES
@@ -0,0 +1,63 @@
+"""Tests for the production launcher."""
+
+import os
+
+import pytest
+
+from langconnect import config, launcher
+
+
+def test_pool_max_size_splits_budget_across_workers() -> None:
+    """Workers share max_connections minus the reserved connections."""
+    size = launcher.pool_max_size(100, 4, reserved=10, engine_connections=15)
+    assert size == 7
+    assert 4 * (size + 15) + 10 <= 100
+
+
+def test_pool_max_size_rejects_exhausted_budget() -> None:
+    """A budget that leaves no pooled connection is a configuration error."""
+    with pytest.raises(ValueError, match="too small"):
+        launcher.pool_max_size(20, 4, reserved=10, engine_connections=15)
+
+
+def test_size_worker_pools_exports_capped_sizes(monkeypatch) -> None:
+    """Pool sizes are capped by the budget and exported to the workers."""
+    monkeypatch.setenv("POSTGRES_POOL_MAX_SIZE", "")
+    monkeypatch.setenv("POSTGRES_POOL_MIN_SIZE", "")
+    monkeypatch.setattr(config, "POSTGRES_POOL_MAX_SIZE", 50)
+    monkeypatch.setattr(config, "POSTGRES_POOL_MIN_SIZE", 10)
+    monkeypatch.setattr(config, "POSTGRES_RESERVED_CONNECTIONS", 10)
+    monkeypatch.setattr(config, "VECTORSTORE_POOL_SIZE", 5)
+    monkeypatch.setattr(config, "VECTORSTORE_MAX_OVERFLOW", 10)
+
+    launcher.size_worker_pools(workers=4, max_connections=100)
+
+    assert os.environ["POSTGRES_POOL_MAX_SIZE"] == "7"
+    assert os.environ["POSTGRES_POOL_MIN_SIZE"] == "7"
+    assert config.POSTGRES_POOL_MAX_SIZE == 7
+
+
+def test_uvicorn_options_from_arguments() -> None:
+    """Command line arguments map onto uvicorn settings."""
+    args = launcher.parse_args(
+        [
+            "--workers",
+            "3",
+            "--keep-alive",
+            "75",
+            "--backlog",
+            "4096",
+            "--max-requests",
+            "1000",
+            "--max-requests-jitter",
+            "100",
+        ]
+    )
+    options = launcher.uvicorn_options(args)
+
+    assert options["workers"] == 3
+    assert options["timeout_keep_alive"] == 75
+    assert options["backlog"] == 4096
+    assert options["limit_max_requests"] == 1000
+    assert options["loop"] == "auto"
+    assert options["http"] == "auto"
@@ -0,0 +1,91 @@
+"""Tests for start-up warm-up and shutdown of the API server."""
+
+from langconnect import server
+from langconnect.services import warmup
+
+
+async def test_lifespan_warms_up_and_closes(monkeypatch) -> None:
+    """The pool is warmed before serving and drained on shutdown."""
+    calls = []
+
+    async def setup() -> None:
+        calls.append("setup")
+
+    async def warm_db_pool(queries) -> None:
+        calls.append(("warm_db_pool", len(queries)))
+
+    async def warm_up(collection_ids) -> None:
+        calls.append(("warm_up", list(collection_ids)))
+
+    async def close_db_pool(timeout=None) -> None:
+        calls.append(("close_db_pool", timeout))
+
+    monkeypatch.setattr(server.CollectionsManager, "setup", setup)
+    monkeypatch.setattr(server, "warm_db_pool", warm_db_pool)
+    monkeypatch.setattr(server, "warm_up", warm_up)
+    monkeypatch.setattr(server, "close_db_pool", close_db_pool)
+    monkeypatch.setattr(
+        server, "dispose_vectorstore_engines", lambda: calls.append("dispose")
+    )
+    monkeypatch.setattr(server.config, "PRELOAD_COLLECTION_IDS", ["abc"])
+    monkeypatch.setattr(server.reaper, "start", lambda: calls.append("reaper"))
+
+    async def stop_reaper() -> None:
+        calls.append("stop_reaper")
+
+    monkeypatch.setattr(server.reaper, "stop", stop_reaper)
+    monkeypatch.setattr(server.migrator, "start", lambda: calls.append("migrator"))
+
+    async def stop_migrator() -> None:
+        calls.append("stop_migrator")
+
+    monkeypatch.setattr(server.migrator, "stop", stop_migrator)
+    monkeypatch.setattr(server.cloner, "start", lambda: calls.append("cloner"))
+
+    async def stop_cloner() -> None:
+        calls.append("stop_cloner")
+
+    monkeypatch.setattr(server.cloner, "stop", stop_cloner)
+    monkeypatch.setattr(
+        server.snapshot_engine, "start", lambda: calls.append("snapshot_engine")
+    )
+
+    async def stop_snapshot_engine() -> None:
+        calls.append("stop_snapshot_engine")
+
+    monkeypatch.setattr(server.snapshot_engine, "stop", stop_snapshot_engine)
+
+    async with server.lifespan(server.APP):
+        assert calls == [
+            "setup",
+            ("warm_db_pool", len(server.HOT_QUERIES)),
+            ("warm_up", ["abc"]),
+            "reaper",
+            "migrator",
+            "cloner",
+            "snapshot_engine",
+        ]
+    assert calls[7:] == [
+        "stop_snapshot_engine",
+        "stop_cloner",
+        "stop_migrator",
+        "stop_reaper",
+        ("close_db_pool", server.config.SHUTDOWN_TIMEOUT),
+        "dispose",
+    ]
+
+
+async def test_failed_preload_does_not_block_startup(monkeypatch) -> None:
+    """Warm-up failures are logged and swallowed."""
+
+    async def failing_probe() -> dict:
+        raise RuntimeError("provider unavailable")
+
+    def failing_connection():
+        raise ConnectionRefusedError("connection refused")
+
+    monkeypatch.setattr(warmup.embedding_probe, "get", failing_probe)
+    monkeypatch.setattr(warmup, "get_db_connection", failing_connection)
+    monkeypatch.setattr(warmup.config, "STARTUP_EMBEDDING_PROBE", True)
+
+    await warmup.warm_up(["abc", "def"])
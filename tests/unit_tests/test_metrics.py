@@ -0,0 +1,94 @@
+"""Tests for the latency histograms and the /metrics endpoint."""
+
+import threading
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from langconnect.metrics import (
+    STAGE_DURATION,
+    Histogram,
+    MetricsMiddleware,
+    TimedJSONResponse,
+    performance_summaries,
+    render_prometheus,
+    timed,
+)
+
+
+def test_histogram_merges_thread_shards() -> None:
+    """Observations from several threads are summed at exposition."""
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+
+    def worker() -> None:
+        for _ in range(1000):
+            histogram.observe(0.05, "a")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    histogram.observe(5.0, "a")
+
+    snapshot = histogram.collect()[("a",)]
+    assert snapshot.counts == [4000, 0, 1]
+    assert snapshot.max == 5.0
+
+    lines = histogram.expose()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 4000' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 4001' in lines
+    assert 'test_seconds_count{stage="a"} 4001' in lines
+
+
+def test_histogram_quantile_interpolates() -> None:
+    """Quantiles are interpolated within the bucket holding the rank."""
+    histogram = Histogram("q_seconds", "Test.", (), buckets=(1.0, 2.0))
+    assert histogram.quantile([0, 0, 0], 0.5) is None
+    assert histogram.quantile([0, 10, 0], 0.5) == 1.5
+    assert histogram.quantile([10, 0, 0], 0.99) == 0.99
+
+
+async def test_middleware_labels_requests_with_route_template() -> None:
+    """Requests and stages are labelled with the matched route template."""
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str) -> dict:
+        with timed("sql", "semantic"):
+            pass
+        return {"id": item_id}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/items/abc")
+    assert response.status_code == 200
+
+    stages = STAGE_DURATION.collect()
+    assert ("sql", "/items/{item_id}", "semantic") in stages
+    assert ("json_encode", "/items/{item_id}", "") in stages
+
+    output = render_prometheus()
+    assert (
+        'langconnect_http_request_duration_seconds_count{method="GET",'
+        'endpoint="/items/{item_id}",status="200"}'
+    ) in output
+
+    labels = {"stage": "sql", "endpoint": "/items/{item_id}", "search_type": "semantic"}
+    summary = next(s for s in performance_summaries() if s["labels"] == labels)
+    assert summary["metric_type"] == "response_time"
+    assert summary["p50_value"] <= summary["p95_value"] <= summary["p99_value"]
+
+
+async def test_metrics_endpoint() -> None:
+    """The API server exposes Prometheus text on /metrics."""
+    from langconnect.server import APP
+
+    transport = ASGITransport(app=APP)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/health")
+        response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'endpoint="/health"' in response.text
@@ -0,0 +1,65 @@
+"""Tests for hash partitioning of the embedding table."""
+
+import json
+
+from langchain_core.documents import Document
+
+from langconnect.database import partitioning
+from langconnect.database.partitioning import ADD_SQL, migration_sql
+from langconnect.database.vector_storage import create_index_sql, normalize_storage
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.executed: list[tuple] = []
+
+    async def execute(self, query, *args, timeout=None):
+        self.executed.append((query, *args))
+        return "INSERT 0 2"
+
+
+def test_migration_sql_creates_partitions_keyed_by_collection() -> None:
+    statements = migration_sql(4)
+
+    assert "ACCESS EXCLUSIVE" in statements[0]
+    assert "PARTITION BY HASH (collection_id)" in statements[1]
+    partitions = [s for s in statements if "FOR VALUES WITH" in s]
+    assert len(partitions) == 4
+    assert "langchain_pg_embedding_p3" in partitions[-1]
+    assert "MODULUS 4, REMAINDER 3" in partitions[-1]
+    copy = next(s for s in statements if s.strip().startswith("INSERT"))
+    # Shadow vectors are only kept when a migration is copying them back
+    assert "COALESCE(e.embedding_shadow, e.embedding)" in copy
+    assert "flipped_at" in copy
+    assert any("PRIMARY KEY (collection_id, id)" in s for s in statements)
+    assert any("ON DELETE CASCADE" in s for s in statements)
+    assert statements[-len(partitioning.PARTITIONED_INDEXES) :] == list(
+        partitioning.PARTITIONED_INDEXES
+    )
+
+
+async def test_add_documents_upserts_chunks_with_their_vectors() -> None:
+    conn = FakeConnection()
+    documents = [
+        Document("abc", id="chunk-1", metadata={"file_id": "f"}),
+        Document("de", id="chunk-2", metadata={}),
+    ]
+
+    await partitioning.add_documents(conn, "c", documents, [[3.0, 0.5], [2.0, 0.5]])
+
+    [(query, collection_id, sent_ids, vectors, texts, metadata)] = conn.executed
+    assert query == ADD_SQL
+    assert collection_id == "c"
+    assert sent_ids == ["chunk-1", "chunk-2"]
+    assert vectors == ["[3.0,0.5]", "[2.0,0.5]"]
+    assert texts == ["abc", "de"]
+    assert [json.loads(m) for m in metadata] == [{"file_id": "f"}, {}]
+
+
+def test_storage_index_can_target_a_partition() -> None:
+    storage = normalize_storage({"type": "halfvec", "dimensions": 3})
+    collection_id = "4cd0276e-96b5-4e7b-9bb8-ad67319cd95f"
+
+    assert "ON langchain_pg_embedding\n" in create_index_sql(collection_id, storage)
+    sql = create_index_sql(collection_id, storage, "langchain_pg_embedding_p2")
+    assert "ON langchain_pg_embedding_p2\n" in sql
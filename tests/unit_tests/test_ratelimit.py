@@ -0,0 +1,116 @@
+"""Tests for per-user rate limiting and admission control."""
+
+import asyncio
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.exceptions import HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from langconnect import config, ratelimit
+from langconnect.auth import AuthenticatedUser
+from langconnect.ratelimit import RateLimiter, TokenBucket, rate_limited, tier_limits
+
+
+def test_token_bucket_refills_at_rate() -> None:
+    bucket = TokenBucket(rate=2.0, burst=2)
+    now = bucket.updated
+
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+    assert bucket.take(now + 0.5) == pytest.approx(0.5)
+
+
+def test_tier_limits_apply_overrides(monkeypatch) -> None:
+    monkeypatch.setattr(
+        config, "RATE_LIMITS", {"premium": {"search": {"concurrency": 1}}}
+    )
+
+    premium = tier_limits("premium", "search")
+    assert premium["concurrency"] == 1
+    assert premium["rate"] == config.DEFAULT_RATE_LIMITS["premium"]["search"]["rate"]
+    assert (
+        tier_limits("unknown", "ingest")
+        == (config.DEFAULT_RATE_LIMITS["basic"]["ingest"])
+    )
+
+
+async def test_admit_rejects_over_concurrency_and_rate(monkeypatch) -> None:
+    monkeypatch.setattr(
+        config,
+        "RATE_LIMITS",
+        {"basic": {"ingest": {"rate": 0.001, "burst": 2, "concurrency": 1}}},
+    )
+    limiter = RateLimiter()
+    alice = AuthenticatedUser("alice", "Alice")
+    bob = AuthenticatedUser("bob", "Bob")
+
+    async with limiter.admit(alice, "ingest"):
+        with pytest.raises(HTTPException) as busy:
+            async with limiter.admit(alice, "ingest"):
+                pass
+        # Budgets are separate per user and per kind of request
+        async with limiter.admit(bob, "ingest"), limiter.admit(alice, "search"):
+            pass
+    assert busy.value.status_code == 429
+    assert busy.value.headers == {"Retry-After": "1"}
+
+    async with limiter.admit(alice, "ingest"):
+        pass
+    with pytest.raises(HTTPException) as limited:
+        async with limiter.admit(alice, "ingest"):
+            pass
+    assert limited.value.status_code == 429
+    assert int(limited.value.headers["Retry-After"]) > 100
+
+
+async def test_idle_users_are_forgotten() -> None:
+    limiter = RateLimiter(max_tracked=2)
+    for name in ("a", "b"):
+        async with limiter.admit(AuthenticatedUser(name, name), "search"):
+            pass
+    # "a" has been idle long enough for its bucket to refill, "b" has not
+    limiter._budgets[("a", "search")].bucket.updated -= 3600
+
+    async with limiter.admit(AuthenticatedUser("c", "c"), "search"):
+        pass
+    assert set(limiter._budgets) == {("b", "search"), ("c", "search")}
+
+
+async def test_dependency_returns_429_with_retry_after(monkeypatch) -> None:
+    monkeypatch.setattr(config, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(
+        config,
+        "RATE_LIMITS",
+        {"basic": {"search": {"rate": 1.0, "burst": 10, "concurrency": 1}}},
+    )
+    monkeypatch.setattr(ratelimit, "limiter", RateLimiter())
+    release = asyncio.Event()
+
+    app = FastAPI()
+
+    @app.get("/search")
+    async def search(
+        user: Annotated[AuthenticatedUser, Depends(rate_limited("search"))],
+    ) -> dict:
+        await release.wait()
+        return {"user": user.identity}
+
+    headers = {"Authorization": "Bearer user1"}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.get("/search", headers=headers))
+        while not ratelimit.limiter._budgets:
+            await asyncio.sleep(0.01)
+        rejected = await client.get("/search", headers=headers)
+        release.set()
+        accepted = await first
+        again = await client.get("/search", headers=headers)
+
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "1"
+    assert accepted.status_code == 200
+    assert again.status_code == 200
@@ -0,0 +1,91 @@
+"""Tests for the background removal of deleted collections."""
+
+import json
+
+from langconnect.services import reaper as reaper_module
+from langconnect.services.reaper import (
+    DELETE_BATCH_SQL,
+    PENDING_SQL,
+    PROGRESS_SQL,
+    PURGE_SQL,
+    CollectionReaper,
+)
+from tests.unit_tests import fixtures
+
+
+class FakeDatabase(fixtures.FakeDatabase):
+    """In-memory chunks of tombstoned collections."""
+
+    def __init__(self, chunks: dict[str, int], locked: set[str] = frozenset()) -> None:
+        super().__init__(locked)
+        self.chunks = dict(chunks)
+        self.collections = {
+            collection_id: {"deleted_at": "2024-01-01", "vector_storage": None}
+            for collection_id in chunks
+        }
+        self.statements: list[str] = []
+
+    async def fetch(self, query, *args):
+        assert query == PENDING_SQL
+        return [
+            {"uuid": collection_id, "cmetadata": json.dumps(metadata)}
+            for collection_id, metadata in self.collections.items()
+        ]
+
+    async def execute(self, query, *args, timeout=None):
+        if query == DELETE_BATCH_SQL:
+            collection_id, limit = args
+            count = min(limit, self.chunks[collection_id])
+            self.chunks[collection_id] -= count
+            self.statements.append(f"DELETE {count}")
+            return f"DELETE {count}"
+        if query == PROGRESS_SQL:
+            collection_id, deleted = args
+            self.collections[collection_id]["deleted_chunks"] = deleted
+        elif query == PURGE_SQL:
+            del self.collections[args[0]]
+        self.statements.append(query.split()[0])
+        return "OK"
+
+
+def _reaper(vacuum_min_rows: int = 1000) -> CollectionReaper:
+    return CollectionReaper(
+        batch_size=4, pause=0, interval=60, vacuum_min_rows=vacuum_min_rows
+    )
+
+
+async def test_reaper_deletes_in_batches_and_records_progress(monkeypatch) -> None:
+    db = FakeDatabase({"a": 10})
+    fixtures.use_database(monkeypatch, db, reaper_module)
+    progress = []
+    original = db.execute
+
+    async def execute(query, *args, timeout=None):
+        if query == PROGRESS_SQL:
+            progress.append(args[1])
+        return await original(query, *args, timeout=timeout)
+
+    db.execute = execute
+
+    assert await _reaper().run_pending() == 10
+
+    assert progress == [4, 8, 10]
+    assert [s for s in db.statements if s.startswith("DELETE ")] == [
+        "DELETE 4",
+        "DELETE 4",
+        "DELETE 2",
+        "DELETE 0",
+    ]
+    assert db.collections == {}
+    assert "VACUUM" not in db.statements
+
+
+async def test_reaper_skips_collections_locked_by_another_worker(monkeypatch) -> None:
+    db = FakeDatabase({"a": 3, "b": 5}, locked={"reap:a"})
+    fixtures.use_database(monkeypatch, db, reaper_module)
+
+    assert await _reaper(vacuum_min_rows=5).run_pending() == 5
+
+    assert set(db.collections) == {"a"}
+    assert db.chunks["a"] == 3
+    assert db.statements[-1] == "VACUUM"
@@ -0,0 +1,91 @@
+"""Tests for the cross-encoder re-ranker."""
+
+import threading
+
+import pytest
+
+from langconnect.services import reranker as reranker_module
+from langconnect.services.reranker import CrossEncoderReranker, shutdown_reranker
+
+
+class OverlapModel:
+    """Scores a pair by the number of query words found in the text."""
+
+    def __init__(self) -> None:
+        self.pairs: list[tuple[str, str]] = []
+        self.threads: set[str] = set()
+
+    def predict(self, pairs, batch_size):
+        assert len(pairs) <= batch_size
+        self.pairs.extend(pairs)
+        self.threads.add(threading.current_thread().name)
+        return [
+            float(sum(word in text.split() for word in query.split()))
+            for query, text in pairs
+        ]
+
+
+def _reranker(model: OverlapModel, cache_size: int = 100) -> CrossEncoderReranker:
+    return CrossEncoderReranker(
+        "test", batch_size=2, max_workers=2, cache_size=cache_size, model=model
+    )
+
+
+def _results(*texts: str) -> list[dict]:
+    return [
+        {"id": str(i), "page_content": text, "metadata": {}, "score": 0.5}
+        for i, text in enumerate(texts)
+    ]
+
+
+async def test_rerank_orders_by_cross_encoder_score() -> None:
+    model = OverlapModel()
+    results = _results("cats", "red fox jumps", "fox", "dogs", "quick red fox")
+
+    ranked = await _reranker(model).rerank("quick red fox", results, limit=2)
+
+    assert [r["page_content"] for r in ranked] == ["quick red fox", "red fox jumps"]
+    assert [r["score"] for r in ranked] == [3.0, 2.0]
+    # Five pairs in batches of two, scored off the event loop
+    assert len(model.pairs) == 5
+    assert all(name.startswith("rerank") for name in model.threads)
+
+
+async def test_scores_are_cached_per_query_and_chunk() -> None:
+    model = OverlapModel()
+    reranker = _reranker(model)
+    results = _results("red fox", "blue fox")
+
+    await reranker.rerank("fox", results, limit=2)
+    await reranker.rerank("fox", results, limit=1)
+    assert len(model.pairs) == 2
+
+    # A new query or changed content is scored again
+    await reranker.rerank("red", results, limit=1)
+    results[0]["page_content"] = "red fox, edited"
+    await reranker.rerank("fox", results, limit=1)
+    assert len(model.pairs) == 5
+
+
+async def test_cache_is_bounded() -> None:
+    model = OverlapModel()
+    reranker = _reranker(model, cache_size=2)
+
+    scores = await reranker.score("fox", [("1", "fox"), ("2", "a"), ("3", "b")])
+
+    assert scores == [1.0, 0.0, 0.0]
+    assert len(reranker._cache) == 2
+
+
+async def test_shutdown_stops_the_process_wide_reranker(monkeypatch) -> None:
+    reranker = _reranker(OverlapModel())
+    await reranker.rerank("fox", _results("fox"), limit=1)
+    monkeypatch.setattr(reranker_module, "_reranker", reranker)
+
+    shutdown_reranker()
+
+    assert reranker_module._reranker is None
+    with pytest.raises(RuntimeError, match="shutdown"):
+        reranker._executor.submit(print)
+    # Nothing to stop when no re-ranker was created
+    shutdown_reranker()
@@ -0,0 +1,256 @@
+"""Tests for in-process searches over local snapshots of collections."""
+
+import json
+import os
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+
+from langconnect.services import snapshots as snapshots_module
+from langconnect.services.snapshots import (
+    CHANGED_CHUNKS_SQL,
+    CHANGES_SQL,
+    CHUNKS_SQL,
+    COUNT_SQL,
+    VERSION_SQL,
+    SnapshotEngine,
+)
+from langconnect.services.vector_snapshot import VectorSnapshot
+
+RNG = np.random.default_rng(7)
+VECTORS = RNG.normal(size=(50, 6)).astype(np.float32)
+
+
+def _snapshot(tmp_path, dtype: str = "float32") -> VectorSnapshot:
+    snapshot = VectorSnapshot("c", 6, directory=str(tmp_path), dtype=dtype, capacity=8)
+    snapshot.update(
+        (f"c{i}", f"text {i}", {"i": i}, vector.tolist())
+        for i, vector in enumerate(VECTORS)
+    )
+    return snapshot
+
+
+def _exact(query: np.ndarray, k: int) -> list[str]:
+    matrix = VECTORS / np.linalg.norm(VECTORS, axis=1, keepdims=True)
+    scores = matrix @ (query / np.linalg.norm(query))
+    return [f"c{i}" for i in np.argsort(-scores)[:k]]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_search_returns_the_exact_top_k(tmp_path, dtype) -> None:
+    snapshot = _snapshot(tmp_path, dtype)
+    query = RNG.normal(size=6).astype(np.float32)
+
+    results = snapshot.search(query.tolist(), 5)
+
+    assert [doc.id for doc, _ in results] == _exact(query, 5)
+    doc, distance = results[0]
+    assert doc.page_content == f"text {doc.metadata['i']}"
+    expected = 1 - VECTORS[doc.metadata["i"]] @ query / (
+        np.linalg.norm(VECTORS[doc.metadata["i"]]) * np.linalg.norm(query)
+    )
+    assert distance == pytest.approx(expected, abs=1e-2 if dtype == "float16" else 1e-5)
+    snapshot.close()
+
+
+def test_updates_replace_delete_and_compact(tmp_path) -> None:
+    snapshot = _snapshot(tmp_path)
+    query = VECTORS[3]
+
+    snapshot.update([("c3", "new text", {}, (-query).tolist())], deleted=["c4"])
+    assert snapshot.search(query.tolist(), 1)[0][0].id != "c3"
+    assert "c4" not in [doc.id for doc, _ in snapshot.search(VECTORS[4].tolist(), 50)]
+
+    snapshot.update([], deleted=[f"c{i}" for i in range(5, 40)])
+    assert len(snapshot) == 14
+    assert len(snapshot.search(query.tolist(), 50)) == 14
+    assert snapshot.search(VECTORS[45].tolist(), 1)[0][0].id == "c45"
+
+    with pytest.raises(ValueError, match="dimensions"):
+        snapshot.update([("c1", "", {}, [1.0, 2.0])])
+    snapshot.close()
+    assert snapshot.search(query.tolist(), 1) is None
+    assert not list(tmp_path.iterdir())
+
+
+class FakeDatabase:
+    """A change log and the current chunks of one collection."""
+
+    def __init__(self, version: int, changes: dict[int, list[str]], chunks: dict):
+        self.version = version
+        self.changes = changes
+        self.chunks = chunks
+
+    @asynccontextmanager
+    async def transaction(self, **options):
+        yield
+
+    async def fetchval(self, query, collection_id):
+        assert query == VERSION_SQL
+        return self.version
+
+    async def fetchrow(self, query, collection_id, since):
+        assert query == CHANGES_SQL
+        versions = [v for v in self.changes if v > since]
+        ids = {i for v in versions for i in self.changes[v]}
+        return {"versions": len(versions), "ids": sorted(ids)}
+
+    async def fetch(self, query, collection_id, ids):
+        assert query == CHANGED_CHUNKS_SQL
+        return [
+            {
+                "id": i,
+                "document": self.chunks[i][0],
+                "metadata": json.dumps({}),
+                "embedding": self.chunks[i][1],
+            }
+            for i in ids
+            if i in self.chunks
+        ]
+
+
+def _engine(monkeypatch, tmp_path, db: FakeDatabase) -> SnapshotEngine:
+    @asynccontextmanager
+    async def get_db_connection():
+        yield db
+
+    monkeypatch.setattr(snapshots_module, "get_db_connection", get_db_connection)
+    return SnapshotEngine(
+        max_chunks=100,
+        max_collections=2,
+        dtype="float32",
+        directory=str(tmp_path),
+        interval=60,
+        retention=3600,
+    )
+
+
+async def test_stale_snapshots_fall_back_then_catch_up(monkeypatch, tmp_path) -> None:
+    db = FakeDatabase(
+        12,
+        {11: ["c1"], 12: ["c2", "new"]},
+        {"c1": ("moved", VECTORS[0].tolist()), "new": ("new", VECTORS[9].tolist())},
+    )
+    engine = _engine(monkeypatch, tmp_path, db)
+    snapshot = _snapshot(tmp_path)
+    snapshot.version = 10
+    engine._snapshots["c"] = snapshot
+    requested = []
+    monkeypatch.setattr(engine, "request", lambda *args: requested.append(args))
+
+    assert await engine.search("c", 12, VECTORS[0].tolist(), 2) is None
+    assert requested == [("c", 12)]
+
+    await engine.refresh("c")
+
+    assert snapshot.version == 12
+    assert len(snapshot) == 50
+    results = await engine.search("c", 12, VECTORS[9].tolist(), 2)
+    assert {doc.id for doc, _ in results} == {"c9", "new"}
+    assert "c2" not in [doc.id for doc, _ in snapshot.search(VECTORS[2].tolist(), 50)]
+    await engine.stop()
+
+
+async def test_pruned_change_log_rebuilds_the_snapshot(monkeypatch, tmp_path) -> None:
+    db = FakeDatabase(12, {12: ["c1"]}, {})
+    engine = _engine(monkeypatch, tmp_path, db)
+    snapshot = _snapshot(tmp_path)
+    snapshot.version = 10
+    rebuilt = []
+
+    async def build(collection_id):
+        rebuilt.append(collection_id)
+
+    monkeypatch.setattr(engine, "_build", build)
+    engine._snapshots["c"] = snapshot
+
+    await engine.refresh("c")
+
+    assert rebuilt == ["c"]
+    assert snapshot.version == 10
+    snapshot.close()
+
+
+async def test_unlogged_version_rebuilds_the_snapshot(monkeypatch, tmp_path) -> None:
+    """The flip of an embedding migration bumps the version without a change."""
+    db = FakeDatabase(13, {11: ["c1"], 13: ["c2"]}, {})
+    engine = _engine(monkeypatch, tmp_path, db)
+    snapshot = _snapshot(tmp_path)
+    snapshot.version = 10
+    rebuilt = []
+
+    async def build(collection_id):
+        rebuilt.append(collection_id)
+
+    monkeypatch.setattr(engine, "_build", build)
+    engine._snapshots["c"] = snapshot
+
+    await engine.refresh("c")
+
+    assert rebuilt == ["c"]
+    assert snapshot.version == 10
+    snapshot.close()
+
+
+class BuildDatabase(FakeDatabase):
+    """Chunks read by a build, in batches of two; ``on_fetch`` runs before each."""
+
+    def __init__(self, version: int, chunks: dict, on_fetch) -> None:
+        super().__init__(version, {}, chunks)
+        self.on_fetch = on_fetch
+
+    async def fetchval(self, query, collection_id):
+        if query == COUNT_SQL:
+            return len(self.chunks)
+        return await super().fetchval(query, collection_id)
+
+    async def cursor(self, query, collection_id):
+        assert query == CHUNKS_SQL
+        rows = [
+            {"id": i, "document": text, "metadata": "{}", "embedding": vector}
+            for i, (text, vector) in self.chunks.items()
+        ]
+        db = self
+
+        class Cursor:
+            async def fetch(self, n):
+                nonlocal rows
+                db.on_fetch()
+                batch, rows = rows[:n], rows[n:]
+                return batch
+
+        return Cursor()
+
+
+async def test_rebuild_replaces_a_snapshot_being_searched(
+    monkeypatch, tmp_path
+) -> None:
+    """The new, smaller snapshot gets its own file while the old one is searched."""
+    old = _snapshot(tmp_path)
+    query = VECTORS[5].tolist()
+    expected = [doc.id for doc, _ in old.search(query, 3)]
+    searched = []
+
+    def search_old() -> None:
+        searched.append([doc.id for doc, _ in old.search(query, 3)])
+
+    chunks = {f"n{i}": (f"new {i}", VECTORS[i].tolist()) for i in range(3)}
+    engine = _engine(monkeypatch, tmp_path, BuildDatabase(20, chunks, search_old))
+    monkeypatch.setattr(snapshots_module, "BUILD_BATCH_SIZE", 2)
+    old.version = 10
+    engine._snapshots["c"] = old
+
+    await engine.refresh("c")
+
+    # Searched again once the new snapshot's file was written
+    assert len(searched) == 3
+    assert all(ids == expected for ids in searched)
+    new = engine._snapshots["c"]
+    assert new is not old and new.version == 20
+    assert old.search(query, 3) is None
+    assert [path.name for path in tmp_path.iterdir()] == [os.path.basename(new.path)]
+    results = await engine.search("c", 20, VECTORS[1].tolist(), 1)
+    assert results[0][0].id == "n1"
+    await engine.stop()
+    assert not list(tmp_path.iterdir())
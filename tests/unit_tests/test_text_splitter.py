@@ -0,0 +1,86 @@
+"""Tests for the offset-based recursive text splitter."""
+
+import random
+import re
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from langconnect import config
+from langconnect.services.text_splitter import RecursiveTextSplitter, get_splitter
+
+PIECES = ["lorem", "ipsum", "a", " ", "  ", "\n", "\n\n", "\t", "\r\n", "文字"]
+
+
+def _random_texts(count: int, seed: int = 0) -> list[tuple[str, int, int]]:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 300)))
+        chunk_size = rng.randint(1, 60)
+        cases.append((text, chunk_size, rng.randint(0, chunk_size)))
+    return cases
+
+
+@pytest.mark.parametrize(
+    ("text", "chunk_size", "chunk_overlap"),
+    [
+        ("", 10, 2),
+        ("\n\n\n\nword", 4, 0),
+        ("one two three four five six seven", 10, 10),
+        ("a" * 50 + " " + "b" * 7, 8, 3),
+        ("文字" * 40, 7, 2),
+        ("x\ny", 1, 0),
+    ],
+)
+def test_matches_langchain_on_edge_cases(text, chunk_size, chunk_overlap) -> None:
+    expected = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    ).split_text(text)
+
+    assert RecursiveTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected
+
+
+def test_matches_langchain_on_random_text() -> None:
+    for text, chunk_size, chunk_overlap in _random_texts(500):
+        expected = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        ).split_text(text)
+        actual = RecursiveTextSplitter(chunk_size, chunk_overlap).split_text(text)
+        assert actual == expected, (text, chunk_size, chunk_overlap)
+
+
+def test_matches_langchain_with_length_function() -> None:
+    def words(text: str) -> int:
+        return len(re.findall(r"\w+|\S", text))
+
+    for text, chunk_size, chunk_overlap in _random_texts(200, seed=1):
+        expected = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=words
+        ).split_text(text)
+        actual = RecursiveTextSplitter(
+            chunk_size, chunk_overlap, length_function=words
+        ).split_text(text)
+        assert actual == expected, (text, chunk_size, chunk_overlap)
+
+
+def test_split_documents_copies_metadata() -> None:
+    metadata = {"source": "a.txt", "tags": ["x"]}
+    docs = RecursiveTextSplitter(5, 0).split_documents(
+        [Document(page_content="aaaa bbbb cccc", metadata=metadata)]
+    )
+
+    assert [doc.page_content for doc in docs] == ["aaaa", "bbbb", "cccc"]
+    docs[0].metadata["tags"].append("y")
+    assert docs[1].metadata == metadata
+
+
+def test_get_splitter_is_shared_and_validated(monkeypatch) -> None:
+    assert get_splitter(100, 10) is get_splitter(100, 10)
+    with pytest.raises(ValueError):
+        get_splitter(10, 20)
+
+    monkeypatch.setattr(config, "CHUNK_SIZE_UNIT", "lines")
+    with pytest.raises(ValueError):
+        get_splitter(100, 10)
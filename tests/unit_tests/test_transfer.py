@@ -0,0 +1,192 @@
+"""Tests for collection export and import."""
+
+import io
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from langconnect.database.partitioning import IS_PARTITIONED_SQL
+from langconnect.services import transfer
+from langconnect.services.transfer import (
+    EXPORT_SQL,
+    INSERT_STAGED_SQL,
+    STAGING_SQL,
+    STAGING_TABLE,
+    TRUNCATE_STAGING_SQL,
+)
+
+pytest.importorskip("pyarrow")
+
+ROWS = [
+    {
+        "id": f"chunk-{i}",
+        "document": f"text {i}",
+        "metadata": json.dumps({"file_id": f"f{i % 2}"}),
+        "embedding": [float(i), 0.5, -1.0],
+    }
+    for i in range(5)
+]
+
+
+class FakeCursor:
+    def __init__(self, rows: list[dict]) -> None:
+        self.rows = list(rows)
+
+    async def fetch(self, n: int) -> list[dict]:
+        batch, self.rows = self.rows[:n], self.rows[n:]
+        return batch
+
+
+class FakeConnection:
+    def __init__(self, rows: list[dict] = (), partitioned: bool = False) -> None:
+        self.rows = rows
+        self.partitioned = partitioned
+        self.transactions: list[dict] = []
+        self.copied: list[list[tuple]] = []
+        self.statements: list[str] = []
+
+    @asynccontextmanager
+    async def transaction(self, **options):
+        self.transactions.append(options)
+        yield
+
+    async def cursor(self, query, collection_id):
+        assert query == EXPORT_SQL
+        return FakeCursor(self.rows)
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        assert table == STAGING_TABLE
+        assert columns == ("id", "document", "cmetadata", "embedding")
+        self.copied.append(records)
+
+    async def fetchval(self, query):
+        assert query == IS_PARTITIONED_SQL
+        return self.partitioned
+
+    async def execute(self, query, *args, timeout=None):
+        self.statements.append(query)
+        if query.startswith(INSERT_STAGED_SQL.split("{")[0]):
+            return f"INSERT 0 {len(self.copied[-1]) - 1}"
+        return "OK"
+
+
+async def _export(monkeypatch, format: str) -> io.BytesIO:
+    conn = FakeConnection(ROWS)
+
+    @asynccontextmanager
+    async def get_db_connection(replica=False):
+        yield conn
+
+    monkeypatch.setattr(transfer, "get_db_connection", get_db_connection)
+    chunks = [
+        chunk
+        async for chunk in transfer.export_collection(
+            "c",
+            format=format,
+            embedding_model="model-1",
+            collection_name="docs",
+            batch_size=2,
+        )
+    ]
+    # A consistent snapshot, and a chunk per batch plus the footer
+    assert conn.transactions == [{"isolation": "repeatable_read", "readonly": True}]
+    assert len(chunks) == 4
+    return io.BytesIO(b"".join(chunks))
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+async def test_export_round_trips_through_import(monkeypatch, format) -> None:
+    file = await _export(monkeypatch, format)
+    assert transfer.detect_format(file) == format
+
+    schema, batches = transfer.read_batches(file, batch_size=2)
+    assert transfer.model_of_export(schema) == "model-1"
+
+    conn = FakeConnection()
+    result = await transfer.import_batches(conn, "target", batches, 3)
+
+    assert result == {"chunks_read": 5, "chunks_imported": 2}
+    assert [record for batch in conn.copied for record in batch] == [
+        (row["id"], row["document"], row["metadata"], row["embedding"]) for row in ROWS
+    ]
+    assert conn.statements[0] == STAGING_SQL
+    assert conn.statements.count(TRUNCATE_STAGING_SQL) == 3
+    assert INSERT_STAGED_SQL.format(conflict_target="(id)") in conn.statements
+
+
+async def test_import_conflicts_on_the_key_of_a_partitioned_table(monkeypatch) -> None:
+    """The conflict target follows the table, not EMBEDDING_PARTITIONS."""
+    file = await _export(monkeypatch, "arrow")
+    _, batches = transfer.read_batches(file, batch_size=2)
+    conn = FakeConnection(partitioned=True)
+
+    await transfer.import_batches(conn, "target", batches, 3)
+
+    insert = INSERT_STAGED_SQL.format(conflict_target="(collection_id, id)")
+    assert conn.statements.count(insert) == 3
+
+
+@pytest.mark.parametrize("dimensions", [4, None])
+async def test_import_rejects_embeddings_of_other_dimensions(
+    monkeypatch, dimensions
+) -> None:
+    file = await _export(monkeypatch, "arrow")
+    _, batches = transfer.read_batches(file, batch_size=2)
+    # The last batch of an export into an empty collection disagrees
+    batches = (
+        batch if i < 2 else batch.set_column(3, "embedding", [[1.0, 2.0]])
+        for i, batch in enumerate(batches)
+    )
+    conn = FakeConnection()
+
+    with pytest.raises(ValueError, match="Expected embeddings of"):
+        await transfer.import_batches(conn, "target", batches, dimensions)
+
+    assert len(conn.copied) == (0 if dimensions else 2)
+
+
+async def test_import_rejects_chunks_without_an_embedding(monkeypatch) -> None:
+    file = await _export(monkeypatch, "arrow")
+    _, batches = transfer.read_batches(file, batch_size=2)
+    batches = (
+        batch if i < 2 else batch.set_column(3, "embedding", [None])
+        for i, batch in enumerate(batches)
+    )
+    conn = FakeConnection()
+
+    with pytest.raises(ValueError, match="without an embedding"):
+        await transfer.import_batches(conn, "target", batches)
+
+
+async def test_import_rejects_ids_repeated_in_a_batch(monkeypatch) -> None:
+    file = await _export(monkeypatch, "arrow")
+    _, batches = transfer.read_batches(file, batch_size=2)
+    batches = (
+        batch.set_column(0, "id", [batch.column(0)[0]] * len(batch))
+        for batch in batches
+    )
+    conn = FakeConnection()
+
+    with pytest.raises(ValueError, match="repeats chunk id"):
+        await transfer.import_batches(conn, "target", batches, 3)
+
+    assert conn.copied == []
+
+
+def test_read_batches_rejects_other_files() -> None:
+    with pytest.raises(ValueError, match="Parquet"):
+        transfer.read_batches(io.BytesIO(b"id,document\n1,a\n"))
+
+
+def test_read_batches_requires_the_embedding_model() -> None:
+    import pyarrow as pa
+
+    arrow_schema = transfer.schema("model-1", "docs").with_metadata({})
+    file = io.BytesIO()
+    with pa.ipc.new_stream(file, arrow_schema):
+        pass
+    file.seek(0)
+
+    with pytest.raises(ValueError, match="embedding model"):
+        transfer.read_batches(file)
@@ -0,0 +1,91 @@
+import pytest
+
+from langconnect.database.vector_storage import (
+    create_index_sql,
+    index_name,
+    normalize_storage,
+    search_sql,
+    storage_of,
+)
+
+COLLECTION_ID = "6f1c2c57-3a6b-4a52-9d2e-7b9f6f0c1e11"
+
+
+def test_normalize_storage_fills_default_candidates() -> None:
+    assert normalize_storage({"type": "binary", "dimensions": 1536}) == {
+        "type": "binary",
+        "dimensions": 1536,
+        "candidates": 4,
+    }
+    assert normalize_storage({"type": "halfvec", "dimensions": 1536})["candidates"] == 1
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"type": "pq", "dimensions": 1536},
+        {"type": "halfvec"},
+        {"type": "matryoshka", "dimensions": 1536},
+        {"type": "matryoshka", "dimensions": 1536, "truncate_to": 1536},
+        {"type": "halfvec", "dimensions": 1536, "truncate_to": 512},
+        {"type": "vector", "dimensions": 3072},
+        {"type": "binary", "dimensions": 1536, "candidates": 1000},
+    ],
+)
+def test_normalize_storage_rejects_invalid_options(options: dict) -> None:
+    with pytest.raises(ValueError):
+        normalize_storage(options)
+
+
+def test_storage_of_reads_collection_metadata() -> None:
+    assert storage_of({"owner_id": "user"}) is None
+    storage = storage_of(
+        {
+            "vector_storage": {
+                "type": "matryoshka",
+                "dimensions": 1536,
+                "truncate_to": 256,
+            }
+        }
+    )
+    assert storage == {
+        "type": "matryoshka",
+        "dimensions": 1536,
+        "candidates": 2,
+        "truncate_to": 256,
+    }
+
+
+def test_index_is_partial_on_the_collection() -> None:
+    storage = normalize_storage({"type": "halfvec", "dimensions": 1536})
+    sql = create_index_sql(COLLECTION_ID, storage)
+
+    name = index_name(COLLECTION_ID, "halfvec")
+    assert len(name) <= 63
+    assert f"IF NOT EXISTS {name}" in sql
+    assert "USING hnsw (((embedding)::halfvec(1536)) halfvec_cosine_ops)" in sql
+    assert f"WHERE collection_id = '{COLLECTION_ID}'::uuid" in sql
+
+
+def test_search_orders_by_the_indexed_expression() -> None:
+    # The query must repeat the index expression and predicate verbatim
+    for options, expression in [
+        ({"type": "binary", "dimensions": 8}, "binary_quantize(embedding)::bit(8)"),
+        (
+            {"type": "matryoshka", "dimensions": 8, "truncate_to": 4},
+            "subvector(embedding, 1, 4)::vector(4)",
+        ),
+    ]:
+        storage = normalize_storage(options)
+        index_sql = create_index_sql(COLLECTION_ID, storage)
+        sql = search_sql(COLLECTION_ID, storage)
+        assert expression in index_sql
+        assert f"ORDER BY {expression}" in sql
+        assert f"WHERE collection_id = '{COLLECTION_ID}'::uuid" in sql
+        assert "embedding <=> $1::vector AS score" in sql
+
+
+def test_collection_id_must_be_a_uuid() -> None:
+    storage = normalize_storage({"type": "halfvec", "dimensions": 8})
+    with pytest.raises(ValueError):
+        search_sql("x'; DROP TABLE langchain_pg_embedding; --", storage)